@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark waktu render peta ODP untuk berbagai jumlah ODP.
+
+ODP sintetis disebar acak dalam radius pencarian dengan kategori acak, dan
+setiap ODP diberi rute berbentuk tangga dari titik referensi (mirip rute di
+jaringan jalan kota). Peta dirender tanpa gambar latar Mapbox sehingga yang
+diukur hanya penggambaran: untuk renderer matplotlib waktu membangun artist,
+waktu savefig dan jumlah artist di axes; untuk renderer raster waktu total.
+
+Contoh:
+    python benchmark_map_render.py
+    python benchmark_map_render.py --counts 10 100 500 --repeat 3 --street
+    python benchmark_map_render.py --renderer raster
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from odp_dataset import LAT_COLUMN, LNG_COLUMN, NAME_COLUMN, KATEGORI_COLUMN
+from odp_route_geometry import route_column, METERS_PER_DEGREE
+from odp_map_render import get_renderer
+
+# Titik referensi (Banjarmasin)
+CENTER_LAT = -3.3172
+CENTER_LNG = 114.5921
+
+
+def staircase_route(rng, lat, lng):
+    """Rute [[lng, lat], ...] dari titik referensi ke ODP lewat beberapa belokan, titik setiap ~10 m."""
+    turns = rng.integers(1, 4)
+    corners = [(CENTER_LNG, CENTER_LAT)]
+    for step in range(1, turns + 1):
+        fraction = step / (turns + 1)
+        previous = corners[-1]
+        if step % 2:
+            corners.append((CENTER_LNG + (lng - CENTER_LNG) * fraction, previous[1]))
+        else:
+            corners.append((previous[0], CENTER_LAT + (lat - CENTER_LAT) * fraction))
+    corners.append((lng, corners[-1][1]))
+    corners.append((lng, lat))
+
+    points = []
+    for (x0, y0), (x1, y1) in zip(corners[:-1], corners[1:]):
+        meters = np.hypot(x1 - x0, y1 - y0) * METERS_PER_DEGREE
+        steps = max(int(meters / 10), 1)
+        t = np.arange(steps) / steps
+        points.extend(zip(x0 + (x1 - x0) * t, y0 + (y1 - y0) * t))
+    points.append((lng, lat))
+    return np.array(points, dtype=np.float32)
+
+
+def synthetic_odps(count, radius_meters, seed=1):
+    """DataFrame ODP sintetis seperti hasil find_nearby_odps (dengan geometri rute)."""
+    rng = np.random.default_rng(seed)
+    distance = radius_meters * np.sqrt(rng.uniform(0, 1, count))
+    angle = rng.uniform(0, 2 * np.pi, count)
+    lats = CENTER_LAT + distance * np.sin(angle) / METERS_PER_DEGREE
+    lngs = CENTER_LNG + distance * np.cos(angle) / (METERS_PER_DEGREE * np.cos(np.radians(CENTER_LAT)))
+    routes = [staircase_route(rng, lat, lng) for lat, lng in zip(lats, lngs)]
+    route_meters = [float(np.hypot(*np.diff(route, axis=0).T).sum() * METERS_PER_DEGREE) for route in routes]
+
+    frame = pd.DataFrame({
+        NAME_COLUMN: [f"ODP-BJM-FAB/{i:03d}" for i in range(count)],
+        LAT_COLUMN: lats,
+        LNG_COLUMN: lngs,
+        KATEGORI_COLUMN: rng.choice(["HIJAU", "KUNING", "MERAH", "HITAM"], count),
+        'jarak_meter': distance,
+        'jarak_rute_meter': np.minimum(route_meters, radius_meters * 0.99),
+        'rute_valid': True,
+    })
+    frame['jarak_tampil'] = frame['jarak_rute_meter']
+    frame['koordinat_rute'] = route_column(routes)
+    return frame.sort_values('jarak_rute_meter').reset_index(drop=True)
+
+
+class SavefigTimer:
+    """Catat waktu savefig dan jumlah artist di axes saat render berlangsung."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.artists = 0
+
+    def __enter__(self):
+        self._savefig = Figure.savefig
+        timer = self
+
+        def savefig(figure, *args, **kwargs):
+            timer.artists = sum(len(ax.get_children()) for ax in figure.axes)
+            started = time.perf_counter()
+            try:
+                return timer._savefig(figure, *args, **kwargs)
+            finally:
+                timer.seconds += time.perf_counter() - started
+
+        Figure.savefig = savefig
+        return self
+
+    def __exit__(self, *exc):
+        Figure.savefig = self._savefig
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark waktu render peta ODP')
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 100, 500], help='Jumlah ODP per peta')
+    parser.add_argument('--radius', type=int, default=500, help='Radius pencarian (meter)')
+    parser.add_argument('--repeat', type=int, default=3, help='Jumlah render per ukuran')
+    parser.add_argument('--street', action='store_true', help='Gaya peta jalan (default: satelit)')
+    parser.add_argument('--no-routes', action='store_true', help='Tanpa rute')
+    parser.add_argument('--renderer', choices=['matplotlib', 'raster'], default='matplotlib', help='Renderer peta')
+    args = parser.parse_args()
+    render = get_renderer(args.renderer)
+
+    print(f"{'ODP':>6} {'total ms':>10} {'artist ms':>10} {'savefig ms':>11} {'artist':>8} {'PNG KB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.counts:
+            frame = synthetic_odps(count, args.radius)
+            totals, draws, artists, sizes = [], [], 0, []
+            for i in range(args.repeat):
+                path = os.path.join(tmp, f"map_{count}_{i}.png")
+                with SavefigTimer() as timer:
+                    started = time.perf_counter()
+                    render(CENTER_LAT, CENTER_LNG, frame, path, radius_meters=args.radius,
+                           max_display=count, with_routes=not args.no_routes,
+                           use_satellite=not args.street)
+                    totals.append(time.perf_counter() - started)
+                draws.append(timer.seconds)
+                artists = timer.artists
+                sizes.append(os.path.getsize(path))
+            total = np.median(totals) * 1000
+            draw = np.median(draws) * 1000
+            print(f"{count:>6} {total:10.0f} {total - draw:10.0f} {draw:11.0f} {artists:>8} "
+                  f"{np.mean(sizes) / 1024:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark memori per ODP untuk berbagai representasi data.
+
+Membandingkan DataFrame mentah dari read_csv (cara lama menyimpan data
+spreadsheet) dengan representasi ringkas dari odp_dataset: hanya kolom
+yang dipakai bot, KATEGORI ODP dan nomor ODP sebagai categorical, AVAI
+sebagai Int16, serta opsi koordinat float32. Ukuran snapshot di disk
+(store yang di-memory-map) juga ditampilkan.
+
+Puncak memori ingest_csv (odp_ingest) diukur dengan tracemalloc dan
+dibandingkan dengan memori yang tersisa setelah dataset selesai dibuat.
+
+Contoh:
+    python benchmark_odp_memory.py --rows 50000
+    python benchmark_odp_memory.py --csv static/odp_data.csv
+"""
+
+import os
+import argparse
+import tempfile
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from odp_dataset import prepare_dataset, CORE_COLUMNS, NAME_COLUMN, LAT_COLUMN, LNG_COLUMN, AVAI_COLUMN, KATEGORI_COLUMN
+from odp_snapshot import write_snapshot
+from odp_ingest import ingest_csv, CHUNK_ROWS
+
+
+def generate_sheet(rows, seed=1):
+    """Buat CSV sintetis dengan kolom seperti spreadsheet ODP (termasuk kolom yang tidak dipakai bot)."""
+    rng = np.random.default_rng(seed)
+    stos = np.array(["BJM", "BJB", "MTP", "PLE", "KYG", "BLN"])
+    sto = stos[rng.integers(0, len(stos), rows)]
+    df = pd.DataFrame({
+        NAME_COLUMN: [f"ODP-{s}-FAB/{i % 1000:03d}" for i, s in enumerate(sto)],
+        LAT_COLUMN: -3.3 + rng.uniform(-0.3, 0.3, rows),
+        LNG_COLUMN: 114.6 + rng.uniform(-0.3, 0.3, rows),
+        AVAI_COLUMN: rng.integers(0, 9, rows),
+        KATEGORI_COLUMN: rng.choice(["HIJAU", "KUNING", "MERAH", "HITAM"], rows),
+        "STO": sto,
+        "ALAMAT": [f"Jl. Ahmad Yani Km {i % 40} No. {i % 200}" for i in range(rows)],
+        "KETERANGAN": rng.choice(["", "Tiang baru", "Perlu pengecekan", "OK"], rows),
+        "TANGGAL UPDATE": rng.choice(["2024-01-05", "2024-02-11", "2024-03-20"], rows),
+    })
+    return df.to_csv(index=False)
+
+
+def frame_bytes(frame):
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+def index_bytes(index):
+    cells = sum(members.nbytes for members in index.cells.values())
+    return int(index.lats.nbytes + index.lngs.nbytes + cells)
+
+
+def snapshot_bytes(dataset):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_snapshot(tmp, dataset.live_frame())
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def ingest_peak(text, chunk_rows, columns=CORE_COLUMNS):
+    """
+    Memori ingest_csv menurut tracemalloc.
+
+    Returns:
+        tuple (peak_bytes, retained_bytes, rows)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sheet.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        tracemalloc.start()
+        try:
+            dataset = ingest_csv(path, columns, chunk_rows=chunk_rows)
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return peak, retained, len(dataset.frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark memori per ODP')
+    parser.add_argument('--rows', type=int, default=20000, help='Jumlah ODP sintetis')
+    parser.add_argument('--csv', help='Gunakan file CSV ekspor spreadsheet alih-alih data sintetis')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Ukuran potongan ingest_csv')
+    args = parser.parse_args()
+
+    if args.csv:
+        with open(args.csv, encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = generate_sheet(args.rows)
+
+    raw = pd.read_csv(StringIO(text))
+    rows = len(raw)
+
+    results = [("DataFrame mentah (semua kolom, cara lama)", frame_bytes(raw), 0, None)]
+    for label, columns, float32 in [
+        ("Ringkas, semua kolom", None, False),
+        ("Ringkas, kolom bot saja", CORE_COLUMNS, False),
+        ("Ringkas, kolom bot + koordinat float32", CORE_COLUMNS, True),
+    ]:
+        dataset = prepare_dataset(raw, columns=columns, float32_coordinates=float32)
+        results.append((label, frame_bytes(dataset.frame), index_bytes(dataset.index), snapshot_bytes(dataset)))
+
+    print(f"Jumlah ODP: {rows}\n")
+    print(f"{'Representasi':<42} {'frame B/ODP':>12} {'indeks B/ODP':>13} {'snapshot B/ODP':>15}")
+    for label, frame_size, index_size, snap_size in results:
+        snap_text = f"{snap_size / rows:15.1f}" if snap_size is not None else f"{'-':>15}"
+        print(f"{label:<42} {frame_size / rows:12.1f} {index_size / rows:13.1f} {snap_text}")
+
+    peak, retained, ingested = ingest_peak(text, args.chunk_rows)
+    print(f"\ningest_csv (kolom bot, potongan {args.chunk_rows} baris, {ingested} ODP):")
+    print(f"  puncak memori   {peak / 1e6:8.1f} MB  ({peak / ingested:.1f} B/ODP)")
+    print(f"  tersisa (hasil) {retained / 1e6:8.1f} MB  ({retained / ingested:.1f} B/ODP)")
+    print(f"  puncak / hasil  {peak / retained:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
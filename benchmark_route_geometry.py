@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark memori geometri rute untuk berbagai representasi.
+
+Membandingkan list [[lng, lat], ...] hasil JSON provider (cara lama
+menyimpan kolom koordinat_rute) dengan array float32 dan penyederhanaan
+Douglas-Peucker dari odp_route_geometry, serta ukuran blob int32 di cache
+rute. Jumlah titik yang digambar setelah penyederhanaan sesuai ukuran
+piksel peta juga ditampilkan.
+
+Rute sintetis meniru geometri ORS di kota: ruas lurus dengan titik setiap
+8-25 m, tikungan, dan belokan di persimpangan. Dengan --graph, rute diambil
+dari graf jalan lokal (odp_road_graph) antara titik-titik acak.
+
+Contoh:
+    python benchmark_route_geometry.py --routes 500
+    python benchmark_route_geometry.py --graph data/road_graph.npz --routes 200
+"""
+
+import sys
+import math
+import time
+import argparse
+
+import numpy as np
+
+from odp_route_cache import encode_geometry
+from odp_route_geometry import route_array, simplify_route, ROUTE_SIMPLIFY_METERS, METERS_PER_DEGREE
+
+# Titik pusat rute sintetis (Banjarmasin)
+CENTER_LAT = -3.3172
+CENTER_LNG = 114.5921
+
+# Lebar area gambar peta bot dalam piksel (figure 15 inci x 200 dpi, dikurangi margin)
+MAP_WIDTH_PIXELS = 2300
+
+
+def synthetic_route(rng, length_meters):
+    """Rute sintetis [[lng, lat], ...] sepanjang kira-kira length_meters."""
+    x, y = rng.uniform(-500, 500, 2)
+    heading = rng.uniform(0, 2 * math.pi)
+    points = [(x, y)]
+    travelled = 0.0
+    while travelled < length_meters:
+        if rng.random() < 0.25:
+            # Tikungan: busur dengan jari-jari 30-80 m, titik setiap 3-5 m
+            radius = rng.uniform(30, 80)
+            sweep = rng.uniform(0.3, 1.2) * rng.choice([-1, 1])
+            steps = max(int(abs(sweep) * radius / rng.uniform(3, 5)), 2)
+            for _ in range(steps):
+                heading += sweep / steps
+                x += math.cos(heading) * abs(sweep) * radius / steps
+                y += math.sin(heading) * abs(sweep) * radius / steps
+                points.append((x, y))
+            travelled += abs(sweep) * radius
+        else:
+            # Ruas lurus: simpul OSM setiap 8-25 m dengan simpangan kecil
+            segment = rng.uniform(40, 250)
+            spacing = rng.uniform(8, 25)
+            for _ in range(max(int(segment / spacing), 1)):
+                x += math.cos(heading) * spacing
+                y += math.sin(heading) * spacing
+                jitter = rng.normal(0, 0.3)
+                points.append((x - math.sin(heading) * jitter, y + math.cos(heading) * jitter))
+            travelled += segment
+            # Belok di persimpangan atau sedikit berbelok mengikuti jalan
+            heading += rng.choice([-math.pi / 2, math.pi / 2]) if rng.random() < 0.4 else rng.normal(0, 0.15)
+
+    lat_scale = 1 / METERS_PER_DEGREE
+    lng_scale = lat_scale / math.cos(math.radians(CENTER_LAT))
+    return [[CENTER_LNG + px * lng_scale, CENTER_LAT + py * lat_scale] for px, py in points]
+
+
+def synthetic_routes(count, seed=1):
+    rng = np.random.default_rng(seed)
+    return [synthetic_route(rng, rng.uniform(200, 2000)) for _ in range(count)]
+
+
+def graph_routes(path, count, seed=1):
+    """Rute dari graf jalan lokal: dari simpul acak ke titik acak dalam ~1 km."""
+    from odp_road_graph import RoadGraph
+
+    graph = RoadGraph.load(path)
+    rng = np.random.default_rng(seed)
+    routes = []
+    attempts = 0
+    while len(routes) < count and attempts < count * 20:
+        attempts += 1
+        origin = rng.integers(0, len(graph.lats))
+        dest_lat, dest_lng = np.array([graph.lats[origin], graph.lngs[origin]]) + rng.uniform(-0.01, 0.01, 2)
+        _, coords = graph.route(graph.lats[origin], graph.lngs[origin], dest_lat, dest_lng, max_meters=3000)
+        if coords is not None and len(coords) > 2:
+            routes.append(np.asarray(coords).tolist())
+    return routes
+
+
+def list_bytes(coords):
+    """Ukuran list bersarang beserta objek float di dalamnya."""
+    size = sys.getsizeof(coords)
+    for point in coords:
+        size += sys.getsizeof(point) + sum(sys.getsizeof(value) for value in point)
+    return size
+
+
+def array_bytes(points):
+    return sys.getsizeof(points) + (0 if points.base is None else points.nbytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark memori geometri rute')
+    parser.add_argument('--routes', type=int, default=500, help='Jumlah rute')
+    parser.add_argument('--graph', help='Ambil rute dari graf jalan (.npz atau .osm) alih-alih rute sintetis')
+    parser.add_argument('--tolerance', type=float, default=ROUTE_SIMPLIFY_METERS,
+                        help='Toleransi penyederhanaan saat disimpan (meter)')
+    args = parser.parse_args()
+
+    routes = graph_routes(args.graph, args.routes) if args.graph else synthetic_routes(args.routes)
+    if not routes:
+        print("Tidak ada rute untuk diukur")
+        return
+    points = sum(len(route) for route in routes)
+
+    started = time.perf_counter()
+    compact = [simplify_route(route_array(route), args.tolerance) for route in routes]
+    simplify_ms = (time.perf_counter() - started) * 1000
+    compact_points = sum(len(route) for route in compact)
+
+    results = [
+        ("list [[lng, lat]] (cara lama)", sum(list_bytes(route) for route in routes), points),
+        ("array float64", sum(array_bytes(np.array(route)) for route in routes), points),
+        ("array float32", sum(array_bytes(route_array(route)) for route in routes), points),
+        (f"array float32 + Douglas-Peucker {args.tolerance:g} m", sum(array_bytes(route) for route in compact),
+         compact_points),
+        ("blob cache int32", sum(len(encode_geometry(route)) for route in routes), points),
+        (f"blob cache int32 + Douglas-Peucker {args.tolerance:g} m",
+         sum(len(encode_geometry(route)) for route in compact), compact_points),
+    ]
+
+    print(f"Jumlah rute: {len(routes)}, titik: {points} ({points / len(routes):.0f} per rute)")
+    print(f"Penyederhanaan: {simplify_ms / len(routes):.3f} ms per rute\n")
+    print(f"{'Representasi':<46} {'total KB':>10} {'B/rute':>9} {'titik/rute':>11}")
+    for label, size, count in results:
+        print(f"{label:<46} {size / 1024:10.1f} {size / len(routes):9.0f} {count / len(routes):11.1f}")
+
+    print(f"\nTitik yang digambar per rute (penyederhanaan 1 piksel, lebar peta {MAP_WIDTH_PIXELS} px):")
+    for radius in (250, 500, 1000, 2000):
+        pixel = 2 * radius / MAP_WIDTH_PIXELS
+        drawn = sum(len(simplify_route(route, pixel)) for route in compact)
+        print(f"  radius {radius:>5} m ({pixel:.2f} m/piksel): {drawn / len(routes):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pemeriksaan refresh kondisional dan inkremental OdpDataService dengan server CSV lokal.
+
+Server HTTP lokal menggantikan ekspor CSV spreadsheet (dengan atau tanpa
+ETag). Urutan pemeriksaan:
+
+1. Muat pertama: mode "full".
+2. Server dengan ETag: refresh mengirim If-None-Match dan mendapat 304 ("not_modified").
+3. Server tanpa ETag, isi sama: CSV diunduh tetapi hash-nya sama ("unchanged").
+4. Satu baris diubah koordinatnya, satu AVAI-nya, satu dihapus dan satu
+   ditambah: "incremental" dengan 1 tambah, 1 hapus, 2 ubah, dan isi dataset
+   (juga snapshot yang dipetakan proses lain) sama dengan CSV baru.
+
+Jalankan:
+    python check_data_refresh.py
+"""
+
+import sys
+import hashlib
+import logging
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from odp_dataset import LAT_COLUMN, LNG_COLUMN, NAME_COLUMN, AVAI_COLUMN, KATEGORI_COLUMN, CORE_COLUMNS
+from odp_data_service import OdpDataService, FETCH_NOT_MODIFIED, FETCH_UNCHANGED
+
+logger = logging.getLogger(__name__)
+
+REF_LAT, REF_LNG = -3.3172, 114.5921
+
+# Jumlah baris CSV awal
+ROWS = 20
+
+# Toleransi koordinat (snapshot menyimpan koordinat float32)
+COORDINATE_TOLERANCE = 1e-5
+
+
+class CsvServer:
+    """Server CSV tiruan; ETag opsional dan header permintaan terakhir dicatat."""
+
+    def __init__(self, frame):
+        self.use_etag = True
+        self.last_headers = {}
+        self.set_frame(frame)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/export.csv"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def set_frame(self, frame):
+        self.body = frame.to_csv(index=False).encode('utf-8')
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.last_headers = dict(self.headers)
+                if server.use_etag and self.headers.get('If-None-Match') == server.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(server.body)))
+                if server.use_etag:
+                    self.send_header('ETag', server.etag)
+                self.end_headers()
+                self.wfile.write(server.body)
+
+        return Handler
+
+
+def sample_frame():
+    """CSV awal: grid ODP di sekitar titik referensi."""
+    numbers = np.arange(ROWS)
+    return pd.DataFrame({
+        NAME_COLUMN: [f"ODP-C/{i}" for i in numbers],
+        LAT_COLUMN: REF_LAT + (numbers // 5) * 0.001,
+        LNG_COLUMN: REF_LNG + (numbers % 5) * 0.001,
+        AVAI_COLUMN: numbers % 4,
+        KATEGORI_COLUMN: "HIJAU",
+    })
+
+
+def edited_frame(frame):
+    """Ubah koordinat ODP-C/1 dan AVAI ODP-C/2, hapus ODP-C/3, tambah ODP-C/NEW."""
+    frame = frame.copy()
+    frame.loc[frame[NAME_COLUMN] == "ODP-C/1", LAT_COLUMN] += 0.0005
+    frame.loc[frame[NAME_COLUMN] == "ODP-C/2", AVAI_COLUMN] = 9
+    frame = frame[frame[NAME_COLUMN] != "ODP-C/3"]
+    added = pd.DataFrame({NAME_COLUMN: ["ODP-C/NEW"], LAT_COLUMN: [REF_LAT - 0.001], LNG_COLUMN: [REF_LNG],
+                          AVAI_COLUMN: [1], KATEGORI_COLUMN: ["KUNING"]})
+    return pd.concat([frame, added], ignore_index=True)
+
+
+def service_for(url, snapshot_base):
+    return OdpDataService('stand-in', refresh_interval=0, csv_url=url,
+                          required_columns=[LAT_COLUMN, LNG_COLUMN, NAME_COLUMN], columns=CORE_COLUMNS,
+                          snapshot_base=snapshot_base)
+
+
+def expect(name, condition, detail=""):
+    """AssertionError dengan keterangan jika kondisi tidak terpenuhi."""
+    if not condition:
+        raise AssertionError(f"{name} {detail}".strip())
+    print(f"OK  {name}")
+
+
+def expect_rows(name, dataset, frame):
+    """Baris yang berlaku di dataset sama dengan CSV (nama, koordinat, AVAI)."""
+    rows = dataset.select(np.flatnonzero(dataset.alive), [NAME_COLUMN, LAT_COLUMN, LNG_COLUMN, AVAI_COLUMN])
+    rows = rows.set_index(NAME_COLUMN).sort_index()
+    expected = frame.set_index(NAME_COLUMN).sort_index()
+    same = list(rows.index) == list(expected.index) \
+        and np.allclose(rows[LAT_COLUMN].astype(float), expected[LAT_COLUMN], atol=COORDINATE_TOLERANCE) \
+        and np.allclose(rows[LNG_COLUMN].astype(float), expected[LNG_COLUMN], atol=COORDINATE_TOLERANCE) \
+        and np.array_equal(rows[AVAI_COLUMN].astype(int), expected[AVAI_COLUMN])
+    expect(name, same, f"\n{rows}\nseharusnya\n{expected}")
+
+
+def check_refresh(server, snapshot_base):
+    frame = sample_frame()
+    service = service_for(server.url, snapshot_base)
+
+    dataset = service.get_dataset()
+    expect("muat pertama penuh", service.last_change["mode"] == "full" and len(dataset) == ROWS,
+           f"{service.last_change}")
+
+    # ETag: request kondisional dijawab 304
+    expect("refresh dengan ETag", service.refresh())
+    expect("If-None-Match dikirim", server.last_headers.get('If-None-Match') == server.etag,
+           f"{server.last_headers}")
+    expect("ETag 304 -> not_modified", service.last_change["mode"] == FETCH_NOT_MODIFIED, f"{service.last_change}")
+
+    # Tanpa ETag: isi diunduh, hash sama
+    server.use_etag = False
+    version = service.version
+    expect("refresh tanpa ETag", service.refresh())
+    expect("tanpa ETag, isi sama -> unchanged", service.last_change["mode"] == FETCH_UNCHANGED,
+           f"{service.last_change}")
+    expect("versi tidak berubah", service.version == version)
+
+    # Ubah, hapus, tambah: perubahan diterapkan inkremental
+    frame = edited_frame(frame)
+    server.set_frame(frame)
+    expect("refresh setelah perubahan", service.refresh())
+    change = service.last_change
+    expect("perubahan -> incremental 1 tambah, 1 hapus, 2 ubah",
+           (change["mode"], change["added"], change["removed"], change["changed"]) == ("incremental", 1, 1, 2),
+           f"{change}")
+    expect("versi naik", service.version == version + 1)
+    expect_rows("isi dataset sama dengan CSV baru", service.get_dataset(), frame)
+
+    # Proses lain memetakan snapshot yang sama
+    other = service_for(server.url, snapshot_base)
+    expect("snapshot dipetakan proses lain", other.load_snapshot())
+    expect_rows("isi snapshot sama dengan CSV baru", other.dataset, frame)
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = CsvServer(sample_frame())
+    try:
+        with tempfile.TemporaryDirectory(prefix='odp-check-') as snapshot_base:
+            check_refresh(server, snapshot_base)
+    except AssertionError as e:
+        print(f"GAGAL  {e}")
+        return 1
+    finally:
+        server.close()
+    print("Semua pemeriksaan refresh data berhasil")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
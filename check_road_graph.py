@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pemeriksaan graf jalan lokal dengan ekstrak OSM sampel (static/road_graph_sample.osm).
+
+Ekstrak sampel berupa grid 8x8 jalan berjarak 0.001 derajat dengan sungai di
+antara kolom 114.593 dan 114.594. Satu-satunya penyeberangan untuk kendaraan
+adalah Jalan Jembatan (latitude -3.314); jembatan footway dan jalan service
+privat tidak boleh dipakai, dan Jalan Sampel 3 (latitude -3.318) searah ke timur.
+
+Jalankan:
+    python check_road_graph.py [path_ekstrak]
+"""
+
+import sys
+import logging
+
+import numpy as np
+
+from odp_distance import haversine_meters
+from odp_road_graph import RoadGraph
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_PATH = 'static/road_graph_sample.osm'
+
+# Toleransi perbandingan jarak (bobot ruas disimpan float32)
+TOLERANCE_METERS = 0.5
+
+
+def air(lat1, lng1, lat2, lng2):
+    """Jarak udara antara dua titik dalam meter."""
+    return float(haversine_meters(lat1, lng1, np.array([lat2]), np.array([lng2]))[0])
+
+
+def expect(name, actual, expected):
+    """Bandingkan jarak dengan nilai yang diharapkan; AssertionError jika meleset."""
+    if actual is None or np.isnan(actual) or abs(actual - expected) > TOLERANCE_METERS:
+        raise AssertionError(f"{name}: {actual} m, seharusnya {expected:.2f} m")
+    print(f"OK  {name}: {actual:.2f} m")
+
+
+def check_graph(graph):
+    # Jarak antar baris dan kolom grid
+    row = air(-3.320, 114.593, -3.319, 114.593)
+    col = air(-3.320, 114.593, -3.320, 114.594)
+
+    # Snap: titik 3 m di selatan Jalan Sampel 1 tersambung ke titik di jalan tersebut
+    lat, lng, offset = graph.snap_point(-3.32003, 114.5905)
+    expect("snap ke Jalan Sampel 1", offset, air(-3.32003, 114.5905, -3.320, 114.5905))
+    assert abs(lat + 3.320) < 1e-6 and abs(lng - 114.5905) < 1e-6, f"titik snap salah: {lat}, {lng}"
+
+    # Titik jauh dari jalan tidak tersambung
+    assert graph.snap_point(-3.330, 114.590)[0] is None, "titik 1 km dari jalan seharusnya tidak tersambung"
+    print("OK  titik jauh dari jalan tidak tersambung")
+
+    # Menyeberang sungai harus lewat Jalan Jembatan (6 baris ke utara dan kembali)
+    distance, coords = graph.route(-3.320, 114.593, -3.320, 114.594)
+    expect("rute lewat Jalan Jembatan", distance, 2 * 6 * row + col)
+    assert np.isclose(coords[:, 1].max(), -3.314), "rute seharusnya melewati latitude -3.314"
+
+    # Jalan searah: searah arus langsung, melawan arus memutar lewat baris sebelah
+    forward, _ = graph.route(-3.318, 114.590, -3.318, 114.593)
+    expect("Jalan Sampel 3 searah arus", forward, 3 * col)
+    backward, _ = graph.route(-3.318, 114.593, -3.318, 114.590)
+    expect("Jalan Sampel 3 melawan arus", backward, 2 * row + 3 * col)
+
+    # Batas pencarian: rute lewat jembatan lebih panjang dari batas tidak ditemukan
+    distances, _ = graph.distances_from(-3.320, 114.593, [-3.320, -3.319], [114.594, 114.593], max_meters=1000)
+    assert np.isnan(distances[0]), "tujuan di seberang sungai seharusnya di luar batas 1000 m"
+    expect("tujuan dalam batas pencarian", distances[1], row)
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    path = sys.argv[1] if len(sys.argv) > 1 else SAMPLE_PATH
+    graph = RoadGraph.load(path)
+    print(f"Graf {path}: {len(graph)} simpul, {graph.edge_count} ruas")
+    try:
+        check_graph(graph)
+    except AssertionError as e:
+        print(f"GAGAL  {e}")
+        return 1
+    print("Semua pemeriksaan graf jalan berhasil")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pemeriksaan permintaan matriks jarak RoutingClient dengan server pengganti lokal.
+
+Server HTTP lokal melayani respons tiruan ORS (POST /v2/matrix/{profil}/json)
+dan Mapbox (GET /directions-matrix/v1/{profil}/{koordinat}); klien diarahkan ke
+server ini lewat ors_base_url/mapbox_base_url (ORS_BASE_URL/MAPBOX_BASE_URL).
+Tujuan ke-i berada i * 0.0001 derajat di utara titik referensi; ORS menjawab
+jarak i * 100 m (null untuk tujuan tanpa rute) dan Mapbox i * 100 + 1 m,
+sehingga provider yang mengisi setiap tujuan bisa dikenali.
+
+Yang diperiksa: pemotongan permintaan pada *_MATRIX_MAX_DESTINATIONS, sel null
+menjadi NaN, dan peralihan ke provider berikutnya (untuk sel tanpa rute dan
+saat ORS gagal).
+
+Jalankan:
+    python check_routing_matrix.py
+"""
+
+import sys
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from odp_routing import RoutingClient, ORS_MATRIX_MAX_DESTINATIONS, MAPBOX_MATRIX_MAX_DESTINATIONS
+
+logger = logging.getLogger(__name__)
+
+REF_LAT, REF_LNG = -3.3172, 114.5921
+
+# Jarak antar tujuan (derajat latitude)
+STEP_DEGREES = 0.0001
+
+# Tujuan yang dijawab null oleh ORS (tidak ada rute)
+ORS_NULL_EVERY = 7
+
+# Batas koordinat per permintaan Mapbox Matrix (ditolak server jika lebih)
+MAPBOX_MAX_COORDINATES = 25
+
+
+class StandInServer:
+    """Server ORS/Mapbox tiruan yang mencatat jumlah tujuan setiap permintaan."""
+
+    def __init__(self):
+        self.requests = []
+        self.ors_status = 200
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self, ors_status=200):
+        with self._lock:
+            self.requests = []
+        self.ors_status = ors_status
+
+    def sizes(self, provider):
+        """Jumlah tujuan per permintaan ke provider, diurutkan."""
+        with self._lock:
+            return sorted(size for name, size in self.requests if name == provider)
+
+    def _record(self, provider, size):
+        with self._lock:
+            self.requests.append((provider, size))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if not urlsplit(self.path).path.startswith('/v2/matrix/'):
+                    return self._send({"error": "not found"}, 404)
+                server._record('ors', len(body['destinations']))
+                if server.ors_status != 200:
+                    return self._send({"error": {"message": "stand-in failure"}}, server.ors_status)
+                locations = body['locations']
+                row = []
+                for j in body['destinations']:
+                    i = destination_number(locations[j][1])
+                    row.append(None if i % ORS_NULL_EVERY == 0 else i * 100.0)
+                self._send({"distances": [row]})
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if '/directions-matrix/v1/' not in url.path:
+                    return self._send({"code": "NotFound"}, 404)
+                coordinates = [tuple(map(float, part.split(','))) for part in url.path.rsplit('/', 1)[1].split(';')]
+                server._record('mapbox', len(coordinates) - 1)
+                if len(coordinates) > MAPBOX_MAX_COORDINATES:
+                    return self._send({"code": "InvalidInput", "message": "Too many coordinates"}, 422)
+                destinations = [int(i) for i in parse_qs(url.query)['destinations'][0].split(';')]
+                row = [destination_number(coordinates[j][1]) * 100.0 + 1 for j in destinations]
+                self._send({"code": "Ok", "distances": [row]})
+
+        return Handler
+
+
+def destination_number(lat):
+    """Nomor tujuan dari latitude-nya."""
+    return int(round((lat - REF_LAT) / STEP_DEGREES))
+
+
+def destinations(count):
+    """Tujuan ke-1..count di utara titik referensi."""
+    numbers = np.arange(1, count + 1)
+    return numbers, REF_LAT + numbers * STEP_DEGREES, np.full(count, REF_LNG)
+
+
+def client(server, providers):
+    """RoutingClient yang diarahkan ke server pengganti."""
+    return RoutingClient(ors_api_key='stand-in', mapbox_token='stand-in', ors_base_url=server.base_url,
+                         mapbox_base_url=server.base_url, providers=providers)
+
+
+def expect(name, condition, detail=""):
+    """AssertionError dengan keterangan jika kondisi tidak terpenuhi."""
+    if not condition:
+        raise AssertionError(f"{name} {detail}".strip())
+    print(f"OK  {name}")
+
+
+def check_ors(server):
+    count = ORS_MATRIX_MAX_DESTINATIONS + 2
+    numbers, lats, lngs = destinations(count)
+    server.reset()
+    distances = client(server, ['ors']).matrix_distances(REF_LAT, REF_LNG, lats, lngs)
+
+    expect("ORS dipotong per ORS_MATRIX_MAX_DESTINATIONS",
+           server.sizes('ors') == [2, ORS_MATRIX_MAX_DESTINATIONS], f"{server.sizes('ors')}")
+    null = numbers % ORS_NULL_EVERY == 0
+    expect("ORS: sel null menjadi NaN", np.isnan(distances[null]).all())
+    expect("ORS: jarak digabung sesuai urutan tujuan",
+           np.array_equal(distances[~null], numbers[~null] * 100.0))
+
+
+def check_mapbox(server):
+    count = 2 * MAPBOX_MATRIX_MAX_DESTINATIONS + 3
+    numbers, lats, lngs = destinations(count)
+    server.reset()
+    distances = client(server, ['mapbox']).matrix_distances(REF_LAT, REF_LNG, lats, lngs)
+
+    expect("Mapbox dipotong per MAPBOX_MATRIX_MAX_DESTINATIONS",
+           server.sizes('mapbox') == [3, MAPBOX_MATRIX_MAX_DESTINATIONS, MAPBOX_MATRIX_MAX_DESTINATIONS],
+           f"{server.sizes('mapbox')}")
+    expect("Mapbox: jarak digabung sesuai urutan tujuan", np.array_equal(distances, numbers * 100.0 + 1))
+
+
+def check_fallback(server):
+    count = 30
+    numbers, lats, lngs = destinations(count)
+    null = numbers % ORS_NULL_EVERY == 0
+
+    # Sel tanpa rute dari ORS diteruskan ke Mapbox; sel lain tetap dari ORS
+    server.reset()
+    distances = client(server, ['ors', 'mapbox']).matrix_distances(REF_LAT, REF_LNG, lats, lngs)
+    expect("sel null ORS diisi Mapbox", np.array_equal(distances[null], numbers[null] * 100.0 + 1))
+    expect("sel lain tetap dari ORS", np.array_equal(distances[~null], numbers[~null] * 100.0))
+    expect("Mapbox hanya menerima tujuan tanpa rute", server.sizes('mapbox') == [int(null.sum())],
+           f"{server.sizes('mapbox')}")
+
+    # ORS gagal: semua tujuan dari Mapbox
+    server.reset(ors_status=500)
+    distances = client(server, ['ors', 'mapbox']).matrix_distances(REF_LAT, REF_LNG, lats, lngs)
+    expect("ORS gagal, beralih ke Mapbox", np.array_equal(distances, numbers * 100.0 + 1))
+    expect("ORS sempat dicoba", server.sizes('ors') == [count], f"{server.sizes('ors')}")
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = StandInServer()
+    try:
+        check_ors(server)
+        check_mapbox(server)
+        check_fallback(server)
+    except AssertionError as e:
+        print(f"GAGAL  {e}")
+        return 1
+    finally:
+        server.close()
+    print("Semua pemeriksaan matriks jarak berhasil")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
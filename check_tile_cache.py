@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pemeriksaan cache tile (odp_tile_cache) dengan server tile XYZ lokal.
+
+Server lokal menggantikan provider tile: kanal merah dan hijau setiap tile
+berisi x % 256 dan y % 256 (sehingga tile asal setiap piksel mosaic bisa
+dikenali), kanal biru berisi derau agar ukuran PNG mendekati tile asli.
+
+Yang diperiksa: mosaic menyusun tile yang benar dan hanya mengunduh sekali,
+cache di disk dipakai proses lain tanpa jaringan, mode offline tidak
+mengunduh, prefetch menolak tile.openstreetmap.org, dan ukuran cache di disk
+tidak melewati max_bytes setelah prefetch maupun mosaic.
+
+Jalankan:
+    python check_tile_cache.py
+"""
+
+import os
+import sys
+import logging
+import tempfile
+import threading
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+from odp_tile_cache import TileCache, TileSource, tile_range, world_x, world_y
+
+logger = logging.getLogger(__name__)
+
+# Area kecil di Banjarmasin (selatan, barat, utara, timur) dan zoom prefetch
+AREA = (-3.33, 114.58, -3.31, 114.60)
+ZOOMS = [14, 15, 16]
+
+# Batas cache untuk pemeriksaan ukuran: sekitar lima tile
+CAP_TILES = 5
+
+TILE_SIZE = 256
+
+
+class TileServer:
+    """Server tile XYZ tiruan yang mencatat jumlah permintaan."""
+
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def source(self):
+        url = f"http://127.0.0.1:{self._server.server_address[1]}/{{z}}/{{x}}/{{y}}.png"
+        return TileSource('stand-in', url, 19)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                z, x, y = (int(part) for part in self.path.rsplit('.', 1)[0].strip('/').split('/'))
+                body = tile_png(z, x, y)
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def tile_png(z, x, y):
+    """PNG tile: merah = x % 256, hijau = y % 256, biru = derau."""
+    rng = np.random.default_rng(z * 1_000_003 + x * 1009 + y)
+    tile = np.empty((TILE_SIZE, TILE_SIZE, 3), dtype=np.uint8)
+    tile[..., 0] = x % 256
+    tile[..., 1] = y % 256
+    tile[..., 2] = rng.integers(0, 256, (TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(tile).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def tiles_in(area, zoom):
+    """Jumlah tile yang menutupi area pada zoom tertentu."""
+    south, west, north, east = area
+    x0, x1, y0, y1 = tile_range(west, south, east, north, zoom)
+    return (x1 - x0 + 1) * (y1 - y0 + 1)
+
+
+def expect(name, condition, detail=""):
+    """AssertionError dengan keterangan jika kondisi tidak terpenuhi."""
+    if not condition:
+        raise AssertionError(f"{name} {detail}".strip())
+    print(f"OK  {name}")
+
+
+def expect_tile_pixels(name, image, extent, zoom):
+    """Setiap piksel mosaic berasal dari tile yang menutupi koordinatnya."""
+    west, east, south, north = extent
+    height, width = image.shape[:2]
+    rows = np.linspace(0, height - 1, 9).astype(int)
+    cols = np.linspace(0, width - 1, 9).astype(int)
+    lats = north - (rows + 0.5) * (north - south) / height
+    lngs = west + (cols + 0.5) * (east - west) / width
+    n = 2 ** zoom
+    xs = (world_x(lngs) * n).astype(int) % 256
+    ys = (world_y(lats) * n).astype(int) % 256
+    # Piksel tepat di tepi tile boleh berasal dari tile tetangganya
+    red_ok = np.abs(image[rows][:, cols, 0].astype(int) - xs[None, :]) <= 1
+    green_ok = np.abs(image[rows][:, cols, 1].astype(int) - ys[:, None]) <= 1
+    expect(name, red_ok.all() and green_ok.all())
+
+
+def check_mosaic(server, directory):
+    path = os.path.join(directory, 'tiles.sqlite')
+    south, west, north, east = AREA
+    cache = TileCache(path)
+    zoom = 15
+    expected = tiles_in(AREA, zoom)
+
+    image, extent = cache.mosaic(west, south, east, north, source=server.source, zoom=zoom)
+    expect("mosaic mengunduh setiap tile sekali", server.requests == expected, f"{server.requests} != {expected}")
+    expect_tile_pixels("piksel mosaic dari tile yang benar", image, extent, zoom)
+
+    cache.mosaic(west, south, east, north, source=server.source, zoom=zoom)
+    expect("mosaic kedua dari memori", server.requests == expected, f"{server.requests}")
+
+    # Proses lain: tile dibaca dari disk tanpa jaringan
+    other = TileCache(path, offline=True)
+    result = other.mosaic(west, south, east, north, source=server.source, zoom=zoom)
+    expect("cache disk dipakai tanpa jaringan",
+           result is not None and server.requests == expected and other.stats()["disk_hits"] == expected,
+           f"{other.stats()}")
+
+    # Offline dengan cache kosong: tidak ada unduhan
+    empty = TileCache(os.path.join(directory, 'empty.sqlite'), offline=True)
+    result = empty.mosaic(west, south, east, north, source=server.source, zoom=zoom)
+    expect("offline tanpa cache tidak mengunduh", result is None and server.requests == expected)
+
+
+def check_prefetch(server, directory):
+    cache = TileCache(os.path.join(directory, 'prefetch.sqlite'))
+    before = server.requests
+    refused = [cache.prefetch(None, AREA, ZOOMS),
+               cache.prefetch('https://tile.openstreetmap.org/{z}/{x}/{y}.png', AREA, ZOOMS)]
+    expect("prefetch OSM ditolak", refused == [None, None] and server.requests == before)
+
+    expected = sum(tiles_in(AREA, zoom) for zoom in ZOOMS)
+    available = cache.prefetch(server.source, AREA, ZOOMS)
+    expect("prefetch mengisi semua tile", available == expected and server.requests - before == expected,
+           f"{available} != {expected}")
+
+
+def check_size_cap(server, directory):
+    tile_bytes = len(tile_png(15, 0, 0))
+    max_bytes = CAP_TILES * tile_bytes
+    south, west, north, east = AREA
+
+    cache = TileCache(os.path.join(directory, 'capped.sqlite'), max_bytes=max_bytes)
+    cache.prefetch(server.source, AREA, ZOOMS)
+    stats = cache.stats()
+    expect("ukuran disk <= max_bytes setelah prefetch", 0 < stats["disk_bytes"] <= max_bytes,
+           f"{stats['disk_bytes']} > {max_bytes}")
+
+    cache = TileCache(os.path.join(directory, 'capped_mosaic.sqlite'), max_bytes=max_bytes)
+    cache.mosaic(west, south, east, north, source=server.source, zoom=16)
+    stats = cache.stats()
+    expect("ukuran disk <= max_bytes setelah mosaic", 0 < stats["disk_bytes"] <= max_bytes,
+           f"{stats['disk_bytes']} > {max_bytes}")
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = TileServer()
+    try:
+        with tempfile.TemporaryDirectory(prefix='odp-tiles-') as directory:
+            check_mosaic(server, directory)
+            check_prefetch(server, directory)
+            check_size_cap(server, directory)
+    except AssertionError as e:
+        print(f"GAGAL  {e}")
+        return 1
+    finally:
+        server.close()
+    print("Semua pemeriksaan cache tile berhasil")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
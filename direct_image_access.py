@@ -185,10 +185,10 @@ def create_odp_map(ref_lat, ref_lng, nearby_df, radius_meters=500, output_filena
             title_text += f'\n(Menampilkan {max_display} dari {len(nearby_df)} ODP)'
         ax.set_title(title_text)
         
-        # Tambahkan basemap dari OpenStreetMap (non-blocking dengan timeout)
+        # Tambahkan basemap dari OpenStreetMap (tile dari cache bersama)
         try:
-            import contextily as ctx
-            ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik, zoom=16)
+            from odp_tile_cache import add_basemap
+            add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik, zoom=16)
         except Exception as e:
             logger.warning(f"Tidak dapat menambahkan peta dasar: {e}")
             # Buat latar belakang putih sebagai alternatif
@@ -7,6 +7,7 @@ import logging
 import re
 from geopy.distance import geodesic
 import contextily as ctx
+from odp_tile_cache import add_basemap
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
 import matplotlib.patheffects as path_effects
 
@@ -169,7 +170,7 @@ def create_odp_map(ref_lat, ref_lng, nearby_df, radius_meters=500):
         
         # Tambahkan basemap dari OpenStreetMap
         try:
-            ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik)
+            add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik)
         except Exception as e:
             logger.warning(f"Tidak dapat menambahkan peta dasar: {e}")
         
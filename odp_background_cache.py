@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache gambar latar Mapbox Static untuk peta ODP.
+
+Setiap peta sebelumnya mengunduh gambar Mapbox baru, termasuk varian
+"satelit tanpa rute" dari lokasi yang sama. Unduhan ini langkah paling lambat
+saat render dan dihitung sebagai pemakaian API berbayar.
+
+Gambar disimpan dengan key (style, zoom, pusat terkuantisasi) di SQLite:
+- Pusat gambar dibulatkan ke grid BACKGROUND_GRID_PIXELS piksel (ruang piksel
+  Mapbox pada zoom tersebut) dan gambar diunduh dengan ukuran maksimal
+  (1280 piksel), sehingga semua permintaan yang pusatnya jatuh di sel yang
+  sama (atau cukup dekat) tertutup oleh gambar itu dan cukup dipotong.
+- Permintaan yang hampir seukuran gambar maksimal tidak bisa digeser; gambar
+  untuk permintaan seperti itu disimpan dengan pusat persisnya dan hanya
+  dipakai ulang untuk lokasi yang sama.
+- Ukuran database dibatasi (LRU berdasarkan waktu pakai terakhir) dan entri
+  kedaluwarsa setelah BACKGROUND_TTL.
+
+Render berjalan di beberapa proses worker, jadi setiap proses membuka
+koneksinya sendiri ke database yang sama (get_background_cache), dan jumlah
+hit/miss disimpan di database agar bisa dibaca proses bot untuk /status.
+"""
+
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+import requests
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Lokasi database cache gambar latar
+DEFAULT_BACKGROUND_CACHE_PATH = os.environ.get('ODP_BACKGROUND_CACHE_PATH', 'data/background_cache.sqlite')
+
+# Ukuran maksimal cache di disk (MB) dan jumlah gambar terdekode di memori per proses
+BACKGROUND_CACHE_MAX_MB = float(os.environ.get('ODP_BACKGROUND_CACHE_MAX_MB', 300))
+MEMORY_MAX_IMAGES = int(os.environ.get('ODP_BACKGROUND_CACHE_MEMORY_IMAGES', 2))
+
+# Masa berlaku gambar latar (detik), default 30 hari
+BACKGROUND_TTL = int(os.environ.get('ODP_BACKGROUND_CACHE_TTL', 30 * 24 * 3600))
+
+# Ukuran sel grid kuantisasi pusat gambar (piksel Mapbox pada zoom gambar)
+BACKGROUND_GRID_PIXELS = int(os.environ.get('ODP_BACKGROUND_GRID_PIXELS', 128))
+
+# URL dasar Mapbox (sama dengan odp_routing; bisa diganti server lokal saat pengujian)
+MAPBOX_BASE_URL = os.environ.get('MAPBOX_BASE_URL', 'https://api.mapbox.com')
+
+# Ukuran maksimal gambar Mapbox Static (piksel logis, sebelum @2x)
+MAPBOX_MAX_SIZE = 1280
+
+# Batas waktu unduhan gambar latar (detik)
+BACKGROUND_TIMEOUT = 20
+
+# Toleransi posisi pusat (piksel logis) akibat pembulatan koordinat di URL
+CENTER_TOLERANCE = 0.5
+
+# Pembersihan disk setiap sekian gambar baru
+PRUNE_EVERY = 20
+
+# Penghitung yang disimpan di database
+COUNTERS = ("exact_hits", "shifted_hits", "misses", "failures")
+
+
+def world_pixels(lat, lng, zoom):
+    """Posisi piksel logis Mapbox (tile 512) untuk latitude/longitude pada zoom tertentu."""
+    scale = 512 * 2 ** zoom
+    lat = math.radians(max(min(lat, 85.05112878), -85.05112878))
+    x = (lng + 180.0) / 360.0 * scale
+    y = (1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * scale
+    return x, y
+
+
+def pixels_to_lnglat(x, y, zoom):
+    """Kebalikan world_pixels: (lng, lat)."""
+    scale = 512 * 2 ** zoom
+    lng = x / scale * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y / scale))))
+    return lng, lat
+
+
+class BackgroundCache:
+    """
+    Cache gambar Mapbox Static di SQLite dengan beberapa gambar terdekode di memori.
+
+    Jika database tidak bisa dibuka, gambar tetap diunduh dan hanya disimpan
+    di memori proses.
+    """
+
+    def __init__(self, path=DEFAULT_BACKGROUND_CACHE_PATH, max_bytes=BACKGROUND_CACHE_MAX_MB * 1024 * 1024,
+                 memory_images=MEMORY_MAX_IMAGES, ttl=BACKGROUND_TTL, grid_pixels=BACKGROUND_GRID_PIXELS):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.memory_images = memory_images
+        self.ttl = ttl
+        self.grid_pixels = grid_pixels
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        # key (style, zoom, cx, cy, size) -> (gambar, expires_at)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = self._open(path)
+
+    def _open(self, path):
+        if not path:
+            return None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Beberapa proses worker menulis ke database yang sama
+            db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS backgrounds (
+                              style TEXT NOT NULL,
+                              zoom INTEGER NOT NULL,
+                              cx REAL NOT NULL,
+                              cy REAL NOT NULL,
+                              size INTEGER NOT NULL,
+                              data BLOB NOT NULL,
+                              bytes INTEGER NOT NULL,
+                              last_used REAL NOT NULL,
+                              expires_at REAL NOT NULL,
+                              PRIMARY KEY (style, zoom, cx, cy, size))""")
+            db.execute("CREATE INDEX IF NOT EXISTS backgrounds_last_used ON backgrounds (last_used)")
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.executemany("INSERT OR IGNORE INTO counters VALUES (?, 0)", [(name,) for name in COUNTERS])
+            db.commit()
+            self._prune(db)
+            logger.info(f"Cache gambar latar dibuka: {path}")
+            return db
+        except Exception as e:
+            logger.warning(f"Gagal membuka cache gambar latar {path}, hanya memakai memori: {e}")
+            return None
+
+    def get(self, style, zoom, lat, lng, size, token):
+        """
+        Gambar latar seukuran size x size piksel logis (@2x) berpusat di lat/lng.
+
+        Args:
+            style: Style Mapbox, misalnya 'satellite-streets-v11'
+            zoom: Level zoom (bulat)
+            lat, lng: Pusat gambar
+            size: Sisi gambar dalam piksel logis (maksimal 1280)
+            token: Token akses Mapbox
+
+        Returns:
+            PIL.Image RGB berukuran 2*size piksel, atau None jika gagal
+        """
+        size = int(min(size, MAPBOX_MAX_SIZE))
+        cx, cy = world_pixels(lat, lng, zoom)
+        with self._lock:
+            found = self._find(style, zoom, cx, cy, size)
+            if found is not None:
+                key, image = found
+                shifted = abs(key[2] - cx) > CENTER_TOLERANCE or abs(key[3] - cy) > CENTER_TOLERANCE
+                self._count("shifted_hits" if shifted else "exact_hits")
+                return self._crop(image, key, cx, cy, size)
+            self._count("misses")
+
+        # Pusat dibulatkan ke grid jika gambar maksimal masih menutupi permintaan
+        # dari pusat grid; jika tidak, gambar diunduh tepat di pusat permintaan
+        if size + self.grid_pixels <= MAPBOX_MAX_SIZE:
+            fetch_x = (math.floor(cx / self.grid_pixels) + 0.5) * self.grid_pixels
+            fetch_y = (math.floor(cy / self.grid_pixels) + 0.5) * self.grid_pixels
+        else:
+            fetch_x, fetch_y = cx, cy
+        fetch_lng, fetch_lat = pixels_to_lnglat(fetch_x, fetch_y, zoom)
+        data = self._download(style, zoom, fetch_lat, fetch_lng, MAPBOX_MAX_SIZE, token)
+        if data is None:
+            with self._lock:
+                self._count("failures")
+            return None
+
+        key = (style, zoom, fetch_x, fetch_y, MAPBOX_MAX_SIZE)
+        try:
+            image = Image.open(BytesIO(data)).convert('RGB')
+        except Exception as e:
+            logger.error(f"Gambar latar Mapbox tidak bisa dibaca: {e}")
+            with self._lock:
+                self._count("failures")
+            return None
+        with self._lock:
+            now = time.time()
+            self._remember(key, image, now + self.ttl)
+            self._store(key, data, now)
+        return self._crop(image, key, cx, cy, size)
+
+    def _covers(self, key, cx, cy, size):
+        """Apakah gambar dengan key ini menutupi permintaan (pusat cx, cy dan sisi size)."""
+        reach = key[4] / 2 - size / 2 + CENTER_TOLERANCE
+        return abs(key[2] - cx) <= reach and abs(key[3] - cy) <= reach
+
+    def _find(self, style, zoom, cx, cy, size):
+        """Cari gambar yang menutupi permintaan di memori lalu di disk (dipanggil dengan lock)."""
+        now = time.time()
+        for key, (image, expires_at) in list(self._memory.items()):
+            if key[0] == style and key[1] == zoom and expires_at > now and self._covers(key, cx, cy, size):
+                self._memory.move_to_end(key)
+                self._touch(key, now)
+                return key, image
+        if self._db is None:
+            return None
+
+        reach = MAPBOX_MAX_SIZE / 2 - size / 2 + CENTER_TOLERANCE
+        try:
+            rows = self._db.execute(
+                "SELECT cx, cy, size, data, expires_at FROM backgrounds "
+                "WHERE style = ? AND zoom = ? AND cx BETWEEN ? AND ? AND cy BETWEEN ? AND ? AND expires_at > ? "
+                "ORDER BY (cx - ?) * (cx - ?) + (cy - ?) * (cy - ?)",
+                (style, zoom, cx - reach, cx + reach, cy - reach, cy + reach, now, cx, cx, cy, cy)).fetchall()
+        except Exception as e:
+            logger.warning(f"Gagal membaca cache gambar latar: {e}")
+            return None
+        for row_cx, row_cy, row_size, data, expires_at in rows:
+            key = (style, zoom, row_cx, row_cy, row_size)
+            if not self._covers(key, cx, cy, size):
+                continue
+            try:
+                image = Image.open(BytesIO(data)).convert('RGB')
+            except Exception as e:
+                logger.warning(f"Gambar latar di cache rusak: {e}")
+                continue
+            self._remember(key, image, expires_at)
+            self._touch(key, now)
+            return key, image
+        return None
+
+    @staticmethod
+    def _crop(image, key, cx, cy, size):
+        """Potong bagian gambar yang berpusat di cx, cy (piksel fisik = 2x piksel logis)."""
+        scale = image.size[0] / key[4]
+        left = int(round((cx - size / 2 - (key[2] - key[4] / 2)) * scale))
+        top = int(round((cy - size / 2 - (key[3] - key[4] / 2)) * scale))
+        side = int(round(size * scale))
+        left = min(max(left, 0), image.size[0] - side)
+        top = min(max(top, 0), image.size[1] - side)
+        if (left, top, side) == (0, 0, image.size[0]):
+            return image
+        return image.crop((left, top, left + side, top + side))
+
+    def _download(self, style, zoom, lat, lng, size, token):
+        url = f"{MAPBOX_BASE_URL}/styles/v1/mapbox/{style}/static/{lng:.7f},{lat:.7f},{zoom},0,0/{size}x{size}@2x"
+        logger.info(f"Mengunduh gambar latar Mapbox: {style} zoom={zoom}")
+        try:
+            response = requests.get(url, params={"access_token": token}, timeout=BACKGROUND_TIMEOUT)
+            if response.status_code == 200 and response.content:
+                return response.content
+            logger.error(f"Gagal mengambil gambar latar Mapbox: {response.status_code}")
+        except Exception as e:
+            logger.error(f"Gagal menggunakan Mapbox API: {e}")
+        return None
+
+    def _remember(self, key, image, expires_at):
+        self._memory[key] = (image, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_images:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key, now):
+        """Perbarui waktu pakai terakhir di disk (untuk urutan LRU)."""
+        if self._db is None:
+            return
+        try:
+            self._db.execute("UPDATE backgrounds SET last_used = ? WHERE style = ? AND zoom = ? AND cx = ? "
+                             "AND cy = ? AND size = ?", (now, *key))
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"Gagal memperbarui cache gambar latar: {e}")
+
+    def _count(self, name):
+        """Tambah penghitung di proses ini dan di database (dipanggil dengan lock)."""
+        self.counts[name] += 1
+        if self._db is None:
+            return
+        try:
+            self._db.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"Gagal memperbarui statistik cache gambar latar: {e}")
+
+    def _store(self, key, data, now):
+        """Simpan gambar baru ke disk (dipanggil dengan lock)."""
+        if self._db is None:
+            return
+        try:
+            self._db.execute("INSERT OR REPLACE INTO backgrounds VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             (*key, data, len(data), now, now + self.ttl))
+            self._db.commit()
+            self._writes += 1
+            if self._writes >= PRUNE_EVERY:
+                self._writes = 0
+                self._prune(self._db)
+        except Exception as e:
+            logger.warning(f"Gagal menyimpan cache gambar latar: {e}")
+
+    def _prune(self, db):
+        """Hapus gambar kedaluwarsa dan gambar yang paling lama tidak dipakai di atas batas ukuran."""
+        db.execute("DELETE FROM backgrounds WHERE expires_at <= ?", (time.time(),))
+        total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM backgrounds").fetchone()[0]
+        if total > self.max_bytes:
+            deleted = db.execute("DELETE FROM backgrounds WHERE rowid IN ("
+                                 "SELECT rowid FROM (SELECT rowid, bytes, SUM(bytes) OVER (ORDER BY last_used, rowid) "
+                                 "AS freed FROM backgrounds) WHERE freed - bytes < ?)",
+                                 (total - self.max_bytes,)).rowcount
+            logger.info(f"Cache gambar latar dibersihkan: {deleted} gambar dihapus")
+        db.commit()
+
+    def stats(self):
+        """
+        Statistik cache untuk /status.
+
+        Penghitung diambil dari database (gabungan semua proses worker) jika
+        tersedia, selain itu dari proses ini saja.
+        """
+        counts = dict(self.counts)
+        entries = size_bytes = None
+        if self._db is not None:
+            with self._lock:
+                try:
+                    counts.update(self._db.execute("SELECT name, value FROM counters").fetchall())
+                    entries, size_bytes = self._db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM backgrounds").fetchone()
+                except Exception:
+                    pass
+        hits = counts["exact_hits"] + counts["shifted_hits"]
+        lookups = hits + counts["misses"]
+        return {
+            **counts,
+            "entries": entries,
+            "bytes": size_bytes,
+            "memory_images": len(self._memory),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+_shared_cache = None
+_shared_pid = None
+_shared_lock = threading.Lock()
+
+
+def get_background_cache():
+    """
+    Cache gambar latar untuk proses ini.
+
+    Dibuat ulang di proses anak hasil fork (worker render) agar koneksi
+    SQLite tidak dipakai bersama antar proses.
+    """
+    global _shared_cache, _shared_pid
+    with _shared_lock:
+        if _shared_cache is None or _shared_pid != os.getpid():
+            _shared_cache = BackgroundCache()
+            _shared_pid = os.getpid()
+        return _shared_cache
@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Layanan data ODP bersama untuk satu proses.
+
+Spreadsheet hanya diunduh dan disiapkan sekali, lalu dataset beserta
+indeks spasialnya disimpan di memori dan dipakai oleh semua request.
+Data diperbarui secara berkala di thread latar belakang sehingga request
+HTTP tidak perlu lagi mengunduh CSV dari Google Sheets setiap kali.
+
+Setiap refresh memakai request kondisional (ETag / Last-Modified) jika
+didukung server, dan hash konten jika tidak. Jika isi berubah, snapshot
+baru dibandingkan per ODP NAME dan hanya baris yang berubah yang
+diterapkan ke dataset dan indeks spasial. Jalur ini diperiksa dengan server
+CSV lokal oleh check_data_refresh.py.
+
+Versi berikutnya dibangun di thread worker tanpa menyentuh versi aktif, lalu
+dipublikasikan dengan satu penggantian referensi (DatasetVersion). Refresh
+manual cukup memanggil request_refresh() yang langsung kembali.
+
+Setiap versi baru juga disimpan sebagai snapshot biner di disk. Saat proses
+dijalankan ulang, snapshot terakhir langsung dipakai dan pengecekan ke
+spreadsheet dilakukan di latar belakang. Dataset aktif dibaca langsung dari
+snapshot yang di-memory-map, sehingga bot dan aplikasi web yang memakai
+sumber yang sama berbagi satu salinan data di memori; snapshot baru yang
+ditulis proses lain dipetakan ulang secara berkala.
+
+CSV diunduh secara streaming ke file sementara (sambil dihitung hash-nya)
+lalu dimuat per potongan oleh odp_ingest, sehingga puncak pemakaian memori
+tidak bergantung pada ukuran spreadsheet.
+
+Jika diberi road_snapper (lihat odp_road_snap), setiap versi dataset yang
+dipublikasikan mendapat tabel snap ODP ke jalan. Tabel dibangun di thread
+terpisah setelah versi dipublikasikan, sehingga pencarian tidak menunggu;
+sampai tabel siap, road_snap() mengembalikan None.
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import namedtuple
+
+import requests
+
+from odp_dataset import (can_diff, diff_snapshots, NAME_COLUMN, LAT_COLUMN, LNG_COLUMN,
+                         ODP_NUMBER_COLUMN, FLOAT32_COORDINATES)
+from odp_ingest import ingest_csv
+from odp_snapshot import (DEFAULT_SNAPSHOT_DIR, snapshot_dir_for, current_snapshot_path,
+                          read_snapshot, write_snapshot)
+
+logger = logging.getLogger(__name__)
+
+# URL spreadsheet publik
+SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/16PFuuwJjL-_hJKuopMJlktlwaNWLnKQdPUMZdX55pkQ/edit?gid=1933962208"
+
+# Interval refresh latar belakang dalam detik (bisa diatur lewat environment)
+DEFAULT_REFRESH_INTERVAL = int(os.environ.get('ODP_REFRESH_INTERVAL', 300))
+
+# Timeout unduhan CSV dalam detik
+FETCH_TIMEOUT = 60
+
+# Interval pengecekan snapshot baru yang ditulis proses lain (detik)
+SNAPSHOT_POLL_INTERVAL = int(os.environ.get('ODP_SNAPSHOT_POLL_INTERVAL', 30))
+
+# Bangun ulang dataset secara penuh jika baris terhapus melebihi porsi ini
+COMPACT_DEAD_RATIO = 0.25
+
+# Status hasil pengambilan CSV
+FETCH_NOT_MODIFIED = "not_modified"  # Server menjawab 304
+FETCH_UNCHANGED = "unchanged"        # Konten diunduh tetapi hash-nya sama
+FETCH_CHANGED = "changed"
+
+# Versi dataset yang dipublikasikan; diganti sebagai satu referensi utuh
+DatasetVersion = namedtuple("DatasetVersion", ["dataset", "version", "loaded_at"])
+EMPTY_VERSION = DatasetVersion(None, 0, None)
+
+# Tabel snap jalan yang berlaku untuk satu versi dataset
+RoadSnapVersion = namedtuple("RoadSnapVersion", ["dataset", "table"])
+EMPTY_SNAP = RoadSnapVersion(None, None)
+
+# Registry layanan per URL spreadsheet
+_services = {}
+_services_lock = threading.Lock()
+
+
+def spreadsheet_csv_url(url, sheet_name="Sheet1"):
+    """
+    Buat URL ekspor CSV dari URL atau ID spreadsheet Google Sheets.
+
+    Args:
+        url: URL spreadsheet atau ID spreadsheet langsung
+        sheet_name: Nama worksheet
+
+    Returns:
+        URL CSV yang bisa dibaca oleh pandas
+    """
+    # URL selain Google Sheets atau path file CSV lokal dipakai apa adanya
+    if "docs.google.com" not in url and (url.startswith("http") or os.path.exists(url)):
+        return url
+
+    match = re.search(r'/d/([a-zA-Z0-9-_]+)', url)
+    spreadsheet_id = match.group(1) if match else url
+    return f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}"
+
+
+# Ukuran blok saat mengunduh dan menghitung hash CSV
+FETCH_BLOCK_SIZE = 1024 * 1024
+
+
+class FetchResult:
+    """Hasil satu kali pengambilan CSV (isi berada di file `path`)."""
+
+    def __init__(self, status, path=None, etag=None, last_modified=None, content_hash=None, temporary=False):
+        self.status = status
+        self.path = path
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.temporary = temporary
+
+    def discard(self):
+        """Hapus file unduhan sementara."""
+        if self.temporary and self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+class ConditionalFetcher:
+    """
+    Pengambil CSV yang hanya mengunduh ulang jika isinya berubah.
+
+    Validator (ETag, Last-Modified, hash konten) baru disimpan lewat commit()
+    setelah snapshot berhasil diterapkan, agar kegagalan parsing tidak membuat
+    perubahan terlewat pada refresh berikutnya.
+    """
+
+    def __init__(self, csv_url, timeout=FETCH_TIMEOUT):
+        self.csv_url = csv_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.etag = None
+        self.last_modified = None
+        self.content_hash = None
+
+    def fetch(self):
+        """
+        Ambil CSV dengan request kondisional.
+
+        Returns:
+            FetchResult
+        """
+        if os.path.exists(self.csv_url):
+            digest = hashlib.sha256()
+            with open(self.csv_url, 'rb') as f:
+                for block in iter(lambda: f.read(FETCH_BLOCK_SIZE), b''):
+                    digest.update(block)
+            return self._result_for(self.csv_url, digest.hexdigest())
+
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        with self.session.get(self.csv_url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304:
+                return FetchResult(FETCH_NOT_MODIFIED)
+            response.raise_for_status()
+
+            # Tulis ke file sementara per blok sambil menghitung hash
+            digest = hashlib.sha256()
+            fd, path = tempfile.mkstemp(prefix='odp-', suffix='.csv')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for block in response.iter_content(FETCH_BLOCK_SIZE):
+                        digest.update(block)
+                        f.write(block)
+            except BaseException:
+                os.remove(path)
+                raise
+
+        return self._result_for(path, digest.hexdigest(), temporary=True,
+                                etag=response.headers.get('ETag'),
+                                last_modified=response.headers.get('Last-Modified'))
+
+    def _result_for(self, path, content_hash, temporary=False, etag=None, last_modified=None):
+        status = FETCH_UNCHANGED if content_hash == self.content_hash else FETCH_CHANGED
+        return FetchResult(status, path, etag, last_modified, content_hash, temporary)
+
+    def validators(self):
+        """Validator saat ini (disimpan di header snapshot)."""
+        return {"etag": self.etag, "last_modified": self.last_modified, "content_hash": self.content_hash}
+
+    def restore(self, validators):
+        """Pulihkan validator dari snapshot agar refresh pertama bisa mendapat 304."""
+        self.etag = validators.get("etag")
+        self.last_modified = validators.get("last_modified")
+        self.content_hash = validators.get("content_hash")
+
+    def commit(self, result):
+        """Simpan validator dari hasil yang sudah berhasil diterapkan."""
+        if result.status == FETCH_NOT_MODIFIED:
+            return
+        self.etag = result.etag
+        self.last_modified = result.last_modified
+        self.content_hash = result.content_hash
+
+
+class OdpDataService:
+    """
+    Pemegang dataset ODP untuk satu proses dengan refresh berkala.
+
+    Versi dataset berikutnya selalu dibangun terpisah di thread worker, lalu
+    dipublikasikan dengan satu kali penggantian referensi. Query yang sedang
+    berjalan tetap memakai versi yang diambilnya di awal.
+    """
+
+    def __init__(self, url=SPREADSHEET_URL, sheet_name="Sheet1", refresh_interval=DEFAULT_REFRESH_INTERVAL,
+                 csv_url=None, required_columns=(LAT_COLUMN, LNG_COLUMN), snapshot_base=DEFAULT_SNAPSHOT_DIR,
+                 columns=None, float32_coordinates=FLOAT32_COORDINATES, road_snapper=None):
+        """
+        Args:
+            url: URL atau ID spreadsheet
+            sheet_name: Nama worksheet
+            refresh_interval: Interval refresh latar belakang dalam detik (0 = hanya atas permintaan)
+            csv_url: URL CSV eksplisit (default: dibangun dari url dan sheet_name)
+            required_columns: Kolom yang wajib ada di spreadsheet
+            snapshot_base: Direktori dasar snapshot biner (None = tanpa snapshot)
+            columns: Kolom yang diambil per pencarian (default: semua kolom); snapshot
+                     tetap menyimpan semua kolom agar dipakai bersama semua proses
+            float32_coordinates: Simpan koordinat sebagai float32 (lihat odp_dataset)
+            road_snapper: Pembangun tabel snap ODP ke jalan (None = tanpa tabel snap)
+        """
+        self.url = url
+        self.sheet_name = sheet_name
+        self.refresh_interval = refresh_interval
+        self.csv_url = csv_url or spreadsheet_csv_url(url, sheet_name)
+        self.required_columns = tuple(required_columns)
+        self.columns = None if columns is None else \
+            tuple(dict.fromkeys((*self.required_columns, *columns, ODP_NUMBER_COLUMN)))
+        self.float32_coordinates = float32_coordinates
+        self.fetcher = ConditionalFetcher(self.csv_url)
+
+        # Semua proses menyimpan tata letak kolom yang sama (semua kolom) sehingga
+        # memetakan snapshot yang sama; pilihan `columns` hanya berlaku saat dibaca
+        layout = 'float32' if float32_coordinates else 'float64'
+        self.snapshot_dir = snapshot_dir_for(self.csv_url, snapshot_base, layout) if snapshot_base else None
+        self.snapshot_path = None
+
+        self.source = None
+        self.checked_at = None
+        self.refreshing = False
+        self.last_change = {"mode": None, "added": 0, "removed": 0, "changed": 0}
+
+        self._current = EMPTY_VERSION
+        self.road_snapper = road_snapper
+        self._road_snap = EMPTY_SNAP
+        self._snap_lock = threading.Lock()
+        self._snap_thread = None
+        self._load_lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def dataset(self):
+        """Dataset aktif tanpa memicu pemuatan (None jika belum pernah dimuat)."""
+        return self._current.dataset
+
+    @property
+    def version(self):
+        return self._current.version
+
+    @property
+    def loaded_at(self):
+        return self._current.loaded_at
+
+    def snapshot(self):
+        """Ambil versi dataset aktif (dataset, nomor versi, waktu muat) secara konsisten."""
+        return self._current
+
+    def road_snap(self, dataset):
+        """Tabel snap jalan untuk dataset tersebut, atau None jika belum siap."""
+        current = self._road_snap
+        return current.table if current.dataset is dataset else None
+
+    @property
+    def road_snap_pending(self):
+        """True jika tabel snap untuk dataset aktif sedang dibangun."""
+        return self._snap_thread is not None
+
+    def _schedule_road_snap(self):
+        """Bangun tabel snap untuk dataset aktif di thread terpisah (satu thread sekaligus)."""
+        if self.road_snapper is None:
+            return
+        with self._snap_lock:
+            if self._snap_thread is not None:
+                return
+            self._snap_thread = threading.Thread(target=self._road_snap_loop, name="odp-road-snap", daemon=True)
+            self._snap_thread.start()
+
+    def _road_snap_loop(self):
+        # Ulangi sampai tabel sesuai dataset aktif (versi baru bisa terbit selama snap berjalan)
+        while True:
+            with self._snap_lock:
+                dataset = self._current.dataset
+                if dataset is None or self._road_snap.dataset is dataset:
+                    self._snap_thread = None
+                    return
+            previous = self._road_snap
+            try:
+                table = self.road_snapper.table_for(dataset, getattr(dataset.store, 'path', None),
+                                                    previous.dataset, previous.table)
+            except Exception as e:
+                logger.error(f"Error saat membangun tabel snap jalan: {e}")
+                table = None
+            self._road_snap = RoadSnapVersion(dataset, table)
+
+    def load_snapshot(self):
+        """
+        Petakan snapshot di disk jika lebih baru dari dataset aktif.
+
+        Dipakai saat start (belum ada dataset) dan untuk mengikuti snapshot
+        baru yang ditulis oleh proses lain.
+
+        Returns:
+            bool: True jika snapshot dipublikasikan sebagai dataset aktif
+        """
+        if self.snapshot_dir is None:
+            return False
+
+        path = current_snapshot_path(self.snapshot_dir)
+        if path is None or path == self.snapshot_path:
+            return False
+
+        snapshot = read_snapshot(self.snapshot_dir, self.required_columns)
+        current = self._current
+        if snapshot is None or (current.loaded_at is not None and snapshot.created_at <= current.loaded_at):
+            return False
+
+        self.fetcher.restore(snapshot.validators)
+        self.snapshot_path = snapshot.path
+        self._current = DatasetVersion(self._project(snapshot.to_dataset()), current.version + 1,
+                                       snapshot.created_at)
+        self.source = "snapshot"
+        self._schedule_road_snap()
+        logger.info(f"Dataset ODP dipetakan dari snapshot {snapshot.path}: {len(snapshot)} baris, "
+                    f"versi {self.version}")
+        return True
+
+    def _project(self, dataset):
+        """Batasi kolom yang dibaca per pencarian sesuai pilihan `columns` layanan."""
+        return dataset if self.columns is None else dataset.projected(self.columns)
+
+    def save_snapshot(self, dataset):
+        """
+        Simpan dataset sebagai snapshot dan petakan kembali hasilnya.
+
+        Snapshot hanya berisi baris yang masih berlaku; indeks spasial dataset
+        dibawa ke snapshot dengan menggeser posisinya, bukan dibangun ulang.
+
+        Returns:
+            Dataset berbasis snapshot yang baru ditulis, atau None jika gagal
+            (hanya dicatat di log)
+        """
+        if self.snapshot_dir is None:
+            return None
+        try:
+            path = write_snapshot(self.snapshot_dir, dataset.live_frame(), source=self.csv_url,
+                                  validators=self.fetcher.validators())
+            snapshot = read_snapshot(self.snapshot_dir, self.required_columns)
+            if snapshot is None or snapshot.path != path:
+                return None
+            self.snapshot_path = path
+            return snapshot.to_dataset(index=dataset.index.compacted(dataset.alive, snapshot.lats, snapshot.lngs))
+        except Exception as e:
+            logger.warning(f"Gagal menyimpan snapshot data ODP: {e}")
+            return None
+
+    def build_next(self, current):
+        """
+        Ambil snapshot terbaru dan bangun versi dataset berikutnya dari `current`.
+
+        Returns:
+            tuple: (dataset, change, fetch_result); dataset None jika snapshot tidak valid
+        """
+        result = self.fetcher.fetch()
+        try:
+            if result.status != FETCH_CHANGED and current is not None:
+                return current, {"mode": result.status, "added": 0, "removed": 0, "changed": 0}, result
+            if result.path is None:
+                logger.error("Server tidak mengirim isi CSV (304) padahal belum ada dataset")
+                return None, None, result
+
+            logger.info(f"Memuat data ODP dari: {self.csv_url}")
+            fresh = ingest_csv(result.path, None, self.required_columns, self.float32_coordinates)
+            if fresh is None:
+                return None, None, result
+        finally:
+            result.discard()
+
+        new_frame = fresh.frame
+
+        # Dataset lama dibandingkan lewat ODP NAME dan hash baris (dari snapshot
+        # jika ada), tanpa membangun DataFrame penuhnya
+        keys = current.row_keys() if current is not None and NAME_COLUMN in current.columns else None
+        if keys is not None and can_diff(current.columns, keys.index, new_frame):
+            diff = diff_snapshots(keys, new_frame)
+            change = dict(mode="incremental", **diff.as_dict())
+            dataset = current.apply_changes(new_frame, diff, keys) if diff.total else current
+
+            # Terlalu banyak baris terhapus tersimpan: pakai dataset hasil muat penuh
+            if dataset.dead_rows > COMPACT_DEAD_RATIO * len(dataset.alive):
+                dataset = fresh
+        else:
+            dataset = fresh
+            change = {"mode": "full", "added": len(new_frame), "removed": 0, "changed": 0}
+
+        return dataset, change, result
+
+    def refresh(self):
+        """
+        Periksa spreadsheet dan terapkan perubahan ke dataset aktif.
+
+        Returns:
+            bool: True jika dataset aktif sudah sesuai dengan spreadsheet terbaru
+        """
+        with self._load_lock:
+            self.load_snapshot()
+            return self._refresh_locked()
+
+    def remap(self):
+        """Petakan ulang snapshot yang ditulis proses lain tanpa mengecek spreadsheet."""
+        with self._load_lock:
+            return self.load_snapshot()
+
+    def _refresh_locked(self):
+        current = self._current
+        self.refreshing = True
+        try:
+            dataset, change, result = self.build_next(current.dataset)
+        except Exception as e:
+            logger.error(f"Error saat memuat data ODP: {e}")
+            return False
+        finally:
+            self.refreshing = False
+
+        self.checked_at = time.time()
+        if dataset is None:
+            return False
+
+        self.fetcher.commit(result)
+        self.last_change = change
+        self.source = "spreadsheet"
+
+        if dataset is not current.dataset:
+            # Versi baru dipakai lewat snapshot yang di-memory-map agar salinan
+            # pandas hasil parsing bisa dilepas dan dibagi dengan proses lain
+            mapped = self.save_snapshot(dataset)
+            if mapped is not None:
+                dataset = mapped
+
+            # Publikasikan versi baru dengan satu penggantian referensi
+            dataset = self._project(dataset)
+            self._current = DatasetVersion(dataset, current.version + 1, self.checked_at)
+            self._schedule_road_snap()
+
+        logger.info(f"Refresh data ODP ({change['mode']}): +{change['added']} -{change['removed']} "
+                    f"~{change['changed']} baris, total {len(dataset)} ODP, versi {self.version}")
+        return True
+
+    def get_dataset(self):
+        """
+        Ambil dataset aktif, memuat jika belum pernah dimuat.
+
+        Snapshot di disk dipakai lebih dulu dan pengecekan ke spreadsheet
+        dijadwalkan di latar belakang; tanpa snapshot, data diunduh secara sinkron.
+
+        Returns:
+            PreparedDataset atau None jika data belum tersedia
+        """
+        if self._current.dataset is None:
+            with self._load_lock:
+                # Periksa ulang: request lain mungkin sudah selesai memuat
+                if self._current.dataset is None:
+                    if self.load_snapshot():
+                        self.request_refresh()
+                    else:
+                        self._refresh_locked()
+        return self._current.dataset
+
+    def request_refresh(self):
+        """
+        Minta refresh di thread worker dan kembali segera.
+
+        Returns:
+            bool: False jika sudah ada permintaan refresh yang menunggu
+        """
+        pending = self._wake_event.is_set()
+        self._wake_event.set()
+        self.start()
+        return not pending
+
+    def start(self):
+        """Mulai thread worker refresh (aman dipanggil berulang kali)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._worker_loop, name="odp-data-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Hentikan thread worker refresh."""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _refresh_due(self):
+        if self.refresh_interval <= 0:
+            return False
+        return self.checked_at is None or time.time() - self.checked_at >= self.refresh_interval
+
+    def _worker_loop(self):
+        # Worker bangun saat ada request_refresh(), saat interval refresh tercapai,
+        # dan secara berkala untuk memetakan ulang snapshot dari proses lain
+        intervals = [interval for interval in (self.refresh_interval, SNAPSHOT_POLL_INTERVAL if self.snapshot_dir else 0)
+                     if interval > 0]
+        timeout = min(intervals) if intervals else None
+        while True:
+            requested = self._wake_event.wait(timeout)
+            if self._stop_event.is_set():
+                break
+            self._wake_event.clear()
+            if requested or self._refresh_due():
+                self.refresh()
+            else:
+                self.remap()
+
+
+def get_data_service(url=SPREADSHEET_URL, sheet_name="Sheet1", refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    """
+    Ambil layanan data bersama untuk spreadsheet tertentu (satu instance per proses).
+
+    Layanan dibuat dan thread worker refresh dimulai pada pemanggilan pertama.
+    """
+    key = (url, sheet_name)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = OdpDataService(url, sheet_name, refresh_interval)
+            _services[key] = service
+            service.start()
+    return service
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tahap "prepare" untuk data ODP dari spreadsheet.
+
+Data mentah dari spreadsheet dibersihkan satu kali saat dimuat: koordinat
+dan AVAI dikonversi ke numerik, baris tanpa koordinat valid dibuang,
+KATEGORI ODP dinormalisasi dan nomor ODP diekstrak dari nama. Hasilnya
+adalah PreparedDataset yang tidak diubah lagi, sehingga setiap pencarian
+cukup memotong baris berdasarkan posisi tanpa menyalin dan mengonversi
+ulang seluruh DataFrame.
+
+Saat spreadsheet diperbarui, snapshot baru dibandingkan dengan dataset
+aktif berdasarkan ODP NAME dan hanya baris yang ditambah, dihapus atau
+berubah yang diterapkan ke dataset dan indeks spasial.
+
+Kolom disimpan dalam bentuk ringkas: KATEGORI ODP dan nomor ODP sebagai
+categorical (kode int8/int16), AVAI sebagai Int16, dan koordinat bisa
+disimpan sebagai float32 (lihat FLOAT32_COORDINATES). Kolom yang tidak
+dipakai bisa dibuang saat dimuat dengan parameter `columns`, atau tetap
+disimpan dan dilewati saat dibaca dengan PreparedDataset.projected().
+"""
+
+import os
+import re
+import copy
+import logging
+import numpy as np
+import pandas as pd
+
+from odp_distance import coordinate_arrays
+from odp_spatial_index import SpatialIndex, DEFAULT_CELL_METERS
+
+logger = logging.getLogger(__name__)
+
+# Kolom-kolom di spreadsheet
+LAT_COLUMN = "LATITUDE"
+LNG_COLUMN = "LONGITUDE"
+NAME_COLUMN = "ODP NAME"
+AVAI_COLUMN = "AVAI"
+KATEGORI_COLUMN = "KATEGORI ODP"
+
+# Kolom turunan yang ditambahkan oleh tahap prepare
+ODP_NUMBER_COLUMN = "nomor_odp"
+
+# Pola nomor ODP dalam nama standar (contoh: ODP-ABC-XYZ/123)
+ODP_NUMBER_PATTERN = re.compile(r'/(\d+)')
+
+# Kolom yang dipakai oleh bot; kolom lain bisa dibuang saat data dimuat
+CORE_COLUMNS = (NAME_COLUMN, LAT_COLUMN, LNG_COLUMN, AVAI_COLUMN, KATEGORI_COLUMN)
+
+# Simpan koordinat sebagai float32 (aktifkan dengan ODP_FLOAT32_COORDINATES=1).
+# float32 punya mantisa 24 bit: untuk nilai 64-128 derajat (longitude Kalimantan)
+# jarak antar nilai 2^-17 derajat, sehingga galat pembulatan <= ~0.43 m; untuk
+# latitude di bawah 4 derajat <= ~0.03 m, dan di seluruh rentang -180..180 <= ~0.85 m.
+# Perhitungan jarak tetap dilakukan dalam float64.
+FLOAT32_COORDINATES = os.environ.get('ODP_FLOAT32_COORDINATES', '0') == '1'
+
+# Rentang nilai AVAI yang muat di Int16
+AVAI_MIN, AVAI_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+
+def _read_only(values):
+    """Tandai array NumPy sebagai read-only agar tidak diubah tanpa sengaja."""
+    values.flags.writeable = False
+    return values
+
+
+class PreparedDataset:
+    """
+    Dataset ODP yang sudah bertipe, sudah difilter dan memiliki indeks spasial.
+
+    Objek ini tidak boleh diubah setelah dibuat. Gunakan select() untuk
+    mengambil salinan baris yang dibutuhkan oleh satu pencarian, dan
+    apply_changes() untuk membuat versi baru dari perubahan sebagian baris.
+
+    Dataset bisa dibangun di atas store yang di-memory-map (lihat
+    odp_snapshot.Snapshot); dalam hal itu DataFrame penuh baru dibangun
+    jika `frame` diakses, sedangkan pencarian hanya membaca baris hasil.
+    """
+
+    def __init__(self, frame, index, alive=None, store=None):
+        """
+        Args:
+            frame: DataFrame hasil prepare dengan indeks 0..n-1 (boleh None jika store diberikan)
+            index: SpatialIndex yang dibangun dari frame
+            alive: Mask baris yang masih berlaku (None = semua baris); baris yang
+                   dihapus lewat perubahan inkremental tetap ada di frame tetapi
+                   tidak lagi terdaftar di indeks
+            store: Penyimpanan kolom read-only dengan take(), numeric() dan columns
+        """
+        self._frame = frame
+        self.store = store
+        self.index = index
+        self.default_columns = None
+        self.lats = _read_only(index.lats)
+        self.lngs = _read_only(index.lngs)
+
+        if alive is None:
+            alive = np.ones(len(index), dtype=bool)
+        self.alive = _read_only(alive)
+        self.size = int(alive.sum())
+
+        if AVAI_COLUMN not in self.columns:
+            available = np.ones(len(index), dtype=bool)
+        elif frame is None:
+            available = store.numeric(AVAI_COLUMN) > 0
+        else:
+            available = frame[AVAI_COLUMN].fillna(0).to_numpy(dtype=np.int64) > 0
+        self.available = _read_only(available & alive)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def frame(self):
+        """DataFrame penuh (untuk dataset berbasis store, dibangun saat pertama kali diakses)."""
+        if self._frame is None:
+            self._frame = self.store.frame
+        return self._frame
+
+    @property
+    def columns(self):
+        if self._frame is None and self.store is not None:
+            return self.store.columns
+        return list(self._frame.columns)
+
+    @property
+    def empty(self):
+        return self.size == 0
+
+    @property
+    def dead_rows(self):
+        """Jumlah baris terhapus yang masih tersimpan di frame."""
+        return len(self.alive) - self.size
+
+    def live_frame(self):
+        """DataFrame berisi baris yang masih berlaku saja."""
+        if self.dead_rows == 0:
+            return self.frame
+        return self.frame[self.alive]
+
+    def projected(self, columns):
+        """
+        Salinan ringan dataset yang select() bawaannya hanya mengambil kolom tertentu.
+
+        Kolom tetap tersimpan lengkap (frame, store dan indeks dipakai bersama);
+        kolom yang tidak ada di dataset diabaikan.
+
+        Args:
+            columns: Kolom yang diambil per pencarian
+
+        Returns:
+            PreparedDataset
+        """
+        dataset = copy.copy(self)
+        dataset.default_columns = [col for col in self.columns if col in columns]
+        return dataset
+
+    def select(self, positions, columns=None):
+        """
+        Ambil salinan baris pada posisi tertentu.
+
+        Args:
+            positions: Array posisi baris (iloc)
+            columns: Kolom yang diambil (default: kolom proyeksi, atau semua kolom)
+
+        Returns:
+            DataFrame baru yang aman untuk ditambahi kolom
+        """
+        if columns is None:
+            columns = self.default_columns
+        if self._frame is None:
+            return self.store.take(positions, columns)
+        frame = self._frame if columns is None else self._frame[columns]
+        return frame.iloc[positions].copy()
+
+    def within_radius(self, ref_lat, ref_lng, radius_meters, band_meters=0.0):
+        """
+        Ambil baris dalam radius beserta kolom 'jarak_meter', terurut dari yang terdekat.
+        """
+        positions, distances = self.index.query_radius(ref_lat, ref_lng, radius_meters, band_meters=band_meters)
+        nearby = self.select(positions)
+        nearby['jarak_meter'] = distances
+        return nearby
+
+    def row_keys(self):
+        """
+        Posisi dan hash isi baris yang masih berlaku, diindeks ODP NAME.
+
+        Untuk dataset berbasis store hanya kolom ODP NAME yang di-decode dan
+        hash dibaca dari snapshot, sehingga DataFrame penuh tidak dibangun.
+
+        Returns:
+            DataFrame dengan kolom 'position' dan 'hash'
+        """
+        if self._frame is None:
+            names = self.store.take(slice(None), [NAME_COLUMN])[NAME_COLUMN]
+            hashes = self.store.row_hashes()
+        else:
+            names = self._frame[NAME_COLUMN]
+            hashes = row_hashes(self._frame)
+        keys = pd.DataFrame({"position": np.arange(len(self.alive)), "hash": hashes},
+                            index=pd.Index(names.to_numpy(), name=NAME_COLUMN))
+        return keys[self.alive]
+
+    def apply_changes(self, new_frame, diff, keys):
+        """
+        Buat versi dataset baru dengan menerapkan hanya baris yang berubah.
+
+        Posisi baris lama dipertahankan agar indeks spasial cukup diperbarui
+        untuk titik yang bergeser, dihapus atau ditambah. Isi baris diambil dari
+        new_frame (baris yang tidak berubah isinya sama), sehingga frame lama
+        tidak perlu dibaca; baris terhapus dibiarkan kosong.
+
+        Args:
+            new_frame: Snapshot baru hasil prepare_frame()
+            diff: SnapshotDiff antara dataset ini dan new_frame
+            keys: Hasil row_keys() dataset ini
+
+        Returns:
+            PreparedDataset baru (dataset ini tidak diubah)
+        """
+        positions = keys["position"]
+        new_rows = new_frame.set_index(NAME_COLUMN, drop=False)
+
+        # Susun nama per posisi lama (kosong untuk baris terhapus), baris baru di akhir
+        removed_pos = positions.loc[diff.removed].to_numpy(dtype=np.int64)
+        labels = np.full(len(self.alive) + len(diff.added), None, dtype=object)
+        labels[positions.to_numpy()] = positions.index.to_numpy()
+        labels[removed_pos] = None
+        labels[len(self.alive):] = diff.added
+        frame = new_rows.reindex(labels).reset_index(drop=True)
+        for col in frame.columns:
+            frame[col] = _restore_dtype(frame[col], new_frame[col].dtype)
+
+        alive = np.concatenate((self.alive, np.ones(len(diff.added), dtype=bool)))
+        alive[removed_pos] = False
+
+        # Baris berubah yang koordinatnya bergeser dipindah selnya di indeks
+        lats, lngs = coordinate_arrays(frame, LAT_COLUMN, LNG_COLUMN)
+        changed_pos = positions.loc[diff.changed].to_numpy(dtype=np.int64)
+        moved_mask = ((self.lats[changed_pos] != lats[changed_pos]) |
+                      (self.lngs[changed_pos] != lngs[changed_pos]))
+        moved = changed_pos[moved_mask]
+
+        index = self.index.with_changes(lats, lngs, moved=moved, removed=removed_pos)
+        return PreparedDataset(frame, index, alive)
+
+
+class SnapshotDiff:
+    """Perbedaan antara dua snapshot data ODP berdasarkan ODP NAME."""
+
+    def __init__(self, added, removed, changed):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.changed = list(changed)
+
+    @property
+    def total(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def as_dict(self):
+        return {"added": len(self.added), "removed": len(self.removed), "changed": len(self.changed)}
+
+
+def _restore_dtype(series, dtype):
+    """Kembalikan dtype kolom setelah diubah; kategori baru ikut ditambahkan ke categorical."""
+    if series.dtype == dtype:
+        return series
+    if isinstance(dtype, pd.CategoricalDtype):
+        return series.astype(object).astype('category')
+    return series.astype(dtype)
+
+
+def parse_odp_number(name):
+    """Ekstrak nomor ODP dari nama (contoh: 'ODP-ABC-XYZ/123' -> '123')."""
+    if not isinstance(name, str):
+        return None
+    match = ODP_NUMBER_PATTERN.search(name)
+    return match.group(1) if match else None
+
+
+def prepare_frame(df, columns=None, float32_coordinates=FLOAT32_COORDINATES):
+    """
+    Bersihkan data mentah spreadsheet: koordinat dan AVAI numerik, baris tanpa
+    koordinat valid (kosong, bukan angka, atau di luar rentang lat/lng) dibuang,
+    KATEGORI ODP dinormalisasi dan nomor ODP diekstrak.
+
+    Args:
+        df: DataFrame mentah dari spreadsheet (harus punya kolom LATITUDE, LONGITUDE)
+        columns: Kolom yang disimpan (default: semua kolom spreadsheet)
+        float32_coordinates: Simpan koordinat sebagai float32
+
+    Returns:
+        DataFrame baru dengan indeks 0..n-1
+    """
+    # Buang kolom yang tidak dipakai; salinan dangkal cukup karena kolom diganti, bukan diubah
+    if columns is not None:
+        frame = df.loc[:, [col for col in df.columns if col in columns or col in (LAT_COLUMN, LNG_COLUMN)]]
+    else:
+        frame = df.copy(deep=False)
+
+    # Koordinat numerik; buang baris yang kosong, tidak valid, atau di luar rentang
+    lats = pd.to_numeric(frame[LAT_COLUMN], errors='coerce')
+    lngs = pd.to_numeric(frame[LNG_COLUMN], errors='coerce')
+    valid = lats.between(-90.0, 90.0) & lngs.between(-180.0, 180.0)
+    frame[LAT_COLUMN] = lats
+    frame[LNG_COLUMN] = lngs
+    frame = frame[valid].reset_index(drop=True)
+    if float32_coordinates:
+        frame[LAT_COLUMN] = frame[LAT_COLUMN].astype(np.float32)
+        frame[LNG_COLUMN] = frame[LNG_COLUMN].astype(np.float32)
+
+    # AVAI numerik (bilangan bulat Int16, kosong jika tidak terisi atau di luar rentang)
+    if AVAI_COLUMN in frame.columns:
+        avai = pd.to_numeric(frame[AVAI_COLUMN], errors='coerce').round()
+        frame[AVAI_COLUMN] = avai.where(avai.between(AVAI_MIN, AVAI_MAX)).astype('Int16')
+
+    # KATEGORI ODP dinormalisasi menjadi huruf besar tanpa spasi di tepi
+    if KATEGORI_COLUMN in frame.columns:
+        kategori = frame[KATEGORI_COLUMN].fillna("").astype(str).str.strip().str.upper()
+        frame[KATEGORI_COLUMN] = kategori.astype('category')
+
+    # Nomor ODP dari nama (banyak nilai berulang, disimpan sebagai categorical)
+    if NAME_COLUMN in frame.columns:
+        frame[ODP_NUMBER_COLUMN] = frame[NAME_COLUMN].map(parse_odp_number).astype('category')
+
+    return frame
+
+
+def prepare_dataset(df, cell_meters=DEFAULT_CELL_METERS, columns=None, float32_coordinates=FLOAT32_COORDINATES):
+    """
+    Bersihkan data mentah spreadsheet dan bangun dataset siap pakai.
+
+    Args:
+        df: DataFrame mentah dari spreadsheet (harus punya kolom LATITUDE, LONGITUDE)
+        cell_meters: Ukuran sel grid indeks spasial dalam meter
+        columns: Kolom yang disimpan (default: semua kolom spreadsheet)
+        float32_coordinates: Simpan koordinat sebagai float32
+
+    Returns:
+        PreparedDataset
+    """
+    frame = prepare_frame(df, columns, float32_coordinates)
+    logger.info(f"Dataset ODP disiapkan: {len(frame)} baris valid dari {len(df)} baris mentah")
+
+    return dataset_from_frame(frame, cell_meters)
+
+
+def dataset_from_frame(frame, cell_meters=DEFAULT_CELL_METERS):
+    """Bangun PreparedDataset dari DataFrame yang sudah melalui prepare_frame()."""
+    index = SpatialIndex.from_dataframe(frame, LAT_COLUMN, LNG_COLUMN, cell_meters)
+    return PreparedDataset(frame, index)
+
+
+def row_hashes(frame):
+    """Hash isi setiap baris frame (dipakai untuk mendeteksi baris yang berubah)."""
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def can_diff(old_columns, old_names, new_frame):
+    """
+    Periksa apakah dua snapshot bisa dibandingkan per baris berdasarkan ODP NAME.
+
+    Perbandingan inkremental hanya aman jika kolomnya sama persis dan
+    ODP NAME terisi serta unik di kedua snapshot.
+
+    Args:
+        old_columns: Kolom dataset lama
+        old_names: ODP NAME baris yang masih berlaku di dataset lama
+        new_frame: Snapshot baru
+    """
+    if NAME_COLUMN not in new_frame.columns or list(old_columns) != list(new_frame.columns):
+        return False
+    for names in (old_names, new_frame[NAME_COLUMN]):
+        if names.isna().any() or not names.is_unique:
+            return False
+    return True
+
+
+def diff_snapshots(old_keys, new_frame):
+    """
+    Bandingkan dataset lama dengan snapshot baru berdasarkan ODP NAME.
+
+    Args:
+        old_keys: Hasil PreparedDataset.row_keys() dataset lama
+        new_frame: Snapshot baru
+
+    Returns:
+        SnapshotDiff berisi nama ODP yang ditambah, dihapus dan berubah
+    """
+    old_hash = old_keys["hash"]
+    new_hash = pd.Series(row_hashes(new_frame), index=new_frame[NAME_COLUMN])
+
+    added = new_hash.index.difference(old_hash.index, sort=False)
+    removed = old_hash.index.difference(new_hash.index, sort=False)
+    common = new_hash.index.intersection(old_hash.index, sort=False)
+    changed = common[new_hash.loc[common].to_numpy() != old_hash.loc[common].to_numpy()]
+
+    return SnapshotDiff(added, removed, changed)
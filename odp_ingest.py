@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pemuatan CSV spreadsheet ODP secara bertahap (per potongan baris).
+
+Ekspor spreadsheet dibaca dengan pd.read_csv(chunksize=...) memakai skema
+kolom yang sudah ditentukan, sehingga hanya satu potongan mentah yang ada
+di memori pada satu waktu. Setiap potongan langsung dibersihkan dengan
+prepare_frame (baris dengan koordinat tidak valid dibuang), koordinatnya
+dimasukkan ke SpatialIndexBuilder, lalu isinya disalin ke buffer per kolom
+(ColumnBuffers) dan DataFrame potongannya dilepas. Buffer dialokasikan di
+awal sebesar jumlah baris file, sehingga puncak memori kira-kira ukuran
+dataset akhir ditambah satu potongan, bukan dua kali ukuran dataset (lihat
+benchmark_odp_memory.py).
+"""
+
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+from odp_dataset import (PreparedDataset, prepare_frame, FLOAT32_COORDINATES,
+                         NAME_COLUMN, LAT_COLUMN, LNG_COLUMN, AVAI_COLUMN, KATEGORI_COLUMN)
+from odp_spatial_index import SpatialIndexBuilder, DEFAULT_CELL_METERS
+
+logger = logging.getLogger(__name__)
+
+# Jumlah baris CSV per potongan (bisa diatur lewat environment)
+CHUNK_ROWS = int(os.environ.get('ODP_CSV_CHUNK_ROWS', 50000))
+
+# Pertumbuhan buffer kolom jika jumlah baris melebihi perkiraan awal
+BUFFER_GROWTH = 1.5
+
+# Ukuran blok saat menghitung baris file untuk alokasi buffer
+COUNT_BLOCK_SIZE = 1024 * 1024
+
+# Skema kolom saat parsing. Kolom teks dibaca sebagai string apa adanya (tanpa
+# tebakan tipe per potongan); kolom angka dibaca sebagai teks juga lalu
+# dikonversi oleh prepare_frame, karena sel yang tidak valid harus dibuang
+# per baris, bukan menggagalkan seluruh potongan.
+CSV_SCHEMA = {
+    NAME_COLUMN: str,
+    LAT_COLUMN: str,
+    LNG_COLUMN: str,
+    AVAI_COLUMN: str,
+    KATEGORI_COLUMN: str,
+}
+
+
+def iter_csv_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    """
+    Baca file CSV per potongan dengan skema yang ditentukan.
+
+    Args:
+        path: Path file CSV (atau objek file)
+        columns: Kolom yang dibaca (default: semua kolom)
+        chunk_rows: Jumlah baris per potongan
+
+    Yields:
+        DataFrame mentah per potongan
+    """
+    usecols = None if columns is None else (lambda col: col in columns)
+    reader = pd.read_csv(path, usecols=usecols, dtype=CSV_SCHEMA, chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def count_lines(path):
+    """
+    Jumlah baris file (batas atas jumlah baris data ditambah header).
+
+    Returns:
+        int, atau 0 jika path bukan file (misalnya objek file)
+    """
+    if not isinstance(path, (str, os.PathLike)):
+        return 0
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COUNT_BLOCK_SIZE), b''):
+            lines += block.count(b'\n')
+    return lines + 1
+
+
+class ColumnBuffers:
+    """
+    Kolom dataset yang diisi per potongan tanpa menyimpan DataFrame potongan.
+
+    Kolom numerik disalin ke buffer numpy, Int16 ke buffer nilai dan mask,
+    categorical ke buffer kode dengan kategori gabungan (urutan kemunculan,
+    seperti union_categoricals). Kolom teks disimpan sebagai array per
+    potongan (string-nya tidak disalin) dan digabung di akhir; begitu juga
+    kolom yang tipenya berbeda antar potongan, yang digabung dengan pd.concat.
+    """
+
+    def __init__(self, capacity=0):
+        self.capacity = int(capacity)
+        self.size = 0
+        self.columns = None
+        self._values = {}
+        self._masks = {}
+        self._categories = {}
+        self._pieces = {}
+
+    def __len__(self):
+        return self.size
+
+    def append(self, frame):
+        """Salin isi potongan hasil prepare_frame ke buffer."""
+        if self.columns is None:
+            self.columns = list(frame.columns)
+            for col in self.columns:
+                self._start(col, frame[col])
+        rows = len(frame)
+        self._reserve(self.size + rows)
+        end = self.size + rows
+
+        for col in self.columns:
+            series = frame[col]
+            if col in self._values and not self._fits(col, series):
+                self._to_pieces(col)
+            if col in self._pieces:
+                self._pieces[col].append(self._piece(series))
+            elif col in self._categories:
+                lookup = self._categories[col]
+                codes = series.cat.codes.to_numpy()
+                mapping = np.array([lookup.setdefault(value, len(lookup)) for value in series.cat.categories],
+                                   dtype=np.int32)
+                self._values[col][self.size:end] = mapping[codes] if len(mapping) else -1
+                self._values[col][self.size:end][codes < 0] = -1
+            elif col in self._masks:
+                self._masks[col][self.size:end] = series.isna().to_numpy()
+                self._values[col][self.size:end] = series.to_numpy(dtype=self._values[col].dtype, na_value=0)
+            else:
+                self._values[col][self.size:end] = series.to_numpy()
+        self.size = end
+
+    @staticmethod
+    def _piece(series):
+        """Array kolom potongan yang tidak ikut menahan blok DataFrame potongan."""
+        if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            return series.array
+        return series.to_numpy(copy=True)
+
+    def _start(self, col, series):
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            self._categories[col] = {}
+            self._values[col] = np.empty(self.capacity, dtype=np.int32)
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            if isinstance(series.array, pd.arrays.IntegerArray):
+                self._masks[col] = np.empty(self.capacity, dtype=bool)
+                self._values[col] = np.empty(self.capacity, dtype=dtype.numpy_dtype)
+            else:
+                self._pieces[col] = []
+        elif dtype == object:
+            self._pieces[col] = []
+        else:
+            self._values[col] = np.empty(self.capacity, dtype=dtype)
+
+    def _fits(self, col, series):
+        """True jika tipe kolom potongan sama dengan buffer-nya."""
+        if col in self._categories:
+            return isinstance(series.dtype, pd.CategoricalDtype)
+        if col in self._masks:
+            return isinstance(series.array, pd.arrays.IntegerArray) \
+                and series.dtype.numpy_dtype == self._values[col].dtype
+        return series.dtype == self._values[col].dtype
+
+    def _to_pieces(self, col):
+        """Tipe kolom berubah antar potongan: simpan isi buffer sebagai potongan pertama."""
+        self._pieces[col] = [self._column(col)]
+        self._values.pop(col, None)
+        self._masks.pop(col, None)
+        self._categories.pop(col, None)
+
+    def _reserve(self, rows):
+        """Perbesar semua buffer agar muat `rows` baris."""
+        if rows <= self.capacity:
+            return
+        capacity = max(rows, int(self.capacity * BUFFER_GROWTH))
+        for buffers in (self._values, self._masks):
+            for col, values in buffers.items():
+                grown = np.empty(capacity, dtype=values.dtype)
+                grown[:self.size] = values[:self.size]
+                buffers[col] = grown
+        self.capacity = capacity
+
+    def _trimmed(self, values):
+        return values if len(values) == self.size else values[:self.size].copy()
+
+    def _column(self, col):
+        """Isi satu kolom sebagai array pandas/numpy sepanjang jumlah baris."""
+        if col in self._pieces:
+            pieces = self._pieces[col]
+            if len(pieces) == 1:
+                return pieces[0]
+            return pd.concat([pd.Series(piece, copy=False) for piece in pieces], ignore_index=True).array
+        values = self._trimmed(self._values[col])
+        if col in self._categories:
+            return pd.Categorical.from_codes(values, categories=list(self._categories[col]))
+        if col in self._masks:
+            return pd.arrays.IntegerArray(values, self._trimmed(self._masks[col]))
+        return values
+
+    def to_frame(self):
+        """
+        DataFrame hasil; buffer setiap kolom dilepas begitu kolomnya selesai.
+
+        Returns:
+            DataFrame dengan indeks 0..n-1
+        """
+        data = {}
+        for col in self.columns:
+            data[col] = self._column(col)
+            for buffers in (self._values, self._masks, self._categories, self._pieces):
+                buffers.pop(col, None)
+        return pd.DataFrame(data, copy=False)
+
+
+def ingest_csv(path, columns=None, required_columns=(LAT_COLUMN, LNG_COLUMN),
+               float32_coordinates=FLOAT32_COORDINATES, cell_meters=DEFAULT_CELL_METERS,
+               chunk_rows=CHUNK_ROWS):
+    """
+    Muat CSV spreadsheet per potongan menjadi dataset siap pakai.
+
+    Args:
+        path: Path file CSV
+        columns: Kolom yang disimpan (default: semua kolom spreadsheet)
+        required_columns: Kolom yang wajib ada
+        float32_coordinates: Simpan koordinat sebagai float32
+        cell_meters: Ukuran sel grid indeks spasial dalam meter
+        chunk_rows: Jumlah baris per potongan
+
+    Returns:
+        PreparedDataset, atau None jika kolom wajib tidak ada
+    """
+    builder = SpatialIndexBuilder(cell_meters)
+    buffers = ColumnBuffers(count_lines(path))
+    chunks = 0
+    raw_rows = 0
+
+    for chunk in iter_csv_chunks(path, columns, chunk_rows):
+        if not chunks:
+            for col in required_columns:
+                if col not in chunk.columns:
+                    logger.error(f"Kolom {col} tidak ditemukan dalam spreadsheet!")
+                    return None
+
+        frame = prepare_frame(chunk, columns, float32_coordinates)
+        dropped = len(chunk) - len(frame)
+        if dropped:
+            logger.warning(f"Potongan baris {raw_rows}-{raw_rows + len(chunk) - 1}: "
+                           f"{dropped} baris dengan koordinat tidak valid dibuang")
+
+        builder.add(frame[LAT_COLUMN].to_numpy(), frame[LNG_COLUMN].to_numpy())
+        buffers.append(frame)
+        chunks += 1
+        raw_rows += len(chunk)
+        del chunk, frame
+
+    if not chunks:
+        logger.error("Spreadsheet kosong")
+        return None
+
+    frame = buffers.to_frame()
+    logger.info(f"Dataset ODP dimuat dari {chunks} potongan: "
+                f"{len(frame)} baris valid dari {raw_rows} baris mentah")
+
+    return PreparedDataset(frame, builder.build())
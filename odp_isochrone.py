@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Wilayah jangkauan jalan (isochrone jarak) untuk pencarian ODP.
+
+Wilayah disimpan seperti koordinat GeoJSON: daftar poligon, setiap poligon
+berupa daftar ring [[lng, lat], ...] dengan ring pertama sebagai batas luar
+dan ring berikutnya sebagai lubang. Wilayah bisa berasal dari API isochrone
+provider atau dibangun dari graf jalan lokal: titik-titik sepanjang jalan
+yang terjangkau dirasterisasi ke grid, dilebarkan sebesar buffer (ODP
+berdiri di tiang samping jalan), lalu batasnya diambil dengan contourpy.
+
+Pemilihan ODP di dalam wilayah memakai uji titik-dalam-poligon vektor dari
+matplotlib.path, sehingga biayanya tidak bergantung pada jumlah rute.
+"""
+
+import math
+import logging
+
+import numpy as np
+from matplotlib.path import Path
+from contourpy import contour_generator, FillType
+
+logger = logging.getLogger(__name__)
+
+# Resolusi raster wilayah dari graf jalan lokal (meter per sel)
+ISOCHRONE_CELL_METERS = 20.0
+
+# Lebar wilayah di kiri-kanan jalan yang masih dianggap terjangkau (meter)
+ISOCHRONE_BUFFER_METERS = 40.0
+
+# Panjang 1 derajat latitude dalam meter (perkiraan)
+METERS_PER_DEGREE = 111320.0
+
+
+def geometry_polygons(geometry):
+    """
+    Poligon dari geometri GeoJSON (Polygon atau MultiPolygon).
+
+    Returns:
+        list poligon, atau None jika geometri tidak didukung
+    """
+    if not geometry:
+        return None
+    if geometry.get('type') == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry.get('type') == 'MultiPolygon':
+        return list(geometry['coordinates'])
+    return None
+
+
+def points_in_region(lats, lngs, polygons):
+    """
+    Uji titik-dalam-wilayah secara vektor.
+
+    Args:
+        lats: Array latitude
+        lngs: Array longitude
+        polygons: Wilayah (daftar poligon ring [lng, lat])
+
+    Returns:
+        np.ndarray bool, True jika titik berada di dalam wilayah
+    """
+    points = np.column_stack((np.asarray(lngs, dtype=np.float64), np.asarray(lats, dtype=np.float64)))
+    inside = np.zeros(len(points), dtype=bool)
+
+    for rings in polygons:
+        outer = np.asarray(rings[0], dtype=np.float64)
+        # Saring dengan bounding box dulu; hanya titik di dalamnya yang diuji poligon
+        in_box = np.flatnonzero(
+            (points[:, 0] >= outer[:, 0].min()) & (points[:, 0] <= outer[:, 0].max()) &
+            (points[:, 1] >= outer[:, 1].min()) & (points[:, 1] <= outer[:, 1].max()) & ~inside)
+        if not len(in_box):
+            continue
+
+        hit = Path(outer).contains_points(points[in_box])
+        for hole in rings[1:]:
+            hit &= ~Path(np.asarray(hole, dtype=np.float64)).contains_points(points[in_box])
+        inside[in_box[hit]] = True
+
+    return inside
+
+
+def region_from_points(ref_lat, ref_lng, lats, lngs, extent_meters,
+                       cell_meters=ISOCHRONE_CELL_METERS, buffer_meters=ISOCHRONE_BUFFER_METERS):
+    """
+    Bangun wilayah dari titik-titik terjangkau dengan rasterisasi grid.
+
+    Args:
+        ref_lat: Latitude titik referensi (pusat grid)
+        ref_lng: Longitude titik referensi
+        lats: Array latitude titik terjangkau (rapat sepanjang jalan)
+        lngs: Array longitude titik terjangkau
+        extent_meters: Jarak maksimal titik dari pusat (ukuran grid)
+        cell_meters: Ukuran sel raster
+        buffer_meters: Pelebaran wilayah di sekitar titik
+
+    Returns:
+        list poligon, atau None jika tidak ada titik
+    """
+    if not len(lats):
+        return None
+
+    lat_step = cell_meters / METERS_PER_DEGREE
+    lng_step = lat_step / max(math.cos(math.radians(ref_lat)), 1e-6)
+    dilate = int(math.ceil(buffer_meters / cell_meters))
+    half = int(math.ceil(extent_meters / cell_meters)) + dilate + 2
+
+    rows = np.rint((np.asarray(lats, dtype=np.float64) - ref_lat) / lat_step).astype(np.int64) + half
+    cols = np.rint((np.asarray(lngs, dtype=np.float64) - ref_lng) / lng_step).astype(np.int64) + half
+    keep = (rows >= 0) & (rows <= 2 * half) & (cols >= 0) & (cols <= 2 * half)
+
+    grid = np.zeros((2 * half + 1, 2 * half + 1), dtype=bool)
+    grid[rows[keep], cols[keep]] = True
+
+    # Pelebaran (dilasi) kotak sebesar buffer
+    reached = grid.copy()
+    for dr in range(-dilate, dilate + 1):
+        for dc in range(-dilate, dilate + 1):
+            if dr or dc:
+                reached[max(dr, 0):len(grid) + min(dr, 0), max(dc, 0):len(grid) + min(dc, 0)] |= \
+                    grid[max(-dr, 0):len(grid) + min(-dr, 0), max(-dc, 0):len(grid) + min(-dc, 0)]
+
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+    generator = contour_generator(x=ref_lng + offsets * lng_step, y=ref_lat + offsets * lat_step,
+                                  z=reached.astype(np.float64), fill_type=FillType.OuterOffset)
+    points, ring_offsets = generator.filled(0.5, 1.5)
+
+    polygons = []
+    for coords, bounds in zip(points, ring_offsets):
+        polygons.append([coords[start:end].tolist() for start, end in zip(bounds[:-1], bounds[1:])])
+    return polygons or None
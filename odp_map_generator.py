@@ -7,6 +7,7 @@ import logging
 import re
 from geopy.distance import geodesic
 import contextily as ctx
+from odp_tile_cache import add_basemap
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
 import matplotlib.patheffects as path_effects
 from flask import Flask, request, jsonify, render_template, send_file
@@ -223,14 +224,8 @@ class ODPMapGenerator:
             
             # Tambahkan basemap dari OpenStreetMap dengan zoom level yang valid
             try:
-                # Gunakan import terpisah dan zoom level yang valid (1-19)
-                import contextily.tile as ctx_tile
-                # Tetapkan zoom level yang optimal (15) untuk mencegah kesalahan inferensi yang menghasilkan level 33
-                ctx.add_basemap(
-                    ax, 
-                    source=ctx_tile.providers['OpenStreetMap']['Mapnik'], 
-                    zoom=15
-                )
+                # Zoom tetap (15); tile diambil dari cache bersama
+                add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik, zoom=15)
             except Exception as e:
                 logger.warning(f"Tidak dapat menambahkan peta dasar: {e}")
             
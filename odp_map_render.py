@@ -0,0 +1,671 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Render peta ODP dengan matplotlib.
+
+Modul ini hanya berisi penggambaran: input berupa data biasa (DataFrame ODP
+yang sudah berisi jarak dan geometri rute, wilayah isochrone, token Mapbox)
+dan output berupa file PNG. Tidak ada akses ke bot, dataset, atau provider
+routing, sehingga fungsi render bisa dijalankan di proses worker
+(lihat odp_render_service) tanpa memuat ulang semua itu.
+
+Marker, rute dan label semua ODP digambar sebagai beberapa collection
+(lingkaran, LineCollection rute, path glyph label) alih-alih beberapa artist
+per ODP, sehingga waktu gambar tidak didominasi overhead per artist pada
+peta yang padat. Lihat benchmark_map_render.py.
+
+Untuk peta Telegram tersedia renderer raster yang jauh lebih ringan
+(odp_map_raster); get_renderer() memilih renderer sesuai ODP_MAP_RENDERER.
+Renderer matplotlib tetap dipakai untuk ekspor berkualitas tinggi.
+"""
+
+import os
+import math
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # Set backend non-interaktif sebelum import plt
+import matplotlib.pyplot as plt
+import matplotlib.patheffects as path_effects
+import matplotlib.patches as mpatches
+import matplotlib.lines as mlines
+from matplotlib.collections import EllipseCollection, LineCollection, PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.patches import BoxStyle
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+from geopy.distance import geodesic
+from PIL import Image
+
+from odp_dataset import LAT_COLUMN, LNG_COLUMN, NAME_COLUMN, KATEGORI_COLUMN
+from odp_route_geometry import route_array, simplify_route, meters_per_pixel
+from odp_background_cache import get_background_cache, world_pixels, MAPBOX_MAX_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Default radius (meter)
+DEFAULT_RADIUS = 250
+
+# Kolom DataFrame yang dipakai saat menggambar
+MAP_COLUMNS = (LAT_COLUMN, LNG_COLUMN, NAME_COLUMN, KATEGORI_COLUMN, 'jarak_meter', 'jarak_tampil',
+               'jarak_rute_meter', 'rute_valid', 'koordinat_rute')
+
+# Renderer peta default: 'raster' (Pillow, cepat) atau 'matplotlib' (kualitas ekspor)
+MAP_RENDERER = os.environ.get('ODP_MAP_RENDERER', 'raster').lower()
+
+# Zoom maksimal Mapbox Static
+MAPBOX_MAX_ZOOM = 22
+
+# Font label marker (tebal, seperti teks label sebelumnya)
+LABEL_FONT = FontProperties(weight='bold')
+
+
+def marker_color(kategori, distance, radius_meters):
+    """Warna marker ODP sesuai kategori; jika kategori tidak dikenal, sesuai jarak."""
+    # Warna yang lebih cerah agar terlihat di atas citra satelit
+    if "HIJAU" in kategori:
+        return '#00CC00'  # Hijau lebih cerah
+    if "KUNING" in kategori:
+        return '#FFCC00'  # Kuning lebih cerah
+    if "MERAH" in kategori:
+        return '#FF3333'  # Merah lebih cerah
+    if "HITAM" in kategori:
+        return '#333333'  # Hitam sedikit lebih terang untuk visibility
+    if "BIRU" in kategori or "ORANGE" in kategori:
+        return '#FF9900'  # Orange cerah
+    # Fallback: tentukan warna berdasarkan jarak jika kategori tidak dikenal
+    if distance < radius_meters * 0.25:
+        return '#00CC00'  # Hijau cerah
+    if distance < radius_meters * 0.5:
+        return '#3399FF'  # Biru cerah
+    if distance < radius_meters * 0.75:
+        return '#FF9900'  # Oranye cerah
+    return '#CC66FF'  # Ungu cerah
+
+
+def circle_collection(ax, offsets, radius, colors, **kwargs):
+    """
+    Lingkaran berjari-jari `radius` (satuan data, seperti plt.Circle) di setiap offset
+    sebagai satu collection.
+    """
+    diameter = np.full(len(offsets), 2 * radius)
+    return EllipseCollection(diameter, diameter, np.zeros(len(offsets)), units='xy',
+                             offsets=offsets, offset_transform=ax.transData,
+                             facecolors=colors, edgecolors=colors, linewidths=1.0, **kwargs)
+
+
+@lru_cache(maxsize=16)
+def _line_extent(fontsize):
+    """Batas bawah dan atas satu baris teks (dari "lp", seperti tata letak Text matplotlib)."""
+    vertices = TextPath((0, 0), "lp", size=fontsize, prop=LABEL_FONT).vertices
+    return float(vertices[:, 1].min()), float(vertices[:, 1].max())
+
+
+@lru_cache(maxsize=4096)
+def _label_layout(text, fontsize, halign, valign):
+    """
+    Path teks (satuan point) dan kotak tata letaknya setelah diratakan terhadap titik (0, 0).
+
+    Lebar diambil dari titik kontrol glyph (lebih cepat daripada Path.get_extents
+    yang menghitung ekstrem setiap kurva).
+    """
+    path = TextPath((0, 0), text, size=fontsize, prop=LABEL_FONT)
+    bottom, top = _line_extent(fontsize)
+    width = float(path.vertices[:, 0].max()) if len(path.vertices) else 0.0
+    dx = -width / 2 if halign == 'center' else 0.0
+    dy = -(bottom + top) / 2 if valign == 'center' else -top
+    box = (dx, bottom + dy, width, top - bottom)
+    return path.transformed(Affine2D().translate(dx, dy)), box
+
+
+def label_collection(ax, texts, offsets, fontsize, halign='center', valign='center', **kwargs):
+    """
+    Teks label di setiap offset (koordinat data) sebagai satu collection path glyph.
+
+    Ukuran huruf dalam point, sama seperti ax.text(fontsize=...).
+    """
+    scale = Affine2D().scale(ax.figure.dpi / 72.0)
+    paths = [_label_layout(text, fontsize, halign, valign)[0].transformed(scale) for text in texts]
+    return PathCollection(paths, offsets=offsets, offset_transform=ax.transData,
+                          transform=Affine2D(), edgecolors='none', **kwargs)
+
+
+def label_box_collection(ax, texts, offsets, fontsize, halign='left', valign='top', pad=0.3, **kwargs):
+    """Kotak bersudut bulat di belakang label (seperti bbox boxstyle='round') sebagai satu collection."""
+    scale = Affine2D().scale(ax.figure.dpi / 72.0)
+    style = BoxStyle('round', pad=pad)
+    paths = []
+    for text in texts:
+        _, (x0, y0, width, height) = _label_layout(text, fontsize, halign, valign)
+        paths.append(style(x0, y0, width, height, fontsize).transformed(scale))
+    return PathCollection(paths, offsets=offsets, offset_transform=ax.transData,
+                          transform=Affine2D(), facecolors='white', **kwargs)
+
+
+def arrow_collection(ax, segments, colors, head_length=4.0, head_width=2.0, shrink=2.0, **kwargs):
+    """
+    Panah '->' dari titik pertama ke titik kedua setiap segmen, sebagai satu collection.
+
+    Ukuran kepala panah dan pemendekan ujung dalam point (seperti ax.annotate dengan
+    arrowstyle '->'). Bentuk panah dihitung dari batas axes saat ini, jadi panggil
+    setelah batas peta tidak berubah lagi.
+    """
+    points = ax.figure.dpi / 72.0
+    segments = np.asarray(segments, dtype=np.float64)
+    tails = ax.transData.transform(segments[:, 0])
+    tips = ax.transData.transform(segments[:, 1])
+    lengths = np.hypot(*(tips - tails).T)
+    visible = lengths > 0
+    
+    paths = []
+    for tail, tip, length in zip(tails[visible], tips[visible], lengths[visible]):
+        direction = (tip - tail) / length
+        normal = np.array([-direction[1], direction[0]])
+        shrink_px = min(shrink * points, length / 2)
+        # Path relatif terhadap titik kedua segmen (offset)
+        end = -direction * shrink_px
+        start = tail - tip + direction * shrink_px
+        back = end - direction * head_length * points
+        paths.append(Path([start, end, back + normal * head_width * points, end, back - normal * head_width * points],
+                          [Path.MOVETO, Path.LINETO, Path.MOVETO, Path.LINETO, Path.LINETO]))
+    return PathCollection(paths, offsets=segments[visible, 1], offset_transform=ax.transData,
+                          transform=Affine2D(), facecolors='none',
+                          edgecolors=[color for color, keep in zip(colors, visible) if keep], **kwargs)
+
+
+def mapbox_axes_background(ax, style, ref_lat, ref_lng, mapbox_token):
+    """
+    Ambil gambar latar Mapbox Static untuk batas axes saat ini (lewat cache gambar latar).
+
+    Seperti odp_map_raster.mapbox_background: zoom dipilih agar resolusi gambar
+    latar sama dengan ukuran axes dalam piksel, lalu diturunkan selama ukuran
+    logis tidak muat di gambar maksimal dengan pusat dibulatkan ke grid cache.
+    Gambar dari zoom yang lebih rendah diperbesar ke ukuran axes, sehingga
+    permintaan di sekitar titik yang sama memakai ulang gambar yang sama.
+
+    Returns:
+        tuple (PIL.Image RGB, extent imshow) atau None jika gagal
+    """
+    cache = get_background_cache()
+    xlim, ylim = ax.get_xlim(), ax.get_ylim()
+    pixels = max(int(round(ax.get_window_extent().width)), 1)
+    span = max((xlim[1] - xlim[0]) / 360.0, 1e-12)
+    # Piksel fisik per satuan dunia pada zoom z dengan @2x: 1024 * 2^z
+    zoom = min(max(math.ceil(math.log2(pixels / span / 1024.0)), 0), MAPBOX_MAX_ZOOM)
+    logical = int(math.ceil(span * 512 * 2 ** zoom)) + 2
+    while zoom > 0 and logical > MAPBOX_MAX_SIZE - cache.grid_pixels:
+        zoom -= 1
+        logical = int(math.ceil(span * 512 * 2 ** zoom)) + 2
+
+    image = cache.get(style, zoom, ref_lat, ref_lng, logical, mapbox_token)
+    if image is None:
+        return None
+
+    # Potong batas axes dari gambar (berpusat di titik referensi, piksel fisik @2x)
+    cx, cy = world_pixels(ref_lat, ref_lng, zoom)
+    left, top = world_pixels(ylim[1], xlim[0], zoom)
+    right, bottom = world_pixels(ylim[0], xlim[1], zoom)
+    half_w, half_h = image.size[0] / 2, image.size[1] / 2
+    box = (half_w + 2 * (left - cx), half_h + 2 * (top - cy), half_w + 2 * (right - cx), half_h + 2 * (bottom - cy))
+    height = max(int(round(pixels * (box[3] - box[1]) / (box[2] - box[0]))), 1)
+    logger.info(f"Gambar latar Mapbox zoom={zoom}, ukuran logis={logical}, diperbesar ke {pixels}x{height}")
+    return image.resize((pixels, height), Image.BILINEAR, box=box), (xlim[0], xlim[1], ylim[0], ylim[1])
+
+
+def render_odp_map(ref_lat, ref_lng, display_df, file_path, radius_meters=DEFAULT_RADIUS, max_display=30,
+                   with_routes=True, use_satellite=True, region=None, mapbox_token=None):
+    """
+    Gambar peta ODP dan simpan sebagai PNG.
+    
+    Args:
+        ref_lat: Latitude titik referensi
+        ref_lng: Longitude titik referensi
+        display_df: DataFrame ODP yang ditampilkan (dengan geometri rute jika with_routes)
+        file_path: Lokasi file PNG hasil
+        radius_meters: Radius pencarian dalam meter
+        max_display: Maksimal ODP yang ditampilkan
+        with_routes: Menampilkan rute dari titik referensi ke ODP
+        use_satellite: Menggunakan citra satelit sebagai basemap
+        region: Wilayah jangkauan jalan mode isochrone (list polygon), atau None
+        mapbox_token: Token Mapbox untuk gambar latar belakang (None = latar polos)
+    
+    Returns:
+        str: file_path
+    """
+    # Buat figure dan axis dengan ukuran dan resolusi tinggi
+    fig, ax = plt.subplots(figsize=(15, 15), dpi=200)
+    try:
+        # Definisikan batas area peta yang proporsional
+        # Gunakan rasio 1 derajat = 111 km (111.000 meter) pada garis equator
+        # Untuk latitude (north-south): 1 derajat = ~111 km konstan
+        # Untuk longitude (east-west): 1 derajat = ~111 km * cos(latitude)
+        # Buffer untuk latitude tetap sama, buffer untuk longitude disesuaikan dengan latitude
+        lat_buffer = radius_meters / 111000  # Buffer latitude dalam derajat
+        lng_buffer = lat_buffer / math.cos(math.radians(abs(ref_lat)))  # Sesuaikan buffer longitude
+        
+        # Set batas plot
+        ax.set_xlim(ref_lng - lng_buffer, ref_lng + lng_buffer)
+        ax.set_ylim(ref_lat - lat_buffer, ref_lat + lat_buffer)
+        
+        # Rute disederhanakan sampai ukuran satu piksel peta: titik yang lebih rapat tidak terlihat
+        route_tolerance = meters_per_pixel(ax)
+        
+        # Log untuk debugging
+        logger.info(f"Setting plot bounds: lng=[{ref_lng - lng_buffer:.6f}, {ref_lng + lng_buffer:.6f}], lat=[{ref_lat - lat_buffer:.6f}, {ref_lat + lat_buffer:.6f}]")
+        
+        # PENTING: ELIMINASI SISTEM KOREKSI KOORDINAT
+        # Untuk menampilkan titik ODP persis sesuai koordinat di spreadsheet,
+        # kita tidak lagi menggunakan sistem koreksi koordinat
+        
+        # Fungsi ini telah diubah untuk mengembalikan koordinat asli tanpa perubahan
+        def apply_coordinate_correction(lat, lng):
+            # Kembalikan koordinat asli tanpa modifikasi
+            return lat, lng
+            
+        # Terapkan koreksi pada titik referensi untuk konsistensi
+        ref_lat_corr, ref_lng_corr = apply_coordinate_correction(ref_lat, ref_lng)
+        
+        # Plot titik referensi sebagai bintang merah - menggunakan koordinat asli tanpa koreksi
+        # Menggunakan scatter untuk ukuran yang lebih presisi dan kontrol yang lebih baik
+        ax.scatter(ref_lng, ref_lat, color='red', marker='*', s=500, 
+                  edgecolor='white', linewidth=1.5, zorder=100, alpha=1.0, label='Titik Referensi')
+        
+        # Log koordinat titik referensi untuk debugging
+        logger.info(f"Plotting reference point at exact coordinates: ({ref_lng:.6f}, {ref_lat:.6f})")
+        
+        # Tambahkan label referensi dengan koordinat - gunakan koordinat asli
+        ref_text = f"REF: {ref_lat:.6f}, {ref_lng:.6f}"
+        t = ax.text(ref_lng, ref_lat, ref_text, 
+                 color='red', fontsize=10, fontweight='bold',
+                 verticalalignment='bottom',
+                 horizontalalignment='center')
+        t.set_path_effects([path_effects.withStroke(linewidth=3, foreground='white')])
+        
+        # Gambar lingkaran radius - gunakan koordinat asli
+        radius_degrees = radius_meters / 111000  # Konversi meter ke derajat (perkiraan)
+        
+        # Lingkaran radius jangkauan - perbesar ukuran lingkaran pada tampilan satelit
+        circle_edge_width = 2.5 if use_satellite else 2.0  # Lingkaran lebih tebal pada tampilan satelit
+        circle_alpha = 0.8 if use_satellite else 0.7  # Lebih solid untuk tampilan satelit
+        circle_color = 'blue' if use_satellite else 'red'  # Warna biru lebih mencolok pada satelit
+        
+        # Mode isochrone: gambar batas wilayah yang terjangkau lewat jalan;
+        # lingkaran radius udara tetap ditampilkan tipis sebagai pembanding
+        if region:
+            for rings in region:
+                for ring in rings:
+                    ring_lngs, ring_lats = zip(*ring)
+                    ax.plot(ring_lngs, ring_lats, color=circle_color, linewidth=circle_edge_width,
+                            alpha=circle_alpha, zorder=4)
+                outer_lngs, outer_lats = zip(*rings[0])
+                ax.fill(outer_lngs, outer_lats, color=circle_color, alpha=0.08, zorder=3)
+        
+        circle = plt.Circle((ref_lng, ref_lat), radius_degrees, 
+                          fill=False, color=circle_color,
+                          linewidth=1.0 if region else circle_edge_width,
+                          linestyle='--' if region else '-',
+                          alpha=0.5 if region else circle_alpha)
+        ax.add_patch(circle)
+        
+        # Plot ODP dengan indikator marker sesuai kategori dan jarak berdasarkan rute.
+        # Atribut per ODP dikumpulkan dulu, lalu digambar sebagai beberapa collection
+        # (marker, rute, garis langsung, label) alih-alih beberapa artist per ODP.
+        marker_lngs, marker_lats, marker_colors, marker_distances = [], [], [], []
+        routes, route_colors = [], []
+        straight_lines, straight_colors = [], []
+        arrows, arrow_colors = [], []
+        
+        has_route_distance = 'jarak_rute_meter' in display_df.columns
+        for i, row in enumerate(display_df.itertuples(index=False, name=None), 1):
+            row = dict(zip(display_df.columns, row))
+            lat = row[LAT_COLUMN]
+            lng = row[LNG_COLUMN]
+            
+            # PENTING: Gunakan koordinat asli tepat seperti dalam spreadsheet
+            # Tidak menerapkan koreksi apapun untuk menjamin presisi
+            logger.debug(f"Plotting ODP marker {i} at exact coordinates: ({lng:.6f}, {lat:.6f})")
+            
+            # Selalu gunakan jarak rute untuk label dan garis ukur, bukan jarak udara
+            # Jika jarak rute tersedia, gunakan itu. Jika tidak, gunakan jarak udara * 1.3 sebagai estimasi
+            if has_route_distance and pd.notnull(row['jarak_rute_meter']):
+                distance = row['jarak_rute_meter']  # Jarak berdasarkan rute jalan
+            else:
+                # Jika tidak ada jarak rute, estimasi dengan jarak udara * faktor
+                distance = row['jarak_meter'] * 1.3  # Estimasi jarak jalan
+                
+            # Apakah memiliki rute valid
+            has_route = row.get('rute_valid', False)
+            route_coords = row.get('koordinat_rute', None)
+            
+            kategori = str(row.get(KATEGORI_COLUMN) or "").upper()
+            color = marker_color(kategori, distance, radius_meters)
+            
+            marker_lngs.append(lng)
+            marker_lats.append(lat)
+            marker_colors.append(color)
+            marker_distances.append(distance)
+            
+            # Tambahkan rute dari referensi ke ODP berdasarkan rute jalan yang sebenarnya
+            if not (with_routes and distance <= radius_meters):  # Hanya tampilkan rute untuk ODP dalam radius
+                continue
+            
+            # Cek apakah rute tersedia dari API
+            if has_route and route_coords is not None and len(route_coords) > 1:
+                # Geometri rute sudah berupa array; buang titik yang lebih rapat dari satu piksel
+                route_coords_array = simplify_route(route_array(route_coords), route_tolerance)
+                
+                # Pastikan koordinat valid dan memiliki setidaknya dua titik
+                if route_coords_array is not None and route_coords_array.shape[0] >= 2:
+                    x_coords = route_coords_array[:, 0]
+                    y_coords = route_coords_array[:, 1]
+                    
+                    # Verifikasi bahwa titik awal dan akhir mendekati referensi dan ODP
+                    # Pastikan rute ini memang dari referensi ke ODP
+                    start_near_ref = geodesic((ref_lat, ref_lng), (float(y_coords[0]), float(x_coords[0]))).meters < 50
+                    end_near_odp = geodesic((lat, lng), (float(y_coords[-1]), float(x_coords[-1]))).meters < 50
+                    
+                    if start_near_ref and end_near_odp:
+                        routes.append(route_coords_array)
+                        route_colors.append(color)
+                        
+                        # Panah di tengah untuk menunjukkan arah rute
+                        mid_idx = len(x_coords) // 2
+                        if len(x_coords) > 2 and mid_idx > 0:
+                            arrows.append(route_coords_array[mid_idx - 1:mid_idx + 1])
+                            arrow_colors.append(color)
+                        continue
+                    # Fallback: Jika rute tidak terhubung dengan benar, buat garis lurus sebagai solusi alternatif
+                    logger.warning(f"Rute tidak terhubung dengan benar, menggunakan garis langsung: {row.get(NAME_COLUMN, 'Unknown')}")
+                else:
+                    logger.warning(f"Format koordinat rute tidak valid: {row.get(NAME_COLUMN, 'Unknown')}")
+            else:
+                logger.debug(f"Tidak ada data rute valid, menggunakan garis langsung: {row.get(NAME_COLUMN, 'Unknown')}")
+            
+            # Fallback ke garis langsung dari referensi ke ODP
+            straight_lines.append([(ref_lng, ref_lat), (lng, lat)])
+            straight_colors.append(color)
+        
+        if straight_lines:
+            # Garis ukur lebih kecil dan transparan pada peta jalan
+            ax.add_collection(LineCollection(
+                straight_lines, colors=straight_colors,
+                linewidths=0.5 if not use_satellite else 1.5,
+                alpha=0.3 if not use_satellite else 0.5,
+                linestyles=':',
+                path_effects=[path_effects.withStroke(linewidth=1.2 if not use_satellite else 3.0,
+                                                      foreground='white', alpha=0.25)],
+                zorder=5
+            ), autolim=False)
+        
+        if routes:
+            if not use_satellite:
+                # Pada peta jalan, gunakan garis putus-putus dengan outline lebih tebal
+                route_style = dict(linestyles='--', linewidths=3, alpha=0.9,
+                                   path_effects=[path_effects.withStroke(linewidth=5, foreground='#444444', alpha=0.4)])
+            else:
+                # Pada peta satelit, gunakan garis normal dengan outline putih yang lebih tebal
+                route_style = dict(linestyles='-', linewidths=2.5, alpha=0.8,
+                                   path_effects=[path_effects.withStroke(linewidth=4, foreground='white', alpha=0.5)])
+            # zorder 10: rute muncul di atas lapisan lain
+            ax.add_collection(LineCollection(routes, colors=route_colors, zorder=10, **route_style), autolim=False)
+        
+        if marker_lngs:
+            marker_offsets = np.column_stack((marker_lngs, marker_lats))
+            
+            # Outline putih lalu lingkaran warna cerah sesuai kategori (ukuran dalam derajat seperti plt.Circle)
+            ax.add_collection(circle_collection(ax, marker_offsets, radius_degrees * 0.03, 'white',
+                                                alpha=0.95, zorder=9), autolim=False)
+            ax.add_collection(circle_collection(ax, marker_offsets, radius_degrees * 0.025, marker_colors,
+                                                alpha=0.95, zorder=10), autolim=False)
+            
+            # Nomor urut di dalam lingkaran (teks putih dengan outline hitam)
+            ax.add_collection(label_collection(
+                ax, [str(i) for i in range(1, len(marker_offsets) + 1)], marker_offsets,
+                fontsize=10, facecolors='white', halign='center', valign='center', zorder=11,
+                path_effects=[path_effects.withStroke(linewidth=2.0, foreground='black')]
+            ), autolim=False)
+            
+            # Jarak di samping kanan bawah marker, dalam kotak putih bergaris warna kategori
+            distance_offsets = marker_offsets + np.array([radius_degrees * 0.03, -radius_degrees * 0.03])
+            distance_labels = [f"{distance:.1f}m" for distance in marker_distances]
+            ax.add_collection(label_box_collection(
+                ax, distance_labels, distance_offsets, fontsize=8, edgecolors=marker_colors,
+                halign='left', valign='top', pad=0.3, alpha=0.9, linewidths=1.5, zorder=3
+            ), autolim=False)
+            ax.add_collection(label_collection(
+                ax, distance_labels, distance_offsets, fontsize=8, facecolors=marker_colors,
+                halign='left', valign='top', zorder=3,
+                path_effects=[path_effects.withStroke(linewidth=2.0, foreground='white')]
+            ), autolim=False)
+        
+        # Set judul dan label dengan informasi tambahan
+        title_elements = [f'ODP dalam Radius {radius_meters}m dari Titik Referensi']
+        if len(display_df) > max_display:
+            title_elements.append(f'(Menampilkan {max_display} dari {len(display_df)} ODP)')
+        if with_routes:
+            title_elements.append('dengan Rute')
+        
+        title_text = '\n'.join(title_elements)
+        
+        # Tambahkan background putih transparan di belakang judul agar lebih terbaca
+        ax.set_title(
+            title_text, 
+            fontsize=12, 
+            fontweight='bold',
+            bbox=dict(
+                facecolor='white',
+                alpha=0.7,
+                edgecolor='none',
+                boxstyle='round,pad=0.5'
+            )
+        )
+        
+        # Tambahkan basemap (citra satelit atau peta jalan) dengan Mapbox
+        try:
+            # Tetapkan batas-batas peta yang lebih luas untuk peta satelit agar semua ODP terlihat
+            # Gunakan faktor pengali yang lebih besar untuk tampilan satelit
+            view_factor = 1.5 if use_satellite else 1.2  # Faktor lebih besar untuk satelit
+            ax.set_xlim(ref_lng - radius_degrees * view_factor, ref_lng + radius_degrees * view_factor)
+            ax.set_ylim(ref_lat - radius_degrees * view_factor, ref_lat + radius_degrees * view_factor)
+            
+            # Non-aktifkan ticks
+            ax.set_xticks([])
+            ax.set_yticks([])
+            
+            # Tambahkan background yang menampilkan jalan dan bangunan
+            # Menambahkan latar belakang secara manual menggunakan Mapbox API
+            if mapbox_token:
+                logger.info("Menggunakan Mapbox Static API untuk gambar latar belakang")
+                
+                try:                    
+                    # Style map yang akan digunakan
+                    if use_satellite:
+                        mapbox_style = "satellite-streets-v11"  # Satelit dengan jalan
+                        map_label = "Peta satelit dengan jalan dan titik ODP"
+                    else:
+                        mapbox_style = "streets-v11"  # Peta jalan original
+                        map_label = "Peta jalan dengan titik ODP"
+                    
+                    # Gambar latar diambil lewat cache (dipakai ulang untuk style, zoom dan pusat yang sama).
+                    # Tanpa overlay penanda di gambar agar gambar tidak terikat ke satu titik referensi;
+                    # titik referensi sudah digambar sebagai bintang merah
+                    background = mapbox_axes_background(ax, mapbox_style, ref_lat, ref_lng, mapbox_token)
+                    if background is not None:
+                        try:
+                            background_img, extent_bounds = background
+                            # Konversi ke array untuk matplotlib
+                            background_array = np.array(background_img)
+                            
+                            # 1. Ambil batas plot saat ini
+                            xlim = ax.get_xlim()
+                            ylim = ax.get_ylim()
+                            
+                            # 2. Gambar latar sudah dipotong tepat sebesar batas plot, jadi
+                            # extent imshow identik dengan bounding box plot matplotlib
+                            logger.info(f"Setting background image extent to: {extent_bounds}")
+                            ax.imshow(
+                                background_array, 
+                                extent=extent_bounds,
+                                aspect='equal',  # Gunakan 'equal' untuk memastikan skala yang konsisten
+                                zorder=0
+                            )
+                            # Log untuk debugging
+                            logger.info(f"Background image placed with exact extent: {extent_bounds}")
+                            
+                            # PENTING: Jangan kembalikan batas plot ke nilai asli
+                            # Kita gunakan nilai batas latar belakang secara konsisten
+                            # Ini memastikan posisi marker tepat sama dengan koordinat asli
+                            ax.set_xlim(extent_bounds[0], extent_bounds[1])
+                            ax.set_ylim(extent_bounds[2], extent_bounds[3])
+                            
+                            # Log batas final untuk debugging
+                            logger.info(f"Final plot bounds: x[{ax.get_xlim()[0]:.6f}, {ax.get_xlim()[1]:.6f}], y[{ax.get_ylim()[0]:.6f}, {ax.get_ylim()[1]:.6f}]")
+                            
+                            # 4. Log batas-batas untuk debugging
+                            logger.info(f"Old plot bounds: x[{xlim[0]:.6f}, {xlim[1]:.6f}], y[{ylim[0]:.6f}, {ylim[1]:.6f}]")
+                            
+                            # 5. Verifikasi bahwa marker akan tepat pada posisi yang benar
+                            # Verifikasi penempatan marker REF
+                            logger.info(f"VERIFIKASI REF: Plotting marker at exact coordinates on map with bounds: x[{ax.get_xlim()[0]:.6f}, {ax.get_xlim()[1]:.6f}], y[{ax.get_ylim()[0]:.6f}, {ax.get_ylim()[1]:.6f}]")
+                            
+                            # Verifikasi bahwa marker tidak mengalami koreksi atau transformasi
+                            logger.info(f"REF marker exact position: lng={ref_lng:.6f}, lat={ref_lat:.6f} - No correction applied")
+                            
+                            # Catat bahwa latar belakang berhasil ditampilkan
+                            logger.info(f"Berhasil menggunakan Peta {'satelit' if use_satellite else 'jalan'} dengan titik ODP")
+                        except Exception as e:
+                            logger.error(f"Gagal menampilkan latar belakang: {str(e)}")
+                        
+                        # Tambahkan keterangan
+                        fig.text(0.5, 0.97, map_label,
+                               fontsize=14, color='black', 
+                               ha='center', va='top',
+                               bbox=dict(facecolor='white', alpha=0.7, boxstyle='round'))
+                        
+                        logger.info(f"Berhasil menggunakan {map_label}")
+                    else:
+                        raise Exception("Gambar latar dari Mapbox API tidak tersedia")
+                except Exception as e:
+                    logger.error(f"Gagal menggunakan Mapbox API: {e}")
+                    # Fallback: gunakan latar belakang sederhana
+                    if use_satellite:
+                        ax.set_facecolor('#e6f7ff')  # Biru muda (simulasi air)
+                    else:
+                        ax.set_facecolor('white')
+                        ax.grid(True, linestyle='-', alpha=0.3)
+                    
+                    fig.text(0.5, 0.97, f"Peta {'satelit' if use_satellite else 'jalan'} (gambar latar tidak tersedia)",
+                           fontsize=14, color='black', 
+                           ha='center', va='top',
+                           bbox=dict(facecolor='white', alpha=0.7, boxstyle='round'))
+            else:
+                # Gunakan latar belakang sederhana jika tidak ada Mapbox token
+                if use_satellite:
+                    ax.set_facecolor('#e6f7ff')  # Biru muda (simulasi air)
+                    label = "Peta satelit (gambar latar tidak tersedia)"
+                else:
+                    ax.set_facecolor('white')
+                    ax.grid(True, linestyle='-', alpha=0.3)
+                    label = "Peta jalan (gambar latar tidak tersedia)"
+                
+                fig.text(0.5, 0.97, label,
+                       fontsize=14, color='black', 
+                       ha='center', va='top',
+                       bbox=dict(facecolor='white', alpha=0.7, boxstyle='round'))
+                
+        except Exception as e:
+            logger.warning(f"Tidak dapat menambahkan basemap: {e}")
+            # Buat latar belakang putih sebagai alternatif
+            ax.set_facecolor('white')
+            ax.grid(True, linestyle='--', alpha=0.7)
+            
+            # Tambahkan pesan error sebagai watermark
+            fig.text(0.5, 0.5, "Citra Satelit Tidak Tersedia",
+                   fontsize=20, color='gray', alpha=0.5,
+                   ha='center', va='center', rotation=30)
+        
+        # Panah arah rute ditambahkan setelah batas peta final (ukurannya dalam point)
+        if arrows:
+            ax.add_collection(arrow_collection(ax, arrows, arrow_colors, linewidths=2, zorder=11),
+                              autolim=False)
+        
+        # Tambahkan legenda untuk kategori ODP
+        lokasi_ref = mlines.Line2D([0], [0], marker='*', color='w', markerfacecolor='red', markersize=15)
+        odp_hijau = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='green', markersize=10)
+        odp_kuning = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='yellow', markersize=10)
+        odp_merah = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10)
+        odp_biru = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='#FF9900', markersize=10)
+        odp_hitam = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='black', markersize=10)
+        
+        legend_items = [
+            (lokasi_ref, 'Lokasi Referensi'),
+            (odp_hijau, 'ODP Kategori HIJAU'),
+            (odp_kuning, 'ODP Kategori KUNING'),
+            (odp_merah, 'ODP Kategori MERAH'),
+            (odp_biru, 'ODP Kategori ORANGE'),
+            (odp_hitam, 'ODP Kategori HITAM')
+        ]
+        
+        if with_routes:
+            # Gunakan style rute yang sesuai dengan tipe peta
+            if use_satellite:
+                route_line = mlines.Line2D([0], [0], color='green', linestyle='-', linewidth=2)
+            else:
+                route_line = mlines.Line2D([0], [0], color='green', linestyle='--', linewidth=2.5)
+            legend_items.append((route_line, 'Rute ke ODP'))
+
+        if region:
+            reach_patch = mpatches.Patch(facecolor=circle_color, edgecolor=circle_color, alpha=0.3)
+            legend_items.append((reach_patch, f'Jangkauan jalan {radius_meters}m'))
+
+        # Buat legenda dari items
+        ax.legend(
+            [item[0] for item in legend_items],
+            [item[1] for item in legend_items],
+            loc='upper right',
+            fancybox=True, framealpha=0.7
+        )
+        
+        # Tambahkan informasi jumlah ODP
+        info_text = f"Jumlah ODP: {len(display_df)}"
+        info = ax.text(0.02, 0.02, info_text, transform=ax.transAxes, 
+                     fontsize=12, fontweight='bold',
+                     bbox=dict(facecolor='white', alpha=0.8, boxstyle='round'))
+        
+        
+        # Simpan gambar dengan resolusi tinggi
+        fig.savefig(file_path, bbox_inches='tight', dpi=200)
+    finally:
+        # Figure selalu ditutup agar memori worker tidak bertambah
+        plt.close(fig)
+    
+    logger.info(f"Peta berhasil disimpan di: {file_path}")
+    return file_path
+
+
+def get_renderer(name=None):
+    """
+    Fungsi render peta sesuai nama renderer.
+
+    Semua renderer punya argumen yang sama dengan render_odp_map dan
+    mengembalikan path file PNG.
+
+    Args:
+        name: 'raster' atau 'matplotlib' (default: MAP_RENDERER)
+
+    Returns:
+        callable: Fungsi render tingkat modul (bisa dijalankan di worker render)
+    """
+    name = (name or MAP_RENDERER).lower()
+    if name == 'matplotlib':
+        return render_odp_map
+    if name != 'raster':
+        logger.warning(f"Renderer peta '{name}' tidak dikenal, menggunakan raster")
+    # Import di sini karena odp_map_raster memakai konstanta dari modul ini
+    from odp_map_raster import render_odp_raster
+    return render_odp_raster
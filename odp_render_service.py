@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Layanan render peta di pool proses worker.
+
+Menggambar peta (figure matplotlib 15x15 inci pada 200 dpi ditambah unduhan
+gambar latar Mapbox) memakan waktu beberapa detik. Jika dijalankan di thread
+handler bot, pencarian pengguna lain ikut menunggu; di thread lain pun
+rendering tetap dibatasi GIL menjadi satu peta sekaligus. Layanan ini
+menjalankan job render di ProcessPoolExecutor sehingga jumlah peta yang
+dirender bersamaan mengikuti jumlah core.
+
+- Worker memuat matplotlib dengan backend Agg sekali saat dibuat. Pada
+  platform yang mendukung fork, semua worker dibuat sekaligus oleh start(),
+  yang sebaiknya dipanggil sebelum thread lain berjalan.
+- Antrean dibatasi (RENDER_QUEUE_SIZE job menunggu + berjalan); submit()
+  mengembalikan None jika antrean penuh.
+- Setiap job punya batas waktu. Worker menghentikan job-nya sendiri dengan
+  SIGALRM sehingga slot worker langsung bebas untuk job berikutnya.
+- Job diberi kunci (misalnya chat id dan jenis peta). Job baru dengan kunci
+  yang sama membatalkan job lama yang masih di antrean; hasil job lama yang
+  sudah terlanjur berjalan dibuang tanpa dikirim, dan hook on_superseded job
+  lama dipanggil agar pemiliknya bisa membereskan pesan tunggu.
+
+Hasil job diserahkan ke callback di thread pengiriman milik layanan, bukan
+di thread handler, sehingga handler bisa langsung kembali setelah submit().
+"""
+
+import os
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, CancelledError
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Jumlah proses worker render (0 = sesuai jumlah core, maksimal 4)
+RENDER_WORKERS = int(os.environ.get('ODP_RENDER_WORKERS', 0)) or min(os.cpu_count() or 1, 4)
+
+# Jumlah job maksimal yang menunggu atau sedang dirender
+RENDER_QUEUE_SIZE = int(os.environ.get('ODP_RENDER_QUEUE_SIZE', 16))
+
+# Batas waktu satu job render dalam detik
+RENDER_TIMEOUT = float(os.environ.get('ODP_RENDER_TIMEOUT', 60))
+
+# Tambahan waktu tunggu di proses utama di atas batas waktu worker (detik)
+RESULT_GRACE = 5
+
+
+class RenderTimeout(BaseException):
+    """
+    Job render melewati batas waktu.
+
+    Turunan BaseException agar tidak tertangkap oleh blok `except Exception`
+    di dalam fungsi render (misalnya saat unduhan gambar latar gagal).
+    """
+
+
+def _alarm_handler(signum, frame):
+    raise RenderTimeout("Batas waktu render terlampaui")
+
+
+def _init_worker():
+    """Inisialisasi proses worker: backend Agg dan handler batas waktu."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    # Ctrl+C ditangani proses utama, bukan worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'SIGALRM'):
+        signal.signal(signal.SIGALRM, _alarm_handler)
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _run_job(fn, kwargs, timeout):
+    """Jalankan satu job di worker dengan batas waktu; mengembalikan (hasil, detik render)."""
+    started = time.monotonic()
+    use_alarm = timeout and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(**kwargs), time.monotonic() - started
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _discard_file(path):
+    """Hapus file hasil render yang tidak jadi dikirim."""
+    if isinstance(path, str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class MapRenderService:
+    """
+    Pool proses worker untuk job render peta.
+
+    Job adalah fungsi tingkat modul (bisa di-pickle) yang dipanggil dengan
+    argumen kata kunci dan mengembalikan path file hasil render.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, queue_size=RENDER_QUEUE_SIZE, timeout=RENDER_TIMEOUT):
+        self.workers = max(int(workers), 1)
+        self.queue_size = max(int(queue_size), 1)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        # Job terakhir per kunci; job lain dengan kunci yang sama sudah digantikan
+        self._latest = {}
+        # Satu thread pengiriman per job di antrean, sehingga pengiriman tidak saling menunggu
+        self._delivery = ThreadPoolExecutor(max_workers=self.queue_size, thread_name_prefix='odp-map-deliver')
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "timed_out": 0,
+            "cancelled": 0, "superseded": 0, "rejected": 0,
+        }
+        self._render_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    @staticmethod
+    def _context():
+        # fork: worker mewarisi modul yang sudah diimpor (matplotlib, fungsi render)
+        # tanpa menjalankan ulang skrip utama bot
+        if 'fork' in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context('fork')
+        return multiprocessing.get_context('spawn')
+
+    def start(self):
+        """Buat pool worker (jika belum ada) dan tunggu sampai worker siap."""
+        with self._lock:
+            executor = self._ensure_executor()
+        try:
+            executor.submit(_warm_up).result(timeout=60)
+        except Exception as e:
+            logger.warning(f"Worker render belum siap: {e}")
+        return self
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context(),
+                                                 initializer=_init_worker)
+            logger.info(f"Pool render peta dibuat dengan {self.workers} worker")
+        return self._executor
+
+    def _restart_locked(self):
+        """Ganti pool yang rusak (misalnya worker mati karena kehabisan memori)."""
+        logger.warning("Pool render peta rusak, membuat pool baru")
+        broken, self._executor = self._executor, None
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+        return self._ensure_executor()
+
+    def submit(self, key, fn, callback=None, on_superseded=None, **kwargs):
+        """
+        Antrekan job render.
+
+        Args:
+            key: Kunci pemilik job (misalnya (chat id, jenis peta)); job lama dengan
+                kunci sama dibatalkan. None = tanpa pembatalan.
+            fn: Fungsi render tingkat modul
+            callback: Dipanggil di thread pengiriman dengan path hasil (None jika
+                gagal atau melewati batas waktu); tidak dipanggil jika job digantikan
+            on_superseded: Dipanggil di thread pengiriman (tanpa argumen) jika job
+                digantikan job lain dengan kunci sama
+            **kwargs: Argumen fungsi render
+
+        Returns:
+            Future berisi (hasil, detik render), atau None jika antrean penuh
+        """
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self._stats["rejected"] += 1
+                logger.warning(f"Antrean render penuh ({self._pending} job), job ditolak")
+                return None
+            executor = self._ensure_executor()
+            try:
+                future = executor.submit(_run_job, fn, kwargs, self.timeout)
+            except BrokenProcessPool:
+                future = self._restart_locked().submit(_run_job, fn, kwargs, self.timeout)
+            self._pending += 1
+            self._stats["submitted"] += 1
+            previous = self._latest.get(key) if key is not None else None
+            if key is not None:
+                self._latest[key] = future
+
+        submitted_at = time.monotonic()
+        future.add_done_callback(self._job_done)
+        # Job lama yang belum dikirim ke worker dibatalkan (di luar lock karena
+        # cancel() langsung memanggil _job_done)
+        if previous is not None and previous.cancel():
+            logger.info(f"Job render lama untuk {key} dibatalkan")
+        self._delivery.submit(self._deliver, key, future, callback, on_superseded, submitted_at)
+        return future
+
+    def _job_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                self._stats["cancelled"] += 1
+
+    def _forget(self, key, future):
+        """Hapus job dari daftar job terakhir; False jika job sudah digantikan job lain."""
+        if key is None:
+            return True
+        with self._lock:
+            if self._latest.get(key) is future:
+                del self._latest[key]
+                return True
+            return False
+
+    def _wait(self, future):
+        """
+        Tunggu hasil job. Batas waktu dihitung sejak job mulai berjalan, bukan sejak
+        masuk antrean; batas di worker (SIGALRM) yang utama, ini hanya pengaman jika
+        worker macet di kode yang tidak bisa diinterupsi.
+        """
+        deadline = None
+        while True:
+            try:
+                return future.result(timeout=1.0)
+            except FutureTimeoutError:
+                if not self.timeout:
+                    continue
+                if deadline is None and future.running():
+                    # Satu job tambahan bisa sudah diserahkan ke worker sebelum worker bebas
+                    deadline = time.monotonic() + 2 * self.timeout + RESULT_GRACE
+                if deadline is not None and time.monotonic() > deadline:
+                    raise
+
+    def _deliver(self, key, future, callback, on_superseded, submitted_at):
+        result = None
+        cancelled = False
+        try:
+            result, render_seconds = self._wait(future)
+            with self._lock:
+                self._stats["completed"] += 1
+                self._render_seconds += render_seconds
+                self._wait_seconds += max(time.monotonic() - submitted_at - render_seconds, 0.0)
+        except CancelledError:
+            cancelled = True
+        except (RenderTimeout, FutureTimeoutError):
+            with self._lock:
+                self._stats["timed_out"] += 1
+            logger.error(f"Render peta melewati batas waktu {self.timeout:g} dtk")
+        except BrokenProcessPool as e:
+            with self._lock:
+                self._stats["failed"] += 1
+                if self._executor is not None and self._executor._broken:
+                    self._restart_locked()
+            logger.error(f"Worker render berhenti saat membuat peta: {e}")
+        except Exception as e:
+            with self._lock:
+                self._stats["failed"] += 1
+            logger.error(f"Error saat membuat peta ODP: {e}")
+
+        if not self._forget(key, future):
+            # Pengguna sudah meminta peta yang sama lagi; hasil ini tidak dikirim
+            if not cancelled:
+                with self._lock:
+                    self._stats["superseded"] += 1
+                _discard_file(result)
+            if on_superseded is not None:
+                try:
+                    on_superseded()
+                except Exception as e:
+                    logger.error(f"Error saat membereskan job render yang digantikan: {e}")
+            return
+
+        if callback is not None:
+            try:
+                callback(result)
+            except Exception as e:
+                logger.error(f"Error saat mengirim hasil render: {e}")
+
+    def render(self, fn, **kwargs):
+        """
+        Render secara sinkron di pool worker (untuk pemanggil yang menunggu hasilnya).
+
+        Returns:
+            Path hasil render, atau None jika gagal, antrean penuh, atau melewati batas waktu
+        """
+        done = threading.Event()
+        box = []
+
+        def keep(result):
+            box.append(result)
+            done.set()
+
+        if self.submit(None, fn, callback=keep, **kwargs) is None:
+            return None
+        done.wait()
+        return box[0]
+
+    def stats(self):
+        """Statistik pool: jumlah worker, antrean dan hasil job."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["workers"] = self.workers
+            stats["pending"] = self._pending
+            stats["queue_size"] = self.queue_size
+            completed = stats["completed"]
+            stats["avg_render_seconds"] = self._render_seconds / completed if completed else None
+            stats["avg_wait_seconds"] = self._wait_seconds / completed if completed else None
+        return stats
+
+    def shutdown(self, wait=True):
+        """Hentikan pool worker; job yang belum berjalan dibatalkan."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        self._delivery.shutdown(wait=False)
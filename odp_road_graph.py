@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Mesin routing lokal dari ekstrak jaringan jalan OpenStreetMap.
+
+Ekstrak OSM (XML .osm / .osm.gz) wilayah layanan dimuat menjadi graf
+berarah ringkas dalam bentuk CSR: indptr/indices (int32) dan bobot panjang
+ruas dalam meter (float32), plus koordinat simpul. Hasil konversi disimpan
+sebagai .npz sehingga bot cukup memuat beberapa array saat start.
+
+Query satu-ke-banyak memakai Dijkstra terbatas dari simpul terdekat titik
+referensi: pencarian berhenti begitu semua simpul tujuan sudah pasti atau
+jarak melewati batas, sehingga hanya jalan di sekitar radius pencarian
+yang dikunjungi. Geometri rute diambil dari simpul-simpul jalan yang
+dilalui, bukan garis simulasi.
+
+Contoh konversi dan uji rute:
+    python odp_road_graph.py wilayah.osm.gz --output data/road_graph.npz
+    python odp_road_graph.py static/road_graph_sample.osm --route -3.3200 114.5900 -3.3155 114.5960
+
+Pemeriksaan snap dan rute terpendek dengan ekstrak sampel:
+    python check_road_graph.py
+"""
+
+import os
+import gzip
+import math
+import time
+import heapq
+import hashlib
+import logging
+import argparse
+from array import array
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from odp_distance import haversine_meters
+from odp_spatial_index import SpatialIndex, METERS_PER_DEGREE
+
+logger = logging.getLogger(__name__)
+
+# Lokasi graf jalan hasil konversi (.npz) atau ekstrak OSM langsung
+DEFAULT_ROAD_GRAPH_PATH = os.environ.get('ODP_ROAD_GRAPH_PATH', 'data/road_graph.npz')
+
+# Jarak maksimal titik ke simpul jalan terdekat agar dianggap terhubung (meter)
+ROAD_GRAPH_SNAP_METERS = float(os.environ.get('ODP_ROAD_GRAPH_SNAP_METERS', 150))
+
+# Batas pencarian jika tidak ditentukan: kelipatan jarak udara tujuan terjauh,
+# minimal ROAD_GRAPH_MIN_SEARCH_METERS (tujuan dekat di seberang sungai bisa
+# memerlukan putaran jauh lewat jembatan)
+ROAD_GRAPH_MAX_DETOUR = 3.0
+ROAD_GRAPH_MIN_SEARCH_METERS = 3000.0
+
+# Margin di atas radius pencarian pemanggil untuk batas Dijkstra (meter); rute
+# yang lebih panjang dianggap tidak terjangkau dan memakai estimasi jarak udara
+ROAD_GRAPH_SEARCH_MARGIN = float(os.environ.get('ODP_ROAD_GRAPH_SEARCH_MARGIN', 500))
+
+# Ruas yang lebih panjang dipecah dengan simpul antara, sehingga titik di tengah
+# jalan lurus tersambung ke simpul yang dekat (galat sambungan <= setengahnya)
+ROAD_GRAPH_MAX_EDGE_METERS = 40.0
+
+# Ukuran sel indeks spasial simpul jalan dalam meter
+ROAD_GRAPH_CELL_METERS = 100
+
+# Jenis jalan OSM yang bisa dilalui kendaraan
+ROUTABLE_HIGHWAYS = frozenset({
+    'motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'unclassified', 'residential',
+    'motorway_link', 'trunk_link', 'primary_link', 'secondary_link', 'tertiary_link',
+    'living_street', 'service', 'road', 'track',
+})
+
+# Nilai tag access yang menutup jalan untuk umum
+BLOCKED_ACCESS = frozenset({'no', 'private'})
+
+
+class RoadGraph:
+    """
+    Graf jalan berarah dalam format CSR.
+
+    Simpul ke-i berada di (lats[i], lngs[i]); ruas keluar dari simpul i
+    adalah indices[indptr[i]:indptr[i + 1]] dengan panjang weights pada
+    posisi yang sama.
+    """
+
+    def __init__(self, lats, lngs, indptr, indices, weights):
+        self.lats = np.ascontiguousarray(lats, dtype=np.float64)
+        self.lngs = np.ascontiguousarray(lngs, dtype=np.float64)
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.index = SpatialIndex(self.lats, self.lngs, cell_meters=ROAD_GRAPH_CELL_METERS)
+        self._fingerprint = None
+
+    def __len__(self):
+        return len(self.lats)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        """Ukuran array graf di memori (tanpa indeks spasial)."""
+        return int(self.lats.nbytes + self.lngs.nbytes + self.indptr.nbytes +
+                   self.indices.nbytes + self.weights.nbytes)
+
+    @classmethod
+    def from_edges(cls, lats, lngs, sources, targets, weights=None):
+        """
+        Bangun graf dari daftar ruas berarah.
+
+        Args:
+            lats: Array latitude simpul
+            lngs: Array longitude simpul
+            sources: Array simpul asal setiap ruas
+            targets: Array simpul tujuan setiap ruas
+            weights: Panjang ruas dalam meter (default: haversine antar simpul)
+
+        Returns:
+            RoadGraph
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if weights is None:
+            weights = haversine_meters(lats[sources], lngs[sources], lats[targets], lngs[targets])
+
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(len(lats) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(lats)), out=indptr[1:])
+        return cls(lats, lngs, indptr, targets[order], np.asarray(weights)[order])
+
+    @classmethod
+    def from_osm(cls, path, highways=ROUTABLE_HIGHWAYS):
+        """
+        Muat ekstrak OSM XML (.osm atau .osm.gz) menjadi graf jalan.
+
+        Hanya way dengan tag highway yang bisa dilalui kendaraan yang dipakai;
+        oneway (termasuk bundaran dan motorway) menghasilkan ruas satu arah.
+        Simpul yang tidak dipakai jalan mana pun dibuang, dan ruas yang lebih
+        panjang dari ROAD_GRAPH_MAX_EDGE_METERS dipecah.
+        """
+        node_ids, node_lats, node_lngs = array('q'), array('d'), array('d')
+        edge_from, edge_to = array('q'), array('q')
+        ways = 0
+
+        opener = gzip.open if str(path).endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            context = ET.iterparse(f, events=('start', 'end'))
+            _, root = next(context)
+            for event, elem in context:
+                if event != 'end' or elem.tag not in ('node', 'way', 'relation'):
+                    continue
+                if elem.tag == 'node':
+                    node_ids.append(int(elem.get('id')))
+                    node_lats.append(float(elem.get('lat')))
+                    node_lngs.append(float(elem.get('lon')))
+                elif elem.tag == 'way':
+                    tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+                    refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                    direction = _way_direction(tags, highways)
+                    if direction is not None and len(refs) > 1:
+                        if direction < 0:
+                            refs.reverse()
+                        edge_from.extend(refs[:-1])
+                        edge_to.extend(refs[1:])
+                        if direction == 0:
+                            edge_from.extend(refs[1:])
+                            edge_to.extend(refs[:-1])
+                        ways += 1
+                # Elemen yang sudah diproses dibuang agar memori tidak tumbuh
+                root.clear()
+
+        node_ids = np.frombuffer(node_ids, dtype=np.int64)
+        edge_from = np.frombuffer(edge_from, dtype=np.int64)
+        edge_to = np.frombuffer(edge_to, dtype=np.int64)
+
+        # Petakan ID OSM ke posisi; ruas dengan simpul di luar ekstrak dibuang
+        order = np.argsort(node_ids)
+        sorted_ids = node_ids[order]
+        from_pos = np.clip(np.searchsorted(sorted_ids, edge_from), 0, max(len(sorted_ids) - 1, 0))
+        to_pos = np.clip(np.searchsorted(sorted_ids, edge_to), 0, max(len(sorted_ids) - 1, 0))
+        known = (sorted_ids[from_pos] == edge_from) & (sorted_ids[to_pos] == edge_to) \
+            if len(sorted_ids) else np.zeros(len(edge_from), dtype=bool)
+        if not known.all():
+            logger.warning(f"{int(np.count_nonzero(~known))} ruas jalan merujuk simpul di luar ekstrak, dibuang")
+        from_node = order[from_pos[known]]
+        to_node = order[to_pos[known]]
+
+        # Simpan hanya simpul yang dipakai ruas, dengan nomor baru 0..n-1
+        used, inverse = np.unique(np.concatenate((from_node, to_node)), return_inverse=True)
+        lats = np.frombuffer(node_lats, dtype=np.float64)[used]
+        lngs = np.frombuffer(node_lngs, dtype=np.float64)[used]
+        lats, lngs, sources, targets = _densify(lats, lngs, inverse[:len(from_node)], inverse[len(from_node):],
+                                                ROAD_GRAPH_MAX_EDGE_METERS)
+        graph = cls.from_edges(lats, lngs, sources, targets)
+
+        logger.info(f"Graf jalan dimuat dari {path}: {ways} jalan, {len(graph)} simpul, "
+                    f"{graph.edge_count} ruas ({graph.nbytes / 1e6:.1f} MB)")
+        return graph
+
+    @classmethod
+    def load(cls, path):
+        """Muat graf dari file .npz hasil save(), atau dari ekstrak OSM."""
+        if str(path).endswith(('.osm', '.osm.gz', '.xml')):
+            return cls.from_osm(path)
+
+        with np.load(path) as data:
+            graph = cls(data['lats'], data['lngs'], data['indptr'], data['indices'], data['weights'])
+        logger.info(f"Graf jalan dimuat dari {path}: {len(graph)} simpul, {graph.edge_count} ruas "
+                    f"({graph.nbytes / 1e6:.1f} MB)")
+        return graph
+
+    def save(self, path):
+        """Simpan array graf ke file .npz."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, lats=self.lats, lngs=self.lngs, indptr=self.indptr,
+                 indices=self.indices, weights=self.weights)
+
+    def nearest_node(self, lat, lng, max_meters=ROAD_GRAPH_SNAP_METERS):
+        """
+        Simpul jalan terdekat dari sebuah titik.
+
+        Returns:
+            tuple: (simpul, jarak_meter) atau (None, None) jika tidak ada dalam max_meters
+        """
+        positions, distances = self.index.query_radius(lat, lng, max_meters, refine=False)
+        if not len(positions):
+            return None, None
+        return int(positions[0]), float(distances[0])
+
+    def snap_point(self, lat, lng, max_meters=ROAD_GRAPH_SNAP_METERS):
+        """
+        Titik terdekat di ruas jalan (bukan hanya di simpul) dari sebuah titik.
+
+        Ruas terdekat selalu berawal dari simpul yang tidak lebih jauh dari simpul
+        terdekat + ROAD_GRAPH_MAX_EDGE_METERS, jadi hanya ruas keluar dari simpul
+        tersebut yang diproyeksikan.
+
+        Returns:
+            tuple: (lat, lng, jarak_meter) atau (None, None, None) jika tidak ada
+                   jalan dalam max_meters
+        """
+        # Radius kecil dulu (cukup untuk titik di tepi jalan), radius penuh jika perlu
+        for radius in (min(2 * ROAD_GRAPH_MAX_EDGE_METERS, max_meters), max_meters):
+            positions, distances = self.index.query_radius(lat, lng, radius + ROAD_GRAPH_MAX_EDGE_METERS,
+                                                           refine=False)
+            if len(positions) and distances[0] <= radius:
+                break
+        else:
+            return None, None, None
+        near = positions[distances <= distances[0] + ROAD_GRAPH_MAX_EDGE_METERS]
+
+        starts = np.repeat(near, self.indptr[near + 1] - self.indptr[near])
+        ends = np.concatenate([self.indices[self.indptr[node]:self.indptr[node + 1]] for node in near])
+        if not len(ends):
+            starts = ends = near
+
+        # Proyeksi ke setiap ruas dalam bidang datar lokal (meter)
+        lng_scale = METERS_PER_DEGREE * math.cos(math.radians(lat))
+        ax, ay = (self.lngs[starts] - lng) * lng_scale, (self.lats[starts] - lat) * METERS_PER_DEGREE
+        bx, by = (self.lngs[ends] - lng) * lng_scale, (self.lats[ends] - lat) * METERS_PER_DEGREE
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        t = np.clip(-(ax * dx + ay * dy) / np.where(length_sq > 0, length_sq, 1.0), 0.0, 1.0)
+        px, py = ax + t * dx, ay + t * dy
+        offsets = np.hypot(px, py)
+
+        best = int(np.argmin(offsets))
+        if offsets[best] > max_meters:
+            return None, None, None
+        return lat + py[best] / METERS_PER_DEGREE, lng + px[best] / lng_scale, float(offsets[best])
+
+    def snap_points(self, lats, lngs, max_meters=ROAD_GRAPH_SNAP_METERS):
+        """
+        Titik jalan terdekat untuk banyak titik (lihat snap_point).
+
+        Returns:
+            tuple: (lats, lngs, jarak_meter) berupa np.ndarray; NaN jika tidak ada jalan
+        """
+        result = np.full((len(lats), 3), np.nan)
+        for i, (lat, lng) in enumerate(zip(np.asarray(lats, dtype=np.float64).tolist(),
+                                           np.asarray(lngs, dtype=np.float64).tolist())):
+            snapped = self.snap_point(lat, lng, max_meters)
+            if snapped[0] is not None:
+                result[i] = snapped
+        return result[:, 0], result[:, 1], result[:, 2]
+
+    def fingerprint(self):
+        """Sidik graf (hash koordinat dan ruas) untuk menandai data turunan seperti tabel snap."""
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            for values in (self.lats, self.lngs, self.indptr, self.indices):
+                digest.update(np.ascontiguousarray(values).tobytes())
+            self._fingerprint = digest.hexdigest()[:16]
+        return self._fingerprint
+
+    def shortest_paths(self, source, limit, targets=None):
+        """
+        Dijkstra terbatas dari satu simpul.
+
+        Args:
+            source: Simpul asal
+            limit: Jarak maksimal yang dijelajahi (meter)
+            targets: Simpul tujuan; pencarian berhenti setelah semuanya pasti
+
+        Returns:
+            tuple: (dict jarak per simpul, dict simpul sebelumnya per simpul)
+        """
+        indptr, indices, weights = self.indptr, self.indices, self.weights
+        dist = {source: 0.0}
+        previous = {source: -1}
+        remaining = set(targets) if targets is not None else None
+        heap = [(0.0, source)]
+
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            if remaining is not None:
+                remaining.discard(node)
+                if not remaining:
+                    break
+
+            start, end = int(indptr[node]), int(indptr[node + 1])
+            for neighbor, weight in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+                candidate = d + weight
+                if candidate <= limit and candidate < dist.get(neighbor, np.inf):
+                    dist[neighbor] = candidate
+                    previous[neighbor] = node
+                    heapq.heappush(heap, (candidate, neighbor))
+
+        return dist, previous
+
+    def path_coordinates(self, previous, node):
+        """Koordinat simpul-simpul dari asal sampai `node` sebagai array (N, 2) berisi [lng, lat]."""
+        nodes = []
+        while node != -1:
+            nodes.append(node)
+            node = previous[node]
+        nodes.reverse()
+        return np.column_stack((self.lngs[nodes], self.lats[nodes]))
+
+    def distances_from(self, ref_lat, ref_lng, dest_lats, dest_lngs, max_meters=None, with_paths=False):
+        """
+        Jarak jalan dari titik referensi ke banyak tujuan.
+
+        Titik referensi dan tujuan disambungkan ke simpul jalan terdekat;
+        jarak sambungan (garis lurus) ikut dijumlahkan.
+
+        Args:
+            ref_lat: Latitude titik referensi
+            ref_lng: Longitude titik referensi
+            dest_lats: Array latitude tujuan
+            dest_lngs: Array longitude tujuan
+            max_meters: Batas jarak di jaringan jalan; pencarian ODP memberi radiusnya
+                + ROAD_GRAPH_SEARCH_MARGIN (default: ROAD_GRAPH_MAX_DETOUR x jarak
+                udara tujuan terjauh, minimal ROAD_GRAPH_MIN_SEARCH_METERS)
+            with_paths: Sertakan koordinat rute per tujuan
+
+        Returns:
+            tuple: (np.ndarray jarak meter dengan NaN jika tidak terjangkau,
+                    list koordinat rute atau None per tujuan jika with_paths)
+        """
+        dest_lats = np.asarray(dest_lats, dtype=np.float64)
+        dest_lngs = np.asarray(dest_lngs, dtype=np.float64)
+        distances = np.full(len(dest_lats), np.nan)
+        paths = [None] * len(dest_lats) if with_paths else None
+
+        source, source_offset = self.nearest_node(ref_lat, ref_lng)
+        if source is None or not len(dest_lats):
+            return distances, paths
+
+        snapped = [self.nearest_node(lat, lng) for lat, lng in zip(dest_lats.tolist(), dest_lngs.tolist())]
+        targets = {node for node, _ in snapped if node is not None}
+        if not targets:
+            return distances, paths
+
+        if max_meters is None:
+            farthest = float(np.max(haversine_meters(ref_lat, ref_lng, dest_lats, dest_lngs)))
+            max_meters = max(ROAD_GRAPH_MAX_DETOUR * farthest, ROAD_GRAPH_MIN_SEARCH_METERS)
+        dist, previous = self.shortest_paths(source, max_meters, targets)
+
+        for i, (node, offset) in enumerate(snapped):
+            if node is None or node not in dist:
+                continue
+            distances[i] = source_offset + dist[node] + offset
+            if with_paths:
+                paths[i] = self.path_coordinates(previous, node)
+
+        return distances, paths
+
+    def route(self, ref_lat, ref_lng, dest_lat, dest_lng, max_meters=None):
+        """
+        Rute lengkap (jarak dan geometri) ke satu tujuan.
+
+        Returns:
+            tuple: (jarak_meter, koordinat_rute) atau (None, None) jika tidak terjangkau
+        """
+        distances, paths = self.distances_from(ref_lat, ref_lng, [dest_lat], [dest_lng],
+                                               max_meters=max_meters, with_paths=True)
+        if np.isnan(distances[0]):
+            return None, None
+        return float(distances[0]), paths[0]
+
+    def reachable_points(self, ref_lat, ref_lng, max_meters, spacing_meters=10.0):
+        """
+        Titik-titik sepanjang jalan yang terjangkau dalam max_meters dari titik referensi.
+
+        Setiap ruas dari simpul terjangkau disampel setiap spacing_meters sampai
+        sisa jarak habis, sehingga ruas yang hanya terjangkau sebagian ikut terwakili.
+
+        Returns:
+            tuple: (lats, lngs) berupa np.ndarray; kosong jika titik tidak dekat jalan
+        """
+        source, source_offset = self.nearest_node(ref_lat, ref_lng)
+        budget = max_meters - (source_offset or 0.0)
+        if source is None or budget <= 0:
+            return np.empty(0), np.empty(0)
+
+        dist, _ = self.shortest_paths(source, budget)
+        nodes = np.fromiter(dist.keys(), dtype=np.int64, count=len(dist))
+        reached = np.fromiter(dist.values(), dtype=np.float64, count=len(dist))
+
+        # Semua ruas keluar dari simpul terjangkau
+        starts = self.indptr[nodes].astype(np.int64)
+        counts = self.indptr[nodes + 1].astype(np.int64) - starts
+        edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+        sources = np.repeat(nodes, counts)
+        targets = self.indices[edges]
+        lengths = self.weights[edges].astype(np.float64)
+        reach = np.minimum(lengths, budget - np.repeat(reached, counts))
+
+        # Sampel titik di sepanjang bagian ruas yang terjangkau
+        samples = np.ceil(reach / spacing_meters).astype(np.int64) + 1
+        edge_of = np.repeat(np.arange(len(edges)), samples)
+        step = np.arange(int(samples.sum())) - np.repeat(np.cumsum(samples) - samples, samples)
+        fraction = np.divide(reach, lengths, out=np.zeros_like(reach), where=lengths > 0)
+        t = step / np.maximum(samples - 1, 1)[edge_of] * fraction[edge_of]
+
+        lats = self.lats[sources][edge_of] + t * (self.lats[targets] - self.lats[sources])[edge_of]
+        lngs = self.lngs[sources][edge_of] + t * (self.lngs[targets] - self.lngs[sources])[edge_of]
+        return np.concatenate((self.lats[nodes], lats)), np.concatenate((self.lngs[nodes], lngs))
+
+
+def _way_direction(tags, highways):
+    """
+    Arah ruas sebuah way: 0 dua arah, 1 searah urutan simpul, -1 berlawanan,
+    None jika way bukan jalan yang bisa dilalui.
+    """
+    if tags.get('highway') not in highways or tags.get('area') == 'yes':
+        return None
+    if tags.get('access') in BLOCKED_ACCESS or tags.get('motor_vehicle') in BLOCKED_ACCESS:
+        return None
+
+    oneway = tags.get('oneway')
+    if oneway == '-1':
+        return -1
+    if oneway in ('yes', 'true', '1'):
+        return 1
+    if oneway is None and (tags.get('junction') == 'roundabout' or tags.get('highway') == 'motorway'):
+        return 1
+    return 0
+
+
+def _densify(lats, lngs, sources, targets, max_meters):
+    """
+    Pecah ruas yang lebih panjang dari max_meters dengan simpul antara.
+
+    Simpul antara dibuat sekali per pasangan simpul (tanpa memandang arah),
+    sehingga jalan dua arah tetap memakai simpul yang sama untuk kedua arahnya.
+
+    Returns:
+        tuple: (lats, lngs, sources, targets) yang sudah dipecah
+    """
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    lengths = haversine_meters(lats[sources], lngs[sources], lats[targets], lngs[targets])
+
+    # Ruas tanpa arah: ujung a < b
+    low = np.minimum(sources, targets)
+    high = np.maximum(sources, targets)
+    _, first, segment = np.unique(low * len(lats) + high, return_index=True, return_inverse=True)
+    seg_a, seg_b = low[first], high[first]
+    splits = np.maximum(np.ceil(lengths[first] / max_meters).astype(np.int64) - 1, 0)
+    base = len(lats) + np.cumsum(splits) - splits
+
+    # Koordinat simpul antara, berjarak sama dari a ke b
+    seg_of = np.repeat(np.arange(len(splits)), splits)
+    step = np.arange(int(splits.sum())) - np.repeat(base - len(lats), splits) + 1
+    fraction = step / (splits[seg_of] + 1)
+    new_lats = lats[seg_a][seg_of] + fraction * (lats[seg_b] - lats[seg_a])[seg_of]
+    new_lngs = lngs[seg_a][seg_of] + fraction * (lngs[seg_b] - lngs[seg_a])[seg_of]
+
+    # Setiap ruas berarah menjadi rantai splits + 1 ruas searah aslinya
+    counts = splits[segment] + 1
+    edge_of = np.repeat(np.arange(len(sources)), counts)
+    step = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    inner = splits[segment][edge_of]
+    seg = segment[edge_of]
+    forward = (sources == low)[edge_of]
+
+    def chain_node(position):
+        # Posisi 0 = a, inner + 1 = b, di antaranya simpul antara
+        return np.where(position == 0, seg_a[seg],
+                        np.where(position == inner + 1, seg_b[seg], base[seg] + position - 1))
+
+    new_sources = chain_node(np.where(forward, step, inner + 1 - step))
+    new_targets = chain_node(np.where(forward, step + 1, inner - step))
+    return (np.concatenate((lats, new_lats)), np.concatenate((lngs, new_lngs)), new_sources, new_targets)
+
+
+def load_road_graph(path=DEFAULT_ROAD_GRAPH_PATH):
+    """
+    Muat graf jalan lokal jika tersedia.
+
+    Returns:
+        RoadGraph, atau None jika file tidak ada atau gagal dimuat
+    """
+    if not path or not os.path.exists(path):
+        logger.info(f"Graf jalan lokal tidak ditemukan ({path}), routing lokal tidak aktif")
+        return None
+    try:
+        return RoadGraph.load(path)
+    except Exception as e:
+        logger.error(f"Gagal memuat graf jalan lokal {path}: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Konversi ekstrak OSM menjadi graf jalan lokal')
+    parser.add_argument('source', help='Ekstrak OSM (.osm/.osm.gz) atau graf .npz')
+    parser.add_argument('--output', help='Simpan graf sebagai .npz')
+    parser.add_argument('--route', type=float, nargs=4, metavar=('LAT1', 'LNG1', 'LAT2', 'LNG2'),
+                        help='Hitung rute uji antara dua titik')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    graph = RoadGraph.load(args.source)
+    print(f"Simpul: {len(graph)}, ruas: {graph.edge_count}, ukuran: {graph.nbytes / 1e6:.2f} MB")
+
+    if args.output:
+        graph.save(args.output)
+        print(f"Graf disimpan ke {args.output}")
+
+    if args.route:
+        started = time.perf_counter()
+        distance, coords = graph.route(*args.route)
+        elapsed = (time.perf_counter() - started) * 1000
+        if distance is None:
+            print(f"Tidak ada rute ({elapsed:.1f} ms)")
+        else:
+            print(f"Jarak rute: {distance:.1f} m melalui {len(coords)} titik ({elapsed:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
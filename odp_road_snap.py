@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tabel snap ODP ke jaringan jalan.
+
+Setiap ODP di dataset disambungkan sekali ke titik terdekat di ruas jalan
+(graf jalan lokal, atau API snap ORS untuk ODP di luar graf). Permintaan
+rute memakai titik jalan ini sebagai ujung rute, sehingga provider tidak
+perlu mencari jalan terdekat di setiap permintaan dan ODP yang agak jauh
+dari jalan tetap mendapat rute; sambungan dari titik jalan ke ODP digambar
+sebagai garis lurus pendek dan panjangnya (jarak snap) ditambahkan ke jarak
+rute ODP.
+
+Tabel disimpan di direktori versi snapshot dataset (road_snap.npy berisi
+lat, lng dan jarak snap per baris, ditambah header road_snap.json) dan
+ditandai dengan sumbernya (sidik graf jalan dan provider). Proses lain yang
+memetakan snapshot yang sama cukup membaca tabel ini; tabel dibangun ulang
+jika graf jalan berubah. Untuk versi dataset baru, baris yang koordinatnya
+sama dengan versi sebelumnya memakai hasil lama sehingga hanya ODP baru atau
+yang berpindah yang di-snap.
+"""
+
+import os
+import json
+import time
+import logging
+import numpy as np
+
+from odp_routing import SNAP_MAX_METERS
+
+logger = logging.getLogger(__name__)
+
+SNAP_FILE = "road_snap.npy"
+SNAP_HEADER_FILE = "road_snap.json"
+
+
+class RoadSnapTable:
+    """
+    Titik jalan per baris dataset: kolom lat, lng dan jarak snap (meter).
+
+    Baris yang tidak punya jalan dalam jarak snap (atau baris terhapus)
+    bernilai NaN dan tetap dirutekan dari koordinat aslinya.
+    """
+
+    def __init__(self, points, source):
+        self.points = points
+        self.source = source
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def snapped(self):
+        """Mask baris yang berhasil di-snap ke jalan."""
+        return ~np.isnan(self.points[:, 2])
+
+    def route_points(self, positions, lats, lngs):
+        """
+        Ujung rute untuk baris pada posisi tertentu.
+
+        Args:
+            positions: Posisi baris dataset
+            lats: Latitude asli baris tersebut (dipakai jika tidak ada titik jalan)
+            lngs: Longitude asli baris tersebut
+
+        Returns:
+            tuple: (lats, lngs, offsets) berupa np.ndarray float64; offsets adalah
+            jarak snap ODP ke titik jalan (0 untuk baris yang tidak di-snap)
+        """
+        points = np.asarray(self.points[positions], dtype=np.float64)
+        snapped = ~np.isnan(points[:, 2])
+        return (np.where(snapped, points[:, 0], np.asarray(lats, dtype=np.float64)),
+                np.where(snapped, points[:, 1], np.asarray(lngs, dtype=np.float64)),
+                np.where(snapped, points[:, 2], 0.0))
+
+    def stats(self):
+        """Jumlah baris, baris ter-snap dan median jarak snap."""
+        snapped = self.snapped
+        offsets = self.points[:, 2][snapped]
+        return {
+            "rows": len(self),
+            "snapped": int(snapped.sum()),
+            "median_meters": float(np.median(offsets)) if len(offsets) else None,
+        }
+
+
+class RoadSnapper:
+    """
+    Pembangun tabel snap dari RoutingClient (lihat RoutingClient.snap_points).
+    """
+
+    def __init__(self, routing_client, max_meters=SNAP_MAX_METERS):
+        self.routing_client = routing_client
+        self.max_meters = max_meters
+
+    @property
+    def source(self):
+        """Penanda sumber snap; None jika tidak ada provider yang bisa melakukan snap."""
+        parts = []
+        for provider in self.routing_client.providers:
+            if provider == 'local':
+                parts.append(f"local:{self.routing_client.road_graph.fingerprint()}")
+            elif provider == 'ors':
+                parts.append('ors')
+        if not parts:
+            return None
+        return f"{','.join(parts)}|{self.max_meters:g}"
+
+    def table_for(self, dataset, path=None, previous_dataset=None, previous_table=None):
+        """
+        Tabel snap untuk dataset: dibaca dari direktori snapshot jika ada, jika tidak dibangun.
+
+        Args:
+            dataset: PreparedDataset
+            path: Direktori versi snapshot dataset (None = tidak disimpan)
+            previous_dataset: Versi dataset sebelumnya (untuk memakai ulang hasil snap)
+            previous_table: Tabel snap versi sebelumnya
+
+        Returns:
+            RoadSnapTable, atau None jika tidak ada provider snap
+        """
+        source = self.source
+        if source is None:
+            return None
+
+        if path is not None:
+            table = read_snap_table(path, source, len(dataset.lats))
+            if table is not None:
+                return table
+
+        started = time.monotonic()
+        table = self.build(dataset, source, previous_dataset, previous_table)
+        stats = table.stats()
+        logger.info(f"Tabel snap jalan dibangun: {stats['snapped']} dari {stats['rows']} ODP "
+                    f"({time.monotonic() - started:.1f} dtk)")
+
+        if path is not None:
+            try:
+                write_snap_table(path, table)
+            except Exception as e:
+                logger.warning(f"Gagal menyimpan tabel snap jalan: {e}")
+        return table
+
+    def build(self, dataset, source, previous_dataset=None, previous_table=None):
+        """Snap semua baris yang berlaku; baris dengan koordinat sama seperti versi sebelumnya dipakai ulang."""
+        lats = np.asarray(dataset.lats, dtype=np.float64)
+        lngs = np.asarray(dataset.lngs, dtype=np.float64)
+        points = np.full((len(lats), 3), np.nan)
+        todo = np.flatnonzero(dataset.alive)
+
+        if previous_table is not None and previous_table.source == source and len(todo):
+            known = {coords: row for row, coords in
+                     enumerate(zip(previous_dataset.lats.tolist(), previous_dataset.lngs.tolist()))}
+            rows = np.array([known.get(coords, -1) for coords in zip(lats[todo].tolist(), lngs[todo].tolist())],
+                            dtype=np.int64)
+            reused = rows >= 0
+            points[todo[reused]] = previous_table.points[rows[reused]]
+            todo = todo[~reused]
+            logger.info(f"Tabel snap jalan: {int(reused.sum())} ODP dipakai ulang, {len(todo)} ODP di-snap")
+
+        if len(todo):
+            points[todo] = np.column_stack(self.routing_client.snap_points(lats[todo], lngs[todo], self.max_meters))
+        return RoadSnapTable(points, source)
+
+
+def read_snap_table(path, source, rows):
+    """
+    Baca tabel snap dari direktori versi snapshot (di-memory-map).
+
+    Returns:
+        RoadSnapTable, atau None jika belum ada atau dibangun dari sumber lain
+    """
+    try:
+        with open(os.path.join(path, SNAP_HEADER_FILE), encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get("source") != source or header.get("rows") != rows:
+            return None
+        points = np.load(os.path.join(path, SNAP_FILE), mmap_mode='r')
+        if points.shape != (rows, 3):
+            return None
+        return RoadSnapTable(points, source)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Gagal membaca tabel snap jalan {path}: {e}")
+        return None
+
+
+def write_snap_table(path, table):
+    """Simpan tabel snap ke direktori versi snapshot; header ditulis terakhir sebagai penanda selesai."""
+    array_tmp = os.path.join(path, f".{SNAP_FILE}.{os.getpid()}.tmp")
+    header_tmp = os.path.join(path, f".{SNAP_HEADER_FILE}.{os.getpid()}.tmp")
+
+    with open(array_tmp, 'wb') as f:
+        np.save(f, np.asarray(table.points, dtype=np.float64))
+    os.replace(array_tmp, os.path.join(path, SNAP_FILE))
+
+    header = {"source": table.source, "rows": len(table), "created_at": time.time()}
+    with open(header_tmp, 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+    os.replace(header_tmp, os.path.join(path, SNAP_HEADER_FILE))
+    logger.info(f"Tabel snap jalan disimpan di {path}")
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache rute dua tingkat: LRU di memori di atas penyimpanan SQLite di disk.
+
+Setiap entri berisi jarak rute (meter) dan, jika sudah diambil, geometri
+rute. Geometri disimpan ringkas sebagai pasangan int32 dalam mikroderajat
+(8 byte per titik, presisi ~0,1 m) setelah disederhanakan oleh pemanggil
+(lihat odp_route_geometry). Entri kedaluwarsa setelah TTL; hasil
+gagal (tidak ada rute) juga disimpan tetapi dengan TTL pendek, agar API
+tidak dipanggil berulang kali namun rute tetap dicoba lagi nanti.
+
+Tingkat disk bertahan saat proses dijalankan ulang, sehingga pencarian
+berulang di koordinat yang sama tidak memanggil API routing lagi.
+
+RouteLookup menambahkan grid kuantisasi di atas cache: kedua ujung rute
+dibulatkan ke pusat sel grid (default 10 m) sehingga titik referensi yang
+berdekatan memakai rute yang sama, dan key tidak bergantung arah sehingga
+rute A->B juga dipakai untuk B->A.
+"""
+
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Lokasi database cache rute
+DEFAULT_ROUTE_CACHE_PATH = os.environ.get('ODP_ROUTE_CACHE_PATH', 'data/route_cache.sqlite')
+
+# Jumlah entri maksimal di memori dan di disk
+MEMORY_MAX_ENTRIES = int(os.environ.get('ODP_ROUTE_CACHE_MEMORY_ENTRIES', 5000))
+DISK_MAX_ENTRIES = int(os.environ.get('ODP_ROUTE_CACHE_DISK_ENTRIES', 200000))
+
+# Masa berlaku entri (detik): rute 7 hari, hasil gagal 10 menit
+ROUTE_TTL = int(os.environ.get('ODP_ROUTE_CACHE_TTL', 7 * 24 * 3600))
+NEGATIVE_TTL = int(os.environ.get('ODP_ROUTE_CACHE_NEGATIVE_TTL', 600))
+
+# Pembersihan disk (entri kedaluwarsa dan kelebihan) setiap sekian penulisan
+PRUNE_EVERY = 500
+
+# Skala koordinat geometri (mikroderajat)
+GEOMETRY_SCALE = 1e6
+
+# Ukuran sel grid kuantisasi ujung rute dalam meter (0 = tanpa kuantisasi)
+ROUTE_GRID_METERS = float(os.environ.get('ODP_ROUTE_GRID_METERS', 10))
+
+# Panjang 1 derajat latitude dalam meter (perkiraan)
+METERS_PER_DEGREE = 111320.0
+
+
+class RouteEntry(namedtuple('RouteEntry', ['distance', 'geometry', 'expires_at'])):
+    """Entri cache; distance None berarti hasil gagal (negatif), geometry dalam bentuk ringkas."""
+    __slots__ = ()
+
+    @property
+    def coords(self):
+        """Geometri rute sebagai array float32 (N, 2) berisi [lng, lat], atau None."""
+        return decode_geometry(self.geometry)
+
+    def reversed(self):
+        """Entri yang sama dengan geometri berlawanan arah."""
+        if self.geometry is None:
+            return self
+        points = np.frombuffer(self.geometry, dtype='<i4').reshape(-1, 2)
+        return self._replace(geometry=points[::-1].tobytes())
+
+
+def route_key(ref_lat, ref_lng, dest_lat, dest_lng):
+    """Key cache untuk rute dari titik referensi ke tujuan."""
+    return f"{ref_lat:.6f}_{ref_lng:.6f}_{dest_lat:.6f}_{dest_lng:.6f}"
+
+
+def encode_geometry(coords):
+    """Koordinat rute (list [[lng, lat], ...] atau array (N, 2)) menjadi bytes ringkas (int32 mikroderajat)."""
+    if coords is None:
+        return None
+    values = np.round(np.asarray(coords, dtype=np.float64) * GEOMETRY_SCALE)
+    return values.astype('<i4').tobytes()
+
+
+def decode_geometry(blob):
+    """Kebalikan encode_geometry: bytes menjadi array float32 (N, 2) berisi [lng, lat]."""
+    if blob is None:
+        return None
+    values = np.frombuffer(blob, dtype='<i4').reshape(-1, 2)
+    return (values / GEOMETRY_SCALE).astype(np.float32)
+
+
+class RouteCache:
+    """
+    Cache rute dengan LRU di memori dan SQLite di disk.
+
+    Aman dipakai bersamaan oleh thread routing. Jika database tidak bisa
+    dibuka, cache tetap bekerja hanya di memori.
+    """
+
+    def __init__(self, path=DEFAULT_ROUTE_CACHE_PATH, memory_entries=MEMORY_MAX_ENTRIES,
+                 disk_entries=DISK_MAX_ENTRIES, ttl=ROUTE_TTL, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = self._open(path)
+
+    def _open(self, path):
+        if not path:
+            return None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS routes (
+                              key TEXT PRIMARY KEY,
+                              distance REAL,
+                              geometry BLOB,
+                              created_at REAL NOT NULL,
+                              expires_at REAL NOT NULL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS routes_created ON routes (created_at)")
+            db.commit()
+            self._prune(db)
+            logger.info(f"Cache rute disk dibuka: {path}")
+            return db
+        except Exception as e:
+            logger.warning(f"Gagal membuka cache rute {path}, hanya memakai memori: {e}")
+            return None
+
+    def __len__(self):
+        return len(self._memory)
+
+    def get(self, key):
+        """
+        Ambil entri yang masih berlaku.
+
+        Returns:
+            RouteEntry atau None jika tidak ada / kedaluwarsa
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Ambil banyak entri sekaligus (satu query disk untuk yang tidak ada di memori).
+
+        Returns:
+            dict key -> RouteEntry untuk entri yang ditemukan
+        """
+        now = time.time()
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None and entry.expires_at > now:
+                    self._memory.move_to_end(key)
+                    found[key] = entry
+                    self.memory_hits += 1
+                else:
+                    if entry is not None:
+                        del self._memory[key]
+                    missing.append(key)
+
+            loaded = self._load(missing, now)
+            for key, entry in loaded.items():
+                self._remember(key, entry)
+                found[key] = entry
+            self.disk_hits += len(loaded)
+            self.misses += len(missing) - len(loaded)
+
+        return found
+
+    def _load(self, keys, now):
+        if self._db is None or not keys:
+            return {}
+        rows = {}
+        try:
+            # Batas parameter SQLite: query per potongan
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                for key, distance, geometry, expires_at in self._db.execute(
+                        f"SELECT key, distance, geometry, expires_at FROM routes "
+                        f"WHERE key IN ({placeholders}) AND expires_at > ?", (*part, now)):
+                    rows[key] = RouteEntry(distance, geometry, expires_at)
+        except Exception as e:
+            logger.warning(f"Gagal membaca cache rute: {e}")
+        return rows
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key, distance, coords=None):
+        """Simpan hasil rute; distance None disimpan sebagai hasil gagal dengan TTL pendek."""
+        self.put_many([(key, distance, coords)])
+
+    def put_many(self, items):
+        """Simpan banyak hasil rute sekaligus: iterable (key, distance, coords)."""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for key, distance, coords in items:
+                ttl = self.ttl if distance is not None else self.negative_ttl
+                entry = RouteEntry(None if distance is None else float(distance), encode_geometry(coords), now + ttl)
+                self._remember(key, entry)
+                rows.append((key, entry.distance, entry.geometry, now, entry.expires_at))
+
+            if self._db is None or not rows:
+                return
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?, ?)", rows)
+                self._db.commit()
+                self._writes += len(rows)
+                if self._writes >= PRUNE_EVERY:
+                    self._writes = 0
+                    self._prune(self._db)
+            except Exception as e:
+                logger.warning(f"Gagal menyimpan cache rute: {e}")
+
+    def _prune(self, db):
+        """Hapus entri kedaluwarsa dan entri tertua di atas batas disk."""
+        db.execute("DELETE FROM routes WHERE expires_at <= ?", (time.time(),))
+        count = db.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        if count > self.disk_entries:
+            db.execute("DELETE FROM routes WHERE key IN "
+                       "(SELECT key FROM routes ORDER BY created_at LIMIT ?)", (count - self.disk_entries,))
+        db.commit()
+
+    def stats(self):
+        """Statistik cache untuk /status."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        disk_entries = None
+        if self._db is not None:
+            with self._lock:
+                try:
+                    disk_entries = self._db.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+                except Exception:
+                    pass
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+class RouteGrid:
+    """
+    Grid kuantisasi untuk ujung rute.
+
+    Titik dibulatkan ke pusat sel berukuran `cell_meters`; lebar sel longitude
+    mengikuti cos(latitude) baris selnya. Setiap ujung bergeser paling jauh
+    setengah diagonal sel, jadi selisih jarak rute dari titik asli dibatasi
+    oleh error_bound_meters (dengan asumsi titik terhubung jalan sepanjang
+    pergeseran itu, seperti yang dilakukan API saat menempelkan titik ke jalan).
+    """
+
+    def __init__(self, cell_meters=ROUTE_GRID_METERS):
+        self.cell_meters = cell_meters
+        self.cell_lat_deg = cell_meters / METERS_PER_DEGREE
+
+    @property
+    def error_bound_meters(self):
+        """Batas selisih jarak rute: setengah diagonal sel di kedua ujung."""
+        return math.sqrt(2) * self.cell_meters
+
+    def snap(self, lat, lng):
+        """Pusat sel grid untuk satu titik."""
+        if self.cell_meters <= 0:
+            return float(lat), float(lng)
+        row = math.floor(lat / self.cell_lat_deg)
+        snapped_lat = (row + 0.5) * self.cell_lat_deg
+        cell_lng_deg = self.cell_lat_deg / max(math.cos(math.radians(min(abs(snapped_lat), 89.0))), 1e-6)
+        snapped_lng = (math.floor(lng / cell_lng_deg) + 0.5) * cell_lng_deg
+        return round(snapped_lat, 6), round(snapped_lng, 6)
+
+
+class RouteLookup:
+    """
+    Lapisan pencarian cache rute dengan ujung terkuantisasi dan key simetris.
+
+    Pemanggil memakai endpoints() untuk mendapatkan koordinat yang dikirim ke
+    API, lalu get/put dengan koordinat asli. Entri disimpan dengan arah
+    kanonik (ujung yang lebih kecil dulu); saat dibaca dari arah sebaliknya
+    geometrinya dibalik. Perbedaan akibat jalan satu arah diabaikan.
+    """
+
+    def __init__(self, cache, grid=None):
+        self.cache = cache
+        self.grid = grid if grid is not None else RouteGrid()
+
+    def endpoints(self, ref_lat, ref_lng, dest_lat, dest_lng):
+        """Ujung rute setelah kuantisasi: (ref_lat, ref_lng, dest_lat, dest_lng)."""
+        return self.grid.snap(ref_lat, ref_lng) + self.grid.snap(dest_lat, dest_lng)
+
+    def _key(self, ref_lat, ref_lng, dest_lat, dest_lng):
+        """Key kanonik dan apakah arah permintaan berlawanan dengan arah simpan."""
+        origin = self.grid.snap(ref_lat, ref_lng)
+        destination = self.grid.snap(dest_lat, dest_lng)
+        if destination < origin:
+            return route_key(*destination, *origin), True
+        return route_key(*origin, *destination), False
+
+    def get(self, ref_lat, ref_lng, dest_lat, dest_lng):
+        """Entri untuk rute ini (geometri searah permintaan) atau None."""
+        return self.get_many(ref_lat, ref_lng, [dest_lat], [dest_lng])[0]
+
+    def get_many(self, ref_lat, ref_lng, dest_lats, dest_lngs):
+        """
+        Entri untuk rute dari satu titik referensi ke banyak tujuan.
+
+        Returns:
+            list RouteEntry atau None, urutan sama seperti tujuan
+        """
+        keys = [self._key(ref_lat, ref_lng, lat, lng) for lat, lng in zip(dest_lats, dest_lngs)]
+        found = self.cache.get_many([key for key, _ in keys])
+
+        entries = []
+        for key, is_reversed in keys:
+            entry = found.get(key)
+            if entry is not None and is_reversed:
+                entry = entry.reversed()
+            entries.append(entry)
+        return entries
+
+    def put(self, ref_lat, ref_lng, dest_lat, dest_lng, distance, coords=None):
+        """Simpan hasil rute (geometri searah permintaan)."""
+        self.put_many(ref_lat, ref_lng, [dest_lat], [dest_lng], [distance], [coords])
+
+    def put_many(self, ref_lat, ref_lng, dest_lats, dest_lngs, distances, coords=None):
+        """Simpan hasil rute dari satu titik referensi ke banyak tujuan."""
+        if coords is None:
+            coords = [None] * len(distances)
+        items = []
+        for lat, lng, distance, route in zip(dest_lats, dest_lngs, distances, coords):
+            key, is_reversed = self._key(ref_lat, ref_lng, lat, lng)
+            if route is not None and is_reversed:
+                route = route[::-1]
+            items.append((key, distance, route))
+        self.cache.put_many(items)
+
+    @property
+    def error_bound_meters(self):
+        """Batas selisih jarak rute terhadap ujung asli (lihat RouteGrid.error_bound_meters)."""
+        return self.grid.error_bound_meters
+
+    def stats(self):
+        """Statistik cache ditambah data grid kuantisasi."""
+        stats = self.cache.stats()
+        stats.update(grid_meters=self.grid.cell_meters, error_bound_meters=self.grid.error_bound_meters)
+        return stats
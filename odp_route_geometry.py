@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Geometri rute ringkas untuk cache dan peta.
+
+Geometri rute dari provider (list [[lng, lat], ...] hasil JSON) diubah
+sekali menjadi array float32 berbentuk (N, 2) dan disederhanakan dengan
+Douglas-Peucker: titik yang menyimpang kurang dari toleransi dari garis
+antara titik-titik yang dipertahankan dibuang. Jarak rute tidak berubah
+karena dihitung oleh provider, hanya garis yang digambar yang dipangkas.
+
+Presisi float32 di sekitar longitude 115 adalah ~0,8 m, masih di bawah
+ukuran satu piksel peta. Saat menggambar, rute disederhanakan lagi sesuai
+ukuran piksel peta (lihat meters_per_pixel).
+"""
+
+import os
+import math
+
+import numpy as np
+
+# Toleransi penyederhanaan saat rute disimpan (meter)
+ROUTE_SIMPLIFY_METERS = float(os.environ.get('ODP_ROUTE_SIMPLIFY_METERS', 0.5))
+
+# Panjang 1 derajat latitude dalam meter (perkiraan)
+METERS_PER_DEGREE = 111320.0
+
+
+def route_array(coords):
+    """Koordinat rute [[lng, lat], ...] menjadi array float32 (N, 2), atau None."""
+    if coords is None:
+        return None
+    points = np.asarray(coords, dtype=np.float32)
+    if points.ndim != 2 or points.shape[1] != 2:
+        return None
+    return np.ascontiguousarray(points)
+
+
+def simplify_route(points, tolerance_meters):
+    """
+    Sederhanakan rute dengan algoritma Douglas-Peucker.
+
+    Args:
+        points: Array (N, 2) berisi [lng, lat]
+        tolerance_meters: Penyimpangan maksimal garis hasil dari rute asli
+
+    Returns:
+        Array dengan dtype sama berisi titik yang dipertahankan (titik awal dan
+        akhir selalu ada)
+    """
+    if points is None or len(points) < 3 or tolerance_meters <= 0:
+        return points
+
+    # Proyeksi equirectangular lokal ke meter
+    lat0 = float(points[:, 1].mean())
+    x = points[:, 0].astype(np.float64) * (METERS_PER_DEGREE * math.cos(math.radians(lat0)))
+    y = points[:, 1].astype(np.float64) * METERS_PER_DEGREE
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length_sq = dx * dx + dy * dy
+        if length_sq > 0:
+            # Jarak ke ruas (bukan garis tak hingga) agar rute bolak-balik tetap utuh
+            t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+            deviation = np.hypot(px - t * dx, py - t * dy)
+        else:
+            deviation = np.hypot(px, py)
+        farthest = int(np.argmax(deviation))
+        if deviation[farthest] > tolerance_meters:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+
+    return points[keep]
+
+
+def compact_route(coords, tolerance_meters=ROUTE_SIMPLIFY_METERS):
+    """Geometri rute dari provider menjadi array float32 yang sudah disederhanakan."""
+    return simplify_route(route_array(coords), tolerance_meters)
+
+
+def route_column(routes):
+    """
+    Array object 1 dimensi berisi geometri per baris, untuk kolom DataFrame.
+
+    Diperlukan karena list berisi array dengan bentuk sama akan diubah pandas
+    menjadi satu array 3 dimensi.
+    """
+    column = np.empty(len(routes), dtype=object)
+    for i, route in enumerate(routes):
+        column[i] = route
+    return column
+
+
+def meters_per_pixel(ax):
+    """Ukuran satu piksel (meter) pada axes peta dengan sumbu longitude/latitude."""
+    (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+    width_pixels = max(ax.get_window_extent().width, 1.0)
+    lat = math.radians((y0 + y1) / 2)
+    return abs(x1 - x0) * METERS_PER_DEGREE * math.cos(lat) / width_pixels
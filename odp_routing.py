@@ -0,0 +1,846 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Klien routing jalan untuk pencarian ODP (graf jalan lokal, OpenRouteService
+dan Mapbox).
+
+Jarak jalan dari titik referensi ke semua kandidat ODP diambil dengan satu
+permintaan matriks (satu sumber, banyak tujuan) per potongan sesuai batas
+provider, bukan satu permintaan directions per ODP. Geometri rute lengkap
+hanya diambil lewat directions() untuk ODP yang benar-benar digambar di peta.
+settle_top_routes() memangkas kandidat: rute hanya diminta sampai N ODP
+terdekat menurut jarak jalan sudah pasti. isochrone() mengembalikan wilayah
+yang terjangkau dalam jarak jalan tertentu (lihat odp_isochrone).
+snap_points() mencari titik jalan terdekat untuk banyak titik sekaligus
+(dipakai tabel snap ODP, lihat odp_road_snap).
+
+Provider dicoba berurutan (ODP_ROUTE_PROVIDERS, default "local,ors,mapbox");
+provider berikutnya hanya dipakai untuk tujuan yang belum punya jarak.
+Provider "local" adalah RoadGraph dari odp_road_graph (tanpa kuota dan
+tanpa jaringan) dan hanya aktif jika graf jalan diberikan.
+
+URL dasar kedua provider API dapat diatur lewat environment (ORS_BASE_URL,
+MAPBOX_BASE_URL), misalnya untuk server pengganti lokal saat pengujian
+(lihat check_routing_matrix.py).
+
+Setiap provider punya ProviderHealth: circuit breaker (provider yang gagal
+berturut-turut dilewati selama masa jeda) dan catatan latensi (p50/p95).
+matrix_distances(), directions() dan isochrone() memakai permintaan hedge:
+jika provider utama belum menjawab dalam p95-nya, provider berikutnya ikut
+dikirimi permintaan yang sama dan jawaban valid pertama yang dipakai.
+
+Permintaan dijalankan bersamaan di thread pool berukuran tetap dengan
+session HTTP keep-alive, timeout per permintaan, dan pembatas laju (token
+bucket) per provider, sehingga fase rute satu pencarian kira-kira selama
+rute paling lambat, bukan jumlah semua rute.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+import openrouteservice as ors
+
+from odp_distance import haversine_meters
+from odp_road_graph import ROAD_GRAPH_SEARCH_MARGIN
+from odp_isochrone import geometry_polygons, region_from_points
+
+logger = logging.getLogger(__name__)
+
+ORS_API_KEY = os.environ.get('OPENROUTESERVICE_API_KEY')
+MAPBOX_ACCESS_TOKEN = os.environ.get('MAPBOX_ACCESS_TOKEN')
+
+# URL dasar API (bisa diarahkan ke server lokal)
+ORS_BASE_URL = os.environ.get('ORS_BASE_URL', 'https://api.openrouteservice.org')
+MAPBOX_BASE_URL = os.environ.get('MAPBOX_BASE_URL', 'https://api.mapbox.com')
+
+# Urutan provider routing; provider yang tidak tersedia dilewati
+ROUTE_PROVIDERS = [name.strip() for name in
+                   os.environ.get('ODP_ROUTE_PROVIDERS', 'local,ors,mapbox').split(',') if name.strip()]
+
+# Profil kendaraan untuk ORS dan Mapbox
+ORS_PROFILE = 'driving-car'
+MAPBOX_PROFILE = 'mapbox/driving'
+
+# Batas tujuan per permintaan matriks (satu lokasi dipakai oleh titik referensi).
+# ORS publik: maksimal 3500 elemen sumber x tujuan; Mapbox: maksimal 25 koordinat.
+ORS_MATRIX_MAX_DESTINATIONS = int(os.environ.get('ORS_MATRIX_MAX_DESTINATIONS', 3499))
+MAPBOX_MATRIX_MAX_DESTINATIONS = int(os.environ.get('MAPBOX_MATRIX_MAX_DESTINATIONS', 24))
+
+# Batas lokasi per permintaan snap ORS dan jarak maksimal titik ke jalan (meter)
+ORS_SNAP_MAX_LOCATIONS = int(os.environ.get('ORS_SNAP_MAX_LOCATIONS', 1000))
+SNAP_MAX_METERS = float(os.environ.get('ODP_SNAP_MAX_METERS', 150))
+
+# Timeout per permintaan routing dalam detik
+ROUTE_TIMEOUT = 15
+
+# Jumlah permintaan routing yang berjalan bersamaan (juga ukuran pool koneksi)
+ROUTE_WORKERS = int(os.environ.get('ODP_ROUTE_WORKERS', 8))
+
+# Batas laju per provider: permintaan per menit dan jumlah maksimal sekaligus
+# (default mengikuti kuota gratis ORS 40/menit dan Mapbox Directions 300/menit)
+ORS_REQUESTS_PER_MINUTE = float(os.environ.get('ORS_REQUESTS_PER_MINUTE', 40))
+ORS_BURST = int(os.environ.get('ORS_BURST', 20))
+MAPBOX_REQUESTS_PER_MINUTE = float(os.environ.get('MAPBOX_REQUESTS_PER_MINUTE', 300))
+MAPBOX_BURST = int(os.environ.get('MAPBOX_BURST', 30))
+
+# Jumlah kandidat per permintaan saat perencana rute memangkas kandidat
+ROUTE_BATCH_SIZE = int(os.environ.get('ODP_ROUTE_BATCH_SIZE', 20))
+
+# Faktor estimasi jarak jalan dari jarak udara untuk ODP tanpa rute
+ROUTE_FACTOR = 1.3
+
+# Batas waktu total percobaan ulang klien ORS saat server sibuk/gagal (detik);
+# lebih dari ini langsung beralih ke Mapbox agar pencarian tidak tertahan
+ORS_RETRY_TIMEOUT = 2
+
+# Circuit breaker: buka setelah sekian kegagalan berturut-turut, lalu lewati
+# provider selama masa jeda (detik) sebelum mencoba satu permintaan percobaan
+BREAKER_FAILURES = int(os.environ.get('ODP_BREAKER_FAILURES', 5))
+BREAKER_COOLDOWN = float(os.environ.get('ODP_BREAKER_COOLDOWN', 60))
+
+# Latensi terakhir per provider yang dipakai untuk menghitung persentil:
+# paling banyak LATENCY_WINDOW sampel dan tidak lebih tua dari LATENCY_HORIZON detik
+LATENCY_WINDOW = 200
+LATENCY_HORIZON = 300
+
+# Hedge dikirim setelah p95 provider; sebelum ada cukup sampel latensi
+# dipakai jeda default. Jeda tidak pernah lebih pendek dari HEDGE_MIN_DELAY.
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = float(os.environ.get('ODP_HEDGE_DEFAULT_DELAY', 2.0))
+HEDGE_MIN_DELAY = 0.05
+
+
+def chunk_ranges(total, size):
+    """Pasangan (awal, akhir) untuk memotong `total` elemen per `size`."""
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+class TokenBucket:
+    """
+    Pembatas laju token bucket yang aman dipakai banyak thread.
+
+    Token bertambah `rate` per detik hingga `capacity`; setiap permintaan
+    mengambil satu token dan menunggu jika token habis.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """
+        Ambil satu token, tunggu paling lama `timeout` detik.
+
+        Returns:
+            bool: True jika token didapat
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining < wait:
+                    return False
+            time.sleep(wait)
+
+
+class ProviderHealth:
+    """
+    Kesehatan satu provider routing: circuit breaker dan persentil latensi.
+
+    Breaker "tertutup" (normal) menjadi "terbuka" setelah BREAKER_FAILURES
+    kegagalan berturut-turut; jawaban yang lebih lambat dari p95 provider juga
+    dihitung, karena provider yang lambat sama merugikannya dengan yang gagal.
+    Selama masa jeda provider dilewati. Setelah jeda habis breaker "setengah
+    terbuka": satu permintaan percobaan diizinkan, berhasil tepat waktu
+    menutup breaker, gagal atau lambat membukanya lagi.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN,
+                 window=LATENCY_WINDOW):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latencies = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.slow = 0
+        self.hedges = 0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True jika permintaan ke provider boleh dikirim sekarang."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            # Satu percobaan sekaligus; percobaan yang tidak pernah sampai ke
+            # provider (mis. ditolak pembatas laju) kedaluwarsa setelah masa jeda
+            if self.state == self.HALF_OPEN and (
+                    not self._probing or time.monotonic() - self._probe_started >= self.cooldown):
+                self._probing = True
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def record_success(self, latency):
+        """Catat jawaban provider; jawaban di atas p95 dihitung sebagai lambat."""
+        with self._lock:
+            self._expire()
+            slow = len(self.latencies) >= HEDGE_MIN_SAMPLES and latency > self._percentile(95)
+            self.latencies.append((time.monotonic(), latency))
+            self.successes += 1
+            if slow:
+                self.slow += 1
+                self._degraded(f"jawaban lambat ({latency * 1000:.0f}ms)")
+                return
+            if self.state == self.OPEN:
+                # Jawaban terlambat dari permintaan sebelum breaker terbuka
+                return
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit breaker {self.name} tertutup kembali")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._degraded("kegagalan")
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def _degraded(self, reason):
+        """Tambah hitungan gangguan berturut-turut dan buka breaker jika perlu (lock dipegang)."""
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+            logger.warning(f"Circuit breaker {self.name} terbuka setelah {self.consecutive_failures} gangguan "
+                           f"berturut-turut (terakhir: {reason}); dilewati selama {self.cooldown:.0f} detik")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def _expire(self):
+        """Buang sampel latensi yang lebih tua dari LATENCY_HORIZON (lock dipegang)."""
+        cutoff = time.monotonic() - LATENCY_HORIZON
+        while self.latencies and self.latencies[0][0] < cutoff:
+            self.latencies.popleft()
+
+    def _percentile(self, q):
+        return float(np.percentile([latency for _, latency in self.latencies], q))
+
+    def percentile(self, q):
+        """Persentil latensi jawaban (detik), atau None jika belum ada sampel."""
+        with self._lock:
+            self._expire()
+            return self._percentile(q) if self.latencies else None
+
+    def hedge_delay(self):
+        """Lama menunggu jawaban sebelum hedge ke provider berikutnya (detik)."""
+        with self._lock:
+            self._expire()
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return HEDGE_DEFAULT_DELAY
+            return max(self._percentile(95), HEDGE_MIN_DELAY)
+
+    def snapshot(self):
+        """Ringkasan kesehatan untuk /status."""
+        with self._lock:
+            self._expire()
+            remaining = None
+            if self.state == self.OPEN:
+                remaining = max(self.cooldown - (time.monotonic() - self.opened_at), 0.0)
+            return {
+                'name': self.name,
+                'state': self.state,
+                'cooldown_remaining': remaining,
+                'p50': self._percentile(50) if self.latencies else None,
+                'p95': self._percentile(95) if self.latencies else None,
+                'successes': self.successes,
+                'failures': self.failures,
+                'slow': self.slow,
+                'hedges': self.hedges,
+                'samples': len(self.latencies),
+            }
+
+
+class RoutingClient:
+    """
+    Klien routing dengan rantai provider: graf jalan lokal, ORS, lalu Mapbox.
+
+    Jarak yang tidak bisa dihitung oleh provider mana pun bernilai NaN;
+    pemanggil yang menentukan estimasi penggantinya.
+    """
+
+    def __init__(self, ors_api_key=ORS_API_KEY, mapbox_token=MAPBOX_ACCESS_TOKEN,
+                 ors_base_url=ORS_BASE_URL, mapbox_base_url=MAPBOX_BASE_URL, timeout=ROUTE_TIMEOUT,
+                 workers=ROUTE_WORKERS, road_graph=None, providers=ROUTE_PROVIDERS):
+        self.timeout = timeout
+        self.road_graph = road_graph
+        self.provider_order = list(providers)
+        self.mapbox_token = mapbox_token
+        self.mapbox_base_url = mapbox_base_url.rstrip('/')
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='odp-route')
+        # Pool per provider untuk directions/isochrone (termasuk hedge): permintaan
+        # yang macet di satu provider tidak menghabiskan thread provider lain
+        self.provider_executors = {name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'odp-{name}')
+                                   for name in ('local', 'ors', 'mapbox')}
+        self.health = {name: ProviderHealth(name) for name in ('local', 'ors', 'mapbox')}
+        self.limits = {
+            'ors': TokenBucket(ORS_REQUESTS_PER_MINUTE / 60.0, ORS_BURST),
+            'mapbox': TokenBucket(MAPBOX_REQUESTS_PER_MINUTE / 60.0, MAPBOX_BURST),
+        }
+
+        # Session keep-alive dengan pool koneksi sebesar jumlah worker
+        self.session = _pooled_session(workers)
+
+        # ORS publik butuh API key; server ORS sendiri (base URL lain) tidak
+        self.ors_client = None
+        if ors_api_key or ors_base_url != 'https://api.openrouteservice.org':
+            try:
+                self.ors_client = ors.Client(key=ors_api_key, base_url=ors_base_url,
+                                             timeout=timeout, retry_timeout=ORS_RETRY_TIMEOUT,
+                                             retry_over_query_limit=False)
+                # Klien ORS membuat session sendiri; ganti dengan session ber-pool
+                self.ors_client._session = _pooled_session(workers)
+                logger.info("Berhasil inisialisasi OpenRouteService API")
+            except Exception as e:
+                logger.error(f"Gagal inisialisasi OpenRouteService API: {e}")
+        else:
+            logger.warning("OPENROUTESERVICE_API_KEY tidak ditemukan dalam environment variables")
+
+        if mapbox_token:
+            logger.info("Mapbox Access Token tersedia dan akan digunakan sebagai alternatif jika diperlukan")
+        else:
+            logger.warning("MAPBOX_ACCESS_TOKEN tidak ditemukan dalam environment variables")
+
+        if road_graph is not None:
+            logger.info(f"Graf jalan lokal aktif: {len(road_graph)} simpul, {road_graph.edge_count} ruas")
+        logger.info(f"Urutan provider routing: {', '.join(self.providers) or '-'}")
+
+    @property
+    def providers(self):
+        """Nama provider yang tersedia, sesuai urutan ODP_ROUTE_PROVIDERS."""
+        configured = {
+            'local': self.road_graph is not None,
+            'ors': self.ors_client is not None,
+            'mapbox': bool(self.mapbox_token),
+        }
+        return [name for name in self.provider_order if configured.get(name)]
+
+    @property
+    def available(self):
+        """True jika setidaknya satu provider routing tersedia."""
+        return bool(self.providers)
+
+    def run_concurrent(self, func, *iterables):
+        """
+        Jalankan `func` untuk setiap elemen secara bersamaan di thread pool routing.
+
+        Returns:
+            list hasil dengan urutan sama seperti input
+        """
+        return list(self.executor.map(func, *iterables))
+
+    def _acquire(self, provider):
+        """Ambil token laju provider; False jika kuota habis melebihi timeout."""
+        if self.limits[provider].acquire(timeout=self.timeout):
+            return True
+        logger.warning(f"Batas laju {provider} tercapai, permintaan dilewati")
+        return False
+
+    @contextmanager
+    def _track(self, provider):
+        """Catat latensi dan keberhasilan satu permintaan ke provider."""
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if _is_provider_fault(e):
+                self.health[provider].record_failure()
+            else:
+                # Provider menjawab, tetapi permintaannya tidak bisa dilayani (mis. tidak ada rute)
+                self.health[provider].record_success(time.monotonic() - started)
+            raise
+        self.health[provider].record_success(time.monotonic() - started)
+
+    def health_report(self):
+        """Kesehatan provider yang tersedia, sesuai urutan rantai provider."""
+        return [self.health[name].snapshot() for name in self.providers]
+
+    def _first_result(self, attempts):
+        """
+        Jalankan percobaan provider berurutan dengan hedge dan circuit breaker.
+
+        Percobaan berikutnya dimulai saat percobaan sebelumnya gagal, atau
+        (hedge) saat percobaan yang sedang berjalan belum menjawab dalam p95
+        provider-nya. Jawaban valid pertama yang dipakai; permintaan lain
+        dibiarkan selesai di latar belakang agar latensinya tetap tercatat.
+
+        Args:
+            attempts: list (provider, fungsi tanpa argumen -> hasil atau None)
+
+        Returns:
+            tuple: (provider, hasil) atau (None, None) jika semua gagal
+        """
+        queue = list(attempts)
+        pending = {}
+        deadline = None
+
+        while queue or pending:
+            if queue and (not pending or time.monotonic() >= deadline):
+                provider, func = queue.pop(0)
+                if not self.health[provider].allow():
+                    logger.info(f"Circuit breaker {provider} terbuka, provider dilewati")
+                    continue
+                if pending:
+                    self.health[provider].record_hedge()
+                    waiting = ", ".join(pending.values())
+                    logger.info(f"{waiting} belum menjawab dalam p95, hedge ke {provider}")
+                pending[self.provider_executors[provider].submit(func)] = provider
+                deadline = time.monotonic() + self.health[provider].hedge_delay()
+                continue
+
+            timeout = max(deadline - time.monotonic(), 0.0) if queue else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                result = future.result()
+                if result is not None:
+                    return provider, result
+
+        return None, None
+
+    def matrix_distances(self, ref_lat, ref_lng, dest_lats, dest_lngs, radius_meters=None):
+        """
+        Jarak jalan dari titik referensi ke banyak tujuan dengan permintaan matriks.
+
+        Args:
+            ref_lat: Latitude titik referensi
+            ref_lng: Longitude titik referensi
+            dest_lats: Array latitude tujuan
+            dest_lngs: Array longitude tujuan
+            radius_meters: Radius pencarian pemanggil; membatasi penjelajahan graf
+                jalan lokal (lihat _local_limit). None = batas bawaan graf
+
+        Returns:
+            np.ndarray jarak dalam meter (NaN jika tidak ada rute)
+        """
+        dest_lats = np.asarray(dest_lats, dtype=np.float64)
+        dest_lngs = np.asarray(dest_lngs, dtype=np.float64)
+        distances = np.full(len(dest_lats), np.nan)
+        if not len(distances):
+            return distances
+
+        # Tujuan yang belum punya jarak dikirim ke rantai provider dengan hedge;
+        # tujuan tanpa rute dari provider pemenang diteruskan ke provider sesudahnya
+        remaining = self.providers
+        missing = np.arange(len(distances))
+        while remaining and len(missing):
+            attempts = [(provider, lambda provider=provider, missing=missing: self._matrix_attempt(
+                            provider, ref_lat, ref_lng, dest_lats[missing], dest_lngs[missing], radius_meters))
+                        for provider in remaining]
+            provider, row = self._first_result(attempts)
+            if provider is None:
+                break
+            distances[missing] = row
+            remaining = remaining[remaining.index(provider) + 1:]
+            missing = np.flatnonzero(np.isnan(distances))
+
+        found = int(np.count_nonzero(~np.isnan(distances)))
+        logger.info(f"Matriks jarak rute: {found} dari {len(distances)} tujuan memiliki rute")
+        return distances
+
+    def _matrix_attempt(self, provider, ref_lat, ref_lng, dest_lats, dest_lngs, radius_meters=None):
+        """Jarak dari satu provider untuk semua tujuan, atau None jika tidak ada satu pun rute."""
+        if provider == 'local':
+            distances = self._local_matrix(ref_lat, ref_lng, dest_lats, dest_lngs, radius_meters)
+        elif provider == 'ors':
+            distances = self._chunked_matrix(self._ors_matrix, ORS_MATRIX_MAX_DESTINATIONS,
+                                             ref_lat, ref_lng, dest_lats, dest_lngs)
+        else:
+            distances = self._chunked_matrix(self._mapbox_matrix, MAPBOX_MATRIX_MAX_DESTINATIONS,
+                                             ref_lat, ref_lng, dest_lats, dest_lngs)
+        return None if np.isnan(distances).all() else distances
+
+    def _chunked_matrix(self, request, max_destinations, ref_lat, ref_lng, dest_lats, dest_lngs):
+        """Kirim potongan matriks sebuah provider secara bersamaan dan gabungkan hasilnya."""
+        chunks = [slice(start, end) for start, end in chunk_ranges(len(dest_lats), max_destinations)]
+        rows = self.run_concurrent(
+            lambda chunk: request(ref_lat, ref_lng, dest_lats[chunk], dest_lngs[chunk]), chunks)
+        return np.concatenate(rows)
+
+    @staticmethod
+    def _local_limit(radius_meters):
+        """Batas Dijkstra graf jalan lokal: radius pencarian + ROAD_GRAPH_SEARCH_MARGIN."""
+        return None if radius_meters is None else radius_meters + ROAD_GRAPH_SEARCH_MARGIN
+
+    def _local_matrix(self, ref_lat, ref_lng, dest_lats, dest_lngs, radius_meters=None):
+        try:
+            with self._track('local'):
+                return self.road_graph.distances_from(ref_lat, ref_lng, dest_lats, dest_lngs,
+                                                      max_meters=self._local_limit(radius_meters))[0]
+        except Exception as e:
+            logger.error(f"Error graf jalan lokal: {e}. Mencoba alternatif...")
+            return np.full(len(dest_lats), np.nan)
+
+    def _ors_matrix(self, ref_lat, ref_lng, dest_lats, dest_lngs):
+        locations = [[ref_lng, ref_lat]] + [[lng, lat] for lat, lng in zip(dest_lats.tolist(), dest_lngs.tolist())]
+        if not self._acquire('ors'):
+            return np.full(len(dest_lats), np.nan)
+        try:
+            with self._track('ors'):
+                result = self.ors_client.distance_matrix(
+                    locations=locations,
+                    profile=ORS_PROFILE,
+                    sources=[0],
+                    destinations=list(range(1, len(locations))),
+                    metrics=['distance'],
+                    units='m'
+                )
+            return _matrix_row(result.get('distances'), len(dest_lats))
+        except Exception as e:
+            logger.warning(f"Error OpenRouteService matrix API: {e}. Mencoba alternatif...")
+            return np.full(len(dest_lats), np.nan)
+
+    def _mapbox_matrix(self, ref_lat, ref_lng, dest_lats, dest_lngs):
+        coordinates = ";".join([f"{ref_lng},{ref_lat}"] +
+                               [f"{lng},{lat}" for lat, lng in zip(dest_lats.tolist(), dest_lngs.tolist())])
+        url = f"{self.mapbox_base_url}/directions-matrix/v1/{MAPBOX_PROFILE}/{coordinates}"
+        params = {
+            "access_token": self.mapbox_token,
+            "sources": "0",
+            "destinations": ";".join(str(i) for i in range(1, len(dest_lats) + 1)),
+            "annotations": "distance",
+        }
+        if not self._acquire('mapbox'):
+            return np.full(len(dest_lats), np.nan)
+        try:
+            with self._track('mapbox'):
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                response.raise_for_status()
+            data = response.json()
+            if data.get('code', 'Ok') != 'Ok':
+                logger.warning(f"Mapbox matrix API: {data.get('code')} {data.get('message', '')}")
+                return np.full(len(dest_lats), np.nan)
+            return _matrix_row(data.get('distances'), len(dest_lats))
+        except Exception as e:
+            logger.warning(f"Error Mapbox matrix API: {e}")
+            return np.full(len(dest_lats), np.nan)
+
+    def snap_points(self, lats, lngs, max_meters=SNAP_MAX_METERS):
+        """
+        Titik terdekat di jaringan jalan untuk banyak titik sekaligus.
+
+        Graf jalan lokal dipakai lebih dulu; titik yang tidak terjangkau graf
+        dikirim ke API snap ORS per potongan. Mapbox tidak punya API snap massal.
+
+        Returns:
+            tuple: (lats, lngs, jarak_meter) berupa np.ndarray; NaN jika tidak ada jalan
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        snapped = np.full((len(lats), 3), np.nan)
+
+        for provider in self.providers:
+            missing = np.flatnonzero(np.isnan(snapped[:, 2]))
+            if not len(missing):
+                break
+            if provider == 'local':
+                try:
+                    with self._track('local'):
+                        snapped[missing] = np.column_stack(
+                            self.road_graph.snap_points(lats[missing], lngs[missing], max_meters))
+                except Exception as e:
+                    logger.error(f"Error snap graf jalan lokal: {e}. Mencoba alternatif...")
+            elif provider == 'ors' and self.health['ors'].allow():
+                chunks = [missing[start:end] for start, end in chunk_ranges(len(missing), ORS_SNAP_MAX_LOCATIONS)]
+                results = self.run_concurrent(
+                    lambda chunk: self._ors_snap(lats[chunk], lngs[chunk], max_meters), chunks)
+                for chunk, result in zip(chunks, results):
+                    snapped[chunk] = result
+
+        found = int(np.count_nonzero(~np.isnan(snapped[:, 2])))
+        logger.info(f"Snap ke jalan: {found} dari {len(snapped)} titik")
+        return snapped[:, 0], snapped[:, 1], snapped[:, 2]
+
+    def _ors_snap(self, lats, lngs, max_meters):
+        result = np.full((len(lats), 3), np.nan)
+        if not self._acquire('ors'):
+            return result
+        try:
+            body = {"locations": [[lng, lat] for lat, lng in zip(lats.tolist(), lngs.tolist())],
+                    "radius": max_meters}
+            with self._track('ors'):
+                data = self.ors_client.request(f"/v2/snap/{ORS_PROFILE}/json", {}, post_json=body)
+            for i, item in enumerate((data or {}).get('locations') or []):
+                if i < len(result) and item and item.get('location'):
+                    lng, lat = item['location'][:2]
+                    offset = item.get('snapped_distance')
+                    if offset is None:
+                        offset = float(haversine_meters(lats[i], lngs[i], lat, lng))
+                    result[i] = (lat, lng, offset)
+        except Exception as e:
+            logger.warning(f"Error OpenRouteService snap API: {e}")
+        return result
+
+    def directions(self, ref_lat, ref_lng, dest_lat, dest_lng, radius_meters=None):
+        """
+        Rute lengkap (jarak dan geometri) dari titik referensi ke satu tujuan.
+
+        Args:
+            radius_meters: Radius pencarian pemanggil untuk membatasi graf jalan lokal
+
+        Returns:
+            tuple: (jarak_meter, koordinat_rute) atau (None, None) jika gagal
+        """
+        methods = {'local': lambda *args: self._local_directions(*args, radius_meters=radius_meters),
+                   'ors': self._ors_directions, 'mapbox': self._mapbox_directions}
+        attempts = [(provider, lambda method=methods[provider]: _found(method(ref_lat, ref_lng, dest_lat, dest_lng)))
+                    for provider in self.providers if provider in methods]
+        _, route = self._first_result(attempts)
+        return route if route is not None else (None, None)
+
+    def _local_directions(self, ref_lat, ref_lng, dest_lat, dest_lng, radius_meters=None):
+        try:
+            with self._track('local'):
+                distance, coords = self.road_graph.route(ref_lat, ref_lng, dest_lat, dest_lng,
+                                                         max_meters=self._local_limit(radius_meters))
+        except Exception as e:
+            logger.error(f"Error graf jalan lokal: {e}. Mencoba alternatif...")
+            return None, None
+        if distance is None:
+            logger.info("Graf jalan lokal tidak menemukan rute. Mencoba alternatif...")
+            return None, None
+        logger.info(f"Menggunakan graf jalan lokal dengan jarak {distance:.1f}m")
+        return distance, coords
+
+    def _ors_directions(self, ref_lat, ref_lng, dest_lat, dest_lng):
+        if not self._acquire('ors'):
+            return None, None
+        try:
+            with self._track('ors'):
+                routes = self.ors_client.directions(
+                    coordinates=[[ref_lng, ref_lat], [dest_lng, dest_lat]],
+                    profile=ORS_PROFILE,
+                    format='geojson',
+                    preference='shortest',  # Gunakan rute terpendek (bukan tercepat)
+                    instructions=False,
+                    geometry=True
+                )
+            if routes and routes.get('features'):
+                route = routes['features'][0]
+                distance = route['properties']['summary']['distance']
+                logger.info(f"Menggunakan OpenRouteService API dengan jarak {distance:.1f}m")
+                return distance, route['geometry']['coordinates']
+            logger.warning("OpenRouteService API tidak mengembalikan rute valid")
+        except Exception as e:
+            logger.warning(f"Error OpenRouteService API: {e}. Mencoba alternatif...")
+        return None, None
+
+    def _mapbox_directions(self, ref_lat, ref_lng, dest_lat, dest_lng):
+        if not self._acquire('mapbox'):
+            return None, None
+        try:
+            url = f"{self.mapbox_base_url}/directions/v5/{MAPBOX_PROFILE}/{ref_lng},{ref_lat};{dest_lng},{dest_lat}"
+            params = {"access_token": self.mapbox_token, "geometries": "geojson", "overview": "full"}
+            with self._track('mapbox'):
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                response.raise_for_status()
+            data = response.json()
+            if data.get('routes'):
+                route = data['routes'][0]
+                distance = route['distance']
+                logger.info(f"Menggunakan Mapbox API dengan jarak {distance:.1f}m")
+                return distance, route['geometry']['coordinates']
+            logger.warning("Mapbox API tidak mengembalikan rute valid")
+        except Exception as e:
+            logger.warning(f"Error Mapbox API: {e}")
+        return None, None
+
+    def isochrone(self, ref_lat, ref_lng, distance_meters):
+        """
+        Wilayah yang terjangkau dari titik referensi dalam jarak jalan tertentu.
+
+        Returns:
+            list poligon ring [lng, lat] (lihat odp_isochrone), atau None jika gagal
+        """
+        methods = {'local': self._local_isochrone, 'ors': self._ors_isochrone, 'mapbox': self._mapbox_isochrone}
+        attempts = [(provider, lambda method=methods[provider]: method(ref_lat, ref_lng, distance_meters) or None)
+                    for provider in self.providers if provider in methods]
+        provider, region = self._first_result(attempts)
+        if region is not None:
+            logger.info(f"Isochrone {distance_meters}m dari {provider}: {len(region)} poligon")
+        return region
+
+    def _local_isochrone(self, ref_lat, ref_lng, distance_meters):
+        try:
+            with self._track('local'):
+                lats, lngs = self.road_graph.reachable_points(ref_lat, ref_lng, distance_meters)
+                return region_from_points(ref_lat, ref_lng, lats, lngs, distance_meters)
+        except Exception as e:
+            logger.error(f"Error isochrone graf jalan lokal: {e}. Mencoba alternatif...")
+            return None
+
+    def _ors_isochrone(self, ref_lat, ref_lng, distance_meters):
+        if not self._acquire('ors'):
+            return None
+        try:
+            with self._track('ors'):
+                result = self.ors_client.isochrones(
+                    locations=[[ref_lng, ref_lat]],
+                    profile=ORS_PROFILE,
+                    range_type='distance',
+                    range=[distance_meters],
+                    units='m'
+                )
+            features = result.get('features') if result else None
+            if features:
+                return geometry_polygons(features[0].get('geometry'))
+            logger.warning("OpenRouteService isochrone API tidak mengembalikan wilayah")
+        except Exception as e:
+            logger.warning(f"Error OpenRouteService isochrone API: {e}. Mencoba alternatif...")
+        return None
+
+    def _mapbox_isochrone(self, ref_lat, ref_lng, distance_meters):
+        if not self._acquire('mapbox'):
+            return None
+        try:
+            url = f"{self.mapbox_base_url}/isochrone/v1/{MAPBOX_PROFILE}/{ref_lng},{ref_lat}"
+            params = {"access_token": self.mapbox_token, "contours_meters": int(round(distance_meters)),
+                      "polygons": "true"}
+            with self._track('mapbox'):
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                response.raise_for_status()
+            features = response.json().get('features')
+            if features:
+                return geometry_polygons(features[0].get('geometry'))
+            logger.warning("Mapbox isochrone API tidak mengembalikan wilayah")
+        except Exception as e:
+            logger.warning(f"Error Mapbox isochrone API: {e}")
+        return None
+
+
+def _pooled_session(pool_size):
+    """Session requests dengan pool koneksi keep-alive sebesar `pool_size` per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _found(route):
+    """Hasil directions sebagai tuple, atau None jika tidak ada rute."""
+    return route if route[0] is not None else None
+
+
+def _is_provider_fault(error):
+    """
+    True jika error menandakan provider bermasalah (timeout, koneksi, 5xx, 429),
+    bukan permintaan yang memang tidak bisa dilayani (4xx lain, mis. tidak ada rute).
+    """
+    status = getattr(error, 'status', None)
+    if status is None:
+        status = getattr(error, 'status_code', None)
+    response = getattr(error, 'response', None)
+    if status is None and response is not None:
+        status = response.status_code
+    return not isinstance(status, int) or status >= 500 or status == 429
+
+
+def _matrix_row(distances, expected):
+    """Baris pertama matriks jarak sebagai array float (None menjadi NaN)."""
+    if not distances or len(distances[0]) != expected:
+        logger.warning("Respons matriks jarak tidak sesuai jumlah tujuan")
+        return np.full(expected, np.nan)
+    return np.array([np.nan if d is None else d for d in distances[0]], dtype=np.float64)
+
+
+def settle_top_routes(aerial, road, routed, top_n, fetch, batch_size=ROUTE_BATCH_SIZE, factor=ROUTE_FACTOR,
+                      slack=0.0):
+    """
+    Minta rute hanya sampai N ODP terdekat menurut jarak jalan sudah pasti.
+
+    Jarak udara dikurangi slack adalah batas bawah jarak jalan. Kandidat
+    dirutekan berurutan menurut jarak udara per batch; begitu jarak tampil
+    ke-N terbaik tidak lebih besar dari batas bawah kandidat berikutnya yang
+    belum dirutekan, tidak ada kandidat tersisa yang bisa masuk N besar,
+    sehingga berhenti. Baris yang rutenya gagal memakai estimasi jarak
+    udara * factor.
+
+    Args:
+        aerial: Array jarak udara (meter)
+        road: Array jarak jalan yang sudah diketahui (NaN jika belum/gagal)
+        routed: Array bool, True jika baris sudah dirutekan (termasuk dari cache)
+        top_n: Jumlah ODP terdekat yang harus pasti (None = rutekan semua)
+        fetch: fungsi(posisi) -> array jarak jalan (NaN jika gagal)
+        batch_size: Jumlah kandidat per permintaan
+        factor: Faktor estimasi jarak jalan untuk rute yang gagal
+        slack: Galat maksimal jarak jalan di bawah jarak sebenarnya (meter), misalnya
+               error_bound_meters grid kuantisasi cache rute
+
+    Returns:
+        tuple (road, routed) yang sudah diperbarui
+    """
+    aerial = np.asarray(aerial, dtype=np.float64)
+    road = np.array(road, dtype=np.float64)
+    routed = np.array(routed, dtype=bool)
+    order = np.argsort(aerial, kind='stable')
+    requested = 0
+
+    while True:
+        pending = order[~routed[order]]
+        if not len(pending):
+            break
+
+        if top_n is not None and np.count_nonzero(routed) >= top_n:
+            settled = np.where(np.isnan(road), aerial * factor, road)[routed]
+            kth = np.partition(settled, top_n - 1)[top_n - 1]
+            if aerial[pending[0]] - slack >= kth:
+                break
+
+        batch = pending[:batch_size] if top_n is not None else pending
+        road[batch] = fetch(batch)
+        routed[batch] = True
+        requested += len(batch)
+
+    skipped = int(np.count_nonzero(~routed))
+    if requested or skipped:
+        logger.info(f"Perencana rute: {requested} ODP dirutekan, {skipped} dilewati "
+                    f"(tidak dapat masuk {top_n} terdekat)")
+    return road, routed
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Snapshot biner dataset ODP di disk.
+
+Dataset terakhir yang berhasil dimuat disimpan sebagai array kolom NumPy
+(.npy) beserta header.json berisi versi skema, jumlah baris, sumber data
+dan validator HTTP. Saat bot dijalankan ulang, snapshot di-memory-map
+sehingga pencarian bisa langsung dilayani tanpa menunggu unduhan CSV,
+sementara refresh dari spreadsheet berjalan di latar belakang.
+
+Struktur direktori snapshot:
+
+    <snapshot_dir>/CURRENT          nama versi aktif
+    <snapshot_dir>/v<ns>/header.json
+    <snapshot_dir>/v<ns>/c<i>.*.npy  array per kolom
+    <snapshot_dir>/v<ns>/hashes.npy  hash isi per baris (untuk diff refresh)
+
+Setiap penyimpanan menulis direktori versi baru lalu mengganti CURRENT
+secara atomik, sehingga pembaca tidak pernah melihat snapshot setengah jadi.
+
+Snapshot yang sama juga menjadi penyimpanan bersama antarproses (bot
+Telegram, app.py, search_odp.py --server): setiap proses memetakan file
+yang sama secara read-only, dan setelah refresh menulis versi baru, proses
+lain cukup memetakan ulang versi yang ditunjuk CURRENT.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+from odp_dataset import PreparedDataset, row_hashes, LAT_COLUMN, LNG_COLUMN
+from odp_spatial_index import SpatialIndex, DEFAULT_CELL_METERS
+
+logger = logging.getLogger(__name__)
+
+# Direktori dasar snapshot (bisa diatur lewat environment)
+DEFAULT_SNAPSHOT_DIR = os.environ.get('ODP_SNAPSHOT_DIR', 'data/odp_snapshot')
+
+# Identitas dan versi format snapshot; naikkan versi jika tata letak berubah
+SNAPSHOT_FORMAT = "odp-snapshot"
+SNAPSHOT_SCHEMA_VERSION = 2
+
+# Jumlah versi lama yang tetap disimpan (pembaca lain mungkin masih memetakannya)
+KEEP_VERSIONS = 2
+
+HEADER_FILE = "header.json"
+CURRENT_FILE = "CURRENT"
+HASHES_FILE = "hashes.npy"
+
+# Jenis kolom dalam snapshot
+KIND_FLOAT = "float"        # values float32/float64, NaN = kosong
+KIND_INT = "int"            # values int8..int64 + mask kosong
+KIND_STRING = "string"      # tabel string: bytes UTF-8 + offsets + mask kosong
+KIND_CATEGORY = "category"  # codes (-1 = kosong) + tabel string kategori
+
+# File array per jenis kolom, dan file yang panjangnya sama dengan jumlah baris
+KIND_PARTS = {
+    KIND_FLOAT: ("values",),
+    KIND_INT: ("values", "mask"),
+    KIND_STRING: ("data", "offsets", "mask"),
+    KIND_CATEGORY: ("codes", "data", "offsets"),
+}
+ROW_PART = {KIND_FLOAT: "values", KIND_INT: "mask", KIND_STRING: "mask", KIND_CATEGORY: "codes"}
+
+
+class Snapshot:
+    """
+    Snapshot yang di-memory-map dari disk (struct-of-arrays read-only).
+
+    Kolom angka dibaca langsung dari file yang di-memory-map sehingga
+    beberapa proses yang membuka snapshot yang sama berbagi halaman memori
+    yang sama. Kolom teks (tabel string) hanya di-decode untuk baris yang
+    diminta lewat take(); DataFrame penuh baru dibangun jika frame diakses.
+    """
+
+    def __init__(self, path, header, arrays, hashes=None):
+        self.path = path
+        self.header = header
+        self.columns = [column["name"] for column in header["columns"]]
+        self.dtypes = {column["name"]: column["dtype"] for column in header["columns"]}
+        self.kinds = {column["name"]: column["kind"] for column in header["columns"]}
+        self.arrays = arrays
+        self.lats = arrays[LAT_COLUMN]["values"]
+        self.lngs = arrays[LNG_COLUMN]["values"]
+        self.hashes = hashes
+        self._frame = None
+        self._categories = {}
+
+    def __len__(self):
+        return self.header["rows"]
+
+    @property
+    def created_at(self):
+        return self.header.get("created_at")
+
+    @property
+    def validators(self):
+        return self.header.get("validators") or {}
+
+    @property
+    def frame(self):
+        """DataFrame penuh (dibangun sekali saat pertama kali diakses)."""
+        if self._frame is None:
+            self._frame = self.take(slice(None))
+        return self._frame
+
+    def categories(self, name):
+        """Daftar kategori kolom categorical (di-decode sekali)."""
+        if name not in self._categories:
+            arrays = self.arrays[name]
+            count = len(arrays["offsets"]) - 1
+            self._categories[name] = _decode_strings(arrays["data"], arrays["offsets"], np.arange(count),
+                                                     np.zeros(count, dtype=bool))
+        return self._categories[name]
+
+    def numeric(self, name):
+        """Kolom angka sebagai array float (NaN = kosong)."""
+        arrays = self.arrays[name]
+        if self.kinds[name] == KIND_FLOAT:
+            return arrays["values"]
+        values = arrays["values"].astype(np.float64)
+        values[arrays["mask"]] = np.nan
+        return values
+
+    def row_hashes(self):
+        """Hash isi setiap baris; snapshot tanpa hashes.npy dihitung dari kolomnya."""
+        if self.hashes is not None:
+            return self.hashes
+        return row_hashes(self.take(slice(None)))
+
+    def take(self, positions, columns=None):
+        """
+        Ambil baris pada posisi tertentu sebagai DataFrame baru.
+
+        Args:
+            positions: Array posisi baris atau slice
+            columns: Kolom yang diambil (default: semua kolom)
+
+        Returns:
+            DataFrame berindeks sesuai posisi baris
+        """
+        index = np.arange(len(self))[positions]
+        data = {}
+        for name in columns or self.columns:
+            arrays = self.arrays[name]
+            kind = self.kinds[name]
+
+            if kind == KIND_FLOAT:
+                series = pd.Series(np.array(arrays["values"][positions]), index=index)
+            elif kind == KIND_INT:
+                series = pd.Series(pd.arrays.IntegerArray(np.array(arrays["values"][positions]),
+                                                          np.array(arrays["mask"][positions])), index=index)
+            elif kind == KIND_CATEGORY:
+                series = pd.Series(pd.Categorical.from_codes(np.array(arrays["codes"][positions]),
+                                                             categories=self.categories(name)), index=index)
+            else:
+                strings = _decode_strings(arrays["data"], arrays["offsets"], index, arrays["mask"])
+                series = pd.Series(strings, index=index, dtype=object)
+
+            # Kembalikan dtype asli agar snapshot bisa dibandingkan dengan data baru
+            if self.dtypes[name] != str(series.dtype):
+                series = series.astype(self.dtypes[name])
+            data[name] = series
+
+        return pd.DataFrame(data, index=index, columns=columns or self.columns)
+
+    def to_dataset(self, cell_meters=DEFAULT_CELL_METERS, index=None):
+        """
+        Bangun PreparedDataset di atas snapshot ini tanpa menyalin kolom.
+
+        Args:
+            cell_meters: Ukuran sel grid indeks spasial dalam meter
+            index: Indeks yang sudah sesuai dengan baris snapshot (default: dibangun dari koordinatnya)
+        """
+        if index is None:
+            index = SpatialIndex(self.lats, self.lngs, cell_meters=cell_meters)
+        return PreparedDataset(None, index, store=self)
+
+
+def snapshot_dir_for(csv_url, base_dir=DEFAULT_SNAPSHOT_DIR, layout=""):
+    """Direktori snapshot untuk satu sumber CSV (dipisah per URL dan tata letak kolom agar tidak tercampur)."""
+    key = hashlib.sha1(f"{csv_url}|{layout}".encode('utf-8')).hexdigest()[:12]
+    return os.path.join(base_dir, key)
+
+
+def _encode_strings(series):
+    """Encode kolom teks menjadi tabel string (bytes UTF-8, offsets, mask kosong)."""
+    mask = series.isna().to_numpy()
+    encoded = [b"" if missing else str(value).encode('utf-8')
+               for value, missing in zip(series.tolist(), mask)]
+
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets, mask
+
+
+def _decode_strings(data, offsets, positions, mask):
+    """Decode tabel string hanya untuk posisi tertentu; nilai kosong menjadi None."""
+    starts = offsets[positions].tolist()
+    ends = offsets[positions + 1].tolist()
+    missing = mask[positions].tolist()
+    raw = memoryview(data)
+    return [None if skip else str(raw[start:end], 'utf-8')
+            for start, end, skip in zip(starts, ends, missing)]
+
+
+def _column_kind(series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return KIND_CATEGORY
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return KIND_INT
+    if pd.api.types.is_float_dtype(dtype):
+        return KIND_FLOAT
+    return KIND_STRING
+
+
+def _values_dtype(dtype):
+    """dtype NumPy untuk menyimpan kolom angka tanpa memperlebar tipenya."""
+    values_dtype = np.dtype(getattr(dtype, 'numpy_dtype', dtype))
+    return np.dtype(np.int8) if values_dtype.kind == 'b' else values_dtype
+
+
+def write_snapshot(snapshot_dir, frame, source=None, validators=None):
+    """
+    Simpan frame hasil prepare sebagai snapshot versi baru.
+
+    Args:
+        snapshot_dir: Direktori snapshot untuk satu sumber data
+        frame: DataFrame hasil prepare_frame() (hanya baris yang berlaku)
+        source: URL sumber data (dicatat di header)
+        validators: Dict etag / last_modified / content_hash dari fetch terakhir
+
+    Returns:
+        Path direktori versi yang baru ditulis
+    """
+    frame = frame.reset_index(drop=True)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    version_name = f"v{time.time_ns()}"
+    tmp_path = os.path.join(snapshot_dir, f".{version_name}.tmp")
+    os.makedirs(tmp_path)
+
+    try:
+        columns = []
+        for i, name in enumerate(frame.columns):
+            series = frame[name]
+            kind = _column_kind(series)
+            prefix = os.path.join(tmp_path, f"c{i}")
+
+            if kind == KIND_FLOAT:
+                np.save(f"{prefix}.values.npy", series.to_numpy(dtype=_values_dtype(series.dtype), na_value=np.nan))
+            elif kind == KIND_INT:
+                mask = series.isna().to_numpy()
+                np.save(f"{prefix}.values.npy", series.to_numpy(dtype=_values_dtype(series.dtype), na_value=0))
+                np.save(f"{prefix}.mask.npy", mask)
+            elif kind == KIND_CATEGORY:
+                data, offsets, _ = _encode_strings(pd.Series(series.cat.categories, dtype=object))
+                np.save(f"{prefix}.codes.npy", series.cat.codes.to_numpy())
+                np.save(f"{prefix}.data.npy", data)
+                np.save(f"{prefix}.offsets.npy", offsets)
+            else:
+                data, offsets, mask = _encode_strings(series)
+                np.save(f"{prefix}.data.npy", data)
+                np.save(f"{prefix}.offsets.npy", offsets)
+                np.save(f"{prefix}.mask.npy", mask)
+
+            columns.append({"name": name, "kind": kind, "dtype": str(series.dtype)})
+
+        np.save(os.path.join(tmp_path, HASHES_FILE), row_hashes(frame))
+
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "schema_version": SNAPSHOT_SCHEMA_VERSION,
+            "created_at": time.time(),
+            "rows": len(frame),
+            "source": source,
+            "validators": validators or {},
+            "columns": columns,
+        }
+        with open(os.path.join(tmp_path, HEADER_FILE), 'w', encoding='utf-8') as f:
+            json.dump(header, f, ensure_ascii=False, indent=1)
+
+        version_path = os.path.join(snapshot_dir, version_name)
+        os.rename(tmp_path, version_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    # Ganti penunjuk versi aktif secara atomik
+    current_tmp = os.path.join(snapshot_dir, f".{CURRENT_FILE}.tmp")
+    with open(current_tmp, 'w') as f:
+        f.write(version_name)
+    os.replace(current_tmp, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    _prune_versions(snapshot_dir, version_name)
+    logger.info(f"Snapshot ODP disimpan: {len(frame)} baris di {version_path}")
+    return version_path
+
+
+def _prune_versions(snapshot_dir, current_name):
+    versions = sorted(name for name in os.listdir(snapshot_dir)
+                      if name.startswith('v') and name != current_name)
+    for name in versions[:max(len(versions) - (KEEP_VERSIONS - 1), 0)]:
+        shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+
+def current_snapshot_path(snapshot_dir):
+    """Path direktori versi aktif, atau None jika belum ada snapshot."""
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            version_name = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(snapshot_dir, version_name)
+    return path if os.path.isdir(path) else None
+
+
+def read_snapshot(snapshot_dir, required_columns=(LAT_COLUMN, LNG_COLUMN)):
+    """
+    Baca snapshot aktif dengan memory-map.
+
+    Args:
+        snapshot_dir: Direktori snapshot untuk satu sumber data
+        required_columns: Kolom yang wajib ada di snapshot
+
+    Returns:
+        Snapshot, atau None jika tidak ada snapshot atau formatnya tidak cocok
+    """
+    path = current_snapshot_path(snapshot_dir)
+    if path is None:
+        return None
+
+    try:
+        with open(os.path.join(path, HEADER_FILE), encoding='utf-8') as f:
+            header = json.load(f)
+
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("schema_version") != SNAPSHOT_SCHEMA_VERSION:
+            logger.warning(f"Snapshot {path} memakai format yang tidak didukung, diabaikan")
+            return None
+
+        names = [column["name"] for column in header["columns"]]
+        for col in required_columns:
+            if col not in names:
+                logger.warning(f"Kolom {col} tidak ada di snapshot {path}, diabaikan")
+                return None
+
+        arrays = {}
+        for i, column in enumerate(header["columns"]):
+            prefix = os.path.join(path, f"c{i}")
+            parts = KIND_PARTS[column["kind"]]
+            arrays[column["name"]] = {part: np.load(f"{prefix}.{part}.npy", mmap_mode='r') for part in parts}
+
+            if len(arrays[column["name"]][ROW_PART[column["kind"]]]) != header["rows"]:
+                logger.warning(f"Jumlah baris snapshot {path} tidak sesuai header, diabaikan")
+                return None
+
+        # Snapshot yang ditulis sebelum ada hashes.npy tetap bisa dibaca
+        hashes_path = os.path.join(path, HASHES_FILE)
+        hashes = np.load(hashes_path, mmap_mode='r') if os.path.exists(hashes_path) else None
+        if hashes is not None and len(hashes) != header["rows"]:
+            hashes = None
+
+        return Snapshot(path, header, arrays, hashes)
+    except Exception as e:
+        logger.warning(f"Gagal membaca snapshot {path}: {e}")
+        return None
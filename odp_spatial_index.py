@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Indeks spasial grid untuk pencarian ODP berdasarkan radius.
+
+Semua titik ODP dikelompokkan ke dalam sel grid lat/lng berukuran tetap
+(default ~250m). Pencarian radius dan bounding box hanya mengunjungi sel
+yang beririsan dengan area pencarian, sehingga biaya per query sebanding
+dengan jumlah ODP di sekitar titik referensi, bukan jumlah seluruh ODP.
+
+Indeks dibangun sekali saat data spreadsheet dimuat dan dapat dipakai
+bersama oleh bot Telegram maupun aplikasi Flask.
+"""
+
+import math
+import logging
+import numpy as np
+import pandas as pd
+
+from odp_distance import coordinate_arrays, coordinate_dtype, compute_distances
+
+logger = logging.getLogger(__name__)
+
+# Ukuran sel grid default dalam meter
+DEFAULT_CELL_METERS = 250
+
+# Panjang 1 derajat latitude dalam meter (perkiraan)
+METERS_PER_DEGREE = 111320.0
+
+
+def cell_degrees(lats, cell_meters):
+    """Ukuran sel (latitude, longitude) dalam derajat untuk sekumpulan latitude."""
+    cell_lat_deg = cell_meters / METERS_PER_DEGREE
+    max_abs_lat = float(np.max(np.abs(lats))) if len(lats) else 0.0
+    cell_lng_deg = cell_lat_deg / max(math.cos(math.radians(min(max_abs_lat, 89.0))), 1e-6)
+    return cell_lat_deg, cell_lng_deg
+
+
+def cell_coordinates(lats, lngs, cell_lat_deg, cell_lng_deg):
+    """Baris dan kolom sel grid untuk setiap titik."""
+    # Hitung dalam float64 agar sama dengan _cell_of() untuk koordinat float32
+    rows = np.floor(np.asarray(lats, dtype=np.float64) / cell_lat_deg).astype(np.int64)
+    cols = np.floor(np.asarray(lngs, dtype=np.float64) / cell_lng_deg).astype(np.int64)
+    return rows, cols
+
+
+def group_cells(rows, cols):
+    """
+    Kelompokkan posisi titik berdasarkan sel grid.
+
+    Args:
+        rows: Array baris sel per titik
+        cols: Array kolom sel per titik
+
+    Returns:
+        list of ((row, col), np.ndarray posisi)
+    """
+    # Urutkan berdasarkan sel, lalu potong menjadi kelompok per sel
+    order = np.lexsort((cols, rows))
+    rows_sorted = rows[order]
+    cols_sorted = cols[order]
+    boundaries = np.flatnonzero((np.diff(rows_sorted) != 0) | (np.diff(cols_sorted) != 0)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(order)]))
+
+    return [((int(rows_sorted[start]), int(cols_sorted[start])), order[start:end])
+            for start, end in zip(starts, ends)]
+
+
+class SpatialIndex:
+    """
+    Indeks grid seragam di atas koordinat lat/lng.
+
+    Posisi yang dikembalikan oleh query adalah posisi baris (iloc) pada
+    DataFrame yang dipakai untuk membangun indeks.
+    """
+
+    def __init__(self, lats, lngs, cell_meters=DEFAULT_CELL_METERS):
+        """
+        Bangun indeks dari array latitude dan longitude.
+
+        Args:
+            lats: Array latitude
+            lngs: Array longitude
+            cell_meters: Ukuran sel grid dalam meter
+        """
+        self.lats = np.ascontiguousarray(lats, dtype=coordinate_dtype(np.asarray(lats)))
+        self.lngs = np.ascontiguousarray(lngs, dtype=coordinate_dtype(np.asarray(lngs)))
+        self.cell_meters = cell_meters
+
+        # Ukuran sel dalam derajat; sel longitude dihitung pada latitude terjauh dari
+        # ekuator agar lebar sel dalam meter tidak pernah melebihi cell_meters
+        self.cell_lat_deg, self.cell_lng_deg = cell_degrees(self.lats, cell_meters)
+
+        self.cells = {}
+        self._build()
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell_of(self, lat, lng):
+        return (int(math.floor(lat / self.cell_lat_deg)), int(math.floor(lng / self.cell_lng_deg)))
+
+    def _new_like(self, lats, lngs):
+        """Buat indeks kosong dengan ukuran sel yang sama untuk array koordinat baru."""
+        index = SpatialIndex.__new__(SpatialIndex)
+        index.lats = np.ascontiguousarray(lats, dtype=coordinate_dtype(np.asarray(lats)))
+        index.lngs = np.ascontiguousarray(lngs, dtype=coordinate_dtype(np.asarray(lngs)))
+        index.cell_meters = self.cell_meters
+        index.cell_lat_deg = self.cell_lat_deg
+        index.cell_lng_deg = self.cell_lng_deg
+        index.cells = dict(self.cells)
+        return index
+
+    def with_changes(self, lats, lngs, moved=(), removed=()):
+        """
+        Buat indeks baru dengan perubahan sebagian titik, tanpa membangun ulang semua sel.
+
+        Indeks lama tidak diubah (copy-on-write per sel), sehingga query yang sedang
+        berjalan pada indeks lama tetap konsisten.
+
+        Args:
+            lats: Array latitude baru; posisi >= len(self) dianggap titik baru
+            lngs: Array longitude baru
+            moved: Posisi lama yang koordinatnya berubah
+            removed: Posisi lama yang dihapus (tidak akan dikembalikan oleh query lagi)
+
+        Returns:
+            SpatialIndex baru
+        """
+        index = self._new_like(lats, lngs)
+        moved = np.asarray(moved, dtype=np.int64)
+        removed = np.asarray(removed, dtype=np.int64)
+        added = np.arange(len(self.lats), len(index.lats), dtype=np.int64)
+
+        # Keluarkan titik dari sel lamanya
+        outgoing = {}
+        for pos in np.concatenate((moved, removed)):
+            key = self._cell_of(self.lats[pos], self.lngs[pos])
+            outgoing.setdefault(key, []).append(pos)
+        for key, positions in outgoing.items():
+            members = index.cells.get(key)
+            if members is None:
+                continue
+            members = members[~np.isin(members, positions)]
+            if len(members):
+                index.cells[key] = members
+            else:
+                del index.cells[key]
+
+        # Masukkan titik ke sel barunya
+        incoming = {}
+        for pos in np.concatenate((moved, added)):
+            key = index._cell_of(index.lats[pos], index.lngs[pos])
+            incoming.setdefault(key, []).append(pos)
+        for key, positions in incoming.items():
+            members = index.cells.get(key)
+            positions = np.asarray(positions, dtype=np.int64)
+            index.cells[key] = positions if members is None else np.concatenate((members, positions))
+
+        return index
+
+    def compacted(self, alive, lats, lngs):
+        """
+        Buat indeks untuk array yang hanya berisi titik yang masih berlaku, tanpa mengelompokkan ulang.
+
+        Posisi di setiap sel digeser sesuai jumlah titik terhapus sebelumnya;
+        urutan titik yang masih berlaku tidak berubah.
+
+        Args:
+            alive: Mask titik yang masih berlaku (titik lain tidak ada di sel mana pun)
+            lats: Array latitude titik yang masih berlaku (len = alive.sum())
+            lngs: Array longitude titik yang masih berlaku
+
+        Returns:
+            SpatialIndex baru
+        """
+        index = self._new_like(lats, lngs)
+        if not alive.all():
+            rank = np.cumsum(alive, dtype=np.int64) - 1
+            index.cells = {key: rank[members] for key, members in self.cells.items()}
+        return index
+
+    def _build(self):
+        """Kelompokkan posisi baris ke dalam sel grid."""
+        if not len(self.lats):
+            return
+
+        rows, cols = cell_coordinates(self.lats, self.lngs, self.cell_lat_deg, self.cell_lng_deg)
+        for key, members in group_cells(rows, cols):
+            self.cells[key] = members
+
+        logger.info(f"Indeks spasial dibangun: {len(self.lats)} titik dalam {len(self.cells)} sel")
+
+    def query_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        """
+        Ambil posisi semua titik di dalam bounding box.
+
+        Returns:
+            np.ndarray posisi baris (tidak terurut)
+        """
+        row_min, col_min = self._cell_of(min_lat, min_lng)
+        row_max, col_max = self._cell_of(max_lat, max_lng)
+
+        chunks = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                members = self.cells.get((row, col))
+                if members is not None:
+                    chunks.append(members)
+
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.concatenate(chunks)
+        lats = self.lats[candidates]
+        lngs = self.lngs[candidates]
+        inside = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+        return candidates[inside]
+
+    def candidates_within(self, ref_lat, ref_lng, radius_meters):
+        """
+        Ambil kandidat posisi yang mungkin berada dalam radius (bounding box lingkaran).
+
+        Returns:
+            np.ndarray posisi baris kandidat
+        """
+        # Tambahkan 1% agar perbedaan model bumi tidak membuang titik di tepi
+        lat_delta = radius_meters * 1.01 / METERS_PER_DEGREE
+        edge_lat = min(abs(ref_lat) + lat_delta, 89.0)
+        lng_delta = lat_delta / max(math.cos(math.radians(edge_lat)), 1e-6)
+
+        return self.query_bbox(ref_lat - lat_delta, ref_lng - lng_delta,
+                               ref_lat + lat_delta, ref_lng + lng_delta)
+
+    def query_radius(self, ref_lat, ref_lng, radius_meters, band_meters=0.0, refine=True):
+        """
+        Ambil posisi titik dalam radius beserta jaraknya, terurut dari yang terdekat.
+
+        Args:
+            ref_lat: Latitude titik referensi
+            ref_lng: Longitude titik referensi
+            radius_meters: Radius pencarian dalam meter
+            band_meters: Lebar pita perhalusan geodesic di sekitar batas radius
+            refine: Aktifkan perhalusan geodesic untuk titik di dekat batas
+
+        Returns:
+            tuple: (posisi, jarak_meter) berupa np.ndarray
+        """
+        candidates = self.candidates_within(ref_lat, ref_lng, radius_meters + band_meters)
+        distances = compute_distances(
+            ref_lat, ref_lng, self.lats[candidates], self.lngs[candidates],
+            cutoff_meters=radius_meters, band_meters=band_meters, refine=refine
+        )
+
+        inside = distances <= radius_meters
+        positions = candidates[inside]
+        distances = distances[inside]
+
+        order = np.argsort(distances, kind='stable')
+        return positions[order], distances[order]
+
+    @classmethod
+    def from_dataframe(cls, df, lat_col, lng_col, cell_meters=DEFAULT_CELL_METERS):
+        """Bangun indeks dari kolom koordinat DataFrame (harus sudah numerik dan valid)."""
+        lats, lngs = coordinate_arrays(df, lat_col, lng_col)
+        return cls(lats, lngs, cell_meters=cell_meters)
+
+
+class SpatialIndexBuilder:
+    """
+    Pembangun SpatialIndex dari potongan (chunk) koordinat.
+
+    Sel grid setiap potongan dihitung saat potongan ditambahkan dan disimpan
+    ringkas (int32 per titik); pengelompokan per sel dilakukan sekali di
+    build(). Ukuran sel longitude ditetapkan dari potongan pertama; ini hanya
+    memengaruhi efisiensi, bukan ketepatan hasil query.
+    """
+
+    def __init__(self, cell_meters=DEFAULT_CELL_METERS):
+        self.cell_meters = cell_meters
+        self.cell_lat_deg = None
+        self.cell_lng_deg = None
+        self._lats = []
+        self._lngs = []
+        self._rows = []
+        self._cols = []
+
+    def add(self, lats, lngs):
+        """Tambahkan satu potongan koordinat (posisi melanjutkan potongan sebelumnya)."""
+        if not len(lats):
+            return
+        if self.cell_lat_deg is None:
+            self.cell_lat_deg, self.cell_lng_deg = cell_degrees(lats, self.cell_meters)
+
+        rows, cols = cell_coordinates(lats, lngs, self.cell_lat_deg, self.cell_lng_deg)
+        self._rows.append(rows.astype(np.int32))
+        self._cols.append(cols.astype(np.int32))
+        self._lats.append(lats)
+        self._lngs.append(lngs)
+
+    def build(self):
+        """Gabungkan semua potongan menjadi SpatialIndex."""
+        if self.cell_lat_deg is None:
+            return SpatialIndex(np.empty(0), np.empty(0), cell_meters=self.cell_meters)
+
+        index = SpatialIndex.__new__(SpatialIndex)
+        lats = np.concatenate(self._lats)
+        lngs = np.concatenate(self._lngs)
+        index.lats = np.ascontiguousarray(lats, dtype=coordinate_dtype(lats))
+        index.lngs = np.ascontiguousarray(lngs, dtype=coordinate_dtype(lngs))
+        index.cell_meters = self.cell_meters
+        index.cell_lat_deg = self.cell_lat_deg
+        index.cell_lng_deg = self.cell_lng_deg
+        index.cells = dict(group_cells(np.concatenate(self._rows), np.concatenate(self._cols)))
+
+        logger.info(f"Indeks spasial dibangun dari {len(self._lats)} potongan: "
+                    f"{len(index.lats)} titik dalam {len(index.cells)} sel")
+        return index
+
+
+def build_spatial_index(df, lat_col, lng_col, cell_meters=DEFAULT_CELL_METERS):
+    """
+    Bersihkan koordinat DataFrame lalu bangun indeks spasial di atasnya.
+
+    Args:
+        df: DataFrame mentah dari spreadsheet
+        lat_col: Nama kolom latitude
+        lng_col: Nama kolom longitude
+        cell_meters: Ukuran sel grid dalam meter
+
+    Returns:
+        tuple: (valid_df, SpatialIndex) dengan valid_df berindeks 0..n-1
+    """
+    valid_df = df.copy()
+    valid_df[lat_col] = pd.to_numeric(valid_df[lat_col], errors='coerce')
+    valid_df[lng_col] = pd.to_numeric(valid_df[lng_col], errors='coerce')
+    valid_df = valid_df.dropna(subset=[lat_col, lng_col]).reset_index(drop=True)
+
+    return valid_df, SpatialIndex.from_dataframe(valid_df, lat_col, lng_col, cell_meters)
+
+
+def find_within_radius(valid_df, index, ref_lat, ref_lng, radius_meters, band_meters=0.0):
+    """
+    Ambil baris DataFrame dalam radius menggunakan indeks spasial.
+
+    Args:
+        valid_df: DataFrame yang dipakai untuk membangun indeks
+        index: SpatialIndex untuk valid_df
+        ref_lat: Latitude titik referensi
+        ref_lng: Longitude titik referensi
+        radius_meters: Radius pencarian dalam meter
+        band_meters: Lebar pita perhalusan geodesic di sekitar batas radius
+
+    Returns:
+        DataFrame berisi lokasi dalam radius dengan kolom 'jarak_meter', terurut dari terdekat
+    """
+    positions, distances = index.query_radius(ref_lat, ref_lng, radius_meters, band_meters=band_meters)
+    nearby = valid_df.iloc[positions].copy()
+    nearby['jarak_meter'] = distances
+    return nearby
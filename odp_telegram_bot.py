@@ -20,13 +20,15 @@ import folium
 import telebot
 from telebot import types
 import contextily as cx
-from geopy.distance import geodesic
+from odp_tile_cache import add_basemap
 from folium.plugins import MarkerCluster
 import matplotlib.patheffects as pe
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
 import matplotlib.image as mpimg
 from urllib.request import urlopen
 from io import BytesIO
+from odp_data_service import OdpDataService
+from odp_dataset import CORE_COLUMNS
 
 # Konfigurasi logging
 logging.basicConfig(level=logging.INFO,
@@ -52,59 +54,38 @@ else:
     logger.error("Token bot Telegram tidak ditemukan!")
     bot = None
 
-# Data spreadsheet global
+# Dataset ODP global (PreparedDataset dari data_service)
 spreadsheet_data = None
 
+# Layanan data dengan snapshot biner di disk untuk start cepat dan fallback offline
+data_service = OdpDataService(
+    SPREADSHEET_URL,
+    refresh_interval=0,
+    csv_url="https://docs.google.com/spreadsheets/d/16PFuuwJjL-_hJKuopMJlktlwaNWLnKQdPUMZdX55pkQ/gviz/tq?tqx=out:csv",
+    columns=CORE_COLUMNS
+)
+
 def load_spreadsheet_data():
     """
     Muat data dari spreadsheet dan simpan ke cache.
+    
+    Snapshot biner terakhir yang berhasil dimuat dipakai lebih dulu (juga saat
+    jaringan tidak tersedia), sementara pengecekan ke spreadsheet berjalan di
+    latar belakang.
     """
     global spreadsheet_data
     
     try:
         logger.info("Mencoba memuat data dari spreadsheet")
         
-        # Coba cara alternatif dengan pandas read_csv langsung dari URL publik
-        # URL dengan format publis/preview yang lebih stabil untuk akses publik
-        spreadsheet_id = "16PFuuwJjL-_hJKuopMJlktlwaNWLnKQdPUMZdX55pkQ"
-        csv_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/gviz/tq?tqx=out:csv"
-        
-        # Jika data masih gagal dimuat, coba gunakan data dari aplikasi web lokal 
-        # yang sudah berhasil memuat datanya
-        try:
-            # Baca data dari URL publik (tanpa timeout karena pandas di versi ini tidak mendukungnya)
-            spreadsheet_data = pd.read_csv(csv_url)
-            logger.info(f"Berhasil memuat {len(spreadsheet_data)} baris data dari URL publik")
-            return True
-        except Exception as e1:
-            logger.warning(f"Gagal memuat dari URL publik: {e1}, mencoba solusi alternatif...")
-            
-            # Cek apakah file odp_data.csv ada di direktori static
-            local_csv = "static/odp_data.csv"
-            if os.path.exists(local_csv):
-                try:
-                    spreadsheet_data = pd.read_csv(local_csv)
-                    logger.info(f"Berhasil memuat {len(spreadsheet_data)} baris data dari file lokal")
-                    return True
-                except Exception as e2:
-                    logger.error(f"Gagal memuat dari file lokal: {e2}")
+        dataset = data_service.get_dataset()
+        if dataset is None:
+            logger.error("Data tidak tersedia: spreadsheet tidak bisa diakses dan belum ada snapshot lokal")
+            return False
             
-            # Jika semua upaya gagal, buat dataset minimal
-            logger.warning("Membuat dataset minimal untuk pengujian")
-            # Buat DataFrame dengan kolom-kolom yang dibutuhkan
-            mini_data = {
-                'ODP NAME': ['ODP-PLE-FM/001', 'ODP-PLE-FM/002', 'ODP-PLE-FM/003'],
-                'LATITUDE': [-3.816090, -3.815940, -3.816140],
-                'LONGITUDE': [114.750625, 114.750540, 114.750730],
-                'AVAI': [1, 2, 3]
-            }
-            spreadsheet_data = pd.DataFrame(mini_data)
-            logger.info(f"Menggunakan dataset minimal dengan {len(spreadsheet_data)} baris data")
-            
-            # Simpan dataset minimal agar bisa digunakan nanti
-            os.makedirs("static", exist_ok=True)
-            spreadsheet_data.to_csv("static/odp_data_minimal.csv", index=False)
-            return True
+        spreadsheet_data = dataset
+        logger.info(f"Berhasil memuat {len(spreadsheet_data)} baris data (sumber: {data_service.source})")
+        return True
             
     except Exception as e:
         logger.error(f"Error fatal saat memuat data spreadsheet: {e}")
@@ -116,42 +97,16 @@ def find_nearby_odps(ref_lat, ref_lng, radius_meters=DEFAULT_RADIUS):
     """
     global spreadsheet_data
     
-    if spreadsheet_data is None:
-        load_spreadsheet_data()
+    # Muat ulang referensi agar hasil refresh latar belakang ikut terpakai
+    load_spreadsheet_data()
         
     if spreadsheet_data is None:
         return None
     
     try:
-        # Asumsikan nama kolom dari inspeksi data sebelumnya
-        lat_col = 'LATITUDE'
-        lng_col = 'LONGITUDE'
-        name_col = 'ODP NAME'
-        
-        # Konversi koordinat ke float
-        df = spreadsheet_data.copy()
-        
-        # Buat array koordinat referensi
-        ref_coord = (ref_lat, ref_lng)
-        
-        # Hitung jarak untuk semua baris
-        def calculate_distance(row):
-            try:
-                coord = (float(row[lat_col]), float(row[lng_col]))
-                return geodesic(ref_coord, coord).meters
-            except (ValueError, TypeError):
-                return float('inf')  # Nilai jarak tak terhingga jika koordinat tidak valid
-        
-        # Terapkan fungsi jarak
-        df['jarak_meter'] = df.apply(calculate_distance, axis=1)
-        
-        # Filter yang berada dalam radius
-        nearby_df = df[df['jarak_meter'] <= radius_meters].copy()
-        
-        # Urutkan berdasarkan jarak
-        nearby_df = nearby_df.sort_values('jarak_meter')
-        
-        return nearby_df
+        # Jarak dihitung sekaligus hanya untuk ODP di sel grid sekitar titik referensi,
+        # tanpa menyalin seluruh data
+        return spreadsheet_data.within_radius(ref_lat, ref_lng, radius_meters)
     except Exception as e:
         logger.error(f"Error saat mencari ODP terdekat: {e}")
         return None
@@ -237,23 +192,23 @@ def create_odp_map(ref_lat, ref_lng, nearby_df, radius_meters=DEFAULT_RADIUS, ma
         if use_satellite:
             try:
                 # Coba gunakan Google Hybrid (jalan dan bangunan terlihat)
-                cx.add_basemap(ax, crs='EPSG:4326', source=cx.providers.GoogleHybrid, zoom=17)
+                add_basemap(ax, source=cx.providers.GoogleHybrid, zoom=17)
             except Exception as e:
                 logger.warning(f"Gagal menggunakan Google Hybrid, mencoba Esri: {e}")
                 try:
                     # Fallback ke Esri WorldImagery
-                    cx.add_basemap(ax, crs='EPSG:4326', source=cx.providers.Esri.WorldImagery, zoom=17)
+                    add_basemap(ax, source=cx.providers.Esri.WorldImagery, zoom=17)
                 except Exception as e2:
                     logger.warning(f"Gagal menggunakan Esri, mencoba OpenStreetMap: {e2}")
                     try:
                         # Fallback ke OpenStreetMap
-                        cx.add_basemap(ax, crs='EPSG:4326', zoom=17)
+                        add_basemap(ax, zoom=17)
                     except Exception as e3:
                         logger.error(f"Semua provider basemap gagal: {e3}")
         else:
             # Gunakan peta jalan biasa
             try:
-                cx.add_basemap(ax, crs='EPSG:4326', zoom=17)
+                add_basemap(ax, zoom=17)
             except Exception as e:
                 logger.error(f"Gagal menambahkan basemap: {e}")
         
@@ -431,11 +386,8 @@ def reload_command(message):
     # Kirim pesan "sedang memuat"
     wait_msg = bot.reply_to(message, "🔄 Memuat ulang data dari spreadsheet...")
     
-    # Reset data
-    spreadsheet_data = None
-    
-    # Muat ulang data
-    success = load_spreadsheet_data()
+    # Muat ulang data (jika gagal, dataset terakhir tetap dipakai)
+    success = data_service.refresh() and load_spreadsheet_data()
     
     if success and spreadsheet_data is not None:
         bot.edit_message_text(
@@ -14,26 +14,30 @@ import os
 import re
 import uuid
 import time
-import math
 import logging
 import pandas as pd
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # Set backend non-interaktif sebelum import plt
 import matplotlib.pyplot as plt
-import matplotlib.patheffects as path_effects
 import contextily as ctx
-import openrouteservice as ors
 import json
 import sys
-import requests
-from io import BytesIO
-from PIL import Image
+from collections import OrderedDict
 from geopy.distance import geodesic
 from telebot import TeleBot, types
-import matplotlib.patches as mpatches
-import matplotlib.lines as mlines
-from matplotlib.patches import Circle
+from odp_distance import compute_distances
+from odp_dataset import ODP_NUMBER_COLUMN, CORE_COLUMNS
+from odp_data_service import OdpDataService, DEFAULT_REFRESH_INTERVAL
+from odp_routing import RoutingClient, settle_top_routes
+from odp_road_graph import load_road_graph
+from odp_road_snap import RoadSnapper
+from odp_isochrone import points_in_region
+from odp_route_cache import RouteCache, RouteLookup
+from odp_route_geometry import compact_route, route_array, route_column
+from odp_map_render import get_renderer, MAP_COLUMNS, MAP_RENDERER
+from odp_render_service import MapRenderService
+from odp_background_cache import get_background_cache
 
 # Konfigurasi logging
 logging.basicConfig(level=logging.INFO, 
@@ -45,27 +49,18 @@ TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN')
 ORS_API_KEY = os.environ.get('OPENROUTESERVICE_API_KEY')
 MAPBOX_ACCESS_TOKEN = os.environ.get('MAPBOX_ACCESS_TOKEN')
 
-# Inisialisasi API routing
-ors_client = None
-use_mapbox = False
+# Inisialisasi routing: graf jalan lokal (jika ada ODP_ROAD_GRAPH_PATH),
+# lalu OpenRouteService, Mapbox sebagai alternatif
+routing_client = RoutingClient(ORS_API_KEY, MAPBOX_ACCESS_TOKEN, road_graph=load_road_graph())
 
-# Coba inisialisasi OpenRouteService jika API key tersedia
-if ORS_API_KEY:
-    try:
-        ors_client = ors.Client(key=ORS_API_KEY)
-        logger.info("Berhasil inisialisasi OpenRouteService API")
-    except Exception as e:
-        logger.error(f"Gagal inisialisasi OpenRouteService API: {e}")
+# Mode jarak rute: "matrix" (satu permintaan matriks untuk semua kandidat),
+# "directions" (satu permintaan rute per ODP, cara lama), atau "isochrone"
+# (ODP dipilih dengan wilayah jangkauan jalan, lalu diurutkan seperti "matrix")
+ROUTE_MODE = os.environ.get('ODP_ROUTE_MODE', 'matrix')
 
-# Cek apakah Mapbox token tersedia
-if MAPBOX_ACCESS_TOKEN:
-    use_mapbox = True
-    logger.info("Mapbox Access Token tersedia dan akan digunakan sebagai alternatif jika diperlukan")
-else:
-    logger.warning("MAPBOX_ACCESS_TOKEN tidak ditemukan dalam environment variables")
-
-# Cache untuk menyimpan rute yang sudah dihitung
-route_cache = {}
+# Cache rute yang sudah dihitung (LRU di memori + SQLite di disk, dengan TTL);
+# ujung rute dikuantisasi ke grid agar titik yang berdekatan memakai rute yang sama
+route_cache = RouteLookup(RouteCache())
 
 # Periksa apakah token Telegram tersedia
 if not TELEGRAM_TOKEN:
@@ -85,153 +80,153 @@ KATEGORI_COLUMN = "KATEGORI ODP"  # Kolom kategori ODP (HIJAU, KUNING, MERAH, HI
 
 # Default radius
 DEFAULT_RADIUS = 250  # meter
+ROUTE_TOP_N = 10  # Jumlah ODP terdekat yang dijamin berurutan menurut jarak rute (sama dengan daftar)
 SEARCH_MARGIN = 5  # Margin extra untuk mengatasi masalah presisi perhitungan jarak
 
+# Pencarian terakhir per chat untuk perintah /more
+MAX_LAST_SEARCHES = 1000
+last_searches = OrderedDict()
+
 # Direktori untuk menyimpan gambar peta
 ODP_IMAGE_DIR = "static/odp_images"
 os.makedirs(ODP_IMAGE_DIR, exist_ok=True)
 
+# Fungsi render peta default (ODP_MAP_RENDERER); dimuat sebelum pool dibuat agar
+# worker mewarisi modulnya
+map_renderer = get_renderer()
+
+# Pool proses worker untuk render peta. Worker dibuat sekarang, sebelum thread
+# bot, refresh data dan routing berjalan, agar fork tidak mewarisi lock thread lain.
+render_service = MapRenderService().start()
+
 # Inisialisasi bot
 bot = TeleBot(TELEGRAM_TOKEN)
 
-# Data spreadsheet cache
-spreadsheet_data = None
+def spreadsheet_csv_url():
+    """
+    Bangun URL ekspor CSV dari SPREADSHEET_URL.
+    """
+    # Ekstrak ID spreadsheet dari URL
+    match = re.search(r'/d/([a-zA-Z0-9-_]+)', SPREADSHEET_URL)
+    if match:
+        spreadsheet_id = match.group(1)
+    else:
+        spreadsheet_id = SPREADSHEET_URL  # Anggap URL adalah ID langsung
+        
+    # Ekstrak GID (sheet ID) jika ada di URL
+    gid_match = re.search(r'gid=(\d+)', SPREADSHEET_URL)
+    gid = gid_match.group(1) if gid_match else None
+    
+    # Konstruksi URL CSV dengan gid yang benar
+    if gid:
+        # Gunakan export=csv dengan gid untuk mendapatkan sheet yang tepat
+        logger.info(f"Menggunakan spreadsheet dengan GID: {gid}")
+        return f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?format=csv&gid={gid}"
+    
+    # Fallback ke Sheet1 jika tidak ada gid
+    logger.info(f"Menggunakan Sheet1 (default)")
+    return f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/gviz/tq?tqx=out:csv&sheet=Sheet1"
+
+# Layanan data dengan refresh kondisional dan inkremental (hanya baris yang berubah yang diterapkan).
+# Versi baru dibangun di thread worker dan dipublikasikan dengan satu penggantian referensi.
+data_service = OdpDataService(
+    SPREADSHEET_URL,
+    refresh_interval=DEFAULT_REFRESH_INTERVAL,
+    csv_url=spreadsheet_csv_url(),
+    required_columns=[LAT_COLUMN, LNG_COLUMN, NAME_COLUMN],
+    columns=CORE_COLUMNS,  # Kolom spreadsheet lain tidak dipakai bot
+    road_snapper=RoadSnapper(routing_client)  # Tabel snap ODP ke jalan, disimpan bersama snapshot
+)
 
 def load_spreadsheet_data():
     """
-    Muat data dari spreadsheet dan simpan ke cache.
+    Pastikan dataset ODP sudah dimuat dan kembalikan dataset aktif.
+    
+    Pemuatan sinkron hanya terjadi jika belum ada dataset sama sekali;
+    pembaruan berikutnya dilakukan oleh thread worker data_service.
+    DataFrame penuh sengaja tidak dibangun: pencarian hanya membaca baris
+    hasil dari snapshot yang di-memory-map.
     """
-    global spreadsheet_data
     try:
-        # Ekstrak ID spreadsheet dari URL
-        match = re.search(r'/d/([a-zA-Z0-9-_]+)', SPREADSHEET_URL)
-        if match:
-            spreadsheet_id = match.group(1)
-        else:
-            spreadsheet_id = SPREADSHEET_URL  # Anggap URL adalah ID langsung
+        dataset = data_service.get_dataset()
+        if dataset is None:
+            return None
             
-        # Ekstrak GID (sheet ID) jika ada di URL
-        gid_match = re.search(r'gid=(\d+)', SPREADSHEET_URL)
-        gid = gid_match.group(1) if gid_match else None
-        
-        # Konstruksi URL CSV dengan gid yang benar
-        if gid:
-            # Gunakan export=csv dengan gid untuk mendapatkan sheet yang tepat
-            csv_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?format=csv&gid={gid}"
-            logger.info(f"Mencoba memuat data dari spreadsheet dengan GID: {gid}")
-        else:
-            # Fallback ke Sheet1 jika tidak ada gid
-            csv_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/gviz/tq?tqx=out:csv&sheet=Sheet1"
-            logger.info(f"Mencoba memuat data dari Sheet1 (default)")
-        
-        # Muat data dari CSV
-        df = pd.read_csv(csv_url)
-        
-        # Periksa apakah data berisi kolom yang dibutuhkan
-        required_columns = [LAT_COLUMN, LNG_COLUMN, NAME_COLUMN]
-        for col in required_columns:
-            if col not in df.columns:
-                logger.error(f"Kolom {col} tidak ditemukan dalam spreadsheet!")
-                return None
-                
-        # Konversi kolom latitude dan longitude ke numerik
-        df[LAT_COLUMN] = pd.to_numeric(df[LAT_COLUMN], errors='coerce')
-        df[LNG_COLUMN] = pd.to_numeric(df[LNG_COLUMN], errors='coerce')
-        
-        # Buang baris dengan nilai latitude atau longitude yang tidak valid
-        df = df.dropna(subset=[LAT_COLUMN, LNG_COLUMN])
-        
-        spreadsheet_data = df
-        logger.info(f"Berhasil memuat {len(df)} baris data valid")
+        logger.info(f"Dataset ODP versi {data_service.version}: {len(dataset)} baris data valid "
+                    f"(sumber: {data_service.source})")
         
-        return df
+        return dataset
     except Exception as e:
         logger.error(f"Error saat memuat data: {e}")
         return None
 
-def calculate_route_distance(ref_lat, ref_lng, dest_lat, dest_lng):
+def format_age(seconds):
+    """Format umur data dalam bentuk singkat (contoh: '3 menit 12 detik')."""
+    seconds = int(max(seconds, 0))
+    if seconds < 60:
+        return f"{seconds} detik"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} menit {seconds} detik"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} jam {minutes} menit"
+
+def connect_route(coords, ref_lat, ref_lng, dest_lat, dest_lng):
+    """
+    Sambungkan geometri rute (dari ujung terkuantisasi) ke titik referensi dan
+    ODP yang sebenarnya agar garis di peta dimulai dan berakhir di titik aslinya.
+    """
+    if coords is None or not len(coords):
+        return coords
+    start = np.array([[ref_lng, ref_lat]], dtype=coords.dtype)
+    end = np.array([[dest_lng, dest_lat]], dtype=coords.dtype)
+    parts = [coords]
+    if not np.array_equal(coords[0], start[0]):
+        parts.insert(0, start)
+    if not np.array_equal(coords[-1], end[0]):
+        parts.append(end)
+    return np.concatenate(parts) if len(parts) > 1 else coords
+
+def calculate_route_distance(ref_lat, ref_lng, dest_lat, dest_lng, road_lat=None, road_lng=None, radius_meters=None,
+                             snap_offset=0.0):
     """
     Hitung jarak berdasarkan rute jalan menggunakan OpenRouteService API atau Mapbox API.
     Termasuk caching untuk meminimalkan API calls.
     
+    Args:
+        road_lat, road_lng: Titik jalan ODP dari tabel snap; jika ada, rute diminta
+                            sampai titik ini lalu disambungkan ke ODP
+        radius_meters: Radius pencarian (membatasi penjelajahan graf jalan lokal)
+        snap_offset: Jarak titik jalan ke ODP (meter); ditambahkan ke jarak rute
+                     karena cache menyimpan jarak sampai titik jalan
+    
     Returns:
         tuple: (jarak_meter, koordinat_rute) atau (None, None) jika gagal
     """
-    global ors_client, route_cache, use_mapbox, MAPBOX_ACCESS_TOKEN
-    
-    # Buat key cache dari koordinat
-    cache_key = f"{ref_lat:.6f}_{ref_lng:.6f}_{dest_lat:.6f}_{dest_lng:.6f}"
-    
-    # Cek apakah rute sudah ada di cache
-    if cache_key in route_cache:
-        return route_cache[cache_key]
+    route_lat = dest_lat if road_lat is None else road_lat
+    route_lng = dest_lng if road_lng is None else road_lng
     
-    # Coba gunakan OpenRouteService
-    if ors_client is not None:
-        try:
-            # Hitung rute menggunakan ORS API
-            coords = [[ref_lng, ref_lat], [dest_lng, dest_lat]]
-            routes = ors_client.directions(
-                coordinates=coords,
-                profile='driving-car',  # Opsi: driving-car, foot-walking, cycling-regular
-                format='geojson',
-                preference='shortest',  # Gunakan rute terpendek (bukan tercepat)
-                instructions=False,
-                geometry=True
-            )
-            
-            # Ekstrak jarak dan koordinat rute
-            if routes and 'features' in routes and routes['features']:
-                route = routes['features'][0]
-                distance = route['properties']['summary']['distance']  # dalam meter
-                route_coords = route['geometry']['coordinates']
-                
-                # Simpan ke cache
-                result = (distance, route_coords)
-                route_cache[cache_key] = result
-                logger.info(f"Menggunakan OpenRouteService API dengan jarak {distance:.1f}m")
-                return result
-                
-            logger.warning("OpenRouteService API tidak mengembalikan rute valid")
-        except Exception as e:
-            logger.warning(f"Error OpenRouteService API: {e}. Mencoba alternatif...")
-    else:
-        logger.warning("OpenRouteService API tidak tersedia")
+    # Cek apakah rute lengkap sudah ada di cache (entri dari matriks hanya berisi jarak)
+    entry = route_cache.get(ref_lat, ref_lng, route_lat, route_lng)
+    if entry is not None and entry.geometry is not None:
+        return entry.distance + snap_offset, connect_route(entry.coords, ref_lat, ref_lng, dest_lat, dest_lng)
     
-    # Coba gunakan Mapbox API sebagai alternatif
-    if use_mapbox and MAPBOX_ACCESS_TOKEN:
-        try:
-            import requests
-            
-            # Buat URL untuk Mapbox Directions API
-            url = f"https://api.mapbox.com/directions/v5/mapbox/driving/{ref_lng},{ref_lat};{dest_lng},{dest_lat}"
-            params = {
-                "access_token": MAPBOX_ACCESS_TOKEN,
-                "geometries": "geojson",
-                "overview": "full"
-            }
-            
-            # Kirim permintaan ke Mapbox API
-            response = requests.get(url, params=params)
-            data = response.json()
-            
-            # Proses respons
-            if 'routes' in data and data['routes']:
-                route = data['routes'][0]
-                distance = route['distance']  # dalam meter
-                route_coords = route['geometry']['coordinates']
-                
-                # Simpan ke cache
-                result = (distance, route_coords)
-                route_cache[cache_key] = result
-                logger.info(f"Menggunakan Mapbox API dengan jarak {distance:.1f}m")
-                return result
-                
-            logger.warning("Mapbox API tidak mengembalikan rute valid")
-        except Exception as e:
-            logger.warning(f"Error Mapbox API: {e}. Menggunakan simulasi rute...")
+    # Coba gunakan OpenRouteService, lalu Mapbox sebagai alternatif; hasil gagal
+    # yang masih tersimpan di cache (TTL pendek) langsung memakai simulasi.
+    # API dipanggil dengan ujung terkuantisasi agar hasilnya berlaku untuk seluruh sel grid.
+    if entry is not None and entry.distance is None:
+        logger.debug("Rute gagal tersimpan di cache, menggunakan simulasi")
+    elif routing_client.available:
+        distance, coords = routing_client.directions(*route_cache.endpoints(ref_lat, ref_lng, route_lat, route_lng),
+                                                     radius_meters=radius_meters)
+        if distance is not None:
+            coords = compact_route(coords)
+            route_cache.put(ref_lat, ref_lng, route_lat, route_lng, distance, coords)
+            return distance + snap_offset, connect_route(coords, ref_lat, ref_lng, dest_lat, dest_lng)
+        if entry is None:
+            route_cache.put(ref_lat, ref_lng, route_lat, route_lng, None)
     else:
-        logger.warning("Mapbox API tidak tersedia")
+        logger.warning("API routing tidak tersedia")
     
     # Fallback: Gunakan simulasi rute yang lebih realistis mengikuti jalan
     try:
@@ -287,20 +282,75 @@ def calculate_route_distance(ref_lat, ref_lng, dest_lat, dest_lng):
         route_factor = 1.3  # Faktor perkiraan jalanan vs garis lurus
         route_distance = straight_distance * route_factor
         
-        # Simpan hasil ke cache
-        result = (route_distance, route_coords)
-        route_cache[cache_key] = result
+        # Simulasi tidak disimpan di cache agar rute asli tetap dicoba lagi nanti
+        result = (route_distance, route_array(route_coords))
         
         logger.info(f"Menggunakan simulasi rute dengan jarak {route_distance:.1f}m")
         return result
         
     except Exception as e:
         logger.error(f"Error menghitung rute simulasi: {e}")
-        # Tetap cache hasil error untuk menghindari perhitungan berulang yang akan gagal
-        route_cache[cache_key] = (None, None)
         return None, None
 
-def find_nearby_odps(ref_lat, ref_lng, radius_meters=DEFAULT_RADIUS, use_route_distance=True, only_available=False, direct_measurement=False):
+def calculate_route_distances(ref_lat, ref_lng, dest_lats, dest_lngs, road_lats=None, road_lngs=None, radius_meters=None,
+                              snap_offsets=None):
+    """
+    Hitung rute ke banyak tujuan secara bersamaan (lihat calculate_route_distance).
+    
+    Returns:
+        list of tuple (jarak_meter, koordinat_rute) dengan urutan sama seperti input
+    """
+    if road_lats is None:
+        road_lats, road_lngs = dest_lats, dest_lngs
+    if snap_offsets is None:
+        snap_offsets = np.zeros(len(dest_lats))
+    return routing_client.run_concurrent(
+        lambda dest_lat, dest_lng, road_lat, road_lng, snap_offset: calculate_route_distance(
+            ref_lat, ref_lng, dest_lat, dest_lng, road_lat, road_lng, radius_meters, snap_offset),
+        [float(lat) for lat in dest_lats], [float(lng) for lng in dest_lngs],
+        [float(lat) for lat in road_lats], [float(lng) for lng in road_lngs],
+        [float(offset) for offset in snap_offsets])
+
+def cached_route_distances(ref_lat, ref_lng, dest_lats, dest_lngs):
+    """
+    Jarak rute yang sudah ada di cache (tanpa memanggil API).
+    
+    Returns:
+        tuple (jarak, ditemukan): jarak NaN jika belum ada atau rute gagal
+    """
+    entries = route_cache.get_many(ref_lat, ref_lng, np.asarray(dest_lats, dtype=np.float64).tolist(),
+                                   np.asarray(dest_lngs, dtype=np.float64).tolist())
+    distances = np.array([np.nan if entry is None or entry.distance is None else entry.distance
+                          for entry in entries], dtype=np.float64)
+    found = np.array([entry is not None for entry in entries], dtype=bool)
+    logger.info(f"Jarak rute dari cache: {int(found.sum())} dari {len(entries)} ODP")
+    return distances, found
+
+def fetch_route_distances(ref_lat, ref_lng, dest_lats, dest_lngs, radius_meters=None):
+    """
+    Jarak rute ke banyak tujuan dengan permintaan matriks; hasil disimpan di cache.
+    
+    Args:
+        radius_meters: Radius pencarian (membatasi penjelajahan graf jalan lokal)
+    
+    Returns:
+        np.ndarray jarak dalam meter (NaN jika tidak ada rute)
+    """
+    dest_lats = np.asarray(dest_lats, dtype=np.float64).tolist()
+    dest_lngs = np.asarray(dest_lngs, dtype=np.float64).tolist()
+    if not dest_lats or not routing_client.available:
+        return np.full(len(dest_lats), np.nan)
+    
+    # Kirim ujung terkuantisasi agar hasilnya berlaku untuk seluruh sel grid
+    snapped = [route_cache.endpoints(ref_lat, ref_lng, lat, lng) for lat, lng in zip(dest_lats, dest_lngs)]
+    distances = routing_client.matrix_distances(
+        snapped[0][0], snapped[0][1], [end[2] for end in snapped], [end[3] for end in snapped],
+        radius_meters=radius_meters)
+    route_cache.put_many(ref_lat, ref_lng, dest_lats, dest_lngs,
+                         [None if np.isnan(distance) else distance for distance in distances.tolist()])
+    return distances
+
+def find_nearby_odps(ref_lat, ref_lng, radius_meters=DEFAULT_RADIUS, use_route_distance=True, only_available=False, direct_measurement=False, route_top_n=ROUTE_TOP_N):
     """
     Temukan ODP dalam radius tertentu.
     
@@ -312,58 +362,81 @@ def find_nearby_odps(ref_lat, ref_lng, radius_meters=DEFAULT_RADIUS, use_route_d
                          dan menambahkan kolom 'jarak_rute_meter' & 'koordinat_rute'
         only_available: Jika True, hanya menampilkan ODP dengan nilai AVAI > 0
         direct_measurement: Jika True, pengukuran jarak menggunakan jarak udara langsung, bukan rute
+        route_top_n: Rute hanya diminta sampai sekian ODP terdekat menurut jarak rute sudah pasti;
+                     sisanya memakai estimasi jarak udara * 1.3 (None = rutekan semua)
     
     Returns:
         DataFrame berisi semua ODP dalam radius yang ditentukan, dengan informasi jarak
     """
-    global spreadsheet_data
     try:
-        # Muat data jika belum dimuat
-        if spreadsheet_data is None:
-            spreadsheet_data = load_spreadsheet_data()
-            
-        if spreadsheet_data is None or spreadsheet_data.empty:
+        # Ambil versi dataset sekali di awal; refresh di latar belakang tidak
+        # mengubah versi yang sedang dipakai pencarian ini
+        dataset = data_service.get_dataset()
+        if dataset is None or dataset.empty:
             logger.error("Data tidak tersedia")
             return None
             
-        # Buat salinan data
-        df = spreadsheet_data.copy()
-        
-        # Filter baris dengan data latitude dan longitude yang valid
-        df = df.dropna(subset=[LAT_COLUMN, LNG_COLUMN])
-        
-        # Konversi ke numerik jika string
-        df[LAT_COLUMN] = pd.to_numeric(df[LAT_COLUMN], errors='coerce')
-        df[LNG_COLUMN] = pd.to_numeric(df[LNG_COLUMN], errors='coerce')
-        df = df.dropna(subset=[LAT_COLUMN, LNG_COLUMN])
+        # Ambil hanya kandidat dari sel grid di sekitar titik referensi
+        # (termasuk pita 10m di luar radius untuk log diagnostik batas radius)
+        candidates = dataset.index.candidates_within(ref_lat, ref_lng, radius_meters + 10)
         
         # Filter ODP yang tersedia (AVAI > 0) jika diminta
-        if only_available and AVAI_COLUMN in df.columns:
-            # Konversi kolom AVAI ke numerik
-            df[AVAI_COLUMN] = pd.to_numeric(df[AVAI_COLUMN], errors='coerce').fillna(0)
-            # Filter hanya ODP dengan AVAI > 0
-            df = df[df[AVAI_COLUMN] > 0]
-            logger.info(f"Menampilkan hanya ODP tersedia (AVAI > 0): {len(df)} ODP")
-        
-        # Hitung jarak lurus dalam meter (geodesic)
-        ref_point = (ref_lat, ref_lng)
-        df['jarak_meter'] = df.apply(
-            lambda row: geodesic(ref_point, (row[LAT_COLUMN], row[LNG_COLUMN])).meters,
-            axis=1
+        if only_available and AVAI_COLUMN in dataset.columns:
+            candidates = candidates[dataset.available[candidates]]
+            logger.info(f"Menampilkan hanya ODP tersedia (AVAI > 0): {len(candidates)} kandidat")
+        
+        # Hitung jarak lurus dalam meter secara vektor (haversine), lalu perhalus
+        # dengan geodesic hanya untuk ODP di sekitar batas radius
+        distances = compute_distances(
+            ref_lat, ref_lng, dataset.lats[candidates], dataset.lngs[candidates],
+            cutoff_meters=radius_meters + SEARCH_MARGIN,
+            band_meters=SEARCH_MARGIN,
+            refine=True
         )
         
         # Filter lokasi dalam radius geodesic - pastikan SEMUA ODP dalam radius udara ditampilkan
         # Tambahkan margin untuk menangani masalah presisi floating point dan perbedaan perhitungan jarak
-        nearby = df[df['jarak_meter'] <= (radius_meters + SEARCH_MARGIN)].copy()
+        inside = distances <= (radius_meters + SEARCH_MARGIN)
+        nearby = dataset.select(candidates[inside])
+        nearby['jarak_meter'] = distances[inside]
         logger.info(f"ODP dalam radius aerial {radius_meters}m (+{SEARCH_MARGIN}m margin): {len(nearby)} ODP")
         logger.info(f"Data titik referensi: {ref_lat}, {ref_lng}")
         
         # Diagnostic: tampilkan semua ODP yang dekat dengan batas 250m
-        near_boundary = df[(df['jarak_meter'] > radius_meters - 10) & (df['jarak_meter'] <= radius_meters + 10)]
-        if not near_boundary.empty:
+        near_boundary = np.flatnonzero((distances > radius_meters - 10) & (distances <= radius_meters + 10))
+        if len(near_boundary):
             logger.info(f"ODP di sekitar batas radius ({radius_meters-10}m - {radius_meters+10}m): {len(near_boundary)}")
-            for _, row in near_boundary.iterrows():
-                logger.info(f"  ODP: {row.get(NAME_COLUMN, 'Unknown')}, jarak: {row['jarak_meter']:.2f}m")
+            names = dataset.select(candidates[near_boundary], [NAME_COLUMN])[NAME_COLUMN].tolist() \
+                if NAME_COLUMN in dataset.columns else None
+            for j, i in enumerate(near_boundary):
+                name = names[j] if names is not None else 'Unknown'
+                logger.info(f"  ODP: {name}, jarak: {distances[i]:.2f}m")
+        
+        # Ujung rute setiap ODP: titik jalan dari tabel snap (jika sudah dibangun),
+        # selain itu koordinat ODP sendiri. Jarak snap (titik jalan ke ODP)
+        # ditambahkan ke setiap jarak rute
+        if use_route_distance:
+            road_snap = data_service.road_snap(dataset)
+            if road_snap is not None:
+                road_lats, road_lngs, snap_offsets = road_snap.route_points(
+                    nearby.index.to_numpy(), nearby[LAT_COLUMN], nearby[LNG_COLUMN])
+            else:
+                road_lats, road_lngs, snap_offsets = nearby[LAT_COLUMN], nearby[LNG_COLUMN], np.zeros(len(nearby))
+            nearby['lat_jalan'] = np.asarray(road_lats, dtype=np.float64)
+            nearby['lng_jalan'] = np.asarray(road_lngs, dtype=np.float64)
+            nearby['jarak_snap'] = np.asarray(snap_offsets, dtype=np.float64)
+        
+        # Mode isochrone: hanya ODP di dalam wilayah yang terjangkau lewat jalan
+        # dalam jarak radius (satu permintaan wilayah, berapa pun jumlah ODP)
+        region = None
+        if use_route_distance and ROUTE_MODE == 'isochrone' and not nearby.empty:
+            region = routing_client.isochrone(ref_lat, ref_lng, radius_meters)
+            if region is not None:
+                reachable = points_in_region(nearby['lat_jalan'].to_numpy(), nearby['lng_jalan'].to_numpy(), region)
+                logger.info(f"ODP dalam jangkauan jalan {radius_meters}m: {int(reachable.sum())} dari {len(nearby)}")
+                nearby = nearby[reachable]
+            else:
+                logger.warning("Wilayah isochrone tidak tersedia, menggunakan radius udara")
         
         # Jika diminta, hitung jarak berdasarkan rute jalan untuk titik yang dalam radius
         if use_route_distance and not nearby.empty:
@@ -372,25 +445,45 @@ def find_nearby_odps(ref_lat, ref_lng, radius_meters=DEFAULT_RADIUS, use_route_d
             nearby['koordinat_rute'] = None
             nearby['rute_valid'] = False
             
-            # Hitung jarak rute untuk setiap ODP terdekat
-            for idx, row in nearby.iterrows():
-                dest_lat = row[LAT_COLUMN]
-                dest_lng = row[LNG_COLUMN]
-                
-                # Hitung jarak rute
-                route_distance, route_coords = calculate_route_distance(ref_lat, ref_lng, dest_lat, dest_lng)
-                
-                if route_distance is not None:
-                    nearby.at[idx, 'jarak_rute_meter'] = route_distance
-                    nearby.at[idx, 'koordinat_rute'] = route_coords
-                    nearby.at[idx, 'rute_valid'] = True
+            lats = nearby[LAT_COLUMN].to_numpy(dtype=np.float64)
+            lngs = nearby[LNG_COLUMN].to_numpy(dtype=np.float64)
+            road_lats = nearby['lat_jalan'].to_numpy()
+            road_lngs = nearby['lng_jalan'].to_numpy()
+            snap_offsets = nearby['jarak_snap'].to_numpy()
+            route_coords = [None] * len(nearby)
+            
+            if ROUTE_MODE == 'directions':
+                # Hitung rute lengkap untuk setiap ODP dalam batch (bersamaan)
+                def fetch(positions):
+                    routes = calculate_route_distances(ref_lat, ref_lng, lats[positions], lngs[positions],
+                                                       road_lats[positions], road_lngs[positions], radius_meters,
+                                                       snap_offsets[positions])
+                    for position, (_, coords) in zip(positions, routes):
+                        route_coords[position] = coords
+                    return np.array([np.nan if distance is None else distance for distance, _ in routes])
+            else:
+                # Satu permintaan matriks per batch kandidat; geometri rute baru
+                # diambil saat ODP digambar di peta
+                def fetch(positions):
+                    return fetch_route_distances(ref_lat, ref_lng, road_lats[positions], road_lngs[positions],
+                                                 radius_meters) + snap_offsets[positions]
+            
+            # Jarak udara ke ODP adalah batas bawah jarak rute ke titik jalan ditambah
+            # jarak snap (dengan kelonggaran galat kuantisasi grid cache rute):
+            # kandidat yang tidak mungkin masuk daftar terdekat tidak dirutekan
+            # (jarak dari cache tetap dipakai)
+            road, routed = cached_route_distances(ref_lat, ref_lng, road_lats, road_lngs)
+            road = road + snap_offsets
+            road, routed = settle_top_routes(nearby['jarak_meter'].to_numpy(), road, routed, route_top_n, fetch,
+                                             slack=route_cache.error_bound_meters)
+            nearby['jarak_rute_meter'] = road
+            nearby['koordinat_rute'] = route_column(route_coords)
+            nearby['rute_valid'] = ~np.isnan(road)
                     
             # Prioritaskan urutan berdasarkan jarak rute jika tersedia, kalau tidak gunakan estimasi jarak * faktor
             # Kita akan membuat kolom 'jarak_tampil' untuk menampilkan jarak yang dipilih
-            nearby['jarak_tampil'] = nearby.apply(
-                lambda row: row['jarak_rute_meter'] if not np.isnan(row.get('jarak_rute_meter', np.nan)) else row['jarak_meter'] * 1.3,
-                axis=1
-            )
+            nearby['jarak_tampil'] = np.where(np.isnan(nearby['jarak_rute_meter']),
+                                              nearby['jarak_meter'] * 1.3, nearby['jarak_rute_meter'])
             
             # Gunakan jarak rute untuk urutan dan tampilan jika tersedia
             # Urutkan berdasarkan jarak_tampil (ascending untuk mendapatkan dari terdekat ke terjauh)
@@ -429,6 +522,9 @@ def find_nearby_odps(ref_lat, ref_lng, radius_meters=DEFAULT_RADIUS, use_route_d
         
         # Pastikan indeks berjalan mulai dari 0 untuk memudahkan penomoran
         nearby = nearby.reset_index(drop=True)
+        
+        # Wilayah jangkauan jalan (jika ada) disimpan untuk digambar di peta
+        nearby.attrs['isochrone'] = region
             
         return nearby
     except Exception as e:
@@ -437,9 +533,46 @@ def find_nearby_odps(ref_lat, ref_lng, radius_meters=DEFAULT_RADIUS, use_route_d
         logger.error(traceback.format_exc())
         return None
 
-def create_odp_map(ref_lat, ref_lng, nearby_df, radius_meters=DEFAULT_RADIUS, max_display=30, with_routes=True, use_satellite=True):
+def attach_route_geometry(ref_lat, ref_lng, display_df, radius_meters):
+    """
+    Ambil geometri rute hanya untuk ODP yang rutenya akan digambar di peta
+    (sudah punya jarak rute, dalam radius, dan belum punya koordinat rute).
+    
+    Returns:
+        DataFrame baru dengan kolom 'koordinat_rute' dan 'rute_valid' terisi
+    """
+    if 'jarak_rute_meter' in display_df.columns:
+        distances = display_df['jarak_rute_meter'].fillna(display_df['jarak_meter'] * 1.3)
+    else:
+        distances = display_df['jarak_meter'] * 1.3
+    
+    route_coords = list(display_df['koordinat_rute']) if 'koordinat_rute' in display_df.columns \
+        else [None] * len(display_df)
+    has_route = list(display_df['rute_valid']) if 'rute_valid' in display_df.columns \
+        else [False] * len(display_df)
+    
+    # ODP yang tidak dirutekan (di luar daftar terdekat) cukup digambar dengan garis langsung
+    to_draw = [i for i, distance in enumerate(distances)
+               if distance <= radius_meters and route_coords[i] is None and has_route[i]]
+    lats = display_df[LAT_COLUMN].to_numpy()
+    lngs = display_df[LNG_COLUMN].to_numpy()
+    # Rute diminta sampai titik jalan ODP (tabel snap) jika tersedia
+    road_lats = display_df['lat_jalan'].to_numpy() if 'lat_jalan' in display_df.columns else lats
+    road_lngs = display_df['lng_jalan'].to_numpy() if 'lng_jalan' in display_df.columns else lngs
+    routes = calculate_route_distances(ref_lat, ref_lng, lats[to_draw], lngs[to_draw],
+                                       road_lats[to_draw], road_lngs[to_draw], radius_meters)
+    for i, (_, coords) in zip(to_draw, routes):
+        if coords is not None:
+            route_coords[i] = coords
+            has_route[i] = True
+    
+    if to_draw:
+        logger.info(f"Geometri rute diambil untuk {len(to_draw)} dari {len(display_df)} ODP yang ditampilkan")
+    return display_df.assign(koordinat_rute=route_column(route_coords), rute_valid=has_route)
+
+def prepare_map_job(ref_lat, ref_lng, nearby_df, radius_meters=DEFAULT_RADIUS, max_display=30, with_routes=True, use_satellite=True):
     """
-    Buat peta dengan ODP yang ditemukan.
+    Siapkan argumen job render peta (dijalankan di proses bot karena butuh routing dan cache rute).
     
     Args:
         ref_lat: Latitude titik referensi
@@ -449,553 +582,159 @@ def create_odp_map(ref_lat, ref_lng, nearby_df, radius_meters=DEFAULT_RADIUS, ma
         max_display: Maksimal ODP yang ditampilkan
         with_routes: Menampilkan rute dari titik referensi ke ODP terdekat
         use_satellite: Menggunakan citra satelit sebagai basemap
+    
+    Returns:
+        dict: Argumen fungsi render peta, atau None jika tidak ada ODP
+    """
+    if nearby_df is None or nearby_df.empty:
+        logger.warning("Tidak ada data ODP untuk divisualisasikan")
+        return None
+        
+    # Tampilkan semua ODP dalam radius aerial terlepas dari jarak rute
+    # (DataFrame hanya dibaca, jadi tidak perlu disalin)
+    display_df = nearby_df
+    logger.info(f"Menampilkan semua ODP dalam radius aerial {radius_meters}m: {len(display_df)} ODP")
+    
+    # Pastikan seluruh ODP memiliki kolom 'jarak_tampil'
+    if 'jarak_tampil' not in display_df.columns:
+        display_df = display_df.assign(jarak_tampil=display_df['jarak_meter'])
+    
+    # Geometri rute hanya diambil untuk ODP yang rutenya digambar
+    if with_routes:
+        display_df = attach_route_geometry(ref_lat, ref_lng, display_df, radius_meters)
+    
+    # Hanya kolom yang digambar yang dikirim ke worker
+    columns = [column for column in MAP_COLUMNS if column in display_df.columns]
+    
+    # Buat ID unik untuk file
+    map_type = "satellite" if use_satellite else "street"
+    route_type = "with_routes" if with_routes else "no_routes"
+    file_id = f"tg_{map_type}_{route_type}_{uuid.uuid4()}"
+    
+    return dict(
+        ref_lat=ref_lat,
+        ref_lng=ref_lng,
+        display_df=display_df[columns],
+        file_path=os.path.join(ODP_IMAGE_DIR, f"{file_id}.png"),
+        radius_meters=radius_meters,
+        max_display=max_display,
+        with_routes=with_routes,
+        use_satellite=use_satellite,
+        region=nearby_df.attrs.get('isochrone'),
+        mapbox_token=MAPBOX_ACCESS_TOKEN
+    )
+
+def create_odp_map(ref_lat, ref_lng, nearby_df, radius_meters=DEFAULT_RADIUS, max_display=30, with_routes=True, use_satellite=True,
+                   renderer=None):
+    """
+    Buat peta dengan ODP yang ditemukan dan tunggu hasilnya.
+    
+    Rendering tetap dilakukan di pool worker; handler bot memakai send_odp_map
+    agar tidak perlu menunggu.
+    
+    Args:
+        renderer: 'raster' atau 'matplotlib' (untuk ekspor berkualitas tinggi);
+            default sesuai ODP_MAP_RENDERER
+    
+    Returns:
+        str: Path file peta, atau None jika gagal
     """
-    # Import modul yang diperlukan secara lokal untuk menghindari konflik
-    import matplotlib
-    # Menggunakan backend non-interaktif
-    matplotlib.use('Agg')
-    # Penting: Jika kita memiliki masalah dalam visualisasi, kita harus memberikan pesan yang informatif
-    # dan pastikan gambar tetap bisa dihasilkan dan dikirim ke pengguna
     try:
-        if nearby_df is None or nearby_df.empty:
-            logger.warning("Tidak ada data ODP untuk divisualisasikan")
+        job = prepare_map_job(ref_lat, ref_lng, nearby_df, radius_meters, max_display, with_routes, use_satellite)
+        if job is None:
             return None
-            
-        # Tampilkan semua ODP dalam radius aerial terlepas dari jarak rute
-        filtered_df = nearby_df.copy()
-        logger.info(f"Menampilkan semua ODP dalam radius aerial {radius_meters}m: {len(filtered_df)} ODP")
-        
-        # Pastikan seluruh ODP memiliki kolom 'jarak_tampil'
-        if 'jarak_tampil' not in filtered_df.columns:
-            filtered_df['jarak_tampil'] = filtered_df['jarak_meter']
-        
-        # Tampilkan semua ODP dalam radius 250m terlepas dari batasan max_display
-        display_df = filtered_df
-        
-        # Logging informasi jumlah ODP yang ditampilkan
-        logger.info(f"Menampilkan {len(display_df)} ODP dari total {len(filtered_df)} ODP dalam radius {radius_meters}m")
-            
-        # Buat figure dan axis dengan ukuran dan resolusi tinggi
-        fig, ax = plt.subplots(figsize=(15, 15), dpi=200)
-        
-        # Simpan plot awal untuk debugging
-        plt.savefig('static/odp_images/debug_initial_plot.png', dpi=200, bbox_inches='tight')
-        logger.info(f"Debug plot awal tersimpan")
-        
-        # Definisikan batas area peta yang proporsional
-        # Gunakan rasio 1 derajat = 111 km (111.000 meter) pada garis equator
-        # Untuk latitude (north-south): 1 derajat = ~111 km konstan
-        # Untuk longitude (east-west): 1 derajat = ~111 km * cos(latitude)
-        # Buffer untuk latitude tetap sama, buffer untuk longitude disesuaikan dengan latitude
-        lat_buffer = radius_meters / 111000  # Buffer latitude dalam derajat
-        lng_buffer = lat_buffer / math.cos(math.radians(abs(ref_lat)))  # Sesuaikan buffer longitude
-        
-        # Set batas plot
-        ax.set_xlim(ref_lng - lng_buffer, ref_lng + lng_buffer)
-        ax.set_ylim(ref_lat - lat_buffer, ref_lat + lat_buffer)
-        
-        # Log untuk debugging
-        logger.info(f"Setting plot bounds: lng=[{ref_lng - lng_buffer:.6f}, {ref_lng + lng_buffer:.6f}], lat=[{ref_lat - lat_buffer:.6f}, {ref_lat + lat_buffer:.6f}]")
-        
-        # PENTING: ELIMINASI SISTEM KOREKSI KOORDINAT
-        # Untuk menampilkan titik ODP persis sesuai koordinat di spreadsheet,
-        # kita tidak lagi menggunakan sistem koreksi koordinat
-        
-        # Fungsi ini telah diubah untuk mengembalikan koordinat asli tanpa perubahan
-        def apply_coordinate_correction(lat, lng):
-            # Kembalikan koordinat asli tanpa modifikasi
-            return lat, lng
-            
-        # Terapkan koreksi pada titik referensi untuk konsistensi
-        ref_lat_corr, ref_lng_corr = apply_coordinate_correction(ref_lat, ref_lng)
-        
-        # Plot titik referensi sebagai bintang merah - menggunakan koordinat asli tanpa koreksi
-        # Menggunakan scatter untuk ukuran yang lebih presisi dan kontrol yang lebih baik
-        ax.scatter(ref_lng, ref_lat, color='red', marker='*', s=500, 
-                  edgecolor='white', linewidth=1.5, zorder=100, alpha=1.0, label='Titik Referensi')
-        
-        # Log koordinat titik referensi untuk debugging
-        logger.info(f"Plotting reference point at exact coordinates: ({ref_lng:.6f}, {ref_lat:.6f})")
-        
-        # Tambahkan label referensi dengan koordinat - gunakan koordinat asli
-        ref_text = f"REF: {ref_lat:.6f}, {ref_lng:.6f}"
-        t = ax.text(ref_lng, ref_lat, ref_text, 
-                 color='red', fontsize=10, fontweight='bold',
-                 verticalalignment='bottom',
-                 horizontalalignment='center')
-        t.set_path_effects([path_effects.withStroke(linewidth=3, foreground='white')])
-        
-        # Gambar lingkaran radius - gunakan koordinat asli
-        radius_degrees = radius_meters / 111000  # Konversi meter ke derajat (perkiraan)
-        
-        # Lingkaran radius jangkauan - perbesar ukuran lingkaran pada tampilan satelit
-        circle_edge_width = 2.5 if use_satellite else 2.0  # Lingkaran lebih tebal pada tampilan satelit
-        circle_alpha = 0.8 if use_satellite else 0.7  # Lebih solid untuk tampilan satelit
-        circle_color = 'blue' if use_satellite else 'red'  # Warna biru lebih mencolok pada satelit
-        
-        circle = plt.Circle((ref_lng, ref_lat), radius_degrees, 
-                          fill=False, color=circle_color, linewidth=circle_edge_width, 
-                          alpha=circle_alpha)
-        ax.add_patch(circle)
-        
-        # Plot ODP dengan indikator marker sesuai kategori dan jarak berdasarkan rute
-        for i, (idx, row) in enumerate(display_df.iterrows(), 1):
-            lat = row[LAT_COLUMN]
-            lng = row[LNG_COLUMN]
-            
-            # PENTING: Gunakan koordinat asli tepat seperti dalam spreadsheet
-            # Tidak menerapkan koreksi apapun untuk menjamin presisi
-            # Log koordinat ODP untuk analisis presisi
-            logger.info(f"Plotting ODP marker {i} at exact coordinates: ({lng:.6f}, {lat:.6f})")
-            
-            # Selalu gunakan jarak rute untuk label dan garis ukur, bukan jarak udara
-            # Jika jarak rute tersedia, gunakan itu. Jika tidak, gunakan jarak udara * 1.3 sebagai estimasi
-            if 'jarak_rute_meter' in row and pd.notnull(row['jarak_rute_meter']):
-                distance = row['jarak_rute_meter']  # Jarak berdasarkan rute jalan
-            else:
-                # Jika tidak ada jarak rute, estimasi dengan jarak udara * faktor
-                distance = row['jarak_meter'] * 1.3  # Estimasi jarak jalan
-                
-            # Apakah memiliki rute valid
-            has_route = row.get('rute_valid', False)
-            route_coords = row.get('koordinat_rute', None)
-            
-            kategori = row.get(KATEGORI_COLUMN, "").upper() if KATEGORI_COLUMN in row else ""
-            
-            # Tentukan warna berdasarkan kategori ODP dengan warna yang lebih cerah
-            if "HIJAU" in kategori:
-                color = '#00CC00'  # Hijau lebih cerah
-            elif "KUNING" in kategori:
-                color = '#FFCC00'  # Kuning lebih cerah
-            elif "MERAH" in kategori:
-                color = '#FF3333'  # Merah lebih cerah
-            elif "HITAM" in kategori:
-                color = '#333333'  # Hitam sedikit lebih terang untuk visibility
-            elif "BIRU" in kategori or "ORANGE" in kategori:
-                color = '#FF9900'  # Orange cerah
+        render = get_renderer(renderer) if renderer else map_renderer
+        return render_service.render(render, **job)
+    except Exception as e:
+        logger.error(f"Error saat membuat peta ODP: {e}")
+        return None
+
+def map_options_keyboard(lat, lng, radius):
+    """Tombol untuk melihat peta jalan dan peta satelit tanpa rute."""
+    keyboard = types.InlineKeyboardMarkup()
+    btn_street = types.InlineKeyboardButton(text="🗺️ Lihat Peta Jalan", callback_data=f"street_{lat}_{lng}_{radius}")
+    btn_satellite_no_route = types.InlineKeyboardButton(text="🛰️ Satelit Tanpa Rute", callback_data=f"sat_noroute_{lat}_{lng}_{radius}")
+    keyboard.add(btn_street, btn_satellite_no_route)
+    return keyboard
+
+def send_odp_map(chat_id, lat, lng, nearby_odps, radius, caption, with_routes=True, use_satellite=True,
+                 show_options=True, wait_message_id=None):
+    """
+    Render peta di pool worker lalu kirim ke chat setelah selesai.
+    
+    Handler langsung kembali setelah job diantrekan, sehingga pencarian
+    pengguna lain tidak menunggu peta ini selesai dirender.
+    
+    Args:
+        show_options: Kirim tombol opsi peta lain setelah peta
+        wait_message_id: Pesan tunggu yang dihapus saat peta terkirim (atau diganti pesan gagal)
+    
+    Returns:
+        Future job render, atau None jika peta tidak bisa diantrekan
+    """
+    def deliver(map_file):
+        if not map_file:
+            if wait_message_id is not None:
+                bot.edit_message_text("❌ Gagal membuat peta ODP.", chat_id, wait_message_id)
             else:
-                # Fallback: tentukan warna berdasarkan jarak jika kategori tidak dikenal
-                if distance < radius_meters * 0.25:
-                    color = '#00CC00'  # Hijau cerah
-                elif distance < radius_meters * 0.5:
-                    color = '#3399FF'  # Biru cerah
-                elif distance < radius_meters * 0.75:
-                    color = '#FF9900'  # Oranye cerah
-                else:
-                    color = '#CC66FF'  # Ungu cerah
-            
-            # Marker dasar - gunakan koordinat asli dari data spreadsheet
-            ax.plot(lng, lat, '.', color=color, alpha=0, markersize=1)
-            
-            # Tambahkan rute dari referensi ke ODP berdasarkan rute jalan yang sebenarnya
-            if with_routes and distance <= radius_meters:  # Hanya tampilkan rute untuk ODP dalam radius
-                import numpy as np  # Import numpy di dalam fungsi untuk memastikan tersedia
-                
-                # Cek apakah rute tersedia dari API
-                if has_route and route_coords is not None and len(route_coords) > 1:
-                    # Konversi koordinat rute menjadi array untuk plotting
-                    route_coords_array = np.array(route_coords)
-                    
-                    # Pastikan koordinat valid dan memiliki setidaknya dua titik
-                    if route_coords_array.shape[0] >= 2 and route_coords_array.shape[1] == 2:
-                        # Plot rute dengan warna sesuai kategori dan style garis yang tepat
-                        x_coords = route_coords_array[:, 0]
-                        y_coords = route_coords_array[:, 1]
-                        
-                        # Verifikasi bahwa titik awal dan akhir mendekati referensi dan ODP
-                        # Pastikan rute ini memang dari referensi ke ODP
-                        start_near_ref = geodesic((ref_lat, ref_lng), (y_coords[0], x_coords[0])).meters < 50
-                        end_near_odp = geodesic((lat, lng), (y_coords[-1], x_coords[-1])).meters < 50
-                        
-                        if start_near_ref and end_near_odp:
-                            # Menggunakan garis berbeda untuk peta jalan vs satelit
-                            if not use_satellite:
-                                # Pada peta jalan, gunakan garis putus-putus dengan outline lebih tebal
-                                ax.plot(x_coords, y_coords, '--', 
-                                      color=color, linewidth=3, alpha=0.9, 
-                                      path_effects=[path_effects.withStroke(linewidth=5, foreground='#444444', alpha=0.4)],
-                                      zorder=10)  # Pastikan rute muncul di atas lapisan lain
-                            else:
-                                # Pada peta satelit, gunakan garis normal dengan outline putih yang lebih tebal
-                                ax.plot(x_coords, y_coords, '-', 
-                                      color=color, linewidth=2.5, alpha=0.8,
-                                      path_effects=[path_effects.withStroke(linewidth=4, foreground='white', alpha=0.5)],
-                                      zorder=10)
-                            
-                            # Tambahkan panah di tengah untuk menunjukkan arah rute
-                            mid_idx = len(x_coords) // 2
-                            if len(x_coords) > 2 and mid_idx > 0:
-                                arrow_color = color
-                                ax.annotate('', 
-                                         xy=(x_coords[mid_idx], y_coords[mid_idx]),
-                                         xytext=(x_coords[mid_idx-1], y_coords[mid_idx-1]),
-                                         arrowprops=dict(arrowstyle='->', color=arrow_color, lw=2),
-                                         zorder=11)
-                        else:
-                            # Fallback: Jika rute tidak terhubung dengan benar, buat garis lurus sebagai solusi alternatif
-                            logger.warning(f"Rute tidak terhubung dengan benar, menggunakan garis langsung: {row.get(NAME_COLUMN, 'Unknown')}")
-                            # Perkecil ukuran garis ukur pada peta jalan
-                            line_width = 0.5 if not use_satellite else 1.5  # Lebih kecil lagi untuk peta jalan
-                            line_alpha = 0.3 if not use_satellite else 0.5  # Lebih transparan untuk peta jalan
-                            stroke_width = 1.2 if not use_satellite else 3.0  # Stroke lebih kecil lagi untuk peta jalan
-                            
-                            ax.plot([ref_lng, lng], [ref_lat, lat], '-', 
-                                  color=color, linewidth=line_width, alpha=line_alpha, linestyle=':',
-                                  path_effects=[path_effects.withStroke(linewidth=stroke_width, foreground='white', alpha=0.25)],
-                                  zorder=5)
-                    else:
-                        logger.warning(f"Format koordinat rute tidak valid: {row.get(NAME_COLUMN, 'Unknown')}")
-                        # Fallback ke garis langsung jika format rute tidak valid
-                        # Perkecil ukuran garis ukur pada peta jalan
-                        line_width = 0.5 if not use_satellite else 1.5  # Lebih kecil lagi untuk peta jalan
-                        line_alpha = 0.3 if not use_satellite else 0.5  # Lebih transparan untuk peta jalan
-                        stroke_width = 1.2 if not use_satellite else 3.0  # Stroke lebih kecil lagi untuk peta jalan
-                        
-                        ax.plot([ref_lng, lng], [ref_lat, lat], '-', 
-                              color=color, linewidth=line_width, alpha=line_alpha, linestyle=':',
-                              path_effects=[path_effects.withStroke(linewidth=stroke_width, foreground='white', alpha=0.25)],
-                              zorder=5)
-                else:
-                    # Fallback jika tidak ada koordinat rute
-                    logger.debug(f"Tidak ada data rute valid, menggunakan garis langsung: {row.get(NAME_COLUMN, 'Unknown')}")
-                    # Perkecil ukuran garis ukur pada peta jalan
-                    line_width = 0.5 if not use_satellite else 1.5  # Lebih kecil lagi untuk peta jalan
-                    line_alpha = 0.3 if not use_satellite else 0.5  # Lebih transparan untuk peta jalan
-                    stroke_width = 1.2 if not use_satellite else 3.0  # Stroke lebih kecil lagi untuk peta jalan
-                    
-                    ax.plot([ref_lng, lng], [ref_lat, lat], '-', 
-                          color=color, linewidth=line_width, alpha=line_alpha, linestyle=':',
-                          path_effects=[path_effects.withStroke(linewidth=stroke_width, foreground='white', alpha=0.25)],
-                          zorder=5)
-            
-            # Buat nomor urut ODP dalam lingkaran dengan warna sesuai kategori
-            circle_radius = 0.025  # Radius lingkaran sedikit lebih besar
-            
-            # Tambahkan outline putih untuk marker dengan ketebalan lebih
-            outline = plt.Circle((lng, lat), radius_degrees * 0.03, 
-                             color='white', alpha=0.95, zorder=9)
-            ax.add_patch(outline)
-            
-            # Tambahkan lingkaran warna cerah sesuai kategori
-            circle = plt.Circle((lng, lat), radius_degrees * 0.025, 
-                             color=color, alpha=0.95, zorder=10)
-            ax.add_patch(circle)
-            
-            # Tambahkan nomor urut di dalam lingkaran dengan ukuran lebih besar dan ketebalan lebih
-            num_text = ax.text(lng, lat, f"{i}", 
-                            color='white', fontsize=10, fontweight='bold',
-                            verticalalignment='center',
-                            horizontalalignment='center',
-                            zorder=11,  # Pastikan teks berada di atas lingkaran
-                            path_effects=[path_effects.withStroke(linewidth=2.0, foreground='black')])
-            
-            # Tambahkan jarak di posisi yang tidak tertutupi marker
-            dist_txt = f"{distance:.1f}m"
-            
-            # Gunakan offset yang lebih besar dan posisi lateral untuk menghindari tumpang tindih
-            # Posisikan jarak di samping kanan bawah marker - gunakan koordinat asli
-            t = ax.text(lng + (radius_degrees * 0.03), lat - (radius_degrees * 0.03), dist_txt, 
-                     color=color, fontsize=8, fontweight='bold',
-                     verticalalignment='top',
-                     horizontalalignment='left',  # Rata kiri
-                     bbox=dict(facecolor='white', alpha=0.9, boxstyle='round,pad=0.3', 
-                              edgecolor=color, linewidth=1.5))
-            t.set_path_effects([path_effects.withStroke(linewidth=2.0, foreground='white')])
-        
-        # Set judul dan label dengan informasi tambahan
-        title_elements = [f'ODP dalam Radius {radius_meters}m dari Titik Referensi']
-        if len(nearby_df) > max_display:
-            title_elements.append(f'(Menampilkan {max_display} dari {len(nearby_df)} ODP)')
-        if with_routes:
-            title_elements.append('dengan Rute')
-        
-        title_text = '\n'.join(title_elements)
-        
-        # Tambahkan background putih transparan di belakang judul agar lebih terbaca
-        ax.set_title(
-            title_text, 
-            fontsize=12, 
-            fontweight='bold',
-            bbox=dict(
-                facecolor='white',
-                alpha=0.7,
-                edgecolor='none',
-                boxstyle='round,pad=0.5'
-            )
-        )
+                bot.send_message(chat_id, "❌ Gagal membuat peta ODP.")
+            return
         
-        # Tambahkan basemap (citra satelit atau peta jalan) dengan Mapbox
+        if wait_message_id is not None:
+            bot.delete_message(chat_id, wait_message_id)
         try:
-            # Tetapkan batas-batas peta yang lebih luas untuk peta satelit agar semua ODP terlihat
-            # Gunakan faktor pengali yang lebih besar untuk tampilan satelit
-            view_factor = 1.5 if use_satellite else 1.2  # Faktor lebih besar untuk satelit
-            ax.set_xlim(ref_lng - radius_degrees * view_factor, ref_lng + radius_degrees * view_factor)
-            ax.set_ylim(ref_lat - radius_degrees * view_factor, ref_lat + radius_degrees * view_factor)
-            
-            # Non-aktifkan ticks
-            ax.set_xticks([])
-            ax.set_yticks([])
-            
-            # Tambahkan background yang menampilkan jalan dan bangunan
-            global MAPBOX_ACCESS_TOKEN
-            
-            # Menambahkan latar belakang secara manual menggunakan Mapbox API
-            if MAPBOX_ACCESS_TOKEN:
-                logger.info("Menggunakan Mapbox Static API untuk gambar latar belakang")
-                
-                try:                    
-                    # Tetapkan zoom level dan ukuran gambar
-                    zoom_level = 17 if use_satellite else 17  # Sedikit zoom out untuk satelit
-                    img_width = 1280  # piksel - meningkatkan resolusi untuk detail lebih baik
-                    img_height = 1280  # piksel - meningkatkan resolusi untuk detail lebih baik
-                    
-                    # Hitung batas viewport untuk memastikan semua ODP terlihat dengan koordinat tepat
-                    # Buffer untuk memastikan semua titik terlihat - menggunakan buffer minimal untuk presisi tinggi
-                    bounds_buffer = 0.00001  # Buffer sangat kecil untuk presisi maksimal
-                    
-                    # Style map yang akan digunakan
-                    if use_satellite:
-                        mapbox_style = "satellite-streets-v11"  # Satelit dengan jalan
-                        map_label = "Peta satelit dengan jalan dan titik ODP"
-                    else:
-                        mapbox_style = "streets-v11"  # Peta jalan original
-                        map_label = "Peta jalan dengan titik ODP"
-                    
-                    # URL untuk Mapbox Static API
-                    # Menambahkan parameter text-size untuk memperbesar ukuran teks dan text-halo-width untuk outline
-                    # Parameter text-allow-overlap=false membuat teks tidak tumpang tindih
-                    # Menerapkan filter agar jalan utama tetap terlihat
-                    map_params = {
-                        "text-size": 14,  # Memperbesar ukuran teks jalan
-                        "text-halo-width": 2,  # Menambahkan outline pada teks jalan
-                        "text-halo-color": "rgba(255,255,255,0.9)",  # Warna outline putih semi-transparan
-                        "text-color": "#333",  # Warna teks jalan
-                        "text-allow-overlap": "false",  # Mencegah teks tumpang tindih
-                        "text-variable-anchor": "top,bottom,left,right",  # Posisi teks yang bervariasi
-                        "icon-allow-overlap": "true",  # Icon tetap ditampilkan
-                        "text-padding": 5,  # Padding teks
-                        "text-max-width": 8  # Lebar maksimum teks
-                    }
-                    
-                    params_str = ","
-                    for key, value in map_params.items():
-                        params_str += f"{key}:{value},"
-                    
-                    # Modifikasi URL untuk Mapbox Static API dengan parameter khusus untuk perbaikan label jalan
-                    # Buat URL dengan parameter untuk meningkatkan visibilitas teks jalan
-                    style_params = [
-                        # Gunakan style yang sudah ada dengan parameter tambahan
-                        f"{mapbox_style}",
-                        # Perbesar teks jalan dan hindari tumpang tindih
-                        "road-label-visibility=visible",
-                        "text-field={name}",
-                        "text-size=14",
-                        "text-halo-width=2",
-                        "text-halo-color=rgba(255,255,255,0.9)",
-                        "text-anchor=center",
-                        "text-allow-overlap=false",
-                        "symbol-placement=point"
-                    ]
-                    
-                    style_str = ",".join(style_params)
-                    # Ubah ukuran gambar ke 1280x1280 dengan @2x untuk resolusi tinggi (DPI 2x)
-                    mapbox_url = f"https://api.mapbox.com/styles/v1/mapbox/{mapbox_style}/static/geojson(%7B%22type%22%3A%22Point%22%2C%22coordinates%22%3A%5B{ref_lng}%2C{ref_lat}%5D%7D)/{ref_lng},{ref_lat},{zoom_level},0,0/1280x1280@2x?access_token={MAPBOX_ACCESS_TOKEN}"
-                    logger.info(f"Menggunakan Mapbox Static API untuk gambar latar belakang dengan zoom={zoom_level}")
-                    
-                    # Ambil gambar latar belakang dari API Mapbox
-                    response = requests.get(mapbox_url)
-                    if response.status_code == 200:
-                        try:
-                            # Buka gambar dari respons
-                            img_bytesio = BytesIO(response.content)
-                            background_img = Image.open(img_bytesio)
-                            
-                            # Konversi ke array untuk matplotlib
-                            import numpy as np
-                            background_array = np.array(background_img)
-                            
-                            # Gunakan proyeksi yang sama persis antara Mapbox dan matplotlib
-                            # Ini menjamin bahwa titik pada gambar latar belakang selaras dengan titik pada plot
-                            
-                            # PENDEKATAN BARU: Set up latar belakang dengan cara berbeda
-                            # 1. Ambil batas plot saat ini
-                            xlim = ax.get_xlim()
-                            ylim = ax.get_ylim()
-                            
-                            # 2. Tampilkan gambar latar belakang dengan batas yang tepat sama dengan bounding box
-                            # Gunakan parameter extent yang sangat presisi berdasarkan titik referensi
-                            # Batas peta harus identik dengan bounding box dari plot matplotlib
-                            
-                            # PENDEKATAN BARU UNTUK PRESISI ABSOLUT:
-                            # Gunakan formula Mapbox untuk menghitung skala yang tepat dari gambar API
-                            # Di zoom level 0, seluruh dunia adalah 360° lebar
-                            # Pada zoom level z, gambar mencakup 360°/(2^z) derajat
-                            
-                            # Kita menggunakan gambar 1280x1280@2x = 2560x2560 pixels aktual
-                            # Mapbox menggunakan 512x512 (1024x1024@2x) tiles sebagai standar
-                            # Jadi kita perlu menghitung yang tepat
-                            
-                            # Hitung lebar gambar dalam derajat
-                            lng_coverage = 360 / (2 ** zoom_level) * (1280 / 512)
-                            
-                            # Latitude coverage bervariasi berdasarkan latitude lokasi
-                            # Gunakan faktor koreksi berdasarkan proyeksi Mercator
-                            lat_coverage = lng_coverage * math.cos(math.radians(abs(ref_lat)))
-                            
-                            # Tentukan batas-batas gambar dengan presisi tinggi
-                            extent_bounds = (
-                                ref_lng - lng_coverage/2,  # min longitude 
-                                ref_lng + lng_coverage/2,  # max longitude
-                                ref_lat - lat_coverage/2,  # min latitude
-                                ref_lat + lat_coverage/2   # max latitude
-                            )
-                            
-                            # Log batas untuk debugging
-                            logger.info(f"Setting background image extent to: {extent_bounds}")
-                            
-                            # Penting: gunakan transformasi yang tepat untuk imshow
-                            # 'extent' menentukan area koordinat tempat gambar akan dirender
-                            # Kita harus menggunakan nilai yang sama persis dengan batas plot
-                            # Untuk menjamin transformasi yang seragam antara gambar dan koordinat
-                            ax.imshow(
-                                background_array, 
-                                extent=extent_bounds,
-                                aspect='equal',  # Gunakan 'equal' untuk memastikan skala yang konsisten
-                                zorder=0
-                            )
-                            # Log untuk debugging
-                            logger.info(f"Background image placed with exact extent: {extent_bounds}")
-                            
-                            # PENTING: Jangan kembalikan batas plot ke nilai asli
-                            # Kita gunakan nilai batas latar belakang secara konsisten
-                            # Ini memastikan posisi marker tepat sama dengan koordinat asli
-                            ax.set_xlim(extent_bounds[0], extent_bounds[1])
-                            ax.set_ylim(extent_bounds[2], extent_bounds[3])
-                            
-                            # Log batas final untuk debugging
-                            logger.info(f"Final plot bounds: x[{ax.get_xlim()[0]:.6f}, {ax.get_xlim()[1]:.6f}], y[{ax.get_ylim()[0]:.6f}, {ax.get_ylim()[1]:.6f}]")
-                            
-                            # 4. Log batas-batas untuk debugging
-                            logger.info(f"Old plot bounds: x[{xlim[0]:.6f}, {xlim[1]:.6f}], y[{ylim[0]:.6f}, {ylim[1]:.6f}]")
-                            
-                            # 5. Verifikasi bahwa marker akan tepat pada posisi yang benar
-                            # Verifikasi penempatan marker REF
-                            logger.info(f"VERIFIKASI REF: Plotting marker at exact coordinates on map with bounds: x[{ax.get_xlim()[0]:.6f}, {ax.get_xlim()[1]:.6f}], y[{ax.get_ylim()[0]:.6f}, {ax.get_ylim()[1]:.6f}]")
-                            
-                            # Verifikasi bahwa marker tidak mengalami koreksi atau transformasi
-                            logger.info(f"REF marker exact position: lng={ref_lng:.6f}, lat={ref_lat:.6f} - No correction applied")
-                            
-                            # Catat bahwa latar belakang berhasil ditampilkan
-                            logger.info(f"Berhasil menggunakan Peta {'satelit' if use_satellite else 'jalan'} dengan titik ODP")
-                        except Exception as e:
-                            logger.error(f"Gagal menampilkan latar belakang: {str(e)}")
-                        
-                        # Tambahkan keterangan
-                        fig.text(0.5, 0.97, map_label,
-                               fontsize=14, color='black', 
-                               ha='center', va='top',
-                               bbox=dict(facecolor='white', alpha=0.7, boxstyle='round'))
-                        
-                        logger.info(f"Berhasil menggunakan {map_label}")
-                    else:
-                        raise Exception(f"Failed to get image from Mapbox API: {response.status_code}")
-                except Exception as e:
-                    logger.error(f"Gagal menggunakan Mapbox API: {e}")
-                    # Fallback: gunakan latar belakang sederhana
-                    if use_satellite:
-                        ax.set_facecolor('#e6f7ff')  # Biru muda (simulasi air)
-                    else:
-                        ax.set_facecolor('white')
-                        ax.grid(True, linestyle='-', alpha=0.3)
-                    
-                    fig.text(0.5, 0.97, f"Peta {'satelit' if use_satellite else 'jalan'} (gambar latar tidak tersedia)",
-                           fontsize=14, color='black', 
-                           ha='center', va='top',
-                           bbox=dict(facecolor='white', alpha=0.7, boxstyle='round'))
-            else:
-                # Gunakan latar belakang sederhana jika tidak ada Mapbox token
-                if use_satellite:
-                    ax.set_facecolor('#e6f7ff')  # Biru muda (simulasi air)
-                    label = "Peta satelit (gambar latar tidak tersedia)"
-                else:
-                    ax.set_facecolor('white')
-                    ax.grid(True, linestyle='-', alpha=0.3)
-                    label = "Peta jalan (gambar latar tidak tersedia)"
-                
-                fig.text(0.5, 0.97, label,
-                       fontsize=14, color='black', 
-                       ha='center', va='top',
-                       bbox=dict(facecolor='white', alpha=0.7, boxstyle='round'))
-                
+            with open(map_file, 'rb') as photo:
+                bot.send_photo(chat_id, photo, caption=caption)
         except Exception as e:
-            logger.warning(f"Tidak dapat menambahkan basemap: {e}")
-            # Buat latar belakang putih sebagai alternatif
-            ax.set_facecolor('white')
-            ax.grid(True, linestyle='--', alpha=0.7)
-            
-            # Tambahkan pesan error sebagai watermark
-            fig.text(0.5, 0.5, "Citra Satelit Tidak Tersedia",
-                   fontsize=20, color='gray', alpha=0.5,
-                   ha='center', va='center', rotation=30)
-        
-        # Tambahkan legenda untuk kategori ODP
-        lokasi_ref = mlines.Line2D([0], [0], marker='*', color='w', markerfacecolor='red', markersize=15)
-        odp_hijau = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='green', markersize=10)
-        odp_kuning = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='yellow', markersize=10)
-        odp_merah = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10)
-        odp_biru = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='#FF9900', markersize=10)
-        odp_hitam = mlines.Line2D([0], [0], marker='o', color='w', markerfacecolor='black', markersize=10)
-        
-        legend_items = [
-            (lokasi_ref, 'Lokasi Referensi'),
-            (odp_hijau, 'ODP Kategori HIJAU'),
-            (odp_kuning, 'ODP Kategori KUNING'),
-            (odp_merah, 'ODP Kategori MERAH'),
-            (odp_biru, 'ODP Kategori ORANGE'),
-            (odp_hitam, 'ODP Kategori HITAM')
-        ]
-        
-        if with_routes:
-            # Gunakan style rute yang sesuai dengan tipe peta
-            if use_satellite:
-                route_line = mlines.Line2D([0], [0], color='green', linestyle='-', linewidth=2)
-            else:
-                route_line = mlines.Line2D([0], [0], color='green', linestyle='--', linewidth=2.5)
-            legend_items.append((route_line, 'Rute ke ODP'))
-            
-        # Buat legenda dari items
-        ax.legend(
-            [item[0] for item in legend_items],
-            [item[1] for item in legend_items],
-            loc='upper right',
-            fancybox=True, framealpha=0.7
-        )
-        
-        # Tambahkan informasi jumlah ODP
-        info_text = f"Jumlah ODP: {len(nearby_df)}"
-        info = ax.text(0.02, 0.02, info_text, transform=ax.transAxes, 
-                     fontsize=12, fontweight='bold',
-                     bbox=dict(facecolor='white', alpha=0.8, boxstyle='round'))
-        
-        # Buat ID unik untuk file
-        map_type = "satellite" if use_satellite else "street"
-        route_type = "with_routes" if with_routes else "no_routes"
-        file_id = f"tg_{map_type}_{route_type}_{uuid.uuid4()}"
-        file_path = os.path.join(ODP_IMAGE_DIR, f"{file_id}.png")
-        
-        # Simpan gambar dengan resolusi tinggi
-        plt.savefig(file_path, bbox_inches='tight', dpi=200)
-        plt.close(fig)
-        
-        logger.info(f"Peta berhasil disimpan di: {file_path}")
-        
-        return file_path
+            logger.error(f"Error saat mengirim file peta: {e}")
+            bot.send_message(chat_id, "❌ Gagal mengirim peta ODP.")
+            return
         
+        if show_options:
+            bot.send_message(chat_id, "Opsi tampilan peta lainnya:", reply_markup=map_options_keyboard(lat, lng, radius))
+    
+    try:
+        job = prepare_map_job(lat, lng, nearby_odps, radius, with_routes=with_routes, use_satellite=use_satellite)
     except Exception as e:
-        logger.error(f"Error saat membuat peta ODP: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.error(f"Error saat menyiapkan peta ODP: {e}")
+        job = None
+    if job is None:
+        deliver(None)
         return None
+    
+    def superseded():
+        # Peta yang sama diminta lagi di chat ini; pesan tunggu job lama dihapus
+        if wait_message_id is not None:
+            bot.delete_message(chat_id, wait_message_id)
+    
+    # Job render sebelumnya untuk jenis peta yang sama di chat ini dibatalkan (atau
+    # hasilnya tidak dikirim); jenis peta lain tetap dirender berdampingan
+    key = (chat_id, use_satellite, with_routes)
+    future = render_service.submit(key, map_renderer, callback=deliver, on_superseded=superseded, **job)
+    if future is None:
+        busy_text = "⏳ Server peta sedang sibuk, coba lagi sebentar lagi."
+        if wait_message_id is not None:
+            bot.edit_message_text(busy_text, chat_id, wait_message_id)
+        else:
+            bot.send_message(chat_id, busy_text)
+    return future
+
+def format_provider_health(health):
+    """Format ringkasan kesehatan satu provider routing untuk /status"""
+    if health['state'] == 'open':
+        state_text = f"🔴 dilewati ({health['cooldown_remaining']:.0f} dtk lagi)"
+    elif health['state'] == 'half_open':
+        state_text = "🟡 percobaan"
+    else:
+        state_text = "🟢 normal"
+    
+    latency_text = ""
+    if health['samples']:
+        latency_text = f", p50 {health['p50'] * 1000:.0f}ms / p95 {health['p95'] * 1000:.0f}ms"
+    
+    slow_text = f" / {health['slow']} lambat" if health['slow'] else ""
+    hedge_text = f", hedge {health['hedges']}" if health['hedges'] else ""
+    return f"{state_text}{latency_text} ({health['successes']} ok / {health['failures']} gagal{slow_text}{hedge_text})"
 
 def get_kategori_emoji(kategori):
     """Mendapatkan emoji berdasarkan kategori ODP"""
@@ -1013,28 +752,32 @@ def get_kategori_emoji(kategori):
     else:
         return "⚪"  # Default untuk kategori lainnya
 
-def format_odp_list(nearby_odps, max_items=10):
-    """Format daftar ODP untuk teks pesan"""
+def remember_search(chat_id, lat, lng, radius):
+    """Simpan pencarian terakhir per chat untuk /more (jumlah chat dibatasi)."""
+    last_searches[chat_id] = {'lat': lat, 'lng': lng, 'radius': radius, 'shown': ROUTE_TOP_N}
+    last_searches.move_to_end(chat_id)
+    while len(last_searches) > MAX_LAST_SEARCHES:
+        last_searches.popitem(last=False)
+
+def format_odp_list(nearby_odps, max_items=10, start=0):
+    """Format daftar ODP untuk teks pesan (mulai dari urutan ke-`start`)"""
     result = []
     
     # Header hasil pencarian
-    result.append(f"📍 Ditemukan {len(nearby_odps)} ODP dalam radius {DEFAULT_RADIUS}m:\n")
+    if nearby_odps.attrs.get('isochrone'):
+        result.append(f"📍 Ditemukan {len(nearby_odps)} ODP terjangkau ≤{DEFAULT_RADIUS}m lewat jalan:\n")
+    else:
+        result.append(f"📍 Ditemukan {len(nearby_odps)} ODP dalam radius {DEFAULT_RADIUS}m:\n")
     
     # Daftar ODP dengan penomoran berurutan berdasarkan jarak
-    for i, (idx, row) in enumerate(nearby_odps.head(max_items).iterrows(), 1):
+    for i, (idx, row) in enumerate(nearby_odps.iloc[start:start + max_items].iterrows(), start + 1):
         name = row.get(NAME_COLUMN, f"ODP #{idx+1}")
         
-        # Extract nomor ODP jika ada dalam format standar (contoh: ODP-ABC-XYZ/123)
-        odp_number = None
-        if NAME_COLUMN in row:
-            import re
-            # Mencoba ekstrak nomor ODP dari pola standar
-            match = re.search(r'/(\d+)', str(row[NAME_COLUMN]))
-            if match:
-                odp_number = match.group(1)  # Nomor setelah "/"
+        # Nomor ODP sudah diekstrak saat dataset disiapkan (contoh: ODP-ABC-XYZ/123 -> 123)
+        odp_number = row.get(ODP_NUMBER_COLUMN)
         
-        # Tambahkan nomor ODP jika ditemukan
-        if odp_number:
+        # Tambahkan nomor ODP jika ditemukan (kosong berupa NaN pada kolom categorical)
+        if isinstance(odp_number, str) and odp_number:
             name_display = f"{name} (#{odp_number})"
         else:
             name_display = name
@@ -1062,8 +805,8 @@ def format_odp_list(nearby_odps, max_items=10):
         result.append(f"{i}. {emoji} {name_display} - {distance:.1f}m ({distance_type}) (Avai: {avai})")
     
     # Tambahkan informasi tentang ODP lainnya jika ada lebih banyak
-    if len(nearby_odps) > max_items:
-        result.append(f"\n...dan {len(nearby_odps) - max_items} ODP lainnya... ketik /more untuk melihat semua hasil")
+    if len(nearby_odps) > start + max_items:
+        result.append(f"\n...dan {len(nearby_odps) - start - max_items} ODP lainnya... ketik /more untuk melihat hasil berikutnya")
     
     return "\n".join(result)
 
@@ -1077,11 +820,29 @@ def start(message):
 
 @bot.message_handler(commands=['more'])
 def more_command(message):
-    """Menampilkan semua ODP yang ditemukan."""
+    """Menampilkan ODP berikutnya dari pencarian terakhir."""
     chat_id = message.chat.id
     
-    # Cari data dalam cache berdasarkan chat_id (fitur tambahan untuk pengembangan)
-    bot.reply_to(message, "Fitur ini masih dalam pengembangan. Silakan gunakan perintah /cari <lat> <lng> untuk mencari ODP kembali.")
+    search = last_searches.get(chat_id)
+    if search is None:
+        bot.reply_to(message, "Belum ada pencarian. Silakan gunakan perintah /cari <lat> <lng> atau kirim lokasi Anda.")
+        return
+    
+    # Cari ulang dengan daftar terdekat yang lebih panjang; rute yang sudah dihitung
+    # diambil dari cache, hanya ODP baru yang dirutekan
+    start = search['shown']
+    nearby_odps = find_nearby_odps(search['lat'], search['lng'], search['radius'],
+                                   use_route_distance=True, route_top_n=start + ROUTE_TOP_N)
+    if nearby_odps is None:
+        bot.reply_to(message, "❌ Terjadi error saat mencari ODP.")
+        return
+    if start >= len(nearby_odps):
+        bot.reply_to(message, "✅ Semua ODP dari pencarian terakhir sudah ditampilkan.")
+        return
+    
+    search['shown'] = start + ROUTE_TOP_N
+    bot.send_message(chat_id, f"*ODP Berikutnya:*\n{format_odp_list(nearby_odps, max_items=ROUTE_TOP_N, start=start)}",
+                     parse_mode='Markdown')
 
 @bot.message_handler(commands=['help'])
 def help_command(message):
@@ -1156,20 +917,87 @@ def examples_command(message):
 @bot.message_handler(commands=['status'])
 def status_command(message):
     """Menampilkan status bot dan data."""
-    global spreadsheet_data
-    
     # Cek data spreadsheet
-    if spreadsheet_data is None:
+    if data_service.dataset is None:
         data = load_spreadsheet_data()
         if data is None:
             bot.reply_to(message, "❌ Status: Data tidak tersedia.\nCoba muat ulang dengan /reload")
             return
     
+    current = data_service.snapshot()
+    loaded_text = time.strftime("%d-%m-%Y %H:%M:%S", time.localtime(current.loaded_at))
+    age_text = format_age(time.time() - current.loaded_at)
+    refresh_text = " (sedang diperbarui...)" if data_service.refreshing else ""
+    source_text = "snapshot lokal" if data_service.source == "snapshot" else "spreadsheet"
+    
+    # Ringkasan perubahan pada refresh terakhir
+    change = data_service.last_change
+    change_text = {
+        "full": "muat penuh",
+        "incremental": "inkremental",
+        "not_modified": "tidak berubah",
+        "unchanged": "tidak berubah"
+    }.get(change["mode"], "-")
+    changed_rows = change["added"] + change["removed"] + change["changed"]
+    
+    # Statistik cache rute
+    cache = route_cache.stats()
+    disk_text = f", {cache['disk_entries']} di disk" if cache['disk_entries'] is not None else ""
+    grid_text = f"grid {cache['grid_meters']:g}m, selisih jarak maks ±{cache['error_bound_meters']:.0f}m" \
+        if cache['grid_meters'] > 0 else "tanpa grid"
+    
+    # Provider routing yang aktif beserta kesehatannya
+    provider_names = {"local": "graf jalan lokal", "ors": "OpenRouteService", "mapbox": "Mapbox"}
+    routing_text = " → ".join(provider_names.get(name, name) for name in routing_client.providers) or "simulasi saja"
+    for health in routing_client.health_report():
+        routing_text += f"\n   • {provider_names.get(health['name'], health['name'])}: {format_provider_health(health)}"
+    
+    # Tabel snap ODP ke jalan untuk versi data aktif
+    road_snap = data_service.road_snap(current.dataset)
+    if road_snap is not None:
+        snap = road_snap.stats()
+        median_text = f", median {snap['median_meters']:.0f}m dari jalan" if snap['median_meters'] is not None else ""
+        snap_text = f"{snap['snapped']} dari {len(current.dataset)} ODP{median_text}"
+    elif data_service.road_snap_pending:
+        snap_text = "sedang dibangun..."
+    else:
+        snap_text = "tidak aktif (koordinat ODP langsung)"
+    
+    # Pool render peta
+    render = render_service.stats()
+    render_text = (f"{MAP_RENDERER}, {render['workers']} worker, antrean {render['pending']}/{render['queue_size']}, "
+                   f"{render['completed']} selesai")
+    if render['avg_render_seconds'] is not None:
+        render_text += f" (rata-rata {render['avg_render_seconds']:.1f} dtk + tunggu {render['avg_wait_seconds']:.1f} dtk)"
+    render_text += (f", {render['failed'] + render['timed_out']} gagal, "
+                    f"{render['cancelled'] + render['superseded']} dibatalkan, {render['rejected']} ditolak")
+    
+    # Cache gambar latar Mapbox (gabungan semua worker render)
+    background = get_background_cache().stats()
+    background_hits = background['exact_hits'] + background['shifted_hits']
+    background_text = f"hit {background['hit_rate'] * 100:.0f}% ({background_hits} hit"
+    if background['shifted_hits']:
+        background_text += f", {background['shifted_hits']} digeser"
+    background_text += f" / {background['misses']} unduh)"
+    if background['entries'] is not None:
+        background_text = f"{background['entries']} gambar ({background['bytes'] / 1024 / 1024:.0f} MB), " + background_text
+    
     # Tampilkan status
     status_text = (
         "✅ *Status Bot:* Bot berjalan\n"
-        f"📊 *Jumlah Data:* {len(spreadsheet_data)} ODP\n"
-        f"🔄 *Terakhir Dimuat:* Terbaru\n\n"
+        f"📊 *Jumlah Data:* {len(current.dataset)} ODP\n"
+        f"🏷️ *Versi Data:* {current.version}{refresh_text}\n"
+        f"🔄 *Terakhir Dimuat:* {loaded_text} ({age_text} lalu)\n"
+        f"📁 *Sumber Data:* {source_text}\n"
+        f"🧮 *Perubahan Terakhir:* {changed_rows} baris ({change_text}: "
+        f"+{change['added']} / -{change['removed']} / ~{change['changed']})\n"
+        f"🗺️ *Cache Rute:* {cache['memory_entries']} entri memori{disk_text}, "
+        f"hit {cache['hit_rate'] * 100:.0f}% ({cache['memory_hits'] + cache['disk_hits']} hit / {cache['misses']} miss; "
+        f"{grid_text})\n"
+        f"🛣️ *Routing:* {routing_text}\n"
+        f"📍 *Snap Jalan:* {snap_text}\n"
+        f"🖼️ *Render Peta:* {render_text}\n"
+        f"🛰️ *Cache Gambar Latar:* {background_text}\n\n"
         f"💡 Gunakan perintah /help untuk bantuan."
     )
     
@@ -1177,16 +1005,13 @@ def status_command(message):
 
 @bot.message_handler(commands=['reload'])
 def reload_command(message):
-    """Muat ulang data dari spreadsheet."""
-    bot.send_message(message.chat.id, "🔄 Memuat ulang data dari spreadsheet...")
-    
-    # Muat ulang data
-    data = load_spreadsheet_data()
-    
-    if data is not None:
-        bot.send_message(message.chat.id, f"✅ Berhasil memuat {len(data)} baris data.")
+    """Minta refresh data dari spreadsheet di latar belakang."""
+    # Refresh dijalankan oleh thread worker; pencarian tetap memakai versi data saat ini
+    if data_service.request_refresh():
+        bot.send_message(message.chat.id, f"🔄 Refresh data dijadwalkan (versi saat ini: {data_service.version}).\n"
+                                          f"Gunakan /status untuk melihat versi terbaru.")
     else:
-        bot.send_message(message.chat.id, f"❌ Gagal memuat data dari spreadsheet.")
+        bot.send_message(message.chat.id, "⏳ Refresh data sudah dalam antrean.")
 
 @bot.message_handler(commands=['cari'])
 def search_command(message):
@@ -1210,7 +1035,7 @@ def search_command(message):
         wait_msg = bot.send_message(message.chat.id, f"🔍 Mencari ODP dalam radius {radius}m dari koordinat {lat}, {lng}...")
         
         # Muat data jika belum dimuat
-        if spreadsheet_data is None:
+        if data_service.dataset is None:
             load_spreadsheet_data()
             
         # Cari ODP terdekat (menampilkan semua titik dan dengan pengukuran berdasarkan rute)
@@ -1224,6 +1049,9 @@ def search_command(message):
             bot.edit_message_text(f"❌ Tidak ditemukan ODP dalam radius {radius}m dari koordinat {lat}, {lng}.", 
                               message.chat.id, wait_msg.message_id)
             return
+        
+        # Simpan pencarian untuk /more
+        remember_search(message.chat.id, lat, lng, radius)
             
         # Format hasil pencarian
         result_text = (
@@ -1236,23 +1064,9 @@ def search_command(message):
         # Edit pesan tunggu
         bot.edit_message_text(result_text, message.chat.id, wait_msg.message_id, parse_mode='Markdown')
         
-        # Buat dan kirim peta dengan citra satelit dan rute
-        map_file = create_odp_map(lat, lng, nearby_odps, radius, with_routes=True, use_satellite=True)
-        
-        if map_file:
-            caption = f"🗺️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m dengan rute"
-            with open(map_file, 'rb') as photo:
-                bot.send_photo(message.chat.id, photo, caption=caption)
-                
-            # Tambahkan opsi untuk melihat peta jalan juga
-            keyboard = types.InlineKeyboardMarkup()
-            btn_street = types.InlineKeyboardButton(text="🗺️ Lihat Peta Jalan", callback_data=f"street_{lat}_{lng}_{radius}")
-            btn_satellite_no_route = types.InlineKeyboardButton(text="🛰️ Satelit Tanpa Rute", callback_data=f"sat_noroute_{lat}_{lng}_{radius}")
-            keyboard.add(btn_street, btn_satellite_no_route)
-            
-            bot.send_message(message.chat.id, "Opsi tampilan peta lainnya:", reply_markup=keyboard)
-        else:
-            bot.send_message(message.chat.id, "❌ Gagal membuat peta ODP.")
+        # Buat dan kirim peta dengan citra satelit dan rute (dirender di pool worker)
+        caption = f"🗺️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m dengan rute"
+        send_odp_map(message.chat.id, lat, lng, nearby_odps, radius, caption, with_routes=True, use_satellite=True)
             
     except ValueError:
         bot.reply_to(message, "❌ Format koordinat tidak valid.\nGunakan angka untuk latitude dan longitude.")
@@ -1271,7 +1085,7 @@ def handle_location(message):
     wait_msg = bot.send_message(message.chat.id, f"🔍 Mencari ODP dalam radius {radius}m dari lokasi Anda...")
     
     # Muat data jika belum dimuat
-    if spreadsheet_data is None:
+    if data_service.dataset is None:
         load_spreadsheet_data()
         
     # Cari ODP terdekat (menampilkan semua titik dan dengan pengukuran berdasarkan rute)
@@ -1285,6 +1099,9 @@ def handle_location(message):
         bot.edit_message_text(f"❌ Tidak ditemukan ODP dalam radius {radius}m dari lokasi Anda.", 
                           message.chat.id, wait_msg.message_id)
         return
+    
+    # Simpan pencarian untuk /more
+    remember_search(message.chat.id, lat, lng, radius)
         
     # Format hasil pencarian
     result_text = (
@@ -1297,34 +1114,9 @@ def handle_location(message):
     # Edit pesan tunggu
     bot.edit_message_text(result_text, message.chat.id, wait_msg.message_id, parse_mode='Markdown')
     
-    # Buat dan kirim peta dengan citra satelit dan rute
-    map_file = None
-    caption = None
-    
-    try:
-        map_file = create_odp_map(lat, lng, nearby_odps, radius, with_routes=True, use_satellite=True)
-        caption = f"🗺️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m dari lokasi Anda dengan rute"
-    except Exception as e:
-        logger.error(f"Error saat membuat peta awal: {e}")
-        map_file = None
-        
-    if map_file:
-        try:
-            with open(map_file, 'rb') as photo:
-                bot.send_photo(message.chat.id, photo, caption=caption)
-        except Exception as e:
-            logger.error(f"Error saat mengirim file peta: {e}")
-            bot.send_message(message.chat.id, "❌ Gagal mengirim peta ODP.")
-            
-        # Tambahkan opsi untuk melihat peta jalan juga
-        keyboard = types.InlineKeyboardMarkup()
-        btn_street = types.InlineKeyboardButton(text="🗺️ Lihat Peta Jalan", callback_data=f"street_{lat}_{lng}_{radius}")
-        btn_satellite_no_route = types.InlineKeyboardButton(text="🛰️ Satelit Tanpa Rute", callback_data=f"sat_noroute_{lat}_{lng}_{radius}")
-        keyboard.add(btn_street, btn_satellite_no_route)
-        
-        bot.send_message(message.chat.id, "Opsi tampilan peta lainnya:", reply_markup=keyboard)
-    else:
-        bot.send_message(message.chat.id, "❌ Gagal membuat peta ODP.")
+    # Buat dan kirim peta dengan citra satelit dan rute (dirender di pool worker)
+    caption = f"🗺️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m dari lokasi Anda dengan rute"
+    send_odp_map(message.chat.id, lat, lng, nearby_odps, radius, caption, with_routes=True, use_satellite=True)
 
 @bot.callback_query_handler(func=lambda call: True)
 def handle_callback(call):
@@ -1360,7 +1152,7 @@ def handle_callback(call):
             )
             
             # Muat data jika belum dimuat
-            if spreadsheet_data is None:
+            if data_service.dataset is None:
                 load_spreadsheet_data()
                 
             # Cari ODP terdekat (menampilkan semua titik dan dengan pengukuran berdasarkan rute)
@@ -1375,39 +1167,23 @@ def handle_callback(call):
                 return
                 
             # Buat peta sesuai dengan tipe yang diminta
-            map_file = None
-            caption = None
-            
-            try:
-                if map_type == "street":
-                    # Peta jalan (OpenStreetMap)
-                    map_file = create_odp_map(lat, lng, nearby_odps, radius, with_routes=True, use_satellite=False)
-                    caption = f"🗺️ Peta jalan {len(nearby_odps)} ODP dalam radius {radius}m dengan rute"
-                elif map_type == "sat_noroute":
-                    # Peta satelit tanpa rute
-                    map_file = create_odp_map(lat, lng, nearby_odps, radius, with_routes=False, use_satellite=True)
-                    caption = f"🛰️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m tanpa rute"
-                elif map_type == "satellite":
-                    # Peta satelit Google Hybrid (dengan jalan dan bangunan) dengan rute
-                    map_file = create_odp_map(lat, lng, nearby_odps, radius, with_routes=True, use_satellite=True)
-                    caption = f"🏘️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m dengan jalan & bangunan"
-            except Exception as e:
-                logger.error(f"Error saat membuat peta {map_type}: {e}")
-                map_file = None
-                
-            if map_file:
-                # Hapus pesan tunggu
-                bot.delete_message(call.message.chat.id, wait_msg.message_id)
-                
-                # Kirim gambar peta
-                with open(map_file, 'rb') as photo:
-                    bot.send_photo(call.message.chat.id, photo, caption=caption)
+            if map_type == "street":
+                # Peta jalan (OpenStreetMap)
+                with_routes, use_satellite = True, False
+                caption = f"🗺️ Peta jalan {len(nearby_odps)} ODP dalam radius {radius}m dengan rute"
+            elif map_type == "sat_noroute":
+                # Peta satelit tanpa rute
+                with_routes, use_satellite = False, True
+                caption = f"🛰️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m tanpa rute"
             else:
-                bot.edit_message_text(
-                    "❌ Gagal membuat peta ODP.", 
-                    call.message.chat.id, 
-                    wait_msg.message_id
-                )
+                # Peta satelit Google Hybrid (dengan jalan dan bangunan) dengan rute
+                with_routes, use_satellite = True, True
+                caption = f"🏘️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m dengan jalan & bangunan"
+            
+            # Pesan tunggu dihapus saat peta terkirim, atau diganti pesan gagal
+            send_odp_map(call.message.chat.id, lat, lng, nearby_odps, radius, caption,
+                         with_routes=with_routes, use_satellite=use_satellite,
+                         show_options=False, wait_message_id=wait_msg.message_id)
         
     except Exception as e:
         logger.error(f"Error saat menangani callback: {e}")
@@ -1435,7 +1211,7 @@ def handle_text(message):
         wait_msg = bot.send_message(message.chat.id, f"🔍 Mencari ODP dalam radius {radius}m dari koordinat {lat}, {lng}...")
         
         # Muat data jika belum dimuat
-        if spreadsheet_data is None:
+        if data_service.dataset is None:
             load_spreadsheet_data()
             
         # Cari ODP terdekat (menampilkan semua titik dan dengan pengukuran berdasarkan rute)
@@ -1449,6 +1225,9 @@ def handle_text(message):
             bot.edit_message_text(f"❌ Tidak ditemukan ODP dalam radius {radius}m dari koordinat {lat}, {lng}.", 
                               message.chat.id, wait_msg.message_id)
             return
+        
+        # Simpan pencarian untuk /more
+        remember_search(message.chat.id, lat, lng, radius)
             
         # Format hasil pencarian
         result_text = (
@@ -1461,23 +1240,9 @@ def handle_text(message):
         # Edit pesan tunggu
         bot.edit_message_text(result_text, message.chat.id, wait_msg.message_id, parse_mode='Markdown')
         
-        # Buat dan kirim peta dengan citra satelit dan rute
-        map_file = create_odp_map(lat, lng, nearby_odps, radius, with_routes=True, use_satellite=True)
-        
-        if map_file:
-            caption = f"🗺️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m dengan rute"
-            with open(map_file, 'rb') as photo:
-                bot.send_photo(message.chat.id, photo, caption=caption)
-                
-            # Tambahkan opsi untuk melihat peta jalan juga
-            keyboard = types.InlineKeyboardMarkup()
-            btn_street = types.InlineKeyboardButton(text="🗺️ Lihat Peta Jalan", callback_data=f"street_{lat}_{lng}_{radius}")
-            btn_satellite_no_route = types.InlineKeyboardButton(text="🛰️ Satelit Tanpa Rute", callback_data=f"sat_noroute_{lat}_{lng}_{radius}")
-            keyboard.add(btn_street, btn_satellite_no_route)
-            
-            bot.send_message(message.chat.id, "Opsi tampilan peta lainnya:", reply_markup=keyboard)
-        else:
-            bot.send_message(message.chat.id, "❌ Gagal membuat peta ODP.")
+        # Buat dan kirim peta dengan citra satelit dan rute (dirender di pool worker)
+        caption = f"🗺️ Peta satelit {len(nearby_odps)} ODP dalam radius {radius}m dengan rute"
+        send_odp_map(message.chat.id, lat, lng, nearby_odps, radius, caption, with_routes=True, use_satellite=True)
     else:
         # Tidak mengenali format teks
         bot.reply_to(message, 
@@ -1488,8 +1253,9 @@ def handle_text(message):
 def main():
     logger.info("Bot Telegram ODP mulai berjalan...")
     
-    # Muat data spreadsheet saat mulai
+    # Muat data spreadsheet saat mulai, lalu jalankan worker refresh latar belakang
     load_spreadsheet_data()
+    data_service.start()
     
     # Jalankan bot dengan penanganan error dan keep_alive=True
     # Ini akan mencoba terus menjalankan bot bahkan jika terjadi error
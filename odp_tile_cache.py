@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache tile peta dasar (XYZ) bersama untuk semua generator peta.
+
+Sebelumnya setiap generator memanggil ctx.add_basemap, yang mengunduh ulang
+tile setiap kali proses berjalan (contextily hanya menyimpan hasil di memori
+proses). Modul ini menyimpan tile di satu database SQLite dengan key
+provider/z/x/y, dibatasi ukuran total dan dibuang mulai dari tile yang paling
+lama tidak dipakai (LRU).
+
+- mosaic() menyusun tile dari cache menjadi satu gambar untuk area lng/lat
+  tertentu. Dengan fetch=False (atau ODP_TILE_OFFLINE=1) tidak ada akses
+  jaringan sama sekali; tile yang belum ada diisi warna latar.
+- add_basemap() pengganti ctx.add_basemap untuk axes matplotlib yang memakai
+  koordinat lng/lat (EPSG:4326), seperti semua generator peta di repo ini.
+  Baris gambar dipetakan ulang dari Web-Mercator ke latitude linier sehingga
+  jalan tepat di bawah titik ODP.
+- prefetch() mengisi cache untuk wilayah layanan (ODP_TILE_SERVICE_AREA)
+  agar peta tetap bisa dibuat saat provider tile tidak bisa diakses. Provider
+  harus disebut eksplisit dan bukan tile.openstreetmap.org, karena kebijakan
+  pemakaian tile OSM melarang unduhan massal:
+      python odp_tile_cache.py --prefetch --url 'https://tiles.example.com/{z}/{x}/{y}.png'
+- Unduhan dari tile.openstreetmap.org dibatasi OSM_MAX_WORKERS koneksi
+  bersamaan, berapa pun ODP_TILE_WORKERS.
+- Ukuran cache di disk diperiksa setiap kali tile baru disimpan dan di akhir
+  prefetch(), sehingga tidak pernah tertinggal di atas max_bytes.
+
+Lihat check_tile_cache.py untuk pemeriksaan dengan server tile lokal.
+"""
+
+import os
+import sys
+import math
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from io import BytesIO
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Lokasi database cache tile
+DEFAULT_TILE_CACHE_PATH = os.environ.get('ODP_TILE_CACHE_PATH', 'data/tile_cache.sqlite')
+
+# Ukuran maksimal cache tile di disk (MB) dan jumlah tile terdekode di memori
+TILE_CACHE_MAX_MB = float(os.environ.get('ODP_TILE_CACHE_MAX_MB', 500))
+MEMORY_MAX_TILES = int(os.environ.get('ODP_TILE_CACHE_MEMORY_TILES', 256))
+
+# Jangan mengunduh tile sama sekali (hanya memakai cache)
+TILE_OFFLINE = os.environ.get('ODP_TILE_OFFLINE', '0') == '1'
+
+# Jumlah unduhan tile paralel dan batas waktu per tile (detik)
+TILE_WORKERS = int(os.environ.get('ODP_TILE_WORKERS', 8))
+TILE_TIMEOUT = float(os.environ.get('ODP_TILE_TIMEOUT', 10))
+
+# Jumlah tile maksimal per peta; zoom diturunkan jika area terlalu besar
+MAX_TILES_PER_MAP = 64
+
+# Wilayah layanan untuk prefetch: "selatan,barat,utara,timur" (default Banjarmasin)
+SERVICE_AREA = tuple(float(value) for value in
+                     os.environ.get('ODP_TILE_SERVICE_AREA', '-3.40,114.52,-3.25,114.68').split(','))
+
+# Rentang zoom prefetch
+PREFETCH_ZOOMS = os.environ.get('ODP_TILE_PREFETCH_ZOOMS', '12-16')
+
+# Warna latar untuk tile yang tidak tersedia
+MISSING_TILE_COLOR = (230, 230, 230)
+
+# Kebijakan OpenStreetMap mewajibkan User-Agent yang jelas
+USER_AGENT = 'ReplBotCreator-ODP/1.0 (tile cache)'
+
+# Provider default (sama dengan ctx.providers.OpenStreetMap.Mapnik)
+DEFAULT_TILE_URL = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
+
+# Kebijakan pemakaian tile OSM: paling banyak 2 koneksi bersamaan dan tanpa prefetch massal
+OSM_TILE_HOST = 'tile.openstreetmap.org'
+OSM_MAX_WORKERS = 2
+
+# Batas latitude Web-Mercator
+MAX_LATITUDE = 85.05112878
+
+
+class TileSource(namedtuple('TileSource', ['name', 'url', 'max_zoom'])):
+    """Provider tile: nama (bagian key cache), template URL {z}/{x}/{y} dan zoom maksimal."""
+    __slots__ = ()
+
+    def tile_url(self, z, x, y):
+        return self.url.format(z=z, x=x, y=y, s='a', r='')
+
+
+def tile_source(source=None):
+    """
+    Provider tile dari TileProvider xyzservices (ctx.providers...), template URL, atau None (OSM).
+
+    Returns:
+        TileSource
+    """
+    if source is None:
+        return TileSource('OpenStreetMap.Mapnik', DEFAULT_TILE_URL, 19)
+    if isinstance(source, TileSource):
+        return source
+    if isinstance(source, str):
+        return TileSource(source, source, 19)
+    # TileProvider xyzservices: build_url mengisi token dan variabel lain selain x/y/z
+    url = source.build_url(x='{x}', y='{y}', z='{z}')
+    return TileSource(source.get('name', url), url, int(source.get('max_zoom') or 19))
+
+
+def is_osm_source(source):
+    """True jika tile diunduh dari server tile OpenStreetMap (tile.openstreetmap.org)."""
+    return OSM_TILE_HOST in tile_source(source).url
+
+
+def world_x(lngs):
+    """Koordinat dunia Web-Mercator x (0..1) untuk longitude."""
+    return (np.asarray(lngs, dtype=np.float64) + 180.0) / 360.0
+
+
+def world_y(lats):
+    """Koordinat dunia Web-Mercator y (0..1, utara = 0) untuk latitude."""
+    lats = np.radians(np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    return (1.0 - np.arcsinh(np.tan(lats)) / math.pi) / 2.0
+
+
+def tile_range(west, south, east, north, zoom):
+    """Rentang indeks tile (x0, x1, y0, y1), inklusif, yang menutupi area lng/lat."""
+    n = 2 ** zoom
+    x0, x1 = (int(np.clip(math.floor(value * n), 0, n - 1)) for value in world_x([west, east]))
+    y0, y1 = (int(np.clip(math.floor(value * n), 0, n - 1)) for value in world_y([north, south]))
+    return x0, x1, y0, y1
+
+
+def auto_zoom(west, east, width_pixels, max_zoom, tile_size=256):
+    """Zoom dengan resolusi tile minimal sama dengan resolusi gambar tujuan."""
+    span = max(float(world_x(east) - world_x(west)), 1e-12)
+    return int(np.clip(math.ceil(math.log2(width_pixels / (tile_size * span))), 0, max_zoom))
+
+
+def parse_zooms(text):
+    """'12-16' atau '14,16' menjadi list zoom."""
+    zooms = []
+    for part in str(text).split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            zooms.extend(range(int(start), int(end) + 1))
+        elif part.strip():
+            zooms.append(int(part))
+    return zooms
+
+
+class TileCache:
+    """
+    Cache tile XYZ di SQLite dengan batas ukuran (LRU) dan tile terdekode di memori.
+
+    Aman dipakai bersamaan dari beberapa thread. Jika database tidak bisa
+    dibuka, tile tetap diunduh tetapi hanya disimpan di memori.
+    """
+
+    def __init__(self, path=DEFAULT_TILE_CACHE_PATH, max_bytes=TILE_CACHE_MAX_MB * 1024 * 1024,
+                 memory_tiles=MEMORY_MAX_TILES, offline=TILE_OFFLINE, workers=TILE_WORKERS,
+                 timeout=TILE_TIMEOUT):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.memory_tiles = memory_tiles
+        self.offline = offline
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.downloads = 0
+        self.failures = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = USER_AGENT
+        self._db = self._open(path)
+
+    def _open(self, path):
+        if not path:
+            return None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS tiles (
+                              provider TEXT NOT NULL,
+                              z INTEGER NOT NULL,
+                              x INTEGER NOT NULL,
+                              y INTEGER NOT NULL,
+                              data BLOB NOT NULL,
+                              size INTEGER NOT NULL,
+                              last_used REAL NOT NULL,
+                              PRIMARY KEY (provider, z, x, y))""")
+            db.execute("CREATE INDEX IF NOT EXISTS tiles_last_used ON tiles (last_used)")
+            db.commit()
+            self._prune(db)
+            logger.info(f"Cache tile dibuka: {path}")
+            return db
+        except Exception as e:
+            logger.warning(f"Gagal membuka cache tile {path}, hanya memakai memori: {e}")
+            return None
+
+    def get_tiles(self, source, zoom, tiles, fetch=True):
+        """
+        Ambil tile terdekode (array RGB uint8) dari memori, disk, atau provider.
+
+        Args:
+            source: Provider tile (lihat tile_source)
+            zoom: Level zoom
+            tiles: List (x, y)
+            fetch: Unduh tile yang belum ada di cache
+
+        Returns:
+            dict (x, y) -> array (H, W, 3) untuk tile yang tersedia
+        """
+        source = tile_source(source)
+        found = {}
+        with self._lock:
+            missing = []
+            for x, y in tiles:
+                key = (source.name, zoom, x, y)
+                tile = self._memory.get(key)
+                if tile is not None:
+                    self._memory.move_to_end(key)
+                    found[(x, y)] = tile
+                    self.memory_hits += 1
+                else:
+                    missing.append((x, y))
+
+            for (x, y), data in self._load(source.name, zoom, missing).items():
+                tile = self._remember((source.name, zoom, x, y), data)
+                if tile is not None:
+                    found[(x, y)] = tile
+                    self.disk_hits += 1
+
+        missing = [xy for xy in missing if xy not in found]
+        if missing and fetch and not self.offline:
+            found.update(self._download(source, zoom, missing))
+        return found
+
+    def _load(self, name, zoom, tiles):
+        """Baca tile dari disk dan perbarui waktu pakai terakhirnya (dipanggil dengan lock)."""
+        if self._db is None or not tiles:
+            return {}
+        rows = {}
+        try:
+            # Batas parameter SQLite: query per potongan
+            for start in range(0, len(tiles), 200):
+                part = tiles[start:start + 200]
+                condition = " OR ".join("(x = ? AND y = ?)" for _ in part)
+                params = [value for xy in part for value in xy]
+                for x, y, data in self._db.execute(
+                        f"SELECT x, y, data FROM tiles WHERE provider = ? AND z = ? AND ({condition})",
+                        (name, zoom, *params)):
+                    rows[(x, y)] = data
+            if rows:
+                now = time.time()
+                self._db.executemany("UPDATE tiles SET last_used = ? WHERE provider = ? AND z = ? AND x = ? AND y = ?",
+                                     [(now, name, zoom, x, y) for x, y in rows])
+                self._db.commit()
+        except Exception as e:
+            logger.warning(f"Gagal membaca cache tile: {e}")
+        return rows
+
+    def _remember(self, key, data):
+        """Dekode tile dan simpan di LRU memori; None jika data rusak."""
+        try:
+            tile = np.asarray(Image.open(BytesIO(data)).convert('RGB'))
+        except Exception as e:
+            logger.warning(f"Tile {key} tidak bisa dibaca: {e}")
+            return None
+        self._memory[key] = tile
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_tiles:
+            self._memory.popitem(last=False)
+        return tile
+
+    def _fetch_one(self, source, zoom, x, y):
+        try:
+            response = self._session.get(source.tile_url(zoom, x, y), timeout=self.timeout)
+            if response.status_code == 200 and response.content:
+                return response.content
+            logger.warning(f"Gagal mengunduh tile {source.name} {zoom}/{x}/{y}: {response.status_code}")
+        except Exception as e:
+            logger.warning(f"Gagal mengunduh tile {source.name} {zoom}/{x}/{y}: {e}")
+        return None
+
+    def _download(self, source, zoom, tiles):
+        """Unduh tile secara paralel lalu simpan ke cache."""
+        workers = min(self.workers, OSM_MAX_WORKERS) if is_osm_source(source) else self.workers
+        with ThreadPoolExecutor(max_workers=max(min(workers, len(tiles)), 1)) as pool:
+            contents = list(pool.map(lambda xy: self._fetch_one(source, zoom, *xy), tiles))
+
+        found = {}
+        rows = []
+        now = time.time()
+        with self._lock:
+            for (x, y), data in zip(tiles, contents):
+                tile = self._remember((source.name, zoom, x, y), data) if data else None
+                if tile is None:
+                    self.failures += 1
+                    continue
+                found[(x, y)] = tile
+                rows.append((source.name, zoom, x, y, data, len(data), now))
+            self.downloads += len(rows)
+            self._store(rows)
+        return found
+
+    def _store(self, rows):
+        """Simpan tile baru ke disk lalu bersihkan jika ukuran melewati batas (dipanggil dengan lock)."""
+        if self._db is None or not rows:
+            return
+        try:
+            self._db.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+            self._prune(self._db)
+        except Exception as e:
+            logger.warning(f"Gagal menyimpan cache tile: {e}")
+
+    def prune(self):
+        """Bersihkan cache di disk sampai di bawah max_bytes (juga tile yang ditulis proses lain)."""
+        if self._db is None:
+            return
+        with self._lock:
+            try:
+                self._prune(self._db)
+            except Exception as e:
+                logger.warning(f"Gagal membersihkan cache tile: {e}")
+
+    def _prune(self, db):
+        """Hapus tile yang paling lama tidak dipakai sampai ukuran total di bawah batas."""
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Sisakan ruang 10% agar tidak langsung membersihkan lagi pada penulisan berikutnya
+        excess = total - int(self.max_bytes * 0.9)
+        deleted = db.execute("DELETE FROM tiles WHERE rowid IN ("
+                             "SELECT rowid FROM (SELECT rowid, size, SUM(size) OVER (ORDER BY last_used, rowid) AS freed "
+                             "FROM tiles) WHERE freed - size < ?)", (excess,)).rowcount
+        db.commit()
+        logger.info(f"Cache tile dibersihkan: {deleted} tile dihapus")
+
+    def mosaic(self, west, south, east, north, source=None, zoom=None, width_pixels=1024, fetch=True):
+        """
+        Susun tile menjadi gambar untuk area lng/lat dengan latitude linier (EPSG:4326).
+
+        Args:
+            west, south, east, north: Batas area (derajat)
+            source: Provider tile (lihat tile_source)
+            zoom: Level zoom; None = dipilih dari width_pixels
+            width_pixels: Lebar gambar tujuan (untuk memilih zoom)
+            fetch: Unduh tile yang belum ada di cache
+
+        Returns:
+            (array RGB uint8, (west, east, south, north)), atau None jika tidak ada tile sama sekali
+        """
+        source = tile_source(source)
+        if zoom is None:
+            zoom = auto_zoom(west, east, width_pixels, source.max_zoom)
+        zoom = int(min(zoom, source.max_zoom))
+        x0, x1, y0, y1 = tile_range(west, south, east, north, zoom)
+        while zoom > 0 and (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_TILES_PER_MAP:
+            zoom -= 1
+            x0, x1, y0, y1 = tile_range(west, south, east, north, zoom)
+
+        tiles = self.get_tiles(source, zoom, [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)],
+                               fetch=fetch)
+        if not tiles:
+            return None
+
+        # Semua tile disusun dalam satu array di ruang piksel Web-Mercator
+        size = next(iter(tiles.values())).shape[0]
+        canvas = np.empty(((y1 - y0 + 1) * size, (x1 - x0 + 1) * size, 3), dtype=np.uint8)
+        canvas[:] = MISSING_TILE_COLOR
+        for (x, y), tile in tiles.items():
+            if tile.shape[:2] == (size, size):
+                canvas[(y - y0) * size:(y - y0 + 1) * size, (x - x0) * size:(x - x0 + 1) * size] = tile
+
+        # Potong ke area lalu petakan ulang baris ke latitude linier (kolom sudah linier terhadap longitude)
+        scale = size * 2 ** zoom
+        left, right = np.clip((world_x([west, east]) * scale - x0 * size).astype(int), 0, canvas.shape[1] - 1)
+        top, bottom = world_y([north, south]) * scale - y0 * size
+        rows = max(int(round(bottom - top)), 1)
+        lats = north - (np.arange(rows) + 0.5) * (north - south) / rows
+        source_rows = np.clip((world_y(lats) * scale - y0 * size).astype(int), 0, canvas.shape[0] - 1)
+        return canvas[source_rows, left:right + 1], (west, east, south, north)
+
+    def add_basemap(self, ax, source=None, zoom=None, fetch=True, **kwargs):
+        """
+        Gambar peta dasar di bawah axes matplotlib berkoordinat lng/lat.
+
+        Pengganti ctx.add_basemap; batas axes dan aspek tidak diubah.
+
+        Raises:
+            RuntimeError: Tidak ada tile yang tersedia (agar pemanggil bisa mencoba provider lain)
+        """
+        west, east = ax.get_xlim()
+        south, north = ax.get_ylim()
+        width_pixels = ax.get_window_extent().width
+        result = self.mosaic(west, south, east, north, source=source, zoom=zoom, width_pixels=width_pixels,
+                             fetch=fetch)
+        if result is None:
+            raise RuntimeError(f"Tidak ada tile {tile_source(source).name} yang tersedia untuk area ini")
+        image, extent = result
+        kwargs.setdefault('zorder', 0)
+        kwargs.setdefault('interpolation', 'bilinear')
+        aspect = ax.get_aspect()
+        ax.imshow(image, extent=extent, origin='upper', aspect=aspect, **kwargs)
+        ax.set_xlim(west, east)
+        ax.set_ylim(south, north)
+        return image
+
+    def prefetch(self, source, area=SERVICE_AREA, zooms=PREFETCH_ZOOMS):
+        """
+        Isi cache dengan semua tile wilayah layanan pada rentang zoom tertentu.
+
+        Server tile OpenStreetMap ditolak: kebijakan pemakaiannya melarang
+        unduhan massal, jadi prefetch butuh provider sendiri atau berbayar.
+
+        Args:
+            source: Provider tile (TileProvider xyzservices, template URL atau TileSource)
+            area: (selatan, barat, utara, timur)
+            zooms: '12-16', '14,16' atau list zoom
+
+        Returns:
+            int: Jumlah tile yang tersedia di cache setelah prefetch, atau None jika provider ditolak
+        """
+        if source is None or is_osm_source(source):
+            logger.error("Prefetch dari tile.openstreetmap.org tidak diizinkan kebijakan pemakaian tile OSM; "
+                         "gunakan provider tile lain")
+            return None
+        south, west, north, east = area
+        if isinstance(zooms, str):
+            zooms = parse_zooms(zooms)
+        available = 0
+        for zoom in zooms:
+            x0, x1, y0, y1 = tile_range(west, south, east, north, zoom)
+            tiles = [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+            # Per potongan agar tile terdekode tidak menumpuk di memori
+            for start in range(0, len(tiles), self.memory_tiles):
+                available += len(self.get_tiles(source, zoom, tiles[start:start + self.memory_tiles]))
+            logger.info(f"Prefetch zoom {zoom}: {len(tiles)} tile")
+        self.prune()
+        return available
+
+    def stats(self):
+        """Statistik cache tile."""
+        lookups = self.memory_hits + self.disk_hits + self.downloads + self.failures
+        disk_tiles = disk_bytes = None
+        if self._db is not None:
+            with self._lock:
+                try:
+                    disk_tiles, disk_bytes = self._db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tiles").fetchone()
+                except Exception:
+                    pass
+        return {
+            "memory_tiles": len(self._memory),
+            "disk_tiles": disk_tiles,
+            "disk_bytes": disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "downloads": self.downloads,
+            "failures": self.failures,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_tile_cache():
+    """Cache tile bersama untuk proses ini (dibuat saat pertama dipakai)."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = TileCache()
+        return _shared_cache
+
+
+def add_basemap(ax, source=None, zoom=None, **kwargs):
+    """Pengganti ctx.add_basemap untuk axes lng/lat memakai cache tile bersama."""
+    return get_tile_cache().add_basemap(ax, source=source, zoom=zoom, **kwargs)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Cache tile peta dasar')
+    parser.add_argument('--prefetch', action='store_true', help='Isi cache untuk wilayah layanan')
+    parser.add_argument('--zooms', default=PREFETCH_ZOOMS, help='Rentang zoom prefetch, misalnya 12-16')
+    parser.add_argument('--area', default=None, help='Wilayah "selatan,barat,utara,timur" (default ODP_TILE_SERVICE_AREA)')
+    parser.add_argument('--url', default=None,
+                        help='Template URL tile {z}/{x}/{y} (wajib untuk --prefetch, selain tile.openstreetmap.org)')
+    args = parser.parse_args()
+
+    if args.prefetch and (args.url is None or is_osm_source(args.url)):
+        parser.error("--prefetch butuh --url provider tile selain tile.openstreetmap.org "
+                     "(kebijakan pemakaian tile OSM melarang unduhan massal)")
+
+    cache = get_tile_cache()
+    if args.prefetch:
+        area = tuple(float(value) for value in args.area.split(',')) if args.area else SERVICE_AREA
+        available = cache.prefetch(args.url, area, args.zooms)
+        print(f"{available} tile tersedia di cache")
+    print(cache.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,10 +7,13 @@ import logging
 import re
 from geopy.distance import geodesic
 import contextily as ctx
+from odp_tile_cache import add_basemap
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
 import matplotlib.patheffects as path_effects
 from flask import Flask, request, send_file, jsonify
 import argparse
+from odp_dataset import PreparedDataset
+from odp_data_service import get_data_service
 
 # Konfigurasi logging
 logging.basicConfig(level=logging.INFO)
@@ -65,6 +68,12 @@ def find_nearby_odps(data, ref_lat, ref_lng, radius_meters=500):
             logger.error("Data tidak tersedia")
             return None
             
+        # Dataset bersama dari layanan data: gunakan indeks spasial tanpa menyalin seluruh data
+        if isinstance(data, PreparedDataset):
+            nearby = data.within_radius(ref_lat, ref_lng, radius_meters)
+            logger.info(f"Ditemukan {len(nearby)} ODP dalam radius {radius_meters}m")
+            return nearby
+            
         # Buat salinan data
         df = data.copy()
         
@@ -188,7 +197,7 @@ def create_odp_map(ref_lat, ref_lng, nearby_df, radius_meters=500, with_coords=T
         
         # Tambahkan basemap dari OpenStreetMap
         try:
-            ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik)
+            add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik)
         except Exception as e:
             logger.warning(f"Tidak dapat menambahkan peta dasar: {e}")
         
@@ -242,8 +251,8 @@ def search_odp_route():
         # Parameter tambahan 
         as_json = request.args.get('json', 'false').lower() == 'true'
         
-        # Muat data
-        data = load_spreadsheet_data()
+        # Ambil dataset bersama yang sudah dimuat (tanpa unduh ulang spreadsheet per request)
+        data = get_data_service(SPREADSHEET_URL).get_dataset()
         if data is None:
             return jsonify({"error": "Gagal memuat data dari spreadsheet"}), 500
             
@@ -273,12 +282,13 @@ def search_odp_route():
             # Siapkan data ODP untuk respons JSON
             odp_list = []
             for _, row in nearby_odps.iterrows():
+                availability = row.get(AVAI_COLUMN, "N/A")
                 odp_data = {
                     "name": row.get(NAME_COLUMN, f"ODP #{_+1}"),
                     "latitude": row[LAT_COLUMN],
                     "longitude": row[LNG_COLUMN],
                     "distance": row['jarak_meter'],
-                    "availability": row.get(AVAI_COLUMN, "N/A")
+                    "availability": None if pd.isna(availability) else availability
                 }
                 odp_list.append(odp_data)
                 
@@ -3,7 +3,8 @@ import logging
 import pandas as pd
 import telebot
 from telebot import types
-from geopy.distance import geodesic
+from odp_spatial_index import build_spatial_index, find_within_radius
+from odp_data_service import get_data_service
 import tempfile
 import re
 import uuid
@@ -178,8 +179,10 @@ def web_search():
         radius = DEFAULT_RADIUS
         
         # Muat data dari spreadsheet
+        # (gunakan dataset bersama yang sudah dimuat, tanpa unduh ulang spreadsheet)
         sheet_handler = SpreadsheetHandler(SPREADSHEET_URL)
-        data = sheet_handler.load_from_url()
+        dataset = get_data_service(SPREADSHEET_URL).get_dataset()
+        data = sheet_handler.use_dataset(dataset) if dataset is not None else None
         
         if data is None:
             return "Gagal memuat data dari spreadsheet. Pastikan URL spreadsheet valid dan dapat diakses secara publik.", 500
@@ -309,6 +312,10 @@ class SpreadsheetHandler:
         """Inisialisasi handler spreadsheet."""
         self.url = url
         self.data = None
+        self.dataset = None
+        self.valid_data = None
+        self.index = None
+        self.index_columns = None
         
     def load_from_url(self, url=None, sheet_name="Sheet1"):
         """
@@ -345,6 +352,7 @@ class SpreadsheetHandler:
                 # Muat data ke pandas DataFrame
                 self.data = pd.read_csv(csv_export_url)
                 logger.info(f"Berhasil memuat {len(self.data)} baris data dari sheet {sheet_name}")
+                self.build_index()
                 return self.data
             except Exception as e:
                 logger.warning(f"Gagal akses dengan nama sheet: {e}")
@@ -365,12 +373,49 @@ class SpreadsheetHandler:
                 # Muat data ke pandas DataFrame
                 self.data = pd.read_csv(csv_export_url)
                 logger.info(f"Berhasil memuat {len(self.data)} baris data menggunakan GID")
+                self.build_index()
                 return self.data
 
         except Exception as e:
             logger.error(f"Error saat memuat spreadsheet: {e}")
             return None
     
+    def use_dataset(self, dataset):
+        """
+        Gunakan dataset bersama dari layanan data alih-alih mengunduh spreadsheet.
+        
+        Args:
+            dataset: PreparedDataset dari OdpDataService
+        """
+        # Baris dibaca langsung dari dataset bersama saat pencarian, tanpa DataFrame penuh
+        self.dataset = dataset
+        self.data = None
+        self.valid_data = None
+        self.index = dataset.index
+        self.index_columns = (LAT_COLUMN, LNG_COLUMN)
+        return dataset
+        
+    def build_index(self, lat_col=LAT_COLUMN, lng_col=LNG_COLUMN):
+        """
+        Bangun indeks spasial untuk data yang sudah dimuat.
+        
+        Args:
+            lat_col: Nama kolom latitude di DataFrame
+            lng_col: Nama kolom longitude di DataFrame
+            
+        Returns:
+            SpatialIndex atau None jika kolom koordinat tidak ditemukan
+        """
+        self.dataset = None
+        self.valid_data = None
+        self.index = None
+        if self.data is None or lat_col not in self.data.columns or lng_col not in self.data.columns:
+            return None
+            
+        self.valid_data, self.index = build_spatial_index(self.data, lat_col, lng_col)
+        self.index_columns = (lat_col, lng_col)
+        return self.index
+        
     def find_nearby_locations(self, lat, lng, lat_col, lng_col, radius_meters=DEFAULT_RADIUS):
         """
         Temukan lokasi dalam radius tertentu dari titik referensi.
@@ -385,6 +430,10 @@ class SpreadsheetHandler:
         Returns:
             DataFrame dengan lokasi-lokasi yang berada dalam radius
         """
+        # Dataset bersama: ambil hanya baris dalam radius langsung dari dataset
+        if self.dataset is not None and (lat_col, lng_col) == (LAT_COLUMN, LNG_COLUMN):
+            return self.dataset.within_radius(lat, lng, radius_meters)
+        
         if self.data is None:
             logger.error("Data belum dimuat dari spreadsheet")
             return None
@@ -394,29 +443,12 @@ class SpreadsheetHandler:
             logger.error(f"Kolom {lat_col} atau {lng_col} tidak ditemukan di spreadsheet")
             return None
         
-        # Konversi nilai latitude dan longitude ke tipe numerik
-        data_copy = self.data.copy()
-        data_copy[lat_col] = pd.to_numeric(data_copy[lat_col], errors='coerce')
-        data_copy[lng_col] = pd.to_numeric(data_copy[lng_col], errors='coerce')
-        
-        # Hapus data dengan lat/lng yang tidak valid
-        valid_df = data_copy.dropna(subset=[lat_col, lng_col]).copy()
-        
-        # Titik referensi
-        ref_point = (lat, lng)
-        
-        # Hitung jarak untuk setiap lokasi
-        distances = []
-        for _, row in valid_df.iterrows():
-            location_point = (row[lat_col], row[lng_col])
-            distance = geodesic(ref_point, location_point).meters
-            distances.append(distance)
-        
-        # Tambahkan kolom jarak
-        valid_df['jarak_meter'] = distances
+        # Bangun indeks spasial jika belum ada untuk kolom koordinat ini
+        if self.index is None or self.index_columns != (lat_col, lng_col):
+            self.build_index(lat_col, lng_col)
         
-        # Filter lokasi dalam radius yang ditentukan
-        nearby_locations = valid_df[valid_df['jarak_meter'] <= radius_meters].copy()
+        # Ambil lokasi dalam radius hanya dari sel grid di sekitar titik referensi
+        nearby_locations = find_within_radius(self.valid_data, self.index, lat, lng, radius_meters)
         
         # Urutkan berdasarkan jarak
         nearby_locations = nearby_locations.sort_values(by='jarak_meter')
@@ -655,8 +687,10 @@ def handle_text(message):
         
         try:
             # Muat data dari spreadsheet
+            # Gunakan dataset bersama yang sudah dimuat (tanpa unduh ulang spreadsheet)
             sheet_handler = SpreadsheetHandler(SPREADSHEET_URL)
-            data = sheet_handler.load_from_url()
+            dataset = get_data_service(SPREADSHEET_URL).get_dataset()
+            data = sheet_handler.use_dataset(dataset) if dataset is not None else None
             
             if data is None:
                 bot.reply_to(message, "Gagal memuat data dari spreadsheet. Pastikan URL spreadsheet valid dan dapat diakses secara publik.")
@@ -9,6 +9,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from geopy.distance import geodesic
 import contextily as ctx
+from odp_tile_cache import add_basemap
 import matplotlib.patheffects as path_effects
 import uuid
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox
@@ -207,7 +208,7 @@ def create_odp_map(ref_lat, ref_lng, nearby_df, radius_meters=500, with_coords=T
         
         # Tambahkan basemap dari OpenStreetMap
         try:
-            ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik)
+            add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik)
         except Exception as e:
             logger.warning(f"Tidak dapat menambahkan peta dasar: {e}")
         
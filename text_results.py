@@ -1,7 +1,8 @@
 import os
 import pandas as pd
 import folium
-from geopy.distance import geodesic
+from odp_spatial_index import build_spatial_index, find_within_radius
+from odp_data_service import get_data_service
 import uuid
 import logging
 from flask import Flask, request, jsonify, render_template, send_file
@@ -37,6 +38,10 @@ class SpreadsheetHandler:
         """Inisialisasi handler spreadsheet."""
         self.url = url
         self.data = None
+        self.dataset = None
+        self.valid_data = None
+        self.index = None
+        self.index_columns = None
         
     def load_from_url(self, url=None, sheet_name="Sheet1"):
         """
@@ -73,12 +78,49 @@ class SpreadsheetHandler:
             
             # Simpan data
             self.data = df
+            self.build_index()
             return df
             
         except Exception as e:
             logger.error(f"Error saat memuat data dari spreadsheet: {e}")
             return None
             
+    def use_dataset(self, dataset):
+        """
+        Gunakan dataset bersama dari layanan data alih-alih mengunduh spreadsheet.
+        
+        Args:
+            dataset: PreparedDataset dari OdpDataService
+        """
+        # Baris dibaca langsung dari dataset bersama saat pencarian, tanpa DataFrame penuh
+        self.dataset = dataset
+        self.data = None
+        self.valid_data = None
+        self.index = dataset.index
+        self.index_columns = (LAT_COLUMN, LNG_COLUMN)
+        return dataset
+        
+    def build_index(self, lat_col=LAT_COLUMN, lng_col=LNG_COLUMN):
+        """
+        Bangun indeks spasial untuk data yang sudah dimuat.
+        
+        Args:
+            lat_col: Nama kolom latitude di DataFrame
+            lng_col: Nama kolom longitude di DataFrame
+            
+        Returns:
+            SpatialIndex atau None jika kolom koordinat tidak ditemukan
+        """
+        self.dataset = None
+        self.valid_data = None
+        self.index = None
+        if self.data is None or lat_col not in self.data.columns or lng_col not in self.data.columns:
+            return None
+            
+        self.valid_data, self.index = build_spatial_index(self.data, lat_col, lng_col)
+        self.index_columns = (lat_col, lng_col)
+        return self.index
+        
     def find_nearby_locations(self, lat, lng, lat_col, lng_col, radius_meters=DEFAULT_RADIUS):
         """
         Temukan lokasi dalam radius tertentu dari titik referensi.
@@ -94,6 +136,10 @@ class SpreadsheetHandler:
             DataFrame dengan lokasi-lokasi yang berada dalam radius
         """
         try:
+            # Dataset bersama: ambil hanya baris dalam radius langsung dari dataset
+            if self.dataset is not None and (lat_col, lng_col) == (LAT_COLUMN, LNG_COLUMN):
+                return self.dataset.within_radius(lat, lng, radius_meters)
+            
             if self.data is None:
                 raise ValueError("Data belum dimuat")
                 
@@ -101,26 +147,12 @@ class SpreadsheetHandler:
             if lat_col not in self.data.columns or lng_col not in self.data.columns:
                 raise ValueError(f"Kolom {lat_col} atau {lng_col} tidak ditemukan di data")
                 
-            # Buat salinan data
-            df = self.data.copy()
-            
-            # Filter baris dengan data latitude dan longitude yang valid
-            df = df.dropna(subset=[lat_col, lng_col])
-            
-            # Konversi ke numerik jika string
-            df[lat_col] = pd.to_numeric(df[lat_col], errors='coerce')
-            df[lng_col] = pd.to_numeric(df[lng_col], errors='coerce')
-            df = df.dropna(subset=[lat_col, lng_col])
-            
-            # Hitung jarak dalam meter
-            ref_point = (lat, lng)
-            df['jarak_meter'] = df.apply(
-                lambda row: geodesic(ref_point, (row[lat_col], row[lng_col])).meters,
-                axis=1
-            )
+            # Bangun indeks spasial jika belum ada untuk kolom koordinat ini
+            if self.index is None or self.index_columns != (lat_col, lng_col):
+                self.build_index(lat_col, lng_col)
             
-            # Filter lokasi dalam radius
-            nearby = df[df['jarak_meter'] <= radius_meters].copy()
+            # Ambil lokasi dalam radius hanya dari sel grid di sekitar titik referensi
+            nearby = find_within_radius(self.valid_data, self.index, lat, lng, radius_meters)
             
             # Urutkan berdasarkan jarak
             if not nearby.empty:
@@ -217,8 +249,10 @@ def text_search():
             radius = int(request.form.get('radius', DEFAULT_RADIUS))
             
             # Cari lokasi terdekat
+            # Gunakan dataset bersama yang sudah dimuat (tanpa unduh ulang spreadsheet)
             sheet_handler = SpreadsheetHandler(SPREADSHEET_URL)
-            data = sheet_handler.load_from_url()
+            dataset = get_data_service(SPREADSHEET_URL).get_dataset()
+            data = sheet_handler.use_dataset(dataset) if dataset is not None else None
             
             if data is None:
                 return jsonify({"error": "Gagal memuat data dari spreadsheet"}), 500